@@ -0,0 +1,23 @@
+"""Composite index on srs (user_id, due_date)
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_srs_user_id_due_date', 'srs', ['user_id', 'due_date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_srs_user_id_due_date', table_name='srs')
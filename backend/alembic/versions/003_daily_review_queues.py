@@ -0,0 +1,42 @@
+"""Precomputed daily review queues
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_review_queues',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column('user_key', sa.String(36), nullable=False),
+        sa.Column('queue_date', sa.Date(), nullable=False),
+        sa.Column('overdue', postgresql.JSON(), nullable=False),
+        sa.Column('due_today', postgresql.JSON(), nullable=False),
+        sa.Column('overdue_complete', sa.Boolean(), nullable=False),
+        sa.Column('due_today_complete', sa.Boolean(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('user_key', 'queue_date', name='uq_daily_review_queues_user_date'),
+    )
+    op.create_index('ix_daily_review_queues_id', 'daily_review_queues', ['id'])
+    op.create_index('ix_daily_review_queues_queue_date', 'daily_review_queues', ['queue_date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_review_queues_queue_date', table_name='daily_review_queues')
+    op.drop_index('ix_daily_review_queues_id', table_name='daily_review_queues')
+    op.drop_table('daily_review_queues')
@@ -0,0 +1,29 @@
+"""Indexes for keyset-paginated card listings
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_cards_created_at_id', 'cards', ['created_at', 'id'])
+    op.create_index(
+        'ix_cards_type_created_at_id_difficulty', 'cards', ['card_type', 'created_at', 'id', 'difficulty']
+    )
+    op.create_index('ix_knowledge_chapter_id_id', 'knowledge', ['chapter_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_knowledge_chapter_id_id', table_name='knowledge')
+    op.drop_index('ix_cards_type_created_at_id_difficulty', table_name='cards')
+    op.drop_index('ix_cards_created_at_id', table_name='cards')
@@ -0,0 +1,35 @@
+"""Sync change log
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_change_log',
+        sa.Column('seq', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('entity_type', sa.String(20), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('operation', sa.String(10), nullable=False),
+        sa.Column('changes', postgresql.JSON(), nullable=True),
+        sa.Column('client_id', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_sync_change_log_created_at', 'sync_change_log', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_change_log_created_at', table_name='sync_change_log')
+    op.drop_table('sync_change_log')
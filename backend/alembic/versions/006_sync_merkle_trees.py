@@ -0,0 +1,33 @@
+"""Sync Merkle trees
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Leaves of existing data are written by the Merkle tree repair job
+    op.create_table('sync_entity_hashes',
+        sa.Column('entity_type', sa.String(20), primary_key=True),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.Column('hash', sa.String(64), nullable=False),
+    )
+    op.create_index('ix_sync_entity_hashes_type_bucket', 'sync_entity_hashes', ['entity_type', 'bucket'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_entity_hashes_type_bucket', table_name='sync_entity_hashes')
+    op.drop_table('sync_entity_hashes')
@@ -21,6 +21,7 @@ from app.models.learning import Card, CardType, SRS
 from app.core.config import settings
 from app.services.document_service import DocumentService
 from app.services.card_generation_service import CardGenerationService
+from app.services.card_listing import CardListFilters, card_page_statement, count_cards, format_card_page
 from app.schemas.document import DocumentResponse, DocumentCreate
 from app.utils.file_validation import validate_file
 from app.utils.security import SecurityValidator, generate_secure_filename
@@ -886,11 +887,15 @@ async def get_multiple_document_status(
 async def retry_document_processing(
     document_id: UUID,
     priority: bool = False,
+    full_reprocess: bool = False,
     db: AsyncSession = Depends(get_async_db)
 ) -> dict:
     """
     Retry processing for a failed document
     
+    Processing resumes from the last completed stage and only failed chapters
+    are redone; pass ``full_reprocess=true`` to run the whole pipeline again.
+    
     Requirements: 5.3, 5.5 - Error handling and recovery
     """
     try:
@@ -912,13 +917,16 @@ async def retry_document_processing(
             )
         
         # Retry processing
-        job_id = await doc_service.retry_processing(document_id, priority=priority)
+        job_id = await doc_service.retry_processing(
+            document_id, priority=priority, full_reprocess=full_reprocess
+        )
         
         return {
             "document_id": str(document_id),
             "job_id": job_id,
             "status": "queued_for_retry",
             "priority": priority,
+            "full_reprocess": full_reprocess,
             "message": "Document queued for retry processing"
         }
         
@@ -1362,78 +1370,50 @@ async def get_cards(
     difficulty_min: Optional[float] = Query(None, ge=0.0, le=5.0, description="Minimum difficulty"),
     difficulty_max: Optional[float] = Query(None, ge=0.0, le=5.0, description="Maximum difficulty"),
     limit: int = Query(50, ge=1, le=200, description="Maximum number of cards"),
-    offset: int = Query(0, ge=0, description="Number of cards to skip"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    offset: int = Query(0, ge=0, description="Number of cards to skip (deprecated, use cursor)"),
+    total: Optional[str] = Query(
+        None, pattern="^(exact|approximate)$", description="Also count all matching cards: 'exact' or 'approximate'"
+    ),
     db: AsyncSession = Depends(get_async_db)
 ) -> dict:
     """
-    Get flashcards with filtering options
+    Get flashcards with filtering options, newest first
+    
+    Pages are linked by ``next_cursor``, which stays fast for deep pages.
+    ``total_cards`` is the number of cards in the page; the number of all
+    matching cards is only counted when ``total`` is requested.
     
     Requirements: 6.4 - Card management and retrieval
     """
-    
-    # Build base query
-    cards_stmt = (
-        select(Card, Knowledge, Chapter)
-        .join(Knowledge, Card.knowledge_id == Knowledge.id)
-        .join(Chapter, Knowledge.chapter_id == Chapter.id)
-    )
-    
-    # Apply filters
-    if document_id:
-        cards_stmt = cards_stmt.join(Document, Chapter.document_id == Document.id).where(Document.id == document_id)
-    
-    if chapter_id:
-        cards_stmt = cards_stmt.where(Chapter.id == chapter_id)
-    
+    card_type_enum = None
     if card_type:
         try:
             card_type_enum = CardType(card_type.lower())
-            cards_stmt = cards_stmt.where(Card.card_type == card_type_enum)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid card type: {card_type}"
             )
     
-    if difficulty_min is not None:
-        cards_stmt = cards_stmt.where(Card.difficulty >= difficulty_min)
-    
-    if difficulty_max is not None:
-        cards_stmt = cards_stmt.where(Card.difficulty <= difficulty_max)
+    filters = CardListFilters(
+        document_id=document_id,
+        chapter_id=chapter_id,
+        card_type=card_type_enum,
+        difficulty_min=difficulty_min,
+        difficulty_max=difficulty_max
+    )
     
-    # Apply pagination and ordering
-    cards_stmt = cards_stmt.offset(offset).limit(limit).order_by(Card.created_at.desc())
+    try:
+        cards_stmt = card_page_statement(filters, limit, cursor=cursor, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     # Execute query
     cards_result = await db.execute(cards_stmt)
-    results = cards_result.all()
+    cards_data, next_cursor = format_card_page(cards_result.all(), limit)
     
-    # Format response
-    cards_data = []
-    for card, knowledge, chapter in results:
-        card_info = {
-            "id": str(card.id),
-            "card_type": card.card_type.value,
-            "front": card.front,
-            "back": card.back,
-            "difficulty": card.difficulty,
-            "metadata": card.card_metadata or {},
-            "knowledge": {
-                "id": str(knowledge.id),
-                "kind": knowledge.kind.value,
-                "text": knowledge.text[:200] + "..." if len(knowledge.text) > 200 else knowledge.text,
-                "entities": knowledge.entities or []
-            },
-            "chapter": {
-                "id": str(chapter.id),
-                "title": chapter.title,
-                "document_id": str(chapter.document_id)
-            },
-            "created_at": card.created_at.isoformat()
-        }
-        cards_data.append(card_info)
-    
-    return {
+    response = {
         "total_cards": len(cards_data),
         "filters_applied": {
             "document_id": str(document_id) if document_id else None,
@@ -1441,8 +1421,17 @@ async def get_cards(
             "card_type": card_type,
             "difficulty_range": [difficulty_min, difficulty_max]
         },
-        "cards": cards_data
+        "cards": cards_data,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
     }
+    
+    if total:
+        response["total"], response["total_is_estimate"] = await count_cards(
+            db, filters, approximate=total == "approximate"
+        )
+    
+    return response
 
 
 @router.get("/privacy/status")
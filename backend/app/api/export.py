@@ -3,16 +3,21 @@ Export API endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from uuid import UUID
+from typing import Callable, Iterator, Optional, List
+from uuid import UUID, uuid4
+from pathlib import Path
 from pydantic import BaseModel, Field
-import io
+import aiofiles
+import asyncio
 import logging
 
+from ..core.config import settings
 from ..core.database import get_db
+from ..services.queue_service import QueueService
 from ..services.export_service import get_export_service, ExportService
+from ..services.export_jobs import EXPORT_FORMATS, export_filename, export_storage, plan_export
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +25,27 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/export", tags=["export"])
 
 
+def _stream_in_own_session(db: Session, chunks: Callable[[ExportService], Iterator[str]]) -> Iterator[str]:
+    """
+    Export chunks read through a session of their own
+    
+    The request's session can be closed before the body streams (yield
+    dependencies are torn down first on FastAPI 0.106-0.117), so the chunks
+    are read through a new session on the same engine, closed when the
+    stream ends.
+    """
+    bind = db.get_bind()
+    
+    def stream() -> Iterator[str]:
+        session = Session(bind=bind, autoflush=False)
+        try:
+            yield from chunks(get_export_service(session))
+        finally:
+            session.close()
+    
+    return stream()
+
+
 class ImportResult(BaseModel):
     """Import operation result"""
     success: bool
@@ -28,6 +54,27 @@ class ImportResult(BaseModel):
     errors: Optional[List[str]] = None
 
 
+class ExportJobRequest(BaseModel):
+    """Background export request"""
+    format: str = Field(..., description="Export format: 'anki_csv', 'notion_csv', 'jsonl' or 'apkg'")
+    document_id: Optional[UUID] = Field(None, description="Filter by document ID")
+    chapter_ids: Optional[List[UUID]] = Field(None, description="Filter by chapter IDs")
+
+
+class ExportJobStatus(BaseModel):
+    """Background export status"""
+    export_id: str
+    format: Optional[str] = None
+    status: str
+    cards_total: int = 0
+    cards_written: int = 0
+    parts: List[dict] = []
+    status_url: str
+    download_url: Optional[str] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+
 class ExportFormat(BaseModel):
     """Export format description"""
     name: str
@@ -60,13 +107,11 @@ async def export_csv(
     Returns CSV file with format-specific columns
     """
     try:
-        export_service = get_export_service(db)
-        
         if format.lower() == "anki":
-            csv_content = export_service.export_anki_csv(document_id, chapter_ids)
+            csv_chunks = _stream_in_own_session(db, lambda service: service.iter_anki_csv(document_id, chapter_ids))
             filename_prefix = "anki_export"
         elif format.lower() == "notion":
-            csv_content = export_service.export_notion_csv(document_id, chapter_ids)
+            csv_chunks = _stream_in_own_session(db, lambda service: service.iter_notion_csv(document_id, chapter_ids))
             filename_prefix = "notion_export"
         else:
             raise HTTPException(status_code=400, detail="Invalid format. Use 'anki' or 'notion'")
@@ -77,9 +122,9 @@ async def export_csv(
         else:
             filename = f"{filename_prefix}_all.csv"
         
-        # Return as streaming response
+        # Stream rows as they are read
         return StreamingResponse(
-            io.StringIO(csv_content),
+            csv_chunks,
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -103,8 +148,7 @@ async def export_anki_csv(
     Returns CSV file with columns: Front, Back, Tags, Type, Deck, Difficulty, Source
     """
     try:
-        export_service = get_export_service(db)
-        csv_content = export_service.export_anki_csv(document_id, chapter_ids)
+        csv_chunks = _stream_in_own_session(db, lambda service: service.iter_anki_csv(document_id, chapter_ids))
         
         # Create filename
         if document_id:
@@ -112,9 +156,9 @@ async def export_anki_csv(
         else:
             filename = "anki_export_all.csv"
         
-        # Return as streaming response
+        # Stream rows as they are read
         return StreamingResponse(
-            io.StringIO(csv_content),
+            csv_chunks,
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -138,8 +182,7 @@ async def export_notion_csv(
     Returns CSV file with columns optimized for Notion import
     """
     try:
-        export_service = get_export_service(db)
-        csv_content = export_service.export_notion_csv(document_id, chapter_ids)
+        csv_chunks = _stream_in_own_session(db, lambda service: service.iter_notion_csv(document_id, chapter_ids))
         
         # Create filename
         if document_id:
@@ -147,9 +190,9 @@ async def export_notion_csv(
         else:
             filename = "notion_export_all.csv"
         
-        # Return as streaming response
+        # Stream rows as they are read
         return StreamingResponse(
-            io.StringIO(csv_content),
+            csv_chunks,
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -171,8 +214,7 @@ async def export_jsonl(
     Returns JSONL file with complete document data including all relationships
     """
     try:
-        export_service = get_export_service(db)
-        jsonl_content = export_service.export_jsonl_backup(document_id)
+        jsonl_chunks = _stream_in_own_session(db, lambda service: service.iter_jsonl_backup(document_id))
         
         # Create filename
         if document_id:
@@ -180,9 +222,9 @@ async def export_jsonl(
         else:
             filename = "export_all.jsonl"
         
-        # Return as streaming response
+        # Stream rows as they are read
         return StreamingResponse(
-            io.StringIO(jsonl_content),
+            jsonl_chunks,
             media_type="application/jsonl",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -204,8 +246,7 @@ async def export_jsonl_backup(
     Returns JSONL file with complete document data including all relationships
     """
     try:
-        export_service = get_export_service(db)
-        jsonl_content = export_service.export_jsonl_backup(document_id)
+        jsonl_chunks = _stream_in_own_session(db, lambda service: service.iter_jsonl_backup(document_id))
         
         # Create filename
         if document_id:
@@ -213,9 +254,9 @@ async def export_jsonl_backup(
         else:
             filename = "backup_all.jsonl"
         
-        # Return as streaming response
+        # Stream rows as they are read
         return StreamingResponse(
-            io.StringIO(jsonl_content),
+            jsonl_chunks,
             media_type="application/jsonl",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -228,6 +269,7 @@ async def export_jsonl_backup(
 async def import_jsonl_backup(
     file: UploadFile = File(..., description="JSONL backup file to import"),
     validate_only: bool = Query(False, description="Only validate the file without importing"),
+    background: bool = Query(False, description="Import in a background job and return its ID"),
     db: Session = Depends(get_db)
 ):
     """
@@ -235,11 +277,12 @@ async def import_jsonl_backup(
     
     - **file**: JSONL backup file to restore
     - **validate_only**: If true, only validate the file structure without importing
+    - **background**: If true, queue the import and return a job whose progress
+      is reported by `/api/queue/job/{job_id}`
     
-    Returns summary of imported data and any errors encountered
+    The file is read line by line and imported in batches. Returns summary
+    of imported data and any errors encountered
     """
-    errors = []
-    
     try:
         # Validate file exists and has content
         if not file.filename:
@@ -253,23 +296,30 @@ async def import_jsonl_backup(
         if file.size and file.size > 100 * 1024 * 1024:
             raise HTTPException(status_code=400, detail="File size exceeds 100MB limit")
         
-        # Read file content
-        try:
-            content = await file.read()
-            jsonl_content = content.decode('utf-8')
-        except UnicodeDecodeError:
-            raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
-        
         # Validate content is not empty
-        if not jsonl_content.strip():
+        if file.size == 0:
             raise HTTPException(status_code=400, detail="File is empty")
         
+        if background and not validate_only:
+            import_id = uuid4()
+            file_path = await _save_backup_upload(file, import_id)
+            job_id = QueueService().enqueue_backup_import(import_id, str(file_path))
+            return ImportResult(
+                success=True,
+                message="Import queued",
+                summary={'job_id': job_id, 'status_url': f"/api/queue/job/{job_id}"}
+            )
+        
         # Get export service
         export_service = get_export_service(db)
         
         if validate_only:
-            # Only validate the file structure
-            validation_result = export_service.validate_jsonl_backup(jsonl_content)
+            # Only validate the file structure, reading the upload line by line
+            validation_result = await asyncio.get_event_loop().run_in_executor(
+                None, export_service.validate_jsonl_stream, file.file
+            )
+            if validation_result["total_lines"] == 0:
+                raise HTTPException(status_code=400, detail="File is empty")
             return ImportResult(
                 success=validation_result["valid"],
                 message="Validation completed",
@@ -277,8 +327,12 @@ async def import_jsonl_backup(
                 errors=validation_result.get("errors", [])
             )
         else:
-            # Import data
-            result = export_service.import_jsonl_backup(jsonl_content)
+            # Import data, reading the upload line by line
+            result = await asyncio.get_event_loop().run_in_executor(
+                None, export_service.import_jsonl_stream, file.file
+            )
+            if result["lines_read"] == 0:
+                raise HTTPException(status_code=400, detail="File is empty")
             
             return ImportResult(
                 success=result.get("success", True),
@@ -294,6 +348,99 @@ async def import_jsonl_backup(
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
 
+async def _save_backup_upload(file: UploadFile, import_id: UUID) -> Path:
+    """Copy an uploaded backup to the upload directory for a background import"""
+    import_dir = Path(settings.upload_dir) / "imports"
+    import_dir.mkdir(parents=True, exist_ok=True)
+    file_path = import_dir / f"{import_id}.jsonl"
+    async with aiofiles.open(file_path, 'wb') as f:
+        while chunk := await file.read(64 * 1024):
+            await f.write(chunk)
+    return file_path
+
+
+@router.post("/jobs", response_model=ExportJobStatus, status_code=202)
+async def create_export_job(request: ExportJobRequest, db: Session = Depends(get_db)):
+    """
+    Start a background export
+    
+    - **format**: 'anki_csv', 'notion_csv', 'jsonl' (backup) or 'apkg' (Anki package with media)
+    - **document_id**: Optional document ID to filter cards
+    - **chapter_ids**: Optional list of chapter IDs to filter cards
+    
+    The cards are rendered by chapter ranges in parallel jobs. Poll the
+    returned status URL until the export is completed, then download it.
+    """
+    if request.format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    try:
+        export_id = uuid4()
+        parts = plan_export(db, request.format, request.document_id, request.chapter_ids)
+        QueueService().enqueue_export(
+            export_id,
+            request.format,
+            parts,
+            export_filename(request.format, request.document_id),
+            document_id=request.document_id
+        )
+        return ExportJobStatus(
+            export_id=str(export_id),
+            format=request.format,
+            status="queued",
+            cards_total=sum(part.card_count for part in parts),
+            parts=[part.to_dict() for part in parts],
+            status_url=f"/api/export/jobs/{export_id}"
+        )
+    except Exception as e:
+        logger.error(f"Failed to start export: {e}")
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+@router.get("/jobs/{export_id}", response_model=ExportJobStatus)
+async def get_export_job(export_id: UUID):
+    """
+    Get the status and per-part progress of a background export
+    
+    Completed exports include their download URL.
+    """
+    status = QueueService().get_export_status(export_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Export not found")
+    
+    completed = status["status"] == "completed"
+    return ExportJobStatus(
+        **{key: value for key, value in status.items() if key in ExportJobStatus.model_fields},
+        status_url=f"/api/export/jobs/{export_id}",
+        download_url=f"/api/export/jobs/{export_id}/download" if completed else None
+    )
+
+
+@router.get("/jobs/{export_id}/download")
+async def download_export_job(export_id: UUID):
+    """
+    Download the file of a completed background export
+    """
+    status = QueueService().get_export_status(export_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if status["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {status['status']}")
+    
+    file_path = export_storage().get_full_path(status["path"])
+    if not file_path.is_file():
+        raise HTTPException(status_code=404, detail="Export file not found")
+    
+    return FileResponse(
+        file_path,
+        media_type=EXPORT_FORMATS[status["format"]][1],
+        filename=status["filename"]
+    )
+
+
 @router.get("/formats", response_model=ExportFormatsResponse)
 async def get_export_formats():
     """
@@ -322,6 +469,13 @@ async def get_export_formats():
                 endpoint="/export/jsonl", 
                 file_extension=".jsonl",
                 fields=["Complete document structure with all relationships"]
+            ),
+            ExportFormat(
+                name="apkg",
+                description="Anki package with figure images, exported in a background job",
+                endpoint="/export/jobs",
+                file_extension=".apkg",
+                fields=["Front", "Back", "Source"]
             )
         ],
         import_formats=[
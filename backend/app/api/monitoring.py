@@ -3,15 +3,68 @@ Performance monitoring API endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any
-from ..middleware.performance import get_performance_stats, reset_performance_stats
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Any, Optional
+from ..middleware.performance import get_performance_stats, get_prometheus_metrics, reset_performance_stats
 from ..utils.memory_monitor import memory_monitor
 from ..core.cache import cache_manager
 from ..core.db_optimization import DatabaseOptimizer, run_database_optimization
 from ..core.database import get_db_session
+from ..core.config import settings
+from ..utils.sampling_profiler import label_samples, merge_stacks, sampling_profiler, to_collapsed, to_speedscope
 
 router = APIRouter(prefix="/monitoring", tags=["monitoring"])
 
+# Scraped by Prometheus at the application root
+metrics_router = APIRouter(tags=["monitoring"])
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics_endpoint() -> PlainTextResponse:
+    """
+    Request latency histograms per method, endpoint and status in the
+    Prometheus text exposition format, merged over all API workers
+    """
+    return PlainTextResponse(get_prometheus_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Sampled stacks of the API and worker processes (enabled with PROFILER_ENABLED)
+profile_router = APIRouter(prefix="/monitoring/profile", tags=["monitoring"])
+
+@profile_router.get("")
+async def get_profile_summary() -> Dict[str, Any]:
+    """
+    Samples per endpoint and job over all profiled processes, with the
+    share of time each process spent sampling
+    """
+    profiles = sampling_profiler.collect()
+    return {
+        "status": "success",
+        "data": {
+            "enabled": settings.profiler_enabled,
+            "hz": sampling_profiler.hz,
+            "processes": [
+                {key: value for key, value in profile.items() if key != "stacks"}
+                for profile in profiles
+            ],
+            "labels": label_samples(merge_stacks(profiles))
+        }
+    }
+
+@profile_router.get("/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed(label: Optional[str] = None) -> PlainTextResponse:
+    """
+    Sampled stacks in the collapsed format read by flamegraph.pl and
+    speedscope; without ``label`` each endpoint or job is a root frame
+    """
+    return PlainTextResponse(to_collapsed(merge_stacks(sampling_profiler.collect()), label))
+
+@profile_router.get("/speedscope")
+async def get_profile_speedscope(label: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Sampled stacks as a speedscope file (https://www.speedscope.app), one
+    profile per endpoint or job
+    """
+    return to_speedscope(merge_stacks(sampling_profiler.collect()), sampling_profiler.hz, label)
+
 @router.get("/performance")
 async def get_performance_metrics() -> Dict[str, Any]:
     """
@@ -115,14 +168,17 @@ async def get_endpoint_performance() -> Dict[str, Any]:
 @router.get("/performance/queries")
 async def get_query_performance() -> Dict[str, Any]:
     """
-    Get database query performance metrics
+    Get database query performance metrics, aggregated by statement
+    fingerprint, with the requests flagged for N+1 query patterns
     """
     stats = get_performance_stats()
     
     return {
         "status": "success",
         "data": {
+            "fingerprints": stats.get('queries', []),
             "slow_queries": stats.get('slow_queries', []),
+            "n_plus_one": stats.get('n_plus_one', []),
             "total_queries": stats.get('summary', {}).get('total_db_queries', 0),
             "recent_queries": stats.get('summary', {}).get('recent_db_queries_5min', 0),
             "avg_query_time": stats.get('summary', {}).get('avg_query_time', 0)
@@ -156,16 +156,19 @@ async def detect_performance_regression(
     try:
         # Get metric data (this would typically come from a database)
         # For now, we'll use the in-memory data from the monitoring service
-        recent_metrics = performance_monitor._get_recent_metrics(hours=lookback_hours)
+        try:
+            metric_type = PerformanceMetricType(metric_name)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"No data found for metric: {metric_name}")
+        timestamps, values = performance_monitor.metrics_storage.series(
+            metric_type, datetime.now() - timedelta(hours=lookback_hours)
+        )
         
         # Convert to format expected by regression detector
-        metric_data = []
-        for metric in recent_metrics:
-            if metric.metric_type.value == metric_name:
-                metric_data.append({
-                    'timestamp': metric.timestamp.isoformat(),
-                    'value': metric.value
-                })
+        metric_data = [
+            {'timestamp': datetime.fromtimestamp(timestamp).isoformat(), 'value': float(value)}
+            for timestamp, value in zip(timestamps, values)
+        ]
         
         if not metric_data:
             raise HTTPException(status_code=404, detail=f"No data found for metric: {metric_name}")
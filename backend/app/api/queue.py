@@ -73,7 +73,7 @@ async def clear_failed_jobs(queue_name: str = "all") -> Dict[str, int]:
     Requirements: 5.3, 5.5 - Error handling and recovery
     
     Args:
-        queue_name: 'all', 'document_processing', or 'priority_processing'
+        queue_name: 'all' or the name of a single queue (e.g. 'document_processing_small')
     """
     try:
         queue_service = QueueService()
@@ -5,7 +5,7 @@ Review API endpoints for daily review and scheduling system
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 
 from ..core.database import get_db
@@ -62,6 +62,43 @@ class GradeCardResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BatchGradeItem(BaseModel):
+    """A single grade of a batch"""
+    srs_id: str
+    grade: int = Field(..., ge=0, le=5, description="Grade from 0-5")
+    reviewed_at: Optional[datetime] = Field(None, description="When the card was reviewed, e.g. offline")
+
+
+class BatchGradeRequest(BaseModel):
+    """Request model for grading many cards at once"""
+    grades: List[BatchGradeItem] = Field(..., min_length=1, max_length=1000)
+
+
+class ReviewHistoryItem(BaseModel):
+    """A past review of a card"""
+    srs_id: str
+    grade: int = Field(..., ge=0, le=5, description="Grade from 0-5")
+    reviewed_at: datetime = Field(..., description="When the card was reviewed")
+
+
+class ReviewHistoryImportRequest(BaseModel):
+    """Request model for importing a review history"""
+    reviews: List[ReviewHistoryItem] = Field(..., min_length=1, max_length=100000)
+
+
+class ResetDeckRequest(BaseModel):
+    """Request model for resetting the progress of a deck"""
+    user_id: Optional[str] = Field(None, description="Only reset the cards of this user")
+    document_id: Optional[str] = Field(None, description="Only reset the cards of this document")
+    
+    @model_validator(mode="after")
+    def require_filter(self):
+        # An empty request must not reset every card of every user
+        if not self.user_id and not self.document_id:
+            raise ValueError("user_id or document_id is required")
+        return self
+
+
 class ReviewStatsResponse(BaseModel):
     """Response model for review statistics"""
     total_cards: int
@@ -350,7 +387,7 @@ async def cleanup_old_sessions(
     """
     Clean up old completed review sessions
     
-    Removes completed sessions from memory to free up resources.
+    Removes completed sessions from the review session store.
     """
     try:
         review_service = ReviewService(db)
@@ -366,6 +403,131 @@ async def cleanup_old_sessions(
         raise HTTPException(status_code=500, detail=f"Failed to cleanup sessions: {str(e)}")
 
 
+@router.post("/session/{session_id}/flush")
+async def flush_session_grades(
+    session_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Write the buffered grades of a review session
+    
+    Only needed with write-behind grading, e.g. when a client goes to the
+    background in the middle of a session.
+    """
+    try:
+        review_service = ReviewService(db)
+        flushed = review_service.flush_pending_grades(session_id)
+        
+        return {
+            "success": True,
+            "flushed_grades": flushed
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to flush grades: {str(e)}")
+
+
+@router.post("/grade/batch")
+async def grade_cards_batch(
+    batch_request: BatchGradeRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Grade many cards in one transaction
+    
+    Intended for clients that review offline. Repeated grades of the same
+    card are applied in order of ``reviewed_at``; grades already applied
+    (not newer than the card's last review) are reported with
+    ``applied: false``.
+    """
+    try:
+        srs_service = SRSService(db)
+        results = srs_service.grade_cards_batch([item.model_dump() for item in batch_request.grades])
+        
+        return {
+            "success": True,
+            "graded": sum(1 for result in results if result["applied"]),
+            "results": results
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to grade cards: {str(e)}")
+
+
+@router.post("/history/import")
+async def import_review_history(
+    import_request: ReviewHistoryImportRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Replay a review history onto the cards' schedules
+    
+    Reviews are applied in time order. Reviews not newer than a card's last
+    review are skipped, so an import can be retried safely.
+    """
+    try:
+        srs_service = SRSService(db)
+        summary = srs_service.import_review_history([item.model_dump() for item in import_request.reviews])
+        
+        return {
+            "success": True,
+            **summary
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to import review history: {str(e)}")
+
+
+@router.post("/reset")
+async def reset_deck(
+    reset_request: ResetDeckRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Reset the learning progress of all cards of a user or document
+    
+    Every matching card becomes new and due now. At least one of
+    ``user_id`` and ``document_id`` is required.
+    """
+    try:
+        srs_service = SRSService(db)
+        reset = srs_service.reset_deck(reset_request.user_id, reset_request.document_id)
+        
+        return {
+            "success": True,
+            "cards_reset": reset
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reset deck: {str(e)}")
+
+
+@router.get("/forecast")
+async def get_workload_forecast(
+    user_id: Optional[str] = Query(None, description="User ID filter"),
+    days: int = Query(30, ge=1, le=365, description="Number of days to forecast"),
+    db: Session = Depends(get_db)
+):
+    """
+    Forecast the number of reviews of each of the next days
+    
+    Simulates the scheduler over the whole deck, assuming due cards are
+    reviewed on time with grades like the deck's past grades.
+    """
+    try:
+        srs_service = SRSService(db)
+        return srs_service.forecast_workload(user_id, days)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to forecast workload: {str(e)}")
+
+
 # Legacy SRS endpoints for backward compatibility
 @router.post("/grade/{srs_id}")
 async def grade_card_direct(
@@ -2,20 +2,32 @@
 Cross-platform data synchronization API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Callable
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 from uuid import UUID
+from dataclasses import asdict
 import json
 
 from app.core.database import get_async_db
 from app.models.document import Document, Chapter, Figure
 from app.models.knowledge import Knowledge
 from app.models.learning import Card, SRS
-from app.services.sync_service import SyncService, SyncConflictResolver
+from app.services.sync_service import SyncService, SyncConflictResolver, SyncHistoryExpired
+from app.services.sync_change_log import SYNC_CLIENT_ID_KEY, SYNC_ENTITY_MODELS
+from app.services.sync_merkle import MERKLE_BUCKETS, MerkleTreeService, root_hash
+from app.services.sync_stream import (
+    NDJSON_MEDIA_TYPE,
+    compress_stream,
+    decode_sync_cursor,
+    ndjson_full_sync,
+    ndjson_pull,
+    negotiate_encoding,
+)
 from app.utils.logging import SecurityLogger
 
 router = APIRouter(prefix="/api/sync", tags=["sync"])
@@ -29,6 +41,9 @@ class SyncRequest(BaseModel):
     client_id: str = Field(..., description="Unique client identifier")
     platform: str = Field(..., description="Platform (web/ios)")
     changes: List[Dict[str, Any]] = Field(default_factory=list)
+    sync_token: Optional[str] = Field(None, description="next_sync_token of the previous pull")
+    limit: Optional[int] = Field(None, ge=1, le=5000, description="Maximum change log entries to pull")
+    stream: bool = Field(False, description="Stream all pages as NDJSON")
 
 
 class SyncChange(BaseModel):
@@ -49,6 +64,7 @@ class SyncResponse(BaseModel):
     changes: List[SyncChange]
     conflicts: List[Dict[str, Any]] = Field(default_factory=list)
     next_sync_token: Optional[str] = None
+    has_more: bool = False
     stats: Dict[str, int] = Field(default_factory=dict)
 
 
@@ -59,25 +75,106 @@ class ConflictResolution(BaseModel):
     merged_data: Optional[Dict[str, Any]] = None
 
 
+def _stream_in_own_session(
+    db: AsyncSession,
+    lines: Callable[[SyncService], AsyncIterator[bytes]]
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON lines read through a session of their own
+    
+    The request's session can be closed before the body streams (yield
+    dependencies are torn down first on FastAPI 0.106-0.117), so the lines
+    are read through a new session on the same engine, closed when the
+    stream ends.
+    """
+    bind = db.bind
+    
+    async def stream() -> AsyncIterator[bytes]:
+        async with AsyncSession(bind, expire_on_commit=False) as session:
+            async for line in lines(SyncService(session)):
+                yield line
+    
+    return stream()
+
+
+def _ndjson_response(lines, accept_encoding: Optional[str]) -> StreamingResponse:
+    """Stream NDJSON lines, compressed as the client accepts"""
+    encoding = negotiate_encoding(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress_stream(lines, encoding), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
 @router.post("/pull", response_model=SyncResponse)
 async def pull_changes(
     sync_request: SyncRequest,
+    accept_encoding: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_async_db)
 ) -> SyncResponse:
     """
     Pull changes from server since last sync
     
+    Changes are read from the change log after the sequence number in
+    ``sync_token`` (or logged after ``last_sync_time``), a page at a time:
+    only the changed fields of created and updated entities, and
+    tombstones of deleted ones. Pull again with ``next_sync_token`` while
+    ``has_more`` is set. Without either, all data is returned together
+    with the token to pull later changes from. With ``stream`` every page
+    (or the full sync) is streamed as NDJSON instead. A token or time older
+    than the change log's retention gives 410, and the client does a full
+    sync.
+    
     Requirements: 12.5 - Cross-platform data synchronization
     """
     try:
         sync_service = SyncService(db)
-        
-        # Get changes since last sync
-        changes = await sync_service.get_changes_since(
-            last_sync_time=sync_request.last_sync_time,
-            client_id=sync_request.client_id,
-            platform=sync_request.platform
-        )
+        has_more = False
+        
+        if sync_request.sync_token is not None:
+            try:
+                after_seq = int(sync_request.sync_token)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid sync token")
+            await sync_service.check_history(after_seq)
+        
+        if sync_request.stream:
+            if sync_request.sync_token is not None:
+                lines = _stream_in_own_session(db, lambda service: ndjson_pull(service, after_seq, sync_request.limit))
+            elif sync_request.last_sync_time:
+                after_seq = await sync_service.get_seq_before(sync_request.last_sync_time)
+                lines = _stream_in_own_session(db, lambda service: ndjson_pull(service, after_seq, sync_request.limit))
+            else:
+                lines = _stream_in_own_session(
+                    db, lambda service: ndjson_full_sync(service, batch_size=sync_request.limit)
+                )
+            security_logger.log_security_event(
+                "sync_pull_request",
+                {
+                    "client_id": sync_request.client_id,
+                    "platform": sync_request.platform,
+                    "sync_token": sync_request.sync_token,
+                    "streamed": True
+                },
+                "INFO"
+            )
+            return _ndjson_response(lines, accept_encoding)
+        
+        if sync_request.sync_token is not None:
+            page = await sync_service.get_changes_after(after_seq, limit=sync_request.limit)
+            changes, next_seq, has_more = page.changes, page.last_seq, page.has_more
+        elif sync_request.last_sync_time:
+            page = await sync_service.get_changes_since(
+                last_sync_time=sync_request.last_sync_time,
+                client_id=sync_request.client_id,
+                platform=sync_request.platform,
+                limit=sync_request.limit
+            )
+            changes, next_seq, has_more = page.changes, page.last_seq, page.has_more
+        else:
+            # Changes logged while the data is read are pulled again later
+            next_seq = await sync_service.get_latest_seq()
+            changes = await sync_service.get_full_sync_data(sync_request.client_id, sync_request.platform)
         
         # Log sync activity
         security_logger.log_security_event(
@@ -86,6 +183,7 @@ async def pull_changes(
                 "client_id": sync_request.client_id,
                 "platform": sync_request.platform,
                 "last_sync": sync_request.last_sync_time.isoformat() if sync_request.last_sync_time else None,
+                "sync_token": sync_request.sync_token,
                 "changes_count": len(changes)
             },
             "INFO"
@@ -94,15 +192,23 @@ async def pull_changes(
         return SyncResponse(
             success=True,
             sync_time=datetime.now(timezone.utc),
-            changes=changes,
+            changes=[asdict(change) for change in changes],
+            next_sync_token=str(next_seq),
+            has_more=has_more,
             stats={
                 "pulled_changes": len(changes),
                 "documents": len([c for c in changes if c.entity_type == "document"]),
                 "cards": len([c for c in changes if c.entity_type == "card"]),
-                "srs": len([c for c in changes if c.entity_type == "srs"])
+                "srs": len([c for c in changes if c.entity_type == "srs"]),
+                "deleted": len([c for c in changes if c.operation == "delete"])
             }
         )
         
+    except HTTPException:
+        raise
+    except SyncHistoryExpired as e:
+        # The client pulls again without a token or time for a full sync
+        raise HTTPException(status_code=410, detail=f"{e}; a full sync is required")
     except Exception as e:
         security_logger.log_error(e, {
             "operation": "sync_pull",
@@ -127,6 +233,8 @@ async def push_changes(
     try:
         sync_service = SyncService(db)
         conflict_resolver = SyncConflictResolver(db)
+        # Attribute the logged changes to the pushing client
+        db.info[SYNC_CLIENT_ID_KEY] = sync_request.client_id
         
         # Process each change and detect conflicts
         processed_changes = []
@@ -295,6 +403,10 @@ async def validate_data_consistency(
     """
     Validate data consistency between client and server
     
+    Checksums are the roots of the entity types' Merkle trees. For an
+    inconsistent type the client compares the bucket hashes from
+    ``merkle_path`` with its own and resyncs only the buckets that differ.
+    
     Requirements: 12.5 - Data consistency validation across platforms
     """
     try:
@@ -320,7 +432,8 @@ async def validate_data_consistency(
                 inconsistencies.append({
                     "entity_type": entity_type,
                     "client_checksum": client_checksum,
-                    "server_checksum": server_checksum
+                    "server_checksum": server_checksum,
+                    "merkle_path": f"{router.prefix}/merkle/{entity_type}" if server_checksum else None
                 })
         
         overall_consistent = len(inconsistencies) == 0
@@ -356,22 +469,110 @@ async def validate_data_consistency(
         )
 
 
+@router.get("/merkle/{entity_type}")
+async def get_merkle_buckets(
+    entity_type: str,
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    Root and bucket hashes of an entity type's Merkle tree
+    
+    Bucket ``i`` holds the entities whose ID starts with byte ``i``; its
+    hash is the XOR of their entity hashes.
+    """
+    if entity_type not in SYNC_ENTITY_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type: {entity_type}")
+    
+    merkle_service = MerkleTreeService(db)
+    buckets = await merkle_service.get_bucket_hashes(entity_type)
+    
+    return {
+        "entity_type": entity_type,
+        "root": root_hash(buckets),
+        "bucket_count": MERKLE_BUCKETS,
+        "buckets": buckets
+    }
+
+
+@router.get("/merkle/{entity_type}/buckets/{bucket}")
+async def get_merkle_bucket(
+    entity_type: str,
+    bucket: int = Path(..., ge=0, lt=MERKLE_BUCKETS, description="Bucket number"),
+    include_data: bool = Query(False, description="Include the current data of the bucket's entities"),
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    Entity hashes of one Merkle tree bucket
+    
+    Clients compare these with their own to find the entities that differ,
+    or request the bucket's data to resync the whole range.
+    """
+    if entity_type not in SYNC_ENTITY_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type: {entity_type}")
+    
+    leaves = await MerkleTreeService(db).get_leaves(entity_type, bucket)
+    response = {
+        "entity_type": entity_type,
+        "bucket": bucket,
+        "leaves": leaves
+    }
+    if include_data:
+        changes = await SyncService(db).get_bucket_changes(entity_type, bucket)
+        response["entities"] = [asdict(change) for change in changes]
+    return response
+
+
 @router.post("/full-sync")
 async def perform_full_sync(
     client_id: str = Query(..., description="Client ID"),
     platform: str = Query(..., description="Platform"),
     force: bool = Query(False, description="Force full sync even if not needed"),
+    stream: bool = Query(False, description="Stream the data as NDJSON"),
+    cursor: Optional[str] = Query(None, description="Cursor of the last received batch, to resume a streamed sync"),
+    batch_size: Optional[int] = Query(None, ge=1, le=5000, description="Entities per streamed batch"),
+    accept_encoding: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_async_db)
 ) -> SyncResponse:
     """
     Perform full data synchronization
     
+    With ``stream`` the data is sent as NDJSON batches of one entity type,
+    compressed as negotiated, and an interrupted download is resumed with
+    the ``cursor`` of the last batch received.
+    
     Requirements: 12.5 - Full sync for data consistency recovery
     """
     try:
         sync_service = SyncService(db)
         
+        if stream:
+            if cursor:
+                try:
+                    _, entity_type, _ = decode_sync_cursor(cursor)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                if entity_type not in SYNC_ENTITY_MODELS:
+                    raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+            else:
+                await sync_service.reset_sync_metadata(client_id, platform)
+                await db.commit()
+            
+            security_logger.log_security_event(
+                "sync_full_sync",
+                {
+                    "client_id": client_id,
+                    "platform": platform,
+                    "forced": force,
+                    "streamed": True,
+                    "resumed": cursor is not None
+                },
+                "INFO"
+            )
+            lines = _stream_in_own_session(db, lambda service: ndjson_full_sync(service, cursor, batch_size))
+            return _ndjson_response(lines, accept_encoding)
+        
         # Get all data for the client
+        next_seq = await sync_service.get_latest_seq()
         all_changes = await sync_service.get_full_sync_data(client_id, platform)
         
         # Reset sync metadata
@@ -394,7 +595,8 @@ async def perform_full_sync(
         return SyncResponse(
             success=True,
             sync_time=datetime.now(timezone.utc),
-            changes=all_changes,
+            changes=[asdict(change) for change in all_changes],
+            next_sync_token=str(next_seq),
             stats={
                 "full_sync": True,
                 "total_changes": len(all_changes),
@@ -404,6 +606,8 @@ async def perform_full_sync(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         await db.rollback()
         security_logger.log_error(e, {
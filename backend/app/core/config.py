@@ -34,6 +34,50 @@ class Settings(BaseSettings):
     use_llm: bool = Field(default=False, description="Enable LLM processing")
     privacy_mode: bool = Field(default=True, description="Privacy mode - local processing only")
     
+    # Background workers
+    queue_backend: str = Field(default="rq", description="Job queue backend: 'rq' (Redis) or 'local' (embedded SQLite)")
+    local_queue_path: str = Field(default="./queue/jobs.db", description="SQLite database of the local queue backend")
+    worker_processes: int = Field(default=1, description="Number of forked RQ worker processes")
+    worker_preload_models: bool = Field(default=True, description="Load NLP models before forking workers")
+    fanout_enabled: bool = Field(default=True, description="Split large documents into parallel chapter-range jobs")
+    fanout_min_pages: int = Field(default=200, description="Minimum pages left to process before a document is split")
+    fanout_pages_per_part: int = Field(default=100, description="Target pages per chapter-range job")
+    fanout_max_parts: int = Field(default=8, description="Maximum number of chapter-range jobs per document")
+
+    # Background exports
+    export_dir: str = Field(default="./exports", description="Directory of export files produced by background jobs")
+    export_cards_per_part: int = Field(default=5000, description="Target cards per chapter-range job of a background export")
+    export_max_parts: int = Field(default=8, description="Maximum number of chapter-range jobs per background export")
+    export_job_timeout_seconds: int = Field(default=2 * 60 * 60, description="Seconds a part or assembly job of a background export may run")
+    export_retention_hours: int = Field(default=24, description="Hours files and job results of a finished background export are kept")
+
+    # Review sessions
+    review_session_store: str = Field(default="memory", description="Review session store: 'memory', 'redis' or 'sqlite'")
+    review_session_path: str = Field(default="./queue/review_sessions.db", description="SQLite database of the sqlite review session store")
+    review_session_ttl_hours: int = Field(default=24, description="Hours an idle review session is kept")
+    review_write_behind: bool = Field(default=False, description="Buffer in-session grades and write them in batches")
+    review_flush_interval_seconds: int = Field(default=60, description="Flush buffered grades older than this")
+    review_flush_max_pending: int = Field(default=20, description="Flush once this many grades are buffered")
+    srs_scheduler: str = Field(default="sm2", description="Scheduling algorithm of bulk grading, resets and forecasts")
+    review_queue_precompute: bool = Field(default=True, description="Serve daily reviews from queues precomputed after the day boundary")
+    review_queue_size: int = Field(default=200, description="Cards kept per priority bucket of a precomputed review queue")
+    review_queue_build_delay_minutes: int = Field(default=5, description="Minutes after midnight UTC the daily review queues are built")
+
+    # Synchronization
+    sync_change_log_enabled: bool = Field(default=True, description="Record entity changes in the sync change log and Merkle trees")
+    sync_pull_page_size: int = Field(default=500, description="Default number of change log entries per sync pull")
+    sync_settle_seconds: int = Field(default=60, description="Seconds a gap in change log sequence numbers is waited on before it is skipped")
+    sync_change_log_retention_days: int = Field(default=30, description="Days change log entries are kept; clients that last synced earlier need a full sync")
+
+    # Monitoring
+    metrics_multiprocess_dir: str = Field(default="", description="Directory where each API worker writes its request latencies for /metrics to merge (unset: single worker)")
+    metrics_snapshot_interval_seconds: int = Field(default=15, description="Seconds between request latency snapshots of a worker")
+    n_plus_one_threshold: int = Field(default=10, description="Statements with the same fingerprint a request may issue before it is flagged as an N+1 pattern")
+    pipeline_trace_file: str = Field(default="", description="File the spans of document processing runs are appended to as OTLP/JSON, one export request per line (unset: not exported)")
+    profiler_enabled: bool = Field(default=False, description="Run the sampling profiler in the API and worker processes")
+    profiler_hz: int = Field(default=99, description="Stack samples per second taken by the sampling profiler")
+    profiler_dir: str = Field(default="./profiles", description="Directory where each profiled process writes its sampled stacks for the API to merge")
+
     # Privacy and Security
     anonymize_logs: bool = Field(default=True, description="Anonymize sensitive data in logs")
     allowed_file_types: list[str] = Field(
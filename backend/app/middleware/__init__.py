@@ -1,5 +1,5 @@
 """Middleware package"""
 
-from .performance import PerformanceMiddleware, get_performance_stats, reset_performance_stats
+from .performance import PerformanceMiddleware, get_performance_stats, get_prometheus_metrics, reset_performance_stats
 
-__all__ = ['PerformanceMiddleware', 'get_performance_stats', 'reset_performance_stats']
\ No newline at end of file
+__all__ = ['PerformanceMiddleware', 'get_performance_stats', 'get_prometheus_metrics', 'reset_performance_stats']
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Latency metrics registry
+Fixed-memory latency sketches per endpoint and status, mergeable across
+workers and rendered in the Prometheus text exposition format
+"""
+
+import math
+from typing import Dict, Iterable, List, Tuple
+
+# Relative error of quantiles read from a sketch
+RELATIVE_ACCURACY = 0.01
+# Range of latencies (seconds) kept at full accuracy; others are clamped into it
+MIN_LATENCY = 1e-5
+MAX_LATENCY = 1e3
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Series tracked before requests of new endpoints are counted under OVERFLOW_ENDPOINT
+MAX_SERIES = 500
+OVERFLOW_ENDPOINT = "other"
+# Endpoint of requests that matched no route, e.g. scanners probing for paths
+UNMATCHED_ENDPOINT = "<unmatched>"
+
+SeriesKey = Tuple[str, str, int]
+
+
+class LatencySketch:
+    """
+    DDSketch over a fixed latency range
+
+    Values map to logarithmic buckets whose width is a fixed fraction of
+    their value, so every quantile is within ``RELATIVE_ACCURACY`` of the
+    exact one. The bucket array is allocated once; recording a value is a
+    logarithm and a counter increment. Sketches with the same parameters
+    merge by adding their counters.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = RELATIVE_ACCURACY,
+        min_value: float = MIN_LATENCY,
+        max_value: float = MAX_LATENCY
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.counts: List[int] = [0] * (math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Add a value in O(1)"""
+        clamped = min(max(value, self.min_value), self.max_value)
+        self.counts[math.ceil(math.log(clamped) / self._log_gamma) - self._offset] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def bucket_value(self, index: int) -> float:
+        """Value representing a bucket, within the relative accuracy of all its values"""
+        return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Approximate ``q`` quantile (0 to 1), 0 for an empty sketch"""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen > rank:
+                return min(max(self.bucket_value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def cumulative_counts(self, bounds: Iterable[float]) -> List[int]:
+        """Number of values up to each bound, by bucket representative"""
+        cumulative, index, seen = [], 0, 0
+        for bound in bounds:
+            while index < len(self.counts) and self.bucket_value(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            cumulative.append(seen)
+        return cumulative
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Add the values of another sketch with the same parameters"""
+        if (other.relative_accuracy, other.min_value, other.max_value) != (
+            self.relative_accuracy, self.min_value, self.max_value
+        ):
+            raise ValueError("Cannot merge latency sketches with different parameters")
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict:
+        """Serializable form, with only the non-empty buckets"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+            'buckets': {str(index): c for index, c in enumerate(self.counts) if c},
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencySketch":
+        sketch = cls(data['relative_accuracy'], data['min_value'], data['max_value'])
+        for index, bucket_count in data['buckets'].items():
+            sketch.counts[int(index)] = bucket_count
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        sketch.min = data['min'] if data['min'] is not None else math.inf
+        sketch.max = data['max']
+        return sketch
+
+
+class MetricsRegistry:
+    """
+    Request latency sketches keyed by method, endpoint and status code
+
+    Requests are recorded from the event loop only, so series are updated
+    without locks. Past ``max_series`` series, requests of new endpoints
+    are counted under OVERFLOW_ENDPOINT.
+    """
+
+    def __init__(self, max_series: int = MAX_SERIES):
+        self.max_series = max_series
+        self.series: Dict[SeriesKey, LatencySketch] = {}
+
+    def _series_key(self, method: str, endpoint: str, status_code: int) -> SeriesKey:
+        key = (method, endpoint, status_code)
+        if key not in self.series and len(self.series) >= self.max_series:
+            key = (method, OVERFLOW_ENDPOINT, status_code)
+        return key
+
+    def record(self, method: str, endpoint: str, status_code: int, duration: float) -> None:
+        key = self._series_key(method, endpoint, status_code)
+        sketch = self.series.get(key)
+        if sketch is None:
+            sketch = self.series[key] = LatencySketch()
+        sketch.record(duration)
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        """Add the series of another registry, e.g. of another worker process"""
+        for key, sketch in other.series.items():
+            key = self._series_key(*key)
+            if key in self.series:
+                self.series[key].merge(sketch)
+            else:
+                self.series[key] = LatencySketch.from_dict(sketch.to_dict())
+
+    def endpoint_sketches(self) -> Dict[Tuple[str, str], Tuple[LatencySketch, Dict[int, int]]]:
+        """Sketch of each method and endpoint over all statuses, with the count per status"""
+        endpoints: Dict[Tuple[str, str], Tuple[LatencySketch, Dict[int, int]]] = {}
+        for (method, endpoint, status_code), sketch in self.series.items():
+            if (method, endpoint) not in endpoints:
+                endpoints[(method, endpoint)] = (LatencySketch(), {})
+            merged, statuses = endpoints[(method, endpoint)]
+            merged.merge(sketch)
+            statuses[status_code] = sketch.count
+        return endpoints
+
+    def to_dict(self) -> Dict:
+        return {
+            'series': [
+                {'method': method, 'endpoint': endpoint, 'status': status_code, 'sketch': sketch.to_dict()}
+                for (method, endpoint, status_code), sketch in self.series.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricsRegistry":
+        registry = cls()
+        for series in data['series']:
+            key = (series['method'], series['endpoint'], series['status'])
+            registry.series[key] = LatencySketch.from_dict(series['sketch'])
+        return registry
+
+    def render_prometheus(self, buckets: Tuple[float, ...] = PROMETHEUS_BUCKETS) -> str:
+        """Request latencies as a Prometheus histogram, in the text exposition format"""
+        name = 'http_request_duration_seconds'
+        lines = [
+            f'# HELP {name} HTTP request latency by method, endpoint and status.',
+            f'# TYPE {name} histogram',
+        ]
+        for (method, endpoint, status_code), sketch in sorted(self.series.items()):
+            labels = (
+                f'method="{_escape_label(method)}",endpoint="{_escape_label(endpoint)}",'
+                f'status="{status_code}"'
+            )
+            for bound, cumulative in zip(buckets, sketch.cumulative_counts(buckets)):
+                lines.append(f'{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {sketch.count}')
+            lines.append(f'{name}_sum{{{labels}}} {sketch.sum!r}')
+            lines.append(f'{name}_count{{{labels}}} {sketch.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def merge_registries(registries: Iterable[MetricsRegistry]) -> MetricsRegistry:
+    """One registry holding the series of all given registries"""
+    merged = MetricsRegistry()
+    for registry in registries:
+        merged.merge(registry)
+    return merged
+
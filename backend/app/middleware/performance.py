@@ -3,106 +3,215 @@ Performance monitoring middleware for FastAPI
 Tracks request/response times, database queries, and system metrics
 """
 
+import json
+import os
 import time
 import psutil
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, Tuple
+from datetime import datetime
+from collections import deque
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 
+from ..core.config import settings
+from .metrics_registry import (
+    OVERFLOW_ENDPOINT,
+    UNMATCHED_ENDPOINT,
+    LatencySketch,
+    MetricsRegistry,
+    merge_registries,
+)
+from .query_fingerprint import (
+    BACKGROUND_ENDPOINT,
+    EndpointQueries,
+    QueryRegistry,
+    RequestQueries,
+    current_request_queries,
+    fingerprint,
+)
+
 logger = logging.getLogger(__name__)
 
+# Touched in the multiprocess metrics directory by a reset; workers started
+# before it drop their request latencies at their next snapshot
+RESET_MARKER = "reset"
+
 class PerformanceMetrics:
     """Stores and manages performance metrics"""
     
+    # Minutes covered by the recent request statistics
+    RECENT_MINUTES = 5
+    
     def __init__(self, max_entries: int = 1000):
         self.max_entries = max_entries
-        self.request_times: deque = deque(maxlen=max_entries)
-        self.db_queries: deque = deque(maxlen=max_entries)
-        self.endpoint_stats: Dict[str, List[float]] = defaultdict(list)
         self.slow_queries: deque = deque(maxlen=100)
-        self.error_count: Dict[str, int] = defaultdict(int)
+        # Latencies per method, endpoint and status, and per minute for recent stats
+        self.registry = MetricsRegistry()
+        self.recent: deque = deque(maxlen=self.RECENT_MINUTES)
+        self.last_snapshot = 0.0
+        # Statement timings per fingerprint and per minute, database time per endpoint
+        self.queries = QueryRegistry()
+        self.recent_queries: deque = deque(maxlen=self.RECENT_MINUTES)
+        self.endpoint_queries: Dict[Tuple[str, str], EndpointQueries] = {}
+        self.n_plus_one: deque = deque(maxlen=100)
+        self.started_at = time.time()
         
     def add_request_time(self, endpoint: str, method: str, duration: float, status_code: int):
         """Add request timing data"""
-        self.request_times.append({
-            'endpoint': endpoint,
-            'method': method,
-            'duration': duration,
-            'status_code': status_code,
-            'timestamp': datetime.now()
-        })
-        
-        # Track per-endpoint stats
-        key = f"{method} {endpoint}"
-        self.endpoint_stats[key].append(duration)
-        
-        # Keep only recent stats (last 100 requests per endpoint)
-        if len(self.endpoint_stats[key]) > 100:
-            self.endpoint_stats[key] = self.endpoint_stats[key][-100:]
+        self.registry.record(method, endpoint, status_code, duration)
+        
+        self._record_recent(self.recent, duration)
+        
+        if settings.metrics_multiprocess_dir and time.time() - self.last_snapshot >= settings.metrics_snapshot_interval_seconds:
+            self.write_snapshot()
             
-        # Track errors
-        if status_code >= 400:
-            self.error_count[key] += 1
+    def _record_recent(self, recent: deque, duration: float):
+        """Add a duration to the sketch of the current minute"""
+        minute = int(time.time() // 60)
+        if not recent or recent[-1][0] != minute:
+            recent.append((minute, LatencySketch()))
+        recent[-1][1].record(duration)
+    
+    def _merge_recent(self, recent: deque) -> LatencySketch:
+        oldest = int(time.time() // 60) - self.RECENT_MINUTES
+        merged = LatencySketch()
+        for minute, sketch in recent:
+            if minute > oldest:
+                merged.merge(sketch)
+        return merged
+    
+    def recent_requests(self) -> LatencySketch:
+        """Latencies of the requests of the last ``RECENT_MINUTES`` minutes"""
+        return self._merge_recent(self.recent)
+    
+    def write_snapshot(self):
+        """Write this process's request latencies for the other workers to merge"""
+        directory = Path(settings.metrics_multiprocess_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            if (directory / RESET_MARKER).stat().st_mtime > self.started_at:
+                # Another worker reset the statistics of all workers
+                self.registry = MetricsRegistry()
+                self.recent.clear()
+                self.started_at = time.time()
+        except FileNotFoundError:
+            pass
+        path = directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.registry.to_dict()))
+        os.replace(temporary, path)
+        self.last_snapshot = time.time()
+    
+    def collect_registry(self) -> MetricsRegistry:
+        """
+        Request latencies of this process merged with the snapshots of the other workers
+        
+        Snapshots of workers that have exited are removed instead of merged.
+        """
+        registries = [self.registry]
+        if settings.metrics_multiprocess_dir:
+            for path in Path(settings.metrics_multiprocess_dir).glob('*.json'):
+                if path.stem == str(os.getpid()):
+                    continue
+                try:
+                    if not _process_exists(int(path.stem)):
+                        path.unlink()
+                        continue
+                    registries.append(MetricsRegistry.from_dict(json.loads(path.read_text())))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Skipping metrics snapshot {path}: {e}")
+        return merge_registries(registries)
             
-    def add_db_query(self, query: str, duration: float, params: Optional[Dict] = None):
-        """Add database query timing data"""
-        query_data = {
-            'query': query[:200] + '...' if len(query) > 200 else query,
-            'duration': duration,
-            'params': str(params)[:100] if params else None,
-            'timestamp': datetime.now()
-        }
+    def add_db_query(self, query: str, duration: float, rows: int = -1):
+        """
+        Add database query timing data under the statement's fingerprint
+        
+        Statements issued while a request is handled are also counted
+        towards that request. Parameter values are not kept.
+        """
+        query_fingerprint, statement = fingerprint(query)
+        request_queries = current_request_queries.get()
+        endpoint = request_queries.endpoint if request_queries is not None else BACKGROUND_ENDPOINT
         
-        self.db_queries.append(query_data)
+        self.queries.record(query_fingerprint, statement, duration, rows, endpoint)
+        self._record_recent(self.recent_queries, duration)
+        if request_queries is not None:
+            request_queries.record(query_fingerprint, statement, duration)
         
         # Track slow queries (>100ms)
         if duration > 0.1:
-            self.slow_queries.append(query_data)
-            logger.warning(f"Slow query detected: {duration:.3f}s - {query[:100]}")
+            self.slow_queries.append({
+                'fingerprint': query_fingerprint,
+                'query': statement[:200] + '...' if len(statement) > 200 else statement,
+                'duration': duration,
+                'endpoint': endpoint,
+                'timestamp': datetime.now()
+            })
+            logger.warning(f"Slow query detected: {duration:.3f}s - {statement[:100]}")
+    
+    def add_request_queries(self, endpoint: str, method: str, request_queries: RequestQueries, duration: float):
+        """Attribute the statements of a finished request to its endpoint and flag N+1 patterns"""
+        repeated = request_queries.repeated(settings.n_plus_one_threshold)
+        for query_fingerprint, statement, count in repeated:
+            self.n_plus_one.append({
+                'endpoint': f"{method} {endpoint}",
+                'fingerprint': query_fingerprint,
+                'query': statement[:200] + '...' if len(statement) > 200 else statement,
+                'count': count,
+                'timestamp': datetime.now()
+            })
+            logger.warning(f"Possible N+1 queries: {method} {endpoint} issued {count}x {statement[:100]}")
+        
+        key = (method, endpoint)
+        # Bounded like the latency series, whose overflow endpoint it matches
+        if key not in self.endpoint_queries and len(self.endpoint_queries) >= self.registry.max_series:
+            key = (method, OVERFLOW_ENDPOINT)
+        if key not in self.endpoint_queries:
+            self.endpoint_queries[key] = EndpointQueries()
+        self.endpoint_queries[key].record(request_queries, duration, bool(repeated))
             
     def get_stats(self) -> Dict:
         """Get performance statistics summary"""
-        now = datetime.now()
-        recent_requests = [
-            r for r in self.request_times 
-            if now - r['timestamp'] < timedelta(minutes=5)
-        ]
-        
-        recent_queries = [
-            q for q in self.db_queries 
-            if now - q['timestamp'] < timedelta(minutes=5)
-        ]
+        recent_requests = self.recent_requests()
+        recent_queries = self._merge_recent(self.recent_queries)
         
         # Calculate endpoint statistics
         endpoint_summary = {}
-        for endpoint, times in self.endpoint_stats.items():
-            if times:
-                endpoint_summary[endpoint] = {
-                    'count': len(times),
-                    'avg_time': sum(times) / len(times),
-                    'min_time': min(times),
-                    'max_time': max(times),
-                    'p95_time': sorted(times)[int(len(times) * 0.95)] if len(times) > 20 else max(times),
-                    'error_count': self.error_count.get(endpoint, 0)
-                }
+        for (method, endpoint), (sketch, statuses) in self.registry.endpoint_sketches().items():
+            endpoint_summary[f"{method} {endpoint}"] = {
+                'count': sketch.count,
+                'avg_time': sketch.mean,
+                'min_time': sketch.min,
+                'max_time': sketch.max,
+                'p50_time': sketch.quantile(0.5),
+                'p95_time': sketch.quantile(0.95),
+                'p99_time': sketch.quantile(0.99),
+                'error_count': sum(count for status, count in statuses.items() if status >= 400),
+                'status_counts': {str(status): count for status, count in sorted(statuses.items())}
+            }
+            if (method, endpoint) in self.endpoint_queries:
+                endpoint_summary[f"{method} {endpoint}"].update(self.endpoint_queries[(method, endpoint)].to_dict())
         
         return {
             'summary': {
-                'total_requests': len(self.request_times),
-                'recent_requests_5min': len(recent_requests),
-                'total_db_queries': len(self.db_queries),
-                'recent_db_queries_5min': len(recent_queries),
+                'total_requests': sum(sketch.count for sketch in self.registry.series.values()),
+                'recent_requests_5min': recent_requests.count,
+                'total_db_queries': self.queries.total_count,
+                'recent_db_queries_5min': recent_queries.count,
                 'slow_queries_count': len(self.slow_queries),
-                'avg_request_time': sum(r['duration'] for r in recent_requests) / len(recent_requests) if recent_requests else 0,
-                'avg_query_time': sum(q['duration'] for q in recent_queries) / len(recent_queries) if recent_queries else 0
+                'n_plus_one_count': len(self.n_plus_one),
+                'avg_request_time': recent_requests.mean,
+                'p95_request_time': recent_requests.quantile(0.95),
+                'avg_query_time': recent_queries.mean
             },
             'endpoints': endpoint_summary,
+            'queries': self.queries.top(20),
             'slow_queries': list(self.slow_queries)[-10:],  # Last 10 slow queries
+            'n_plus_one': list(self.n_plus_one)[-10:],
             'system': self.get_system_metrics()
         }
         
@@ -137,29 +246,40 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
         process = psutil.Process()
         memory_before = process.memory_info().rss / 1024 / 1024  # MB
         
-        response = await call_next(request)
+        # Statements executed by the endpoint are counted towards this request
+        request_queries = RequestQueries(request.scope)
+        token = current_request_queries.set(request_queries)
+        try:
+            response = await call_next(request)
+        finally:
+            current_request_queries.reset(token)
         
         # Calculate timing and memory usage
         duration = time.time() - start_time
         memory_after = process.memory_info().rss / 1024 / 1024  # MB
         memory_delta = memory_after - memory_before
         
-        # Extract endpoint info
-        endpoint = request.url.path
+        # Extract endpoint info; the route template keeps path parameters out of the series,
+        # and requests matching no route share one series whatever their path
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", None) or UNMATCHED_ENDPOINT
         method = request.method
         status_code = response.status_code
         
         # Record metrics
         performance_metrics.add_request_time(endpoint, method, duration, status_code)
+        performance_metrics.add_request_queries(endpoint, method, request_queries, duration)
         
         # Add performance headers
         response.headers["X-Response-Time"] = f"{duration:.3f}s"
         response.headers["X-Memory-Delta"] = f"{memory_delta:.2f}MB"
+        response.headers["X-DB-Queries"] = str(request_queries.count)
+        response.headers["X-DB-Time"] = f"{request_queries.db_time:.3f}s"
         
         # Log slow requests
         if duration > 1.0:  # Log requests slower than 1 second
             logger.warning(
-                f"Slow request: {method} {endpoint} - {duration:.3f}s "
+                f"Slow request: {method} {request.url.path} - {duration:.3f}s "
                 f"(Status: {status_code}, Memory: +{memory_delta:.2f}MB)"
             )
             
@@ -168,18 +288,38 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
 # Database query performance tracking
 @event.listens_for(Engine, "before_cursor_execute")
 def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    context._query_start_time = time.time()
+    context._query_start_time = time.perf_counter()
 
 @event.listens_for(Engine, "after_cursor_execute")
 def receive_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    total = time.time() - context._query_start_time
-    performance_metrics.add_db_query(statement, total, parameters)
+    total = time.perf_counter() - context._query_start_time
+    performance_metrics.add_db_query(statement, total, getattr(cursor, "rowcount", -1))
 
 def get_performance_stats() -> Dict:
     """Get current performance statistics"""
     return performance_metrics.get_stats()
 
+def get_prometheus_metrics() -> str:
+    """Request latencies of all workers in the Prometheus text exposition format"""
+    return performance_metrics.collect_registry().render_prometheus()
+
 def reset_performance_stats():
-    """Reset all performance statistics"""
+    """Reset all performance statistics, with those of the other workers sharing the metrics directory"""
     global performance_metrics
-    performance_metrics = PerformanceMetrics()
\ No newline at end of file
+    if settings.metrics_multiprocess_dir:
+        directory = Path(settings.metrics_multiprocess_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in directory.glob('*.json'):
+            path.unlink(missing_ok=True)
+        (directory / RESET_MARKER).touch()
+    performance_metrics = PerformanceMetrics()
+
+def _process_exists(pid: int) -> bool:
+    """Whether a process with this ID is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+SQL query fingerprints
+Normalizes statements so the same query with different literals, bound
+parameters or IN-list lengths shares one fingerprint, aggregates timings
+per fingerprint and attributes statements to the request that issued them
+"""
+
+import hashlib
+import re
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .metrics_registry import UNMATCHED_ENDPOINT, LatencySketch
+
+# Fingerprints tracked before new ones are counted under OVERFLOW_FINGERPRINT
+MAX_FINGERPRINTS = 1000
+OVERFLOW_FINGERPRINT = "other"
+# Endpoints remembered per fingerprint
+MAX_ENDPOINTS_PER_FINGERPRINT = 20
+# Endpoint of statements issued outside a request (workers, startup)
+BACKGROUND_ENDPOINT = "(background)"
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])")
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_VALUES_ROWS = re.compile(r"(\bVALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Statement with comments removed, literals and parameters as ``?``,
+    IN lists collapsed and multi-row VALUES reduced to their first row
+    """
+    normalized = _COMMENT.sub(" ", statement)
+    normalized = _STRING.sub("?", normalized)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    normalized = _VALUES_ROWS.sub(r"\1", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> Tuple[str, str]:
+    """
+    Fingerprint and normalized text of a statement
+
+    Cached by statement text; statements compiled by SQLAlchemy repeat
+    verbatim, so normalization runs once per distinct statement.
+    """
+    normalized = normalize_statement(statement)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+class QueryStats:
+    """Timings of the statements of one fingerprint"""
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.latency = LatencySketch()
+        # Rows of the statements whose driver reported a row count
+        self.rows = 0
+        self.endpoints: Dict[str, int] = {}
+
+    def record(self, duration: float, rows: int, endpoint: str) -> None:
+        self.latency.record(duration)
+        if rows > 0:
+            self.rows += rows
+        if endpoint in self.endpoints or len(self.endpoints) < MAX_ENDPOINTS_PER_FINGERPRINT:
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+    def to_dict(self) -> Dict:
+        count = self.latency.count
+        return {
+            'statement': self.statement,
+            'count': count,
+            'total_time': self.latency.sum,
+            'mean_time': self.latency.mean,
+            'p99_time': self.latency.quantile(0.99),
+            'max_time': self.latency.max,
+            'rows': self.rows,
+            'rows_per_query': self.rows / count if count else 0,
+            'endpoints': dict(sorted(self.endpoints.items(), key=lambda item: -item[1]))
+        }
+
+
+class QueryRegistry:
+    """Statement timings aggregated by fingerprint, in bounded memory"""
+
+    def __init__(self, max_fingerprints: int = MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.stats: Dict[str, QueryStats] = {}
+
+    def record(self, query_fingerprint: str, statement: str, duration: float,
+               rows: int = -1, endpoint: str = BACKGROUND_ENDPOINT) -> None:
+        stats = self.stats.get(query_fingerprint)
+        if stats is None:
+            if len(self.stats) >= self.max_fingerprints:
+                query_fingerprint, statement = OVERFLOW_FINGERPRINT, "(other statements)"
+                stats = self.stats.get(query_fingerprint)
+            if stats is None:
+                stats = self.stats[query_fingerprint] = QueryStats(statement)
+        stats.record(duration, rows, endpoint)
+
+    @property
+    def total_count(self) -> int:
+        return sum(stats.latency.count for stats in self.stats.values())
+
+    def top(self, limit: int = 20, key: str = 'total_time') -> List[Dict]:
+        """Fingerprints with the largest ``key`` ('total_time', 'count', 'p99_time' or 'rows')"""
+        entries = [
+            {'fingerprint': query_fingerprint, **stats.to_dict()}
+            for query_fingerprint, stats in self.stats.items()
+        ]
+        entries.sort(key=lambda entry: entry[key], reverse=True)
+        return entries[:limit]
+
+
+class RequestQueries:
+    """Statements issued while handling one request"""
+
+    def __init__(self, scope: Optional[Dict] = None):
+        # ASGI scope of the request; routing adds the matched route to it
+        self.scope = scope or {}
+        self.count = 0
+        self.db_time = 0.0
+        self.fingerprints: Dict[str, int] = {}
+        self.statements: Dict[str, str] = {}
+
+    def record(self, query_fingerprint: str, statement: str, duration: float) -> None:
+        self.count += 1
+        self.db_time += duration
+        repeats = self.fingerprints.get(query_fingerprint, 0)
+        if not repeats:
+            self.statements[query_fingerprint] = statement
+        self.fingerprints[query_fingerprint] = repeats + 1
+
+    @property
+    def endpoint(self) -> str:
+        """Method and route template, UNMATCHED_ENDPOINT until the request is routed"""
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or UNMATCHED_ENDPOINT
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    def repeated(self, threshold: int) -> List[Tuple[str, str, int]]:
+        """Fingerprint, statement and count of the fingerprints issued more than ``threshold`` times"""
+        return [
+            (query_fingerprint, self.statements[query_fingerprint], count)
+            for query_fingerprint, count in self.fingerprints.items()
+            if count > threshold
+        ]
+
+
+class EndpointQueries:
+    """Statements and database time per request of one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.request_time = 0.0
+        self.db_time = LatencySketch()
+        self.n_plus_one = 0
+
+    def record(self, request_queries: RequestQueries, duration: float, flagged: bool) -> None:
+        self.requests += 1
+        self.queries += request_queries.count
+        self.request_time += duration
+        self.db_time.record(request_queries.db_time)
+        if flagged:
+            self.n_plus_one += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            'db_queries_per_request': self.queries / self.requests if self.requests else 0,
+            'db_time_avg': self.db_time.mean,
+            'db_time_p99': self.db_time.quantile(0.99),
+            'db_time_share': self.db_time.sum / self.request_time if self.request_time else 0,
+            'n_plus_one_requests': self.n_plus_one
+        }
+
+
+# Statements of the request being handled; None outside requests
+current_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
@@ -5,7 +5,8 @@ Database models
 from .base import BaseModel
 from .document import Document, Chapter, Figure, ProcessingStatus
 from .knowledge import Knowledge, KnowledgeType
-from .learning import Card, SRS, CardType
+from .learning import Card, SRS, CardType, DailyReviewQueue
+from .sync import SyncChangeLog, SyncEntityHash
 
 __all__ = [
     "BaseModel",
@@ -18,4 +19,7 @@ __all__ = [
     "Card",
     "SRS",
     "CardType",
+    "DailyReviewQueue",
+    "SyncChangeLog",
+    "SyncEntityHash",
 ]
\ No newline at end of file
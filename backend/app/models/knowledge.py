@@ -2,7 +2,7 @@
 Knowledge extraction models
 """
 
-from sqlalchemy import Column, String, Text, JSON, ForeignKey, Float, Enum as SQLEnum
+from sqlalchemy import Column, String, Text, JSON, ForeignKey, Float, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from enum import Enum
 
@@ -41,6 +41,10 @@ class Knowledge(BaseModel):
     """Knowledge point model"""
     
     __tablename__ = "knowledge"
+    __table_args__ = (
+        # Card listings of a chapter join cards without reading knowledge rows
+        Index("ix_knowledge_chapter_id_id", "chapter_id", "id"),
+    )
     
     chapter_id = Column(UUID(), ForeignKey("chapters.id"), nullable=False, index=True)
     kind = Column(SQLEnum(KnowledgeType), nullable=False, index=True)
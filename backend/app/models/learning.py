@@ -2,7 +2,10 @@
 Learning and flashcard models
 """
 
-from sqlalchemy import Column, String, Text, JSON, ForeignKey, Float, Integer, DateTime, Enum as SQLEnum
+from sqlalchemy import (
+    Column, String, Text, JSON, ForeignKey, Float, Integer, Boolean, Date, DateTime, Index,
+    UniqueConstraint, Enum as SQLEnum
+)
 from sqlalchemy.orm import relationship
 from enum import Enum
 from datetime import datetime
@@ -21,6 +24,11 @@ class Card(BaseModel):
     """Flashcard model"""
     
     __tablename__ = "cards"
+    __table_args__ = (
+        # Card listings: newest first, optionally of one type and difficulty range
+        Index("ix_cards_created_at_id", "created_at", "id"),
+        Index("ix_cards_type_created_at_id_difficulty", "card_type", "created_at", "id", "difficulty"),
+    )
     
     knowledge_id = Column(UUID(), ForeignKey("knowledge.id"), nullable=False, index=True)
     card_type = Column(SQLEnum(CardType), nullable=False, index=True)
@@ -41,6 +49,10 @@ class SRS(BaseModel):
     """Spaced Repetition System model"""
     
     __tablename__ = "srs"
+    __table_args__ = (
+        # Per-user due queues and review statistics
+        Index("ix_srs_user_id_due_date", "user_id", "due_date"),
+    )
     
     card_id = Column(UUID(), ForeignKey("cards.id"), nullable=False, index=True)
     user_id = Column(UUID(), nullable=True, index=True)  # For future multi-user support
@@ -55,4 +67,27 @@ class SRS(BaseModel):
     card = relationship("Card", back_populates="srs_records")
     
     def __repr__(self):
-        return f"<SRS(id={self.id}, ease_factor={self.ease_factor}, interval={self.interval}, due_date={self.due_date})>"
\ No newline at end of file
+        return f"<SRS(id={self.id}, ease_factor={self.ease_factor}, interval={self.interval}, due_date={self.due_date})>"
+
+
+class DailyReviewQueue(BaseModel):
+    """Precomputed daily review queue of a user"""
+    
+    __tablename__ = "daily_review_queues"
+    __table_args__ = (
+        UniqueConstraint("user_key", "queue_date", name="uq_daily_review_queues_user_date"),
+    )
+    
+    # User ID, or "" for the queue over the cards of all users
+    user_key = Column(String(36), nullable=False)
+    queue_date = Column(Date, nullable=False, index=True)
+    # Ordered [srs_id, difficulty, due_date] entries of each priority bucket
+    overdue = Column(JSON, nullable=False, default=list)
+    due_today = Column(JSON, nullable=False, default=list)
+    # False when a bucket was truncated to the configured queue size
+    overdue_complete = Column(Boolean, nullable=False, default=True)
+    due_today_complete = Column(Boolean, nullable=False, default=True)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DailyReviewQueue(user_key='{self.user_key}', queue_date={self.queue_date})>"
@@ -0,0 +1,48 @@
+"""
+Synchronization models
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, JSON, String
+from datetime import datetime
+
+from app.core.database import Base
+from .base import UUID
+
+
+class SyncChangeLog(Base):
+    """Append-only log of entity changes, ordered by sequence number"""
+    
+    __tablename__ = "sync_change_log"
+    # Never reuse the sequence number of a removed row on SQLite
+    __table_args__ = (
+        Index("ix_sync_change_log_created_at", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+    
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(UUID(), nullable=False)
+    operation = Column(String(10), nullable=False)  # create, update, delete
+    # Changed fields; None for deletes (tombstones)
+    changes = Column(JSON)
+    # Client whose pushed change this is; None for server-side changes
+    client_id = Column(String(255))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SyncChangeLog(seq={self.seq}, {self.operation} {self.entity_type} {self.entity_id})>"
+
+
+class SyncEntityHash(Base):
+    """Hash of a synced entity: a leaf of its type's Merkle tree"""
+    
+    __tablename__ = "sync_entity_hashes"
+    __table_args__ = (
+        Index("ix_sync_entity_hashes_type_bucket", "entity_type", "bucket"),
+    )
+    
+    entity_type = Column(String(20), primary_key=True)
+    entity_id = Column(UUID(), primary_key=True)
+    bucket = Column(Integer, nullable=False)
+    hash = Column(String(64), nullable=False)
+
@@ -9,6 +9,8 @@ from .entity_extraction_service import (
     EntityType,
     Language
 )
+# Register the ORM event hooks recording changes for sync
+from . import sync_change_log, sync_merkle
 
 __all__ = [
     "EntityExtractionService",
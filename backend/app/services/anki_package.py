@@ -0,0 +1,222 @@
+"""
+Anki package (.apkg) writer
+
+An .apkg is a zip archive holding ``collection.anki2``, an SQLite
+database in Anki's collection schema (version 11, which every Anki
+release imports), the media files named ``0``, ``1``, ... and a
+``media`` JSON file mapping those names to the file names used in note
+fields.
+
+Notes use one "Basic" note type with Front, Back and Source fields.
+Note, card and deck IDs are derived from card IDs and deck names, so
+importing a newer export of the same cards updates them in place. Cards
+with a reviewed SRS record keep their interval, ease and due date.
+"""
+
+import hashlib
+import html
+import json
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+COLLECTION_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+MODEL_ID = 1607392319
+MODEL_FIELDS = ["Front", "Back", "Source"]
+MODEL_CSS = ".card { font-family: arial; font-size: 20px; text-align: center; color: black; background-color: white; }"
+FRONT_TEMPLATE = "{{Front}}"
+BACK_TEMPLATE = "{{FrontSide}}<hr id=answer>{{Back}}<br><small>{{Source}}</small>"
+
+DEFAULT_DECK_CONFIG = {
+    "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0,
+    "replayq": True, "dyn": False,
+    "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20,
+            "bury": True, "separate": True},
+    "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "maxIvl": 36500, "ivlFct": 1, "bury": True,
+            "minSpace": 1},
+    "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+}
+
+_TAG_SPACES = re.compile(r"\s+")
+_HTML_TAGS = re.compile(r"<[^>]+>")
+
+
+def anki_id(value: str) -> int:
+    """Stable positive 53-bit ID derived from a string"""
+    return int(hashlib.sha1(value.encode()).hexdigest()[:13], 16)
+
+
+def field_html(text: Any) -> str:
+    """Plain text as an Anki field"""
+    return html.escape(str(text or "")).replace("\n", "<br>")
+
+
+def field_checksum(field: str) -> int:
+    """Anki's duplicate check value: the first 8 hex digits of the SHA-1 of the stripped field"""
+    return int(hashlib.sha1(_HTML_TAGS.sub("", field).encode()).hexdigest()[:8], 16)
+
+
+class AnkiPackage:
+    """Collects decks, notes and media and writes them as an .apkg"""
+
+    def __init__(self, created_at: Optional[datetime] = None):
+        self.created_at = created_at or datetime.utcnow()
+        self.collection_day = int(self.created_at.timestamp()) // 86400
+        self.decks: Dict[str, int] = {}
+        self.media: Dict[str, Path] = {}
+        self._directory = tempfile.TemporaryDirectory()
+        self.collection_path = Path(self._directory.name) / "collection.anki2"
+        self.connection = sqlite3.connect(self.collection_path)
+        self.connection.executescript(COLLECTION_SCHEMA)
+        self.note_count = 0
+
+    def deck_id(self, name: str) -> int:
+        """ID of a deck, added on first use"""
+        if name not in self.decks:
+            self.decks[name] = anki_id(f"deck:{name}")
+        return self.decks[name]
+
+    def add_media(self, path: Path, name: str) -> Optional[str]:
+        """Add a media file under ``name``, returning the name or None when the file is missing"""
+        if not path.is_file():
+            return None
+        self.media[name] = path
+        return name
+
+    def add_note(
+        self,
+        guid: str,
+        deck: str,
+        fields: List[str],
+        tags: List[str],
+        srs: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Add a note with its card
+
+        ``fields`` are HTML, in ``MODEL_FIELDS`` order. ``srs`` holds the
+        interval, ease_factor, repetitions and due_date of a reviewed card.
+        """
+        now = int(time.time())
+        note_id, card_id = anki_id(f"note:{guid}"), anki_id(f"card:{guid}")
+        tag_text = " ".join(_TAG_SPACES.sub("_", str(tag)) for tag in tags)
+        self.connection.execute(
+            "INSERT INTO notes VALUES (?, ?, ?, ?, -1, ?, ?, ?, ?, 0, '')",
+            (note_id, guid, MODEL_ID, now, f" {tag_text} " if tag_text else "", "\x1f".join(fields),
+             _HTML_TAGS.sub("", fields[0]), field_checksum(fields[0]))
+        )
+
+        if srs and srs.get("repetitions"):
+            # Review card, due in days since the collection was created
+            due_day = int(datetime.fromisoformat(srs["due_date"]).timestamp()) // 86400
+            schedule = (2, 2, due_day - self.collection_day, srs["interval"],
+                        int(srs["ease_factor"] * 1000), srs["repetitions"])
+        else:
+            # New card, in note order
+            schedule = (0, 0, self.note_count, 0, 0, 0)
+        self.connection.execute(
+            "INSERT INTO cards VALUES (?, ?, ?, 0, ?, -1, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, '')",
+            (card_id, note_id, self.deck_id(deck), now, *schedule)
+        )
+        self.note_count += 1
+
+    def write(self, destination: Path) -> Path:
+        """Write the package to ``destination`` and release the working files"""
+        now = int(time.time())
+        self.connection.execute(
+            "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+            (self.collection_day * 86400, now * 1000, now * 1000, json.dumps(self._collection_config()),
+             json.dumps(self._models(now)), json.dumps(self._decks(now)),
+             json.dumps({"1": DEFAULT_DECK_CONFIG}))
+        )
+        self.connection.commit()
+        self.connection.close()
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as package:
+            package.write(self.collection_path, "collection.anki2")
+            media_map = {}
+            for index, (name, path) in enumerate(self.media.items()):
+                package.write(path, str(index))
+                media_map[str(index)] = name
+            package.writestr("media", json.dumps(media_map))
+        self._directory.cleanup()
+        return destination
+
+    def _collection_config(self) -> Dict[str, Any]:
+        return {
+            "nextPos": self.note_count + 1, "estTimes": True, "activeDecks": [1], "sortType": "noteFld",
+            "timeLim": 0, "sortBackwards": False, "addToCur": True, "curDeck": 1, "newSpread": 0,
+            "dueCounts": True, "curModel": str(MODEL_ID), "collapseTime": 1200
+        }
+
+    def _models(self, now: int) -> Dict[str, Any]:
+        return {str(MODEL_ID): {
+            "id": MODEL_ID, "name": "Basic (Document Learning)", "type": 0, "mod": now, "usn": -1,
+            "sortf": 0, "did": 1, "tags": [], "vers": [], "css": MODEL_CSS,
+            "latexPre": "\\documentclass[12pt]{article}\n\\begin{document}\n",
+            "latexPost": "\\end{document}",
+            "flds": [
+                {"name": name, "ord": index, "sticky": False, "rtl": False, "font": "Arial", "size": 20,
+                 "media": []}
+                for index, name in enumerate(MODEL_FIELDS)
+            ],
+            "tmpls": [{"name": "Card 1", "ord": 0, "qfmt": FRONT_TEMPLATE, "afmt": BACK_TEMPLATE,
+                       "did": None, "bqfmt": "", "bafmt": ""}],
+            "req": [[0, "any", [0]]],
+        }}
+
+    def _decks(self, now: int) -> Dict[str, Any]:
+        decks = {"1": {"name": "Default"}}
+        decks.update({str(deck_id): {"name": name} for name, deck_id in self.decks.items()})
+        return {
+            key: {
+                "id": int(key), "name": deck["name"], "desc": "", "mod": now, "usn": -1, "collapsed": False,
+                "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+                "dyn": 0, "conf": 1, "extendNew": 10, "extendRev": 50
+            }
+            for key, deck in decks.items()
+        }
+
+
+def card_guid(card_id: UUID) -> str:
+    """Note GUID of a card, stable across exports"""
+    return f"dl-{card_id}"
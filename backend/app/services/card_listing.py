@@ -0,0 +1,191 @@
+"""
+Card listing queries
+
+Builds the statements behind ``GET /api/cards``. Pages are selected with
+a keyset cursor on (created_at, id) instead of OFFSET, so deep pages cost
+the same as the first one. Only the listed columns are selected, with
+knowledge text truncated in SQL, and a total is counted on request,
+exactly or (on PostgreSQL) from the planner's row estimate.
+"""
+
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, and_, func, or_, select, text
+
+from ..models.document import Chapter
+from ..models.knowledge import Knowledge
+from ..models.learning import Card, CardType
+
+logger = logging.getLogger(__name__)
+
+# Characters of knowledge text included in card listings
+KNOWLEDGE_PREVIEW_LENGTH = 200
+
+
+@dataclass
+class CardListFilters:
+    """Filters of a card listing"""
+    document_id: Optional[UUID] = None
+    chapter_id: Optional[UUID] = None
+    card_type: Optional[CardType] = None
+    difficulty_min: Optional[float] = None
+    difficulty_max: Optional[float] = None
+
+    def apply(self, stmt: Select) -> Select:
+        """Filter a statement over the cards table"""
+        # Chapter and document filters are semi-joins, so cards can still
+        # be read in index order
+        if self.document_id:
+            stmt = stmt.where(Card.knowledge_id.in_(
+                select(Knowledge.id)
+                .join(Chapter, Knowledge.chapter_id == Chapter.id)
+                .where(Chapter.document_id == self.document_id)
+            ))
+        if self.chapter_id:
+            stmt = stmt.where(Card.knowledge_id.in_(
+                select(Knowledge.id).where(Knowledge.chapter_id == self.chapter_id)
+            ))
+        if self.card_type:
+            stmt = stmt.where(Card.card_type == self.card_type)
+        if self.difficulty_min is not None:
+            stmt = stmt.where(Card.difficulty >= self.difficulty_min)
+        if self.difficulty_max is not None:
+            stmt = stmt.where(Card.difficulty <= self.difficulty_max)
+        return stmt
+
+
+def encode_cursor(created_at: datetime, card_id: Any) -> str:
+    """Opaque cursor pointing after a card"""
+    payload = json.dumps([created_at.isoformat(), str(card_id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """(created_at, id) of the card a cursor points after"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, card_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), UUID(card_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def card_page_statement(
+    filters: CardListFilters,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0
+) -> Select:
+    """
+    Newest cards first, starting after ``cursor``
+
+    The page is selected from the cards table alone, walking the
+    (created_at, id) index, and only its rows are joined with knowledge and
+    chapters. One row more than ``limit`` is selected to tell whether
+    another page follows. ``offset`` is only kept for clients not using
+    cursors yet.
+    """
+    page = filters.apply(select(Card.id, Card.created_at))
+    if cursor:
+        created_at, card_id = decode_cursor(cursor)
+        page = page.where(or_(
+            Card.created_at < created_at,
+            and_(Card.created_at == created_at, Card.id < card_id)
+        ))
+    page = page.order_by(Card.created_at.desc(), Card.id.desc())
+    if offset:
+        page = page.offset(offset)
+    page = page.limit(limit + 1).subquery("page")
+
+    return (
+        select(
+            Card.id,
+            Card.card_type,
+            Card.front,
+            Card.back,
+            Card.difficulty,
+            Card.card_metadata,
+            Card.created_at,
+            Knowledge.id.label("knowledge_id"),
+            Knowledge.kind,
+            func.substr(Knowledge.text, 1, KNOWLEDGE_PREVIEW_LENGTH).label("text_preview"),
+            func.length(Knowledge.text).label("text_length"),
+            Knowledge.entities,
+            Chapter.id.label("chapter_id"),
+            Chapter.title.label("chapter_title"),
+            Chapter.document_id
+        )
+        .select_from(page)
+        .join(Card, Card.id == page.c.id)
+        .join(Knowledge, Card.knowledge_id == Knowledge.id)
+        .join(Chapter, Knowledge.chapter_id == Chapter.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc())
+    )
+
+
+def card_count_statement(filters: CardListFilters) -> Select:
+    """Number of cards matching the filters"""
+    return filters.apply(select(func.count()).select_from(Card))
+
+
+def format_card_page(rows: List[Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Response entries of a page and the cursor of the next page, if any"""
+    page = rows[:limit]
+    cards = [
+        {
+            "id": str(row.id),
+            "card_type": row.card_type.value,
+            "front": row.front,
+            "back": row.back,
+            "difficulty": row.difficulty,
+            "metadata": row.card_metadata or {},
+            "knowledge": {
+                "id": str(row.knowledge_id),
+                "kind": row.kind.value,
+                "text": row.text_preview + "..." if row.text_length > KNOWLEDGE_PREVIEW_LENGTH else row.text_preview,
+                "entities": row.entities or []
+            },
+            "chapter": {
+                "id": str(row.chapter_id),
+                "title": row.chapter_title,
+                "document_id": str(row.document_id)
+            },
+            "created_at": row.created_at.isoformat()
+        }
+        for row in page
+    ]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return cards, next_cursor
+
+
+async def count_cards(db, filters: CardListFilters, approximate: bool = False) -> Tuple[int, bool]:
+    """
+    Count the cards matching the filters
+
+    With ``approximate`` on PostgreSQL the planner's row estimate is used,
+    which costs no scan. Returns the count and whether it is an estimate.
+    """
+    stmt = card_count_statement(filters)
+    dialect = db.get_bind().dialect
+    if approximate and dialect.name == "postgresql":
+        rows_stmt = filters.apply(select(Card.id))
+        try:
+            compiled = rows_stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+            # A failed EXPLAIN must not abort the request's transaction
+            async with db.begin_nested():
+                result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"]), True
+        except Exception as e:
+            logger.warning(f"Could not estimate card count, counting instead: {e}")
+
+    result = await db.execute(stmt)
+    return int(result.scalar()), False
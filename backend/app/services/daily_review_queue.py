@@ -0,0 +1,315 @@
+"""
+Precomputed daily review queues
+
+A background job materializes each user's ordered daily review queue
+shortly after the day boundary: the SRS IDs of the overdue and due-today
+priority buckets in review order, up to ``review_queue_size`` entries each.
+Grades and new or deleted SRS records adjust the stored queues as they are
+flushed, so starting a session reads one row by (user, date) and loads the
+selected cards by primary key instead of ranking the user's deck.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.knowledge import Knowledge
+from ..models.learning import SRS, Card, DailyReviewQueue
+from .review_queue import ReviewCard, ReviewQueueBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class SRSChange(NamedTuple):
+    """New due date of an SRS record; ``due_date`` is None when it was deleted"""
+    srs_id: Any
+    user_id: Any
+    card_id: Any
+    due_date: Optional[datetime]
+
+
+def user_key(user_id: Optional[Any]) -> str:
+    """Queue key of a user; "" is the queue over the cards of all users"""
+    return str(user_id) if user_id else ""
+
+
+def day_bounds(now: datetime) -> Tuple[datetime, datetime]:
+    """Start of the UTC day of ``now`` and of the next day"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today, today + timedelta(days=1)
+
+
+def _overdue_order(entry: list) -> tuple:
+    # Most overdue first, then easiest
+    return datetime.fromisoformat(entry[2]), entry[1]
+
+
+def _due_today_order(entry: list) -> tuple:
+    # Easiest first, then earliest
+    return entry[1], datetime.fromisoformat(entry[2])
+
+
+def _entry(srs_id: Any, difficulty: float, due_date: datetime) -> list:
+    return [str(srs_id), difficulty, due_date.isoformat()]
+
+
+def _insert_entry(bucket: List[list], entry: list, order: Callable[[list], tuple], complete: bool) -> None:
+    """Insert an entry in review order; a truncated bucket only takes entries before its tail"""
+    position = bisect_right([order(existing) for existing in bucket], order(entry))
+    if position == len(bucket) and not complete:
+        return
+    bucket.insert(position, entry)
+
+
+class DailyReviewQueueService:
+    """Builds and reads the precomputed daily review queues"""
+
+    def __init__(self, db: Session, queue_size: Optional[int] = None):
+        self.db = db
+        self.queue_size = queue_size or settings.review_queue_size
+        self.builder = ReviewQueueBuilder(db)
+
+    def get_queue(self, user_id: Optional[str] = None, queue_date: Optional[date] = None) -> Optional[DailyReviewQueue]:
+        """Stored queue of a user for a day (today by default)"""
+        queue_date = queue_date or datetime.utcnow().date()
+        return (
+            self.db.query(DailyReviewQueue)
+            .filter(
+                DailyReviewQueue.user_key == user_key(user_id),
+                DailyReviewQueue.queue_date == queue_date
+            )
+            .first()
+        )
+
+    def build(self, user_id: Optional[str] = None, now: Optional[datetime] = None) -> DailyReviewQueue:
+        """
+        Materialize the review queue of a user for the day of ``now``
+
+        Each bucket keeps its first ``queue_size`` entries in review order;
+        one extra row is read to tell whether it was truncated.
+        """
+        now = now or datetime.utcnow()
+        today, tomorrow = day_bounds(now)
+
+        query = (
+            self.db.query(SRS.id, SRS.due_date, Card.difficulty)
+            .join(Card, SRS.card_id == Card.id)
+            .join(Knowledge, Card.knowledge_id == Knowledge.id)
+        )
+        if user_id:
+            query = query.filter(SRS.user_id == user_id)
+
+        overdue = (
+            query.filter(SRS.due_date < today)
+            .order_by(SRS.due_date.asc(), Card.difficulty.asc())
+            .limit(self.queue_size + 1)
+            .all()
+        )
+        due_today = (
+            query.filter(SRS.due_date >= today, SRS.due_date < tomorrow)
+            .order_by(Card.difficulty.asc(), SRS.due_date.asc())
+            .limit(self.queue_size + 1)
+            .all()
+        )
+
+        key = user_key(user_id)
+        queue = self.get_queue(user_id, today.date())
+        if queue is None:
+            queue = DailyReviewQueue(user_key=key, queue_date=today.date())
+            self.db.add(queue)
+        queue.overdue = [_entry(row.id, row.difficulty, row.due_date) for row in overdue[:self.queue_size]]
+        queue.due_today = [_entry(row.id, row.difficulty, row.due_date) for row in due_today[:self.queue_size]]
+        queue.overdue_complete = len(overdue) <= self.queue_size
+        queue.due_today_complete = len(due_today) <= self.queue_size
+        queue.built_at = now
+
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Built concurrently by another worker
+            self.db.rollback()
+            queue = self.get_queue(user_id, today.date())
+        return queue
+
+    def build_all(self, now: Optional[datetime] = None) -> dict:
+        """Build today's queue of every user and drop the queues of earlier days"""
+        now = now or datetime.utcnow()
+        today, _ = day_bounds(now)
+
+        user_ids = [
+            row.user_id for row in
+            self.db.query(SRS.user_id).filter(SRS.user_id.isnot(None)).distinct()
+        ]
+        for user_id in [None] + user_ids:
+            self.build(str(user_id) if user_id else None, now)
+
+        deleted = (
+            self.db.query(DailyReviewQueue)
+            .filter(DailyReviewQueue.queue_date < today.date())
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+
+        logger.info(f"Built {len(user_ids) + 1} daily review queues for {today.date()}")
+        return {
+            'queue_date': today.date().isoformat(),
+            'queues_built': len(user_ids) + 1,
+            'queues_deleted': deleted
+        }
+
+    def get_review_cards(
+        self,
+        user_id: Optional[str] = None,
+        max_cards: int = 50,
+        prioritize_overdue: bool = True,
+        now: Optional[datetime] = None
+    ) -> Optional[List[ReviewCard]]:
+        """
+        Daily review cards from the stored queue
+
+        Returns None when the queue cannot answer the request: it has not
+        been built for today, a truncated bucket holds fewer than
+        ``max_cards`` eligible cards, or a selected card is no longer due.
+        The caller then ranks the cards live.
+        """
+        now = now or datetime.utcnow()
+        queue = self.get_queue(user_id, now.date())
+        if queue is None:
+            return None
+
+        overdue = [entry[0] for entry in queue.overdue]
+        due_today = [entry[0] for entry in queue.due_today if datetime.fromisoformat(entry[2]) <= now]
+        if (not queue.overdue_complete and len(overdue) < max_cards) or \
+                (not queue.due_today_complete and len(due_today) < max_cards):
+            return None
+
+        if prioritize_overdue:
+            ordered = ReviewQueueBuilder.interleave(overdue, due_today)
+        else:
+            ordered = ReviewQueueBuilder.chain(overdue, due_today)
+        srs_ids = list(islice(ordered, max_cards))
+        if not srs_ids:
+            return []
+
+        rows = self.builder.card_query().filter(SRS.id.in_(srs_ids)).all()
+        cards = {
+            card.srs_id: card
+            for card in (self.builder.to_review_card(row, now) for row in rows)
+            if card.due_date <= now
+        }
+        if len(cards) != len(srs_ids):
+            logger.debug(f"Stale daily review queue for user '{queue.user_key}'")
+            return None
+        return [cards[srs_id] for srs_id in srs_ids]
+
+
+def _queues_for_update(keys: Iterable[str], queue_date: date):
+    """
+    Stored queues of the given users for a day, locked until the caller commits
+
+    Concurrent grades of the same user, and of all users for the shared ""
+    queue, would otherwise overwrite each other's changes to the buckets.
+    Rows are locked in key order so two transactions cannot deadlock.
+    """
+    table = DailyReviewQueue.__table__
+    return (
+        select(
+            table.c.id, table.c.user_key, table.c.overdue, table.c.due_today,
+            table.c.overdue_complete, table.c.due_today_complete
+        )
+        .where(table.c.queue_date == queue_date, table.c.user_key.in_(sorted(keys)))
+        .order_by(table.c.user_key)
+        .with_for_update()
+    )
+
+
+def apply_srs_changes(connection, changes: Iterable[SRSChange], now: Optional[datetime] = None) -> int:
+    """
+    Adjust today's stored queues for changed SRS records
+
+    Changed records are removed from the queues of their user and from the
+    all-users queue, and put back in review order while still due today.
+    Runs on the caller's connection, inside its transaction, which holds
+    the queue rows locked until it ends. Returns the
+    number of queues updated.
+    """
+    changes = list(changes)
+    if not changes:
+        return 0
+    now = now or datetime.utcnow()
+    today, tomorrow = day_bounds(now)
+
+    table = DailyReviewQueue.__table__
+    keys = {""} | {user_key(change.user_id) for change in changes}
+    queues = connection.execute(_queues_for_update(keys, today.date())).all()
+    if not queues:
+        return 0
+
+    due = [change for change in changes if change.due_date is not None and change.due_date < tomorrow]
+    difficulties = {}
+    if due:
+        cards = Card.__table__
+        difficulties = {
+            str(row.id): row.difficulty for row in connection.execute(
+                select(cards.c.id, cards.c.difficulty)
+                .where(cards.c.id.in_({str(change.card_id) for change in due}))
+            )
+        }
+
+    changed_ids = {str(change.srs_id) for change in changes}
+    updated = 0
+    for queue in queues:
+        overdue = [entry for entry in queue.overdue if entry[0] not in changed_ids]
+        due_today = [entry for entry in queue.due_today if entry[0] not in changed_ids]
+
+        for change in due:
+            difficulty = difficulties.get(str(change.card_id))
+            if difficulty is None or (queue.user_key and queue.user_key != user_key(change.user_id)):
+                continue
+            entry = _entry(change.srs_id, difficulty, change.due_date)
+            if change.due_date < today:
+                _insert_entry(overdue, entry, _overdue_order, queue.overdue_complete)
+            else:
+                _insert_entry(due_today, entry, _due_today_order, queue.due_today_complete)
+
+        if overdue != queue.overdue or due_today != queue.due_today:
+            connection.execute(
+                update(table).where(table.c.id == queue.id).values(overdue=overdue, due_today=due_today)
+            )
+            updated += 1
+    return updated
+
+
+@event.listens_for(Session, "after_flush")
+def _update_daily_review_queues(session: Session, flush_context) -> None:
+    """Keep today's queues current as SRS records are added, rescheduled or deleted"""
+    if not settings.review_queue_precompute:
+        return
+
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, SRS):
+            changes.append(SRSChange(obj.id, obj.user_id, obj.card_id, obj.due_date))
+    for obj in session.dirty:
+        if not isinstance(obj, SRS):
+            continue
+        attrs = inspect(obj).attrs
+        if not (attrs.due_date.history.has_changes() or attrs.user_id.history.has_changes()):
+            continue
+        # Drop the record from the queue of a previous owner
+        for previous_user_id in attrs.user_id.history.deleted:
+            changes.append(SRSChange(obj.id, previous_user_id, obj.card_id, None))
+        changes.append(SRSChange(obj.id, obj.user_id, obj.card_id, obj.due_date))
+    for obj in session.deleted:
+        if isinstance(obj, SRS):
+            changes.append(SRSChange(obj.id, obj.user_id, obj.card_id, None))
+
+    if changes:
+        apply_srs_changes(session.connection(), changes)
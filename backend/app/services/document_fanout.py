@@ -0,0 +1,132 @@
+"""
+Fan-out of large documents across workers
+
+After chapter extraction, the unfinished chapters of a large document are
+split into contiguous chapter ranges of roughly equal page counts. Each range
+is processed by its own RQ job, and a coordinator job that depends on all of
+them merges their results into the document's checkpoint and sets the final
+processing status.
+
+Part jobs never write the document's metadata (concurrent JSON updates would
+overwrite each other); they report progress through their own job meta and
+return their chapter checkpoints as job results.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..models.document import Chapter
+
+# Rough characters per page for chapters without page numbers
+CHARS_PER_PAGE = 3000
+
+FANOUT_METADATA_KEY = "fanout"
+
+
+@dataclass
+class ChapterRange:
+    """A contiguous range of chapters processed by one part job"""
+    index: int
+    chapter_ids: List[str] = field(default_factory=list)
+    page_count: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "chapter_ids": list(self.chapter_ids),
+            "page_count": self.page_count,
+        }
+
+
+def chapter_page_count(chapter: Chapter) -> int:
+    """Pages covered by a chapter, estimated from its text when page numbers are missing"""
+    if chapter.page_start is not None and chapter.page_end is not None and chapter.page_end >= chapter.page_start:
+        return chapter.page_end - chapter.page_start + 1
+    return max(1, math.ceil(len(chapter.content or "") / CHARS_PER_PAGE))
+
+
+def plan_chapter_ranges(
+    chapters: Sequence[Chapter],
+    pages_per_part: int,
+    max_parts: int,
+    min_pages: int = 0
+) -> List[ChapterRange]:
+    """
+    Split chapters into contiguous ranges of roughly equal page counts.
+
+    Returns an empty list when the chapters should be processed in a single
+    job: fewer than ``min_pages`` pages in total, or not enough pages or
+    chapters for more than one part.
+    """
+    pages = [chapter_page_count(chapter) for chapter in chapters]
+    total_pages = sum(pages)
+    if total_pages < min_pages or len(chapters) < 2:
+        return []
+
+    part_count = min(max_parts, len(chapters), math.ceil(total_pages / max(1, pages_per_part)))
+    if part_count < 2:
+        return []
+
+    ranges: List[ChapterRange] = []
+    current = ChapterRange(index=0)
+    pages_assigned = 0
+
+    for position, (chapter, chapter_pages) in enumerate(zip(chapters, pages)):
+        current.chapter_ids.append(str(chapter.id))
+        current.page_count += chapter_pages
+        pages_assigned += chapter_pages
+
+        parts_left = part_count - len(ranges) - 1
+        chapters_left = len(chapters) - position - 1
+        # Close the range once it reaches its share of the pages so far,
+        # keeping at least one chapter for each remaining part
+        target = total_pages * (len(ranges) + 1) / part_count
+        if parts_left > 0 and chapters_left >= parts_left and (
+            pages_assigned >= target or chapters_left == parts_left
+        ):
+            ranges.append(current)
+            current = ChapterRange(index=len(ranges))
+
+    if current.chapter_ids:
+        ranges.append(current)
+
+    return ranges if len(ranges) > 1 else []
+
+
+def part_outcome(part: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the outcome of a part job.
+
+    ``part`` holds the job's ``status``, its ``result`` (if it finished), the
+    ``error`` it raised (if it failed) and the last ``progress`` it reported.
+    Failed jobs still contribute the chapters they completed before failing.
+    """
+    result = part.get("result") or {}
+    progress = part.get("progress") or {}
+    pipeline_result = result.get("pipeline_result") or {}
+    chapters = pipeline_result.get("chapters") or progress.get("chapters") or {}
+    succeeded = part.get("status") == "finished" and result.get("status") == "completed"
+
+    return {
+        "index": part.get("index"),
+        "job_id": part.get("job_id"),
+        "status": "completed" if succeeded else "failed",
+        "error": None if succeeded else (result.get("error") or part.get("error") or part.get("status")),
+        "chapters": chapters,
+        "trace": pipeline_result.get("trace"),
+    }
+
+
+def fanout_progress(parts: List[Dict[str, Any]], chapters_total: Optional[int] = None) -> Dict[str, Any]:
+    """Summarize per-part progress for status reporting"""
+    completed = sum(part.get("chapters_completed", 0) for part in parts)
+    return {
+        "parts_total": len(parts),
+        "parts_finished": sum(1 for part in parts if part.get("status") in ("finished", "failed")),
+        "chapters_total": chapters_total if chapters_total is not None else sum(
+            part.get("chapters_total", 0) for part in parts
+        ),
+        "chapters_completed": completed,
+        "parts": parts,
+    }
@@ -16,21 +16,38 @@ Requirements addressed:
 import asyncio
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Awaitable, Callable
 from uuid import UUID
 from datetime import datetime
+from sqlalchemy import select, update, delete, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.document import Document, ProcessingStatus, Chapter, Figure
 from ..models.knowledge import Knowledge
-from ..models.learning import Card
+from ..models.learning import Card, SRS
 from ..parsers.factory import get_parser_for_file
 from ..services.text_segmentation_service import TextSegmentationService
 from ..services.knowledge_extraction_service import KnowledgeExtractionService
 from ..services.card_generation_service import CardGenerationService
 from ..services.chapter_service import ChapterService
+from ..services.processing_checkpoint import (
+    ProcessingCheckpoint,
+    PipelineStage,
+    compute_file_fingerprint,
+    compute_chapter_fingerprint,
+)
+from ..services.document_fanout import FANOUT_METADATA_KEY, plan_chapter_ranges, part_outcome
+from ..services.pipeline_tracing import (
+    TRACE_METADATA_KEY,
+    PipelineTracer,
+    merge_trace_summaries,
+    model_time,
+    trace_span,
+)
+from ..core.config import settings
 from ..core.database import get_async_session
 from ..utils.logging import SecurityLogger
+from ..utils.memory_monitor import DocumentProcessingMemoryMonitor
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +69,8 @@ class DocumentProcessingPipeline:
     5. Entity recognition
     6. Flashcard generation
     7. Status tracking and error handling
+    8. Per-stage checkpointing so retries resume where they stopped
+    9. Per-stage tracing with spans summarized in the document's metadata
     """
     
     def __init__(self):
@@ -71,12 +90,29 @@ class DocumentProcessingPipeline:
             "processing_errors": 0
         }
     
-    async def process_document(self, document_id: UUID) -> Dict[str, Any]:
+    async def process_document(
+        self,
+        document_id: UUID,
+        resume: bool = True,
+        allow_fan_out: bool = False
+    ) -> Dict[str, Any]:
         """
         Process a complete document through the entire pipeline.
         
+        Progress is checkpointed per stage and per chapter in the document's
+        metadata. When ``resume`` is True and the source file is unchanged,
+        completed stages and chapters are skipped and only failed or
+        unfinished chapters are redone.
+        
+        With ``allow_fan_out``, large documents are split after chapter
+        extraction into chapter-range jobs processed by other workers; the
+        document then stays in processing until their coordinator job
+        finishes it.
+        
         Args:
             document_id: UUID of the document to process
+            resume: Whether to resume from recorded checkpoints
+            allow_fan_out: Whether large documents may be split across workers
             
         Returns:
             Dictionary containing processing results and statistics
@@ -85,122 +121,505 @@ class DocumentProcessingPipeline:
             ProcessingError: If any step in the pipeline fails
         """
         processing_start = datetime.utcnow()
+        tracer = PipelineTracer()
         
         try:
             # Log processing start
             self.security_logger.log_security_event(
                 "document_processing_start",
-                {"document_id": str(document_id)},
+                {"document_id": str(document_id), "resume": resume},
                 "INFO"
             )
             
             async with get_async_session() as session:
-                # Step 1: Load document from database
-                document = await self._load_document(session, document_id)
-                if not document:
-                    raise ProcessingError(f"Document {document_id} not found")
-                
-                # Step 2: Update status to processing
-                await self._update_document_status(
-                    session, document, ProcessingStatus.PROCESSING,
-                    {"current_step": "parsing", "started_at": processing_start.isoformat()}
-                )
+                with tracer.span("process_document", document_id=str(document_id), resume=resume):
+                    return await self._run_document(
+                        session, document_id, tracer, resume, allow_fan_out, processing_start
+                    )
                 
-                # Step 3: Parse document content
+        except Exception as e:
+            # Handle processing errors
+            await self._handle_processing_error(document_id, e, tracer)
+            raise ProcessingError(f"Document processing failed: {str(e)}") from e
+        finally:
+            tracer.export()
+    
+    async def _run_document(
+        self,
+        session: AsyncSession,
+        document_id: UUID,
+        tracer: PipelineTracer,
+        resume: bool,
+        allow_fan_out: bool,
+        processing_start: datetime
+    ) -> Dict[str, Any]:
+        """Run the pipeline steps of ``process_document`` inside its root span."""
+        # Step 1: Load document from database
+        document = await self._load_document(session, document_id)
+        if not document:
+            raise ProcessingError(f"Document {document_id} not found")
+        
+        # Step 2: Update status to processing
+        await self._update_document_status(
+            session, document, ProcessingStatus.PROCESSING,
+            {
+                "current_step": "parsing",
+                "started_at": processing_start.isoformat(),
+                FANOUT_METADATA_KEY: None,
+                TRACE_METADATA_KEY: tracer.context()
+            }
+        )
+        
+        checkpoint = ProcessingCheckpoint.from_metadata(document.doc_metadata)
+        source_fingerprint = compute_file_fingerprint(Path(document.file_path))
+        if resume and checkpoint.matches_source(source_fingerprint):
+            checkpoint.mark_resumed()
+        else:
+            checkpoint.restart(source_fingerprint, reuse_chapters=resume)
+        
+        # Steps 3-4: Parse document and extract chapters, unless already checkpointed
+        if checkpoint.is_stage_complete(PipelineStage.CHAPTERS):
+            logger.info(f"Resuming document {document_id} from chapter checkpoint")
+            chapters = await self._load_chapters(document.id)
+            figures_processed = checkpoint.stage_details(PipelineStage.PARSED).get("figures", 0)
+        else:
+            file_size_mb = (document.file_size or 0) / (1024 * 1024)
+            with tracer.span(
+                "parse",
+                memory=DocumentProcessingMemoryMonitor.monitor_document_parsing(str(document.id), file_size_mb)
+            ) as parse_span:
                 parsed_content = await self._parse_document(document)
-                
-                # Step 4: Extract chapters and structure
-                await self._update_processing_metadata(
-                    session, document, {"current_step": "extracting_chapters"}
+                page_count = len({block.page for block in parsed_content.text_blocks})
+                figures_processed = len(parsed_content.images)
+                parse_span.set(
+                    page_count=page_count,
+                    text_block_count=len(parsed_content.text_blocks),
+                    figure_count=figures_processed
                 )
+            checkpoint.mark_stage(
+                PipelineStage.PARSED,
+                pages=page_count,
+                text_blocks=len(parsed_content.text_blocks),
+                figures=figures_processed
+            )
+            
+            await self._update_processing_metadata(
+                session, document, {"current_step": "extracting_chapters"}
+            )
+            with tracer.span("extract_chapters") as chapters_span:
                 chapters = await self._extract_chapters(session, document, parsed_content)
-                
-                # Step 5: Process each chapter
-                all_knowledge_points = []
-                all_cards = []
-                
-                for chapter in chapters:
-                    try:
-                        # Extract knowledge points from chapter
-                        await self._update_processing_metadata(
-                            session, document, 
-                            {"current_step": f"processing_chapter_{chapter.title[:30]}"}
-                        )
-                        
-                        knowledge_points = await self._process_chapter(session, chapter)
-                        all_knowledge_points.extend(knowledge_points)
-                        
-                        # Generate cards from knowledge points
-                        chapter_figures = [fig for fig in parsed_content.images 
-                                         if self._figure_belongs_to_chapter(fig, chapter)]
-                        
-                        cards = await self._generate_cards_for_chapter(
-                            session, knowledge_points, chapter_figures
+                await self._reconcile_previous_chapters(session, document.id, chapters, checkpoint)
+                chapters_span.set(chapter_count=len(chapters))
+            checkpoint.mark_stage(PipelineStage.CHAPTERS, chapter_count=len(chapters))
+            await self._save_checkpoint(session, document, checkpoint)
+        
+        # Step 5: Hand large documents to parallel chapter-range jobs
+        if allow_fan_out:
+            fan_out_result = await self._fan_out(session, document, chapters, checkpoint, tracer)
+            if fan_out_result:
+                return fan_out_result
+        
+        # Step 6: Process each chapter that has not completed yet
+        async def save_progress(current_step: Optional[str] = None) -> None:
+            extra = {"current_step": current_step} if current_step else None
+            await self._save_checkpoint(session, document, checkpoint, extra)
+        
+        counts = await self._process_chapters(session, chapters, checkpoint, save_progress)
+        
+        # Step 7: Update final status
+        return await self._complete_document(
+            session, document, checkpoint,
+            chapters_created=len(chapters),
+            chapters_resumed=counts["chapters_resumed"],
+            knowledge_count=counts["knowledge_points"],
+            card_count=counts["cards"],
+            figures_processed=figures_processed,
+            processing_start=processing_start,
+            extra_metadata={TRACE_METADATA_KEY: tracer.summary()}
+        )
+    
+    async def _process_chapters(
+        self,
+        session: AsyncSession,
+        chapters: List[Chapter],
+        checkpoint: ProcessingCheckpoint,
+        save_progress: Callable[..., Awaitable[None]]
+    ) -> Dict[str, int]:
+        """
+        Run knowledge extraction and card generation for chapters not completed yet.
+        
+        ``save_progress`` persists the checkpoint after every chapter stage and
+        optionally takes the name of the current step. A failing chapter is
+        recorded in the checkpoint and does not stop the others.
+        """
+        knowledge_count = 0
+        card_count = 0
+        chapters_resumed = 0
+        
+        for chapter in chapters:
+            chapter_key = str(chapter.id)
+            
+            if checkpoint.is_chapter_complete(chapter_key):
+                details = checkpoint.chapter_details(chapter_key)
+                knowledge_count += details.get("knowledge_points", 0)
+                card_count += details.get("cards", 0)
+                chapters_resumed += 1
+                continue
+            
+            with trace_span("chapter", chapter_id=chapter_key, title=chapter.title[:100]) as chapter_span:
+                try:
+                    # Extract knowledge points from chapter
+                    await save_progress(f"processing_chapter_{chapter.title[:30]}")
+                    
+                    if checkpoint.is_chapter_stage_complete(chapter_key, PipelineStage.KNOWLEDGE):
+                        knowledge_points = await self._load_chapter_knowledge(session, chapter.id)
+                        await self._clear_chapter_outputs(session, chapter.id, keep_knowledge=True)
+                    else:
+                        await self._clear_chapter_outputs(session, chapter.id)
+                        knowledge_points = await self._process_chapter(session, chapter, checkpoint)
+                        checkpoint.mark_chapter_stage(
+                            chapter_key, PipelineStage.KNOWLEDGE,
+                            knowledge_points=len(knowledge_points),
+                            fingerprint=compute_chapter_fingerprint(chapter.title, chapter.content)
                         )
-                        all_cards.extend(cards)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing chapter {chapter.id}: {e}")
-                        # Continue with other chapters
-                        continue
-                
-                # Step 6: Update final status
-                processing_end = datetime.utcnow()
-                processing_duration = (processing_end - processing_start).total_seconds()
-                
-                final_metadata = {
-                    "current_step": "completed",
-                    "started_at": processing_start.isoformat(),
-                    "completed_at": processing_end.isoformat(),
-                    "processing_duration_seconds": processing_duration,
-                    "chapters_created": len(chapters),
-                    "knowledge_points_extracted": len(all_knowledge_points),
-                    "cards_generated": len(all_cards),
-                    "figures_processed": len(parsed_content.images)
+                        await save_progress()
+                    
+                    # Generate cards from knowledge points
+                    chapter_figures = await self._load_chapter_figures(session, chapter.id)
+                    
+                    cards = await self._generate_cards_for_chapter(
+                        session, knowledge_points, chapter_figures
+                    )
+                    checkpoint.mark_chapter_stage(chapter_key, PipelineStage.CARDS, cards=len(cards))
+                    await save_progress()
+                    
+                    knowledge_count += len(knowledge_points)
+                    card_count += len(cards)
+                    chapter_span.set(knowledge_count=len(knowledge_points), card_count=len(cards))
+                    
+                except Exception as e:
+                    logger.error(f"Error processing chapter {chapter.id}: {e}")
+                    chapter_span.record_error(e)
+                    checkpoint.mark_chapter_failed(chapter_key, str(e))
+                    await save_progress()
+                    # Continue with other chapters
+                    continue
+            
+        return {
+            "knowledge_points": knowledge_count,
+            "cards": card_count,
+            "chapters_resumed": chapters_resumed
+        }
+    
+    async def _complete_document(
+        self,
+        session: AsyncSession,
+        document: Document,
+        checkpoint: ProcessingCheckpoint,
+        chapters_created: int,
+        chapters_resumed: int,
+        knowledge_count: int,
+        card_count: int,
+        figures_processed: int,
+        processing_start: datetime,
+        extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Mark a document as completed and record the final processing statistics."""
+        processing_end = datetime.utcnow()
+        processing_duration = (processing_end - processing_start).total_seconds()
+        failed_chapters = checkpoint.failed_chapters()
+        
+        final_metadata = {
+            "current_step": "completed",
+            "started_at": processing_start.isoformat(),
+            "completed_at": processing_end.isoformat(),
+            "processing_duration_seconds": processing_duration,
+            "chapters_created": chapters_created,
+            "chapters_resumed": chapters_resumed,
+            "chapters_failed": len(failed_chapters),
+            "knowledge_points_extracted": knowledge_count,
+            "cards_generated": card_count,
+            "figures_processed": figures_processed,
+            **(extra_metadata or {}),
+            ProcessingCheckpoint.METADATA_KEY: checkpoint.to_dict()
+        }
+        
+        if inspect(document).expired_attributes:
+            await session.refresh(document)
+        await self._update_document_status(
+            session, document, ProcessingStatus.COMPLETED, final_metadata
+        )
+        
+        # Update global statistics
+        self.stats["documents_processed"] += 1
+        self.stats["chapters_created"] += chapters_created - chapters_resumed
+        self.stats["knowledge_points_extracted"] += knowledge_count
+        self.stats["cards_generated"] += card_count
+        
+        # Log successful completion
+        self.security_logger.log_security_event(
+            "document_processing_completed",
+            {
+                "document_id": str(document.id),
+                "processing_duration": processing_duration,
+                "chapters": chapters_created,
+                "chapters_resumed": chapters_resumed,
+                "knowledge_points": knowledge_count,
+                "cards": card_count
+            },
+            "INFO"
+        )
+        
+        return {
+            "success": True,
+            "document_id": str(document.id),
+            "processing_duration": processing_duration,
+            "chapters_created": chapters_created,
+            "chapters_resumed": chapters_resumed,
+            "chapters_failed": len(failed_chapters),
+            "knowledge_points_extracted": knowledge_count,
+            "cards_generated": card_count,
+            "figures_processed": figures_processed
+        }
+    
+    async def _fan_out(
+        self,
+        session: AsyncSession,
+        document: Document,
+        chapters: List[Chapter],
+        checkpoint: ProcessingCheckpoint,
+        tracer: PipelineTracer
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Split the unfinished chapters of a large document into parallel jobs.
+        
+        The trace summary so far is saved with the plan; the part jobs and
+        their coordinator continue the same trace.
+        
+        Returns None (process in this job) when the document is too small to
+        split or the jobs cannot be enqueued.
+        """
+        pending = [chapter for chapter in chapters if not checkpoint.is_chapter_complete(str(chapter.id))]
+        ranges = plan_chapter_ranges(
+            pending,
+            pages_per_part=settings.fanout_pages_per_part,
+            max_parts=settings.fanout_max_parts,
+            min_pages=settings.fanout_min_pages
+        )
+        if not ranges:
+            return None
+        
+        try:
+            from .queue_service import QueueService
+            queue_service = QueueService()
+        except Exception as e:
+            logger.warning(f"Queue unavailable, processing document {document.id} in a single job: {e}")
+            return None
+        
+        fanout = {
+            "started_at": datetime.utcnow().isoformat(),
+            "chapters_resumed": len(chapters) - len(pending),
+            "coordinator_job_id": QueueService.coordinator_job_id(document.id),
+            "parts": [
+                {
+                    "index": chapter_range.index,
+                    "job_id": QueueService.part_job_id(document.id, chapter_range.index),
+                    "chapter_count": len(chapter_range.chapter_ids),
+                    "page_count": chapter_range.page_count
+                }
+                for chapter_range in ranges
+            ]
+        }
+        
+        # Record the plan before enqueuing so the parts never race with this write
+        await self._save_checkpoint(
+            session, document, checkpoint,
+            {
+                "current_step": "processing_parts",
+                FANOUT_METADATA_KEY: fanout,
+                TRACE_METADATA_KEY: tracer.summary()
+            }
+        )
+        
+        try:
+            await queue_service.enqueue_document_parts(document.id, ranges)
+        except Exception as e:
+            logger.warning(f"Failed to fan out document {document.id}, processing in a single job: {e}")
+            await self._update_processing_metadata(session, document, {FANOUT_METADATA_KEY: None})
+            return None
+        
+        self.security_logger.log_security_event(
+            "document_processing_fanned_out",
+            {
+                "document_id": str(document.id),
+                "parts": len(ranges),
+                "chapters_pending": len(pending)
+            },
+            "INFO"
+        )
+        
+        return {
+            "success": True,
+            "fanned_out": True,
+            "document_id": str(document.id),
+            "parts": len(ranges),
+            "chapters_created": len(chapters),
+            "chapters_pending": len(pending),
+            "coordinator_job_id": fanout["coordinator_job_id"]
+        }
+    
+    async def process_document_part(
+        self,
+        document_id: UUID,
+        chapter_ids: List[str],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Process one chapter range of a fanned-out document.
+        
+        The document's metadata is left untouched because other parts run
+        concurrently; progress is reported through ``on_progress`` and the
+        chapter checkpoints and trace summary are returned for the
+        coordinator to merge.
+        
+        Args:
+            document_id: UUID of the document
+            chapter_ids: IDs of the chapters in this part
+            on_progress: Called with the part's progress after every chapter stage
+            
+        Returns:
+            Chapter checkpoints, counts and trace summary of this part
+        """
+        async with get_async_session() as session:
+            document = await self._load_document(session, document_id)
+            if not document:
+                raise ProcessingError(f"Document {document_id} not found")
+            
+            checkpoint = ProcessingCheckpoint.from_metadata(document.doc_metadata)
+            tracer = PipelineTracer.from_metadata(document.doc_metadata)
+            wanted = set(chapter_ids)
+            chapters = [
+                chapter for chapter in await self._load_chapters(document_id)
+                if str(chapter.id) in wanted
+            ]
+            
+            def part_chapters() -> Dict[str, Dict[str, Any]]:
+                return {
+                    chapter_id: checkpoint.chapter_details(chapter_id)
+                    for chapter_id in chapter_ids
+                    if checkpoint.chapter_details(chapter_id)
                 }
+            
+            progress = {"current_step": "starting", "chapters_total": len(chapters)}
+            
+            async def save_progress(current_step: Optional[str] = None) -> None:
+                if on_progress is None:
+                    return
+                state = part_chapters()
+                if current_step:
+                    progress["current_step"] = current_step
+                progress.update({
+                    "chapters_completed": sum(1 for chapter_id in state if checkpoint.is_chapter_complete(chapter_id)),
+                    "chapters_failed": sum(1 for chapter in state.values() if chapter.get("error")),
+                    "chapters": state,
+                    "updated_at": datetime.utcnow().isoformat()
+                })
+                on_progress(dict(progress))
+            
+            try:
+                with tracer.span("process_part", document_id=str(document_id), chapter_count=len(chapters)):
+                    counts = await self._process_chapters(session, chapters, checkpoint, save_progress)
+            finally:
+                tracer.export()
+            await save_progress("completed")
+            
+            return {
+                "success": True,
+                "document_id": str(document_id),
+                "chapters_processed": len(chapters),
+                "knowledge_points_extracted": counts["knowledge_points"],
+                "cards_generated": counts["cards"],
+                "chapters": part_chapters(),
+                TRACE_METADATA_KEY: tracer.summary()
+            }
+    
+    async def finalize_fanned_out_document(
+        self,
+        document_id: UUID,
+        part_results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Merge the results of all part jobs and set the final document status.
+        
+        Chapters completed by any part are merged into the document's
+        checkpoint, including those of parts that failed, so a retry only
+        redoes what is missing. The trace summaries of the parts are merged
+        into the document's. The document fails if any part failed.
+        
+        Args:
+            document_id: UUID of the document
+            part_results: Status, result and last progress of each part job
+            
+        Returns:
+            Aggregated processing results
+        """
+        try:
+            async with get_async_session() as session:
+                document = await self._load_document(session, document_id)
+                if not document:
+                    raise ProcessingError(f"Document {document_id} not found")
                 
-                await self._update_document_status(
-                    session, document, ProcessingStatus.COMPLETED, final_metadata
+                metadata = document.doc_metadata or {}
+                checkpoint = ProcessingCheckpoint.from_metadata(metadata)
+                outcomes = [part_outcome(part) for part in part_results]
+                for outcome in outcomes:
+                    checkpoint.merge_chapters(outcome["chapters"])
+                
+                fanout = dict(metadata.get(FANOUT_METADATA_KEY) or {})
+                fanout["finalized_at"] = datetime.utcnow().isoformat()
+                fanout["part_outcomes"] = [
+                    {key: value for key, value in outcome.items() if key not in ("chapters", "trace")}
+                    for outcome in outcomes
+                ]
+                trace = merge_trace_summaries(
+                    [metadata.get(TRACE_METADATA_KEY)] + [outcome["trace"] for outcome in outcomes]
+                )
+                await self._save_checkpoint(
+                    session, document, checkpoint,
+                    {FANOUT_METADATA_KEY: fanout, TRACE_METADATA_KEY: trace}
                 )
                 
-                # Update global statistics
-                self.stats["documents_processed"] += 1
-                self.stats["chapters_created"] += len(chapters)
-                self.stats["knowledge_points_extracted"] += len(all_knowledge_points)
-                self.stats["cards_generated"] += len(all_cards)
+                failed_parts = [outcome for outcome in outcomes if outcome["status"] == "failed"]
+                if failed_parts:
+                    raise ProcessingError(
+                        f"{len(failed_parts)} of {len(outcomes)} document parts failed: "
+                        f"{failed_parts[0]['error']}"
+                    )
                 
-                # Log successful completion
-                self.security_logger.log_security_event(
-                    "document_processing_completed",
-                    {
-                        "document_id": str(document_id),
-                        "processing_duration": processing_duration,
-                        "chapters": len(chapters),
-                        "knowledge_points": len(all_knowledge_points),
-                        "cards": len(all_cards)
-                    },
-                    "INFO"
-                )
+                started_at = metadata.get("started_at") or fanout.get("started_at")
+                processing_start = datetime.fromisoformat(started_at) if started_at else datetime.utcnow()
+                totals = checkpoint.chapter_totals()
                 
-                return {
-                    "success": True,
-                    "document_id": str(document_id),
-                    "processing_duration": processing_duration,
-                    "chapters_created": len(chapters),
-                    "knowledge_points_extracted": len(all_knowledge_points),
-                    "cards_generated": len(all_cards),
-                    "figures_processed": len(parsed_content.images)
-                }
+                return await self._complete_document(
+                    session, document, checkpoint,
+                    chapters_created=checkpoint.stage_details(PipelineStage.CHAPTERS).get(
+                        "chapter_count", len(checkpoint.chapters)
+                    ),
+                    chapters_resumed=fanout.get("chapters_resumed", 0),
+                    knowledge_count=totals["knowledge_points"],
+                    card_count=totals["cards"],
+                    figures_processed=checkpoint.stage_details(PipelineStage.PARSED).get("figures", 0),
+                    processing_start=processing_start,
+                    extra_metadata={"parts_processed": len(outcomes)}
+                )
                 
         except Exception as e:
-            # Handle processing errors
             await self._handle_processing_error(document_id, e)
             raise ProcessingError(f"Document processing failed: {str(e)}") from e
     
     async def _load_document(self, session: AsyncSession, document_id: UUID) -> Optional[Document]:
         """Load document from database."""
         try:
-            from sqlalchemy import select
             stmt = select(Document).where(Document.id == document_id)
             result = await session.execute(stmt)
             return result.scalar_one_or_none()
@@ -220,8 +639,8 @@ class DocumentProcessingPipeline:
             document.status = status
             
             if metadata:
-                # Merge with existing metadata
-                current_metadata = document.doc_metadata or {}
+                # Merge with existing metadata (copy so the JSON change is detected)
+                current_metadata = dict(document.doc_metadata or {})
                 current_metadata.update(metadata)
                 document.doc_metadata = current_metadata
             
@@ -241,7 +660,7 @@ class DocumentProcessingPipeline:
     ) -> None:
         """Update processing metadata without changing status."""
         try:
-            current_metadata = document.doc_metadata or {}
+            current_metadata = dict(document.doc_metadata or {})
             current_metadata.update(metadata)
             document.doc_metadata = current_metadata
             
@@ -329,7 +748,11 @@ class DocumentProcessingPipeline:
             )
             
             # Save figures to database
-            await self._save_figures(session, parsed_content.images, chapters)
+            image_tracking = DocumentProcessingMemoryMonitor.monitor_image_extraction(
+                str(document.id), len(parsed_content.images)
+            )
+            with trace_span("save_figures", memory=image_tracking, figure_count=len(parsed_content.images)):
+                await self._save_figures(session, parsed_content.images, chapters)
             
             logger.info(f"Extracted {len(chapters)} chapters from document {document.id}")
             return chapters
@@ -390,10 +813,151 @@ class DocumentProcessingPipeline:
         # Default to first chapter if no match found
         return chapters[0] if chapters else None
     
+    async def _save_checkpoint(
+        self,
+        session: AsyncSession,
+        document: Document,
+        checkpoint: ProcessingCheckpoint,
+        extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Persist checkpoint progress so a later retry can resume from it."""
+        if inspect(document).expired_attributes:
+            # A failed step rolled the session back; reload before merging metadata
+            await session.refresh(document)
+        
+        await self._update_processing_metadata(
+            session, document,
+            {**(extra_metadata or {}), ProcessingCheckpoint.METADATA_KEY: checkpoint.to_dict()}
+        )
+    
+    async def _load_chapters(self, document_id: UUID) -> List[Chapter]:
+        """Load the previously extracted chapters of a document."""
+        async with get_async_session() as chapter_session:
+            stmt = select(Chapter).where(
+                Chapter.document_id == document_id
+            ).order_by(Chapter.order_index)
+            result = await chapter_session.execute(stmt)
+            return list(result.scalars().all())
+    
+    async def _load_chapter_knowledge(self, session: AsyncSession, chapter_id: UUID) -> List[Knowledge]:
+        """Load the knowledge points already extracted for a chapter."""
+        stmt = select(Knowledge).where(Knowledge.chapter_id == chapter_id)
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+    
+    async def _load_chapter_figures(self, session: AsyncSession, chapter_id: UUID) -> List[Figure]:
+        """Load the figures saved for a chapter."""
+        stmt = select(Figure).where(Figure.chapter_id == chapter_id)
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+    
+    async def _clear_chapter_outputs(
+        self,
+        session: AsyncSession,
+        chapter_id: UUID,
+        keep_knowledge: bool = False
+    ) -> None:
+        """Delete cards (and optionally knowledge) left behind by an unfinished chapter run."""
+        knowledge_ids = select(Knowledge.id).where(Knowledge.chapter_id == chapter_id)
+        card_ids = select(Card.id).where(Card.knowledge_id.in_(knowledge_ids))
+        
+        statements = [
+            delete(SRS).where(SRS.card_id.in_(card_ids)),
+            delete(Card).where(Card.knowledge_id.in_(knowledge_ids)),
+        ]
+        if not keep_knowledge:
+            statements.append(delete(Knowledge).where(Knowledge.chapter_id == chapter_id))
+        
+        for stmt in statements:
+            await session.execute(stmt.execution_options(synchronize_session=False))
+        await session.commit()
+    
+    async def _delete_chapters(self, session: AsyncSession, chapter_ids: List[UUID]) -> None:
+        """Delete chapters together with their figures, knowledge, cards and review state."""
+        knowledge_ids = select(Knowledge.id).where(Knowledge.chapter_id.in_(chapter_ids))
+        card_ids = select(Card.id).where(Card.knowledge_id.in_(knowledge_ids))
+        
+        statements = [
+            delete(SRS).where(SRS.card_id.in_(card_ids)),
+            delete(Card).where(Card.knowledge_id.in_(knowledge_ids)),
+            delete(Knowledge).where(Knowledge.chapter_id.in_(chapter_ids)),
+            delete(Figure).where(Figure.chapter_id.in_(chapter_ids)),
+            delete(Chapter).where(Chapter.id.in_(chapter_ids)),
+        ]
+        for stmt in statements:
+            await session.execute(stmt.execution_options(synchronize_session=False))
+    
+    async def _reconcile_previous_chapters(
+        self,
+        session: AsyncSession,
+        document_id: UUID,
+        chapters: List[Chapter],
+        checkpoint: ProcessingCheckpoint
+    ) -> None:
+        """
+        Replace chapters left over from earlier runs with the newly extracted ones.
+        
+        Knowledge points (and with them cards and review state) of previously
+        completed chapters whose fingerprint is unchanged are moved to the
+        matching new chapter, so only changed chapters are reprocessed.
+        Everything else from earlier runs is deleted.
+        """
+        try:
+            stmt = select(Chapter.id).where(
+                Chapter.document_id == document_id,
+                Chapter.id.notin_([chapter.id for chapter in chapters])
+            )
+            result = await session.execute(stmt)
+            previous_ids = list(result.scalars().all())
+            previous_keys = {str(chapter_id) for chapter_id in previous_ids}
+            
+            for chapter in chapters:
+                if not previous_keys:
+                    break
+                
+                fingerprint = compute_chapter_fingerprint(chapter.title, chapter.content)
+                reusable = checkpoint.take_reusable_chapter(fingerprint)
+                if not reusable or reusable["chapter_id"] not in previous_keys:
+                    continue
+                
+                await session.execute(
+                    update(Knowledge)
+                    .where(Knowledge.chapter_id == UUID(reusable["chapter_id"]))
+                    .values(chapter_id=chapter.id)
+                    .execution_options(synchronize_session=False)
+                )
+                previous_keys.discard(reusable["chapter_id"])
+                
+                chapter_key = str(chapter.id)
+                checkpoint.mark_chapter_stage(
+                    chapter_key, PipelineStage.KNOWLEDGE,
+                    knowledge_points=reusable.get("knowledge_points", 0),
+                    fingerprint=fingerprint,
+                    reused_from=reusable["chapter_id"]
+                )
+                checkpoint.mark_chapter_stage(
+                    chapter_key, PipelineStage.CARDS, cards=reusable.get("cards", 0)
+                )
+            
+            if previous_ids:
+                await self._delete_chapters(session, previous_ids)
+                logger.info(
+                    f"Replaced {len(previous_ids)} chapters from earlier runs of document {document_id}"
+                )
+            
+            checkpoint.clear_reusable_chapters()
+            await session.commit()
+            
+        except Exception as e:
+            logger.error(f"Error reconciling chapters for document {document_id}: {e}")
+            await session.rollback()
+            raise ProcessingError(f"Chapter reconciliation failed: {str(e)}") from e
+    
     async def _process_chapter(
         self, 
         session: AsyncSession, 
-        chapter: Chapter
+        chapter: Chapter,
+        checkpoint: Optional[ProcessingCheckpoint] = None
     ) -> List[Knowledge]:
         """Process a single chapter to extract knowledge points."""
         try:
@@ -402,40 +966,54 @@ class DocumentProcessingPipeline:
                 return []
             
             # Step 1: Segment the chapter text
-            segments = await self.text_segmentation.segment_text(
-                chapter.content, 
-                str(chapter.id),
-                chapter.page_start or 1
+            nlp_tracking = DocumentProcessingMemoryMonitor.monitor_nlp_processing(
+                str(chapter.document_id), len(chapter.content)
             )
+            with trace_span("segment", memory=nlp_tracking) as segment_span, model_time():
+                segments = await self.text_segmentation.segment_text(
+                    chapter.content, 
+                    str(chapter.id),
+                    chapter.page_start or 1
+                )
+                segment_span.set(segment_count=len(segments))
             
             if not segments:
                 logger.warning(f"No segments extracted from chapter {chapter.id}")
                 return []
             
+            if checkpoint:
+                checkpoint.mark_chapter_stage(
+                    str(chapter.id), PipelineStage.SEGMENTS, segments=len(segments)
+                )
+            
             # Step 2: Extract knowledge points from segments
-            knowledge_points = await self.knowledge_extraction.extract_knowledge_from_segments(
-                segments, str(chapter.id)
-            )
+            with trace_span("extract", segment_count=len(segments)) as extract_span, model_time():
+                knowledge_points = await self.knowledge_extraction.extract_knowledge_from_segments(
+                    segments, str(chapter.id)
+                )
+                extract_span.set(knowledge_count=len(knowledge_points))
             
             # Step 3: Save knowledge points to database
-            saved_knowledge = []
-            for kp in knowledge_points:
-                try:
-                    knowledge = Knowledge(
-                        chapter_id=chapter.id,
-                        kind=kp.kind,
-                        text=kp.text,
-                        entities=kp.entities,
-                        anchors=kp.anchors,
-                        confidence_score=kp.confidence
-                    )
-                    session.add(knowledge)
-                    saved_knowledge.append(knowledge)
-                except Exception as e:
-                    logger.error(f"Error saving knowledge point: {e}")
-                    continue
-            
-            await session.commit()
+            with trace_span("persist", target="knowledge") as persist_span:
+                saved_knowledge = []
+                for kp in knowledge_points:
+                    try:
+                        knowledge = Knowledge(
+                            chapter_id=chapter.id,
+                            kind=kp.kind,
+                            text=kp.text,
+                            entities=kp.entities,
+                            anchors=kp.anchors,
+                            confidence_score=kp.confidence
+                        )
+                        session.add(knowledge)
+                        saved_knowledge.append(knowledge)
+                    except Exception as e:
+                        logger.error(f"Error saving knowledge point: {e}")
+                        continue
+                
+                await session.commit()
+                persist_span.set(knowledge_count=len(saved_knowledge))
             
             logger.info(
                 f"Processed chapter {chapter.id}: "
@@ -461,29 +1039,33 @@ class DocumentProcessingPipeline:
                 return []
             
             # Generate cards using the card generation service
-            generated_cards = await self.card_generation.generate_cards_from_knowledge(
-                knowledge_points, figures
-            )
+            with trace_span("generate", knowledge_count=len(knowledge_points)) as generate_span, model_time():
+                generated_cards = await self.card_generation.generate_cards_from_knowledge(
+                    knowledge_points, figures
+                )
+                generate_span.set(card_count=len(generated_cards))
             
             # Save cards to database
-            saved_cards = []
-            for gen_card in generated_cards:
-                try:
-                    card = Card(
-                        knowledge_id=UUID(gen_card.knowledge_id),
-                        card_type=gen_card.card_type,
-                        front=gen_card.front,
-                        back=gen_card.back,
-                        difficulty=gen_card.difficulty,
-                        metadata=gen_card.metadata
-                    )
-                    session.add(card)
-                    saved_cards.append(card)
-                except Exception as e:
-                    logger.error(f"Error saving card: {e}")
-                    continue
-            
-            await session.commit()
+            with trace_span("persist", target="cards") as persist_span:
+                saved_cards = []
+                for gen_card in generated_cards:
+                    try:
+                        card = Card(
+                            knowledge_id=UUID(gen_card.knowledge_id),
+                            card_type=gen_card.card_type,
+                            front=gen_card.front,
+                            back=gen_card.back,
+                            difficulty=gen_card.difficulty,
+                            metadata=gen_card.metadata
+                        )
+                        session.add(card)
+                        saved_cards.append(card)
+                    except Exception as e:
+                        logger.error(f"Error saving card: {e}")
+                        continue
+                
+                await session.commit()
+                persist_span.set(card_count=len(saved_cards))
             
             logger.info(
                 f"Generated {len(saved_cards)} cards from {len(knowledge_points)} knowledge points"
@@ -496,15 +1078,13 @@ class DocumentProcessingPipeline:
             await session.rollback()
             raise ProcessingError(f"Card generation failed: {str(e)}") from e
     
-    def _figure_belongs_to_chapter(self, figure, chapter: Chapter) -> bool:
-        """Check if a figure belongs to a specific chapter."""
-        if not chapter.page_start or not chapter.page_end:
-            return True  # Default to including if page info not available
-        
-        return chapter.page_start <= figure.page <= chapter.page_end
-    
-    async def _handle_processing_error(self, document_id: UUID, error: Exception) -> None:
-        """Handle processing errors by updating document status."""
+    async def _handle_processing_error(
+        self,
+        document_id: UUID,
+        error: Exception,
+        tracer: Optional[PipelineTracer] = None
+    ) -> None:
+        """Handle processing errors by updating document status and the trace summary."""
         try:
             async with get_async_session() as session:
                 document = await self._load_document(session, document_id)
@@ -515,6 +1095,8 @@ class DocumentProcessingPipeline:
                         "error_type": type(error).__name__,
                         "failed_at": datetime.utcnow().isoformat()
                     }
+                    if tracer and tracer.spans:
+                        error_metadata[TRACE_METADATA_KEY] = tracer.summary()
                     
                     await self._update_document_status(
                         session, document, ProcessingStatus.FAILED, error_metadata
@@ -537,12 +1119,16 @@ class DocumentProcessingPipeline:
         except Exception as e:
             logger.error(f"Error handling processing error for document {document_id}: {e}")
     
-    async def retry_failed_document(self, document_id: UUID) -> Dict[str, Any]:
+    async def retry_failed_document(self, document_id: UUID, resume: bool = True) -> Dict[str, Any]:
         """
         Retry processing for a failed document.
         
+        By default the retry resumes from the last checkpoint, so only stages
+        and chapters that did not complete are redone.
+        
         Args:
             document_id: UUID of the document to retry
+            resume: Whether to resume from checkpoints instead of starting over
             
         Returns:
             Processing results
@@ -565,7 +1151,7 @@ class DocumentProcessingPipeline:
                 )
             
             # Process the document
-            return await self.process_document(document_id)
+            return await self.process_document(document_id, resume=resume)
             
         except Exception as e:
             logger.error(f"Error retrying document {document_id}: {e}")
@@ -595,7 +1181,7 @@ class DocumentProcessingPipeline:
                     return {"error": "Document not found"}
                 
                 # Get related counts
-                from sqlalchemy import select, func
+                from sqlalchemy import func
                 
                 # Count chapters
                 chapter_stmt = select(func.count(Chapter.id)).where(Chapter.document_id == document_id)
@@ -622,6 +1208,7 @@ class DocumentProcessingPipeline:
                     "status": document.status.value,
                     "error_message": document.error_message,
                     "processing_metadata": document.doc_metadata or {},
+                    "checkpoint": ProcessingCheckpoint.from_metadata(document.doc_metadata).summary(),
                     "chapters_created": chapter_count,
                     "knowledge_points_extracted": knowledge_count,
                     "cards_generated": card_count,
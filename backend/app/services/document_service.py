@@ -16,6 +16,9 @@ from app.models.document import Document, ProcessingStatus
 from app.core.config import settings
 from app.utils.file_validation import get_file_type
 from app.services.queue_service import QueueService
+from app.services.processing_checkpoint import ProcessingCheckpoint
+from app.services.document_fanout import FANOUT_METADATA_KEY
+from app.services.pipeline_tracing import TRACE_METADATA_KEY
 from app.utils.security import generate_secure_filename
 from app.utils.access_control import DataProtection
 from app.utils.logging import SecurityLogger
@@ -117,7 +120,12 @@ class DocumentService:
         
         return document
     
-    async def queue_for_processing(self, document_id: UUID, priority: bool = False) -> str:
+    async def queue_for_processing(
+        self,
+        document_id: UUID,
+        priority: bool = False,
+        resume: bool = True
+    ) -> str:
         """
         Queue document for background processing
         
@@ -126,18 +134,22 @@ class DocumentService:
         Args:
             document_id: UUID of document to process
             priority: Whether to use priority queue for urgent processing
+            resume: Whether to resume from processing checkpoints
         
         Returns:
             Job ID for tracking processing status
         """
         try:
             # Update document status to queued
-            await self.update_status(document_id, ProcessingStatus.PENDING)
+            document = await self.update_status(document_id, ProcessingStatus.PENDING)
             
-            # Enqueue for processing
+            # Enqueue for processing (routed by document size)
             job_id = await self.queue_service.enqueue_document_processing(
                 document_id, 
-                priority=priority
+                priority=priority,
+                resume=resume,
+                file_path=document.file_path,
+                file_size=document.file_size
             )
             
             self.security_logger.log_security_event(
@@ -349,6 +361,11 @@ class DocumentService:
             # Get job status from queue
             job_status = self.queue_service.get_job_by_document_id(document_id)
             
+            # Position and expected start for queued jobs
+            queue_estimate = None
+            if job_status and job_status.get('status') == 'queued':
+                queue_estimate = self.queue_service.get_queue_estimate(job_status['id'])
+            
             # Extract progress information from metadata
             progress_info = {}
             if document.doc_metadata and 'processing_progress' in document.doc_metadata:
@@ -362,6 +379,20 @@ class DocumentService:
                     "last_updated": progress_data.get("last_updated")
                 }
             
+            # Extract checkpoint progress for resumable processing
+            checkpoint_info = None
+            if document.doc_metadata and ProcessingCheckpoint.METADATA_KEY in document.doc_metadata:
+                checkpoint_info = ProcessingCheckpoint.from_metadata(document.doc_metadata).summary()
+            
+            # Per-part progress of documents split across workers
+            fanout_info = None
+            fanout = (document.doc_metadata or {}).get(FANOUT_METADATA_KEY)
+            if fanout:
+                fanout_info = self.queue_service.get_document_parts_progress(fanout)
+            
+            # Per-stage time, database and model time and peak memory of the last run
+            trace_info = (document.doc_metadata or {}).get(TRACE_METADATA_KEY)
+            
             # Extract processing statistics
             stats_info = {}
             if document.doc_metadata and 'stats' in document.doc_metadata:
@@ -400,9 +431,14 @@ class DocumentService:
                 "is_processing": is_processing,
                 "progress": progress_info,
                 "statistics": stats_info,
+                "checkpoint": checkpoint_info,
+                "parts": fanout_info,
+                "trace": trace_info,
                 "estimated_completion": estimated_completion,
                 "job_status": job_status,
-                "queue_position": self._get_queue_position(document_id) if job_status and job_status.get('status') == 'queued' else None
+                "queue_position": queue_estimate["queue_position"] if queue_estimate else None,
+                "estimated_start_time": queue_estimate["estimated_start_time"] if queue_estimate else None,
+                "estimated_wait_seconds": queue_estimate["estimated_wait_seconds"] if queue_estimate else None
             }
             
         except Exception as e:
@@ -416,26 +452,19 @@ class DocumentService:
             )
             return {"error": str(e)}
     
-    def _get_queue_position(self, document_id: UUID) -> Optional[int]:
-        """Get position of document in processing queue"""
-        try:
-            job_id = f"doc_process_{document_id}"
-            
-            # Check both queues
-            for queue in [self.queue_service.priority_queue, self.queue_service.queue]:
-                job_ids = queue.job_ids
-                if job_id in job_ids:
-                    return job_ids.index(job_id) + 1
-            
-            return None
-            
-        except Exception:
-            return None
-    
-    async def retry_processing(self, document_id: UUID, priority: bool = False) -> str:
+    async def retry_processing(
+        self,
+        document_id: UUID,
+        priority: bool = False,
+        full_reprocess: bool = False
+    ) -> str:
         """
         Retry processing for a failed document
         
+        Retries resume from the last processing checkpoint so that only
+        unfinished stages and failed chapters are redone, unless
+        ``full_reprocess`` is set.
+        
         Requirements: 5.3, 5.5 - Error handling and recovery
         """
         try:
@@ -443,15 +472,19 @@ class DocumentService:
             if not document:
                 raise ValueError("Document not found")
             
-            # Cancel any existing job
+            # Cancel any existing jobs, including the parts of a fanned-out document
             job_id = f"doc_process_{document_id}"
-            self.queue_service.cancel_job(job_id)
+            self.queue_service.cancel_document_jobs(
+                document_id, (document.doc_metadata or {}).get(FANOUT_METADATA_KEY)
+            )
             
             # Reset document status
             await self.update_status(document_id, ProcessingStatus.PENDING)
             
             # Re-queue for processing
-            new_job_id = await self.queue_for_processing(document_id, priority=priority)
+            new_job_id = await self.queue_for_processing(
+                document_id, priority=priority, resume=not full_reprocess
+            )
             
             self.security_logger.log_security_event(
                 "document_processing_retry",
@@ -459,7 +492,8 @@ class DocumentService:
                     "document_id": str(document_id),
                     "old_job_id": job_id,
                     "new_job_id": new_job_id,
-                    "priority": priority
+                    "priority": priority,
+                    "full_reprocess": full_reprocess
                 },
                 "INFO"
             )
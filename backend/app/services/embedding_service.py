@@ -16,6 +16,10 @@ from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Loaded models are shared by every EmbeddingService in the process, so
+# services created per request or per job do not reload the model.
+_model_cache: Dict[str, SentenceTransformer] = {}
+
 
 class EmbeddingService:
     """Service for generating and managing text embeddings"""
@@ -28,11 +32,19 @@ class EmbeddingService:
     def _get_model(self) -> SentenceTransformer:
         """Lazy load the sentence transformer model"""
         if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self._model = SentenceTransformer(self.model_name)
-            logger.info("Embedding model loaded successfully")
+            model = _model_cache.get(self.model_name)
+            if model is None:
+                logger.info(f"Loading embedding model: {self.model_name}")
+                model = SentenceTransformer(self.model_name)
+                _model_cache[self.model_name] = model
+                logger.info("Embedding model loaded successfully")
+            self._model = model
         return self._model
     
+    def preload(self) -> None:
+        """Load the model now instead of on first use (worker warm-up)"""
+        self._get_model()
+    
     def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for a single text
@@ -21,6 +21,9 @@ except ImportError:
 import jieba
 import jieba.posseg as pseg
 
+# spaCy pipelines are expensive to load; share them across service instances
+_spacy_models: Dict[str, object] = {}
+
 
 class Language(str, Enum):
     """Supported languages for entity extraction."""
@@ -117,26 +120,10 @@ class EntityExtractionService:
         if SPACY_AVAILABLE:
             try:
                 if self.config.enable_english:
-                    # Try to load full English model, fallback to blank
-                    try:
-                        self.en_nlp = spacy.load("en_core_web_sm")
-                    except OSError:
-                        print("Warning: en_core_web_sm not found, using blank English model")
-                        self.en_nlp = English()
-                        # Add basic components
-                        if "sentencizer" not in self.en_nlp.pipe_names:
-                            self.en_nlp.add_pipe("sentencizer")
+                    self.en_nlp = self._get_spacy_model("en_core_web_sm", English)
                 
                 if self.config.enable_chinese:
-                    # Try to load Chinese model, fallback to blank
-                    try:
-                        self.zh_nlp = spacy.load("zh_core_web_sm")
-                    except OSError:
-                        print("Warning: zh_core_web_sm not found, using blank Chinese model")
-                        self.zh_nlp = Chinese()
-                        # Add basic components
-                        if "sentencizer" not in self.zh_nlp.pipe_names:
-                            self.zh_nlp.add_pipe("sentencizer")
+                    self.zh_nlp = self._get_spacy_model("zh_core_web_sm", Chinese)
                     
             except Exception as e:
                 print(f"Error loading spaCy models: {e}")
@@ -153,6 +140,21 @@ class EntityExtractionService:
         except Exception as e:
             print(f"Error initializing jieba: {e}")
     
+    @staticmethod
+    def _get_spacy_model(model_name: str, blank_factory):
+        """Load a spaCy model once per process, falling back to a blank pipeline."""
+        if model_name not in _spacy_models:
+            try:
+                nlp = spacy.load(model_name)
+            except OSError:
+                print(f"Warning: {model_name} not found, using blank model")
+                nlp = blank_factory()
+                # Add basic components
+                if "sentencizer" not in nlp.pipe_names:
+                    nlp.add_pipe("sentencizer")
+            _spacy_models[model_name] = nlp
+        return _spacy_models[model_name]
+    
     def _load_stopwords(self):
         """Load stopwords for different languages."""
         self.stopwords = {
@@ -0,0 +1,305 @@
+"""
+Background exports
+
+Large exports run as RQ jobs instead of holding an HTTP worker. The
+chapters with cards to export are split into contiguous ranges of
+roughly equal card counts, each rendered by its own part job into a part
+file. A coordinator job that depends on all parts assembles the part
+files into the downloadable export: CSV parts are concatenated after the
+header, Anki notes are written into an .apkg package together with the
+figure images of image cards. JSONL backups are one part, since each line
+holds a whole document.
+
+Export files live in the export storage under the export's ID, the parts
+in a ``parts`` directory removed once the export is assembled. The export
+directory is removed once the export's job results have expired.
+"""
+
+import json
+import math
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.learning import CardType
+from ..storage.local import LocalStorage
+from .anki_package import AnkiPackage, card_guid, field_html
+from .export_queries import chapter_card_counts_statement
+from .export_service import ANKI_CSV_HEADER, EXPORT_BATCH_SIZE, NOTION_CSV_HEADER, ExportService
+
+# Export formats: (file extension, media type)
+EXPORT_FORMATS = {
+    "anki_csv": (".csv", "text/csv"),
+    "notion_csv": (".csv", "text/csv"),
+    "jsonl": (".jsonl", "application/jsonl"),
+    "apkg": (".apkg", "application/octet-stream"),
+}
+
+CSV_HEADERS = {"anki_csv": ANKI_CSV_HEADER, "notion_csv": NOTION_CSV_HEADER}
+
+PARTS_DIRECTORY = "parts"
+
+
+@dataclass
+class ExportPart:
+    """A contiguous range of chapters rendered by one part job"""
+    index: int
+    chapter_ids: List[str] = field(default_factory=list)
+    card_count: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "chapter_ids": list(self.chapter_ids),
+            "card_count": self.card_count,
+        }
+
+
+def export_storage() -> LocalStorage:
+    """Storage holding the files of background exports"""
+    return LocalStorage(base_path=settings.export_dir, base_url="/api/export/jobs/")
+
+
+def export_filename(export_format: str, document_id: Optional[UUID] = None) -> str:
+    """File name of an export as offered for download"""
+    extension = EXPORT_FORMATS[export_format][0]
+    return f"{export_format}_export_{document_id or 'all'}{extension}"
+
+
+def plan_export_parts(
+    chapter_counts: Sequence[Tuple[str, int]],
+    cards_per_part: int,
+    max_parts: int
+) -> List[ExportPart]:
+    """
+    Split chapters into contiguous ranges of roughly equal card counts
+
+    ``chapter_counts`` holds (chapter ID, card count) in export order.
+    There is always at least one part, empty if there are no cards.
+    """
+    total_cards = sum(count for _, count in chapter_counts)
+    part_count = max(1, min(max_parts, len(chapter_counts), math.ceil(total_cards / max(1, cards_per_part))))
+
+    parts: List[ExportPart] = []
+    current = ExportPart(index=0)
+    cards_assigned = 0
+
+    for position, (chapter_id, count) in enumerate(chapter_counts):
+        current.chapter_ids.append(str(chapter_id))
+        current.card_count += count
+        cards_assigned += count
+
+        parts_left = part_count - len(parts) - 1
+        chapters_left = len(chapter_counts) - position - 1
+        # Close the range once it reaches its share of the cards so far,
+        # keeping at least one chapter for each remaining part
+        target = total_cards * (len(parts) + 1) / part_count
+        if parts_left > 0 and chapters_left >= parts_left and (
+            cards_assigned >= target or chapters_left == parts_left
+        ):
+            parts.append(current)
+            current = ExportPart(index=len(parts))
+
+    if current.chapter_ids or not parts:
+        parts.append(current)
+
+    return parts
+
+
+def plan_export(
+    db: Session,
+    export_format: str,
+    document_id: Optional[UUID] = None,
+    chapter_ids: Optional[List[UUID]] = None
+) -> List[ExportPart]:
+    """Parts of an export, one for JSONL backups"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    chapter_counts = db.execute(chapter_card_counts_statement(document_id, chapter_ids)).all()
+    if export_format == "jsonl":
+        return [ExportPart(index=0, card_count=sum(count for _, count in chapter_counts))]
+    return plan_export_parts(chapter_counts, settings.export_cards_per_part, settings.export_max_parts)
+
+
+def part_path(storage: LocalStorage, export_id: str, export_format: str, part_index: int) -> Path:
+    """Part file of an export; Anki parts hold one JSON note per line"""
+    extension = ".ndjson" if export_format == "apkg" else EXPORT_FORMATS[export_format][0]
+    return storage.get_full_path(f"{export_id}/{PARTS_DIRECTORY}/{part_index}{extension}")
+
+
+def render_part(
+    db: Session,
+    storage: LocalStorage,
+    export_id: str,
+    export_format: str,
+    part_index: int,
+    document_id: Optional[UUID] = None,
+    chapter_ids: Optional[List[UUID]] = None,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Write one part of an export to its part file
+
+    CSV parts have no header. ``on_progress`` receives the number of
+    cards written so far as the part is written.
+
+    Returns:
+        Part file storage path and number of cards written
+    """
+    export_service = ExportService(db)
+    path = part_path(storage, export_id, export_format, part_index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cards = 0
+
+    def count_cards(count: int) -> None:
+        nonlocal cards
+        cards += count
+
+    with open(path, "w", encoding="utf-8", newline="") as part_file:
+        if export_format == "jsonl":
+            for line in export_service.iter_jsonl_backup(document_id, on_cards=count_cards):
+                part_file.write(line)
+                if on_progress:
+                    on_progress(cards)
+        elif export_format == "apkg":
+            for note in export_service.iter_anki_notes(document_id, chapter_ids):
+                part_file.write(json.dumps(anki_note_record(note)) + "\n")
+                cards += 1
+                if on_progress and cards % EXPORT_BATCH_SIZE == 0:
+                    on_progress(cards)
+        else:
+            render = export_service.iter_anki_csv if export_format == "anki_csv" else export_service.iter_notion_csv
+            for chunk in render(document_id, chapter_ids, header=False, on_cards=count_cards):
+                part_file.write(chunk)
+                if on_progress:
+                    on_progress(cards)
+
+    if on_progress:
+        on_progress(cards)
+    return {
+        "path": str(path.relative_to(storage.base_path)),
+        "cards": cards,
+    }
+
+
+def assemble_export(
+    storage: LocalStorage,
+    export_id: str,
+    export_format: str,
+    part_paths: List[str],
+    filename: str
+) -> Dict[str, Any]:
+    """
+    Combine the part files of an export into the export file and remove the parts
+
+    Returns:
+        Storage path and size of the export file
+    """
+    storage_path = f"{export_id}/{filename}"
+    destination = storage.get_full_path(storage_path)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    if export_format == "apkg":
+        package = AnkiPackage()
+        for path in part_paths:
+            with open(storage.get_full_path(path), encoding="utf-8") as part_file:
+                for line in part_file:
+                    record = json.loads(line)
+                    for media in record["media"]:
+                        package.add_media(Path(media["path"]), media["name"])
+                    package.add_note(record["guid"], record["deck"], record["fields"], record["tags"], record["srs"])
+        package.write(destination)
+    else:
+        with open(destination, "wb") as export_file:
+            if export_format in CSV_HEADERS:
+                buffer, writer = ExportService._csv_writer()
+                writer.writerow(CSV_HEADERS[export_format])
+                export_file.write(buffer.getvalue().encode("utf-8"))
+            for path in part_paths:
+                with open(storage.get_full_path(path), "rb") as part_file:
+                    shutil.copyfileobj(part_file, export_file)
+
+    shutil.rmtree(storage.get_full_path(f"{export_id}/{PARTS_DIRECTORY}"), ignore_errors=True)
+    return {
+        "path": storage_path,
+        "size": destination.stat().st_size,
+    }
+
+
+def remove_expired_exports(
+    storage: LocalStorage,
+    is_current: Callable[[str], bool],
+    min_age_seconds: float = 0
+) -> int:
+    """
+    Remove the directories of exports that are no longer current
+
+    ``is_current`` tells by export ID whether an export is still known to
+    the job queue. Directories changed within ``min_age_seconds`` are kept,
+    so exports whose jobs are being enqueued are not removed.
+
+    Returns:
+        Number of export directories removed
+    """
+    if not storage.base_path.is_dir():
+        return 0
+
+    cutoff = time.time() - min_age_seconds
+    removed = 0
+    for directory in storage.base_path.iterdir():
+        try:
+            UUID(directory.name)
+        except ValueError:
+            continue
+        if not directory.is_dir() or directory.stat().st_mtime > cutoff or is_current(directory.name):
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+        removed += 1
+
+    return removed
+
+
+def anki_note_record(note: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A note from ``ExportService.iter_anki_notes`` as written to an Anki part file
+
+    Image cards show their figure, which is added to the package media.
+    """
+    card, srs = note["card"], note["srs"]
+    front, media = field_html(note["front"]), []
+
+    if card.card_type == CardType.IMAGE_HOTSPOT:
+        image = figure_image_path(card.front)
+        if image.is_file():
+            name = f"{card.card_metadata.get('figure_id') or card.id}{image.suffix}"
+            media.append({"name": name, "path": str(image)})
+            question = card.card_metadata.get("question") or ""
+            front = f'<img src="{name}">' + (f"<br>{field_html(question)}" if question else "")
+
+    return {
+        "guid": card_guid(card.id),
+        "deck": note["deck"],
+        "fields": [front, field_html(note["back"]), field_html(note["source"])],
+        "tags": note["tags"],
+        "srs": {
+            "interval": srs.interval,
+            "ease_factor": srs.ease_factor,
+            "repetitions": srs.repetitions,
+            "due_date": srs.due_date.isoformat(),
+        } if srs and srs.due_date else None,
+        "media": media,
+    }
+
+
+def figure_image_path(image_path: str) -> Path:
+    """Figure image file, relative paths being under the upload directory"""
+    path = Path(image_path)
+    return path if path.is_absolute() else Path(settings.upload_dir) / path
+
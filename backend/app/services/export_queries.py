@@ -0,0 +1,98 @@
+"""
+Export queries
+
+Builds the statements behind CSV and JSONL exports. Card exports read
+each card with its knowledge, chapter and document from one joined
+statement, and optionally its latest SRS record, picked by a window
+function over the SRS table instead of a query per card. JSONL backups
+load documents a batch at a time with ``selectinload``, one ``IN`` query
+per relationship level, instead of joined eager loads whose row count is
+the product of figures, knowledge points, cards and SRS records.
+Background exports are planned from per-chapter card counts.
+"""
+
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import Select, and_, func, select
+from sqlalchemy.orm import aliased, contains_eager, selectinload
+
+from ..models.document import Chapter, Document
+from ..models.knowledge import Knowledge
+from ..models.learning import Card, SRS
+
+# Documents loaded per batch of a JSONL backup, each with all its cards
+BACKUP_DOCUMENT_BATCH_SIZE = 10
+
+
+def latest_srs():
+    """SRS entity over the most recently reviewed record of each card, ranked ``1``"""
+    ranked = select(
+        SRS,
+        func.row_number().over(
+            partition_by=SRS.card_id,
+            order_by=(SRS.last_reviewed.desc().nulls_last(), SRS.updated_at.desc())
+        ).label("rank")
+    ).subquery("latest_srs")
+    return aliased(SRS, ranked), ranked.c.rank
+
+
+def export_cards_statement(
+    document_id: Optional[UUID] = None,
+    chapter_ids: Optional[List[UUID]] = None,
+    with_srs: bool = False
+) -> Select:
+    """
+    Cards to export with their knowledge, chapter and document
+
+    With ``with_srs`` the rows are (card, latest SRS record or None).
+    """
+    stmt = select(Card).join(Card.knowledge).join(Knowledge.chapter).join(Chapter.document)\
+        .options(
+            contains_eager(Card.knowledge).contains_eager(Knowledge.chapter).contains_eager(Chapter.document)
+        )
+
+    if with_srs:
+        srs, rank = latest_srs()
+        stmt = stmt.add_columns(srs).outerjoin(srs, and_(srs.card_id == Card.id, rank == 1))
+
+    if document_id:
+        stmt = stmt.where(Document.id == document_id)
+
+    if chapter_ids:
+        stmt = stmt.where(Chapter.id.in_(chapter_ids))
+
+    return stmt
+
+
+def backup_documents_statement(document_id: Optional[UUID] = None) -> Select:
+    """Documents with their chapters, figures, knowledge points, cards and SRS records"""
+    chapters = selectinload(Document.chapters)
+    stmt = select(Document).options(
+        chapters.selectinload(Chapter.figures),
+        chapters.selectinload(Chapter.knowledge_points)
+        .selectinload(Knowledge.cards)
+        .selectinload(Card.srs_records)
+    )
+    if document_id:
+        stmt = stmt.where(Document.id == document_id)
+    return stmt
+
+
+def chapter_card_counts_statement(
+    document_id: Optional[UUID] = None,
+    chapter_ids: Optional[List[UUID]] = None
+) -> Select:
+    """(chapter ID, card count) of the chapters with cards to export, in reading order"""
+    stmt = select(Chapter.id, func.count(Card.id))\
+        .join(Chapter.document).join(Chapter.knowledge_points).join(Knowledge.cards)\
+        .group_by(Chapter.id, Document.created_at, Document.id, Chapter.order_index)\
+        .order_by(Document.created_at, Document.id, Chapter.order_index)
+
+    if document_id:
+        stmt = stmt.where(Document.id == document_id)
+
+    if chapter_ids:
+        stmt = stmt.where(Chapter.id.in_(chapter_ids))
+
+    return stmt
@@ -5,16 +5,40 @@ Export service for flashcards and learning data
 import csv
 import json
 import io
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime
 from uuid import UUID
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, insert, select
 
 from ..models.document import Document, Chapter, Figure
 from ..models.knowledge import Knowledge, KnowledgeType
 from ..models.learning import Card, SRS, CardType
 from ..core.database import get_db
+from .export_queries import BACKUP_DOCUMENT_BATCH_SIZE, backup_documents_statement, export_cards_statement
+
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+# Characters of CSV buffered before a chunk is yielded
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Rows buffered across tables before a backup import inserts and commits them
+IMPORT_BATCH_SIZE = 5000
+
+ANKI_CSV_HEADER = ['Front', 'Back', 'Tags', 'Type', 'Deck', 'Difficulty', 'Source']
+NOTION_CSV_HEADER = [
+    'Question', 'Answer', 'Category', 'Difficulty', 'Source Document',
+    'Chapter', 'Page', 'Knowledge Type', 'Entities', 'Created Date', 'Last Reviewed'
+]
+
+# Tables written by backup imports in foreign key order, with their result counters
+IMPORT_MODELS = {
+    Document: 'imported_documents',
+    Chapter: 'imported_chapters',
+    Figure: 'imported_figures',
+    Knowledge: 'imported_knowledge',
+    Card: 'imported_cards',
+    SRS: 'imported_srs_records',
+}
 
 
 class ExportService:
@@ -30,46 +54,85 @@ class ExportService:
         Anki CSV format:
         Front, Back, Tags, Type, Deck, Note ID, Card ID
         """
-        cards = self._get_cards_for_export(document_id, chapter_ids)
+        return ''.join(self.iter_anki_csv(document_id, chapter_ids))
+    
+    def iter_anki_csv(
+        self,
+        document_id: Optional[UUID] = None,
+        chapter_ids: Optional[List[UUID]] = None,
+        header: bool = True,
+        on_cards: Optional[Callable[[int], None]] = None
+    ) -> Iterator[str]:
+        """
+        Anki CSV export in chunks, written as cards are read
         
-        output = io.StringIO()
-        writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+        ``on_cards`` is called with the number of cards in each chunk
+        before it is yielded.
+        """
+        buffer, writer = self._csv_writer()
+        rows = 0
         
         # Write header
-        writer.writerow(['Front', 'Back', 'Tags', 'Type', 'Deck', 'Difficulty', 'Source'])
+        if header:
+            writer.writerow(ANKI_CSV_HEADER)
+            yield self._drain(buffer)
         
-        for card in cards:
-            # Get document and chapter info for tags and deck
-            chapter = card.knowledge.chapter
-            document = chapter.document
-            
-            # Create tags from entities and knowledge type
-            tags = []
-            if card.knowledge.entities:
-                tags.extend(card.knowledge.entities[:3])  # Limit to 3 entities
-            tags.append(f"type:{card.knowledge.kind}")
-            tags.append(f"difficulty:{self._difficulty_to_tag(card.difficulty)}")
-            
-            # Create deck name from document
-            deck_name = f"{document.filename}::{chapter.title}"
-            
-            # Format front and back based on card type
-            front, back = self._format_card_content(card)
-            
-            # Create source reference
-            source = f"Page {card.knowledge.anchors.get('page', 'N/A')} - {chapter.title}"
-            
+        for card in self._iter_cards_for_export(document_id, chapter_ids):
+            note = self._anki_note_fields(card)
             writer.writerow([
-                front,
-                back,
-                ' '.join(tags),
+                note['front'],
+                note['back'],
+                ' '.join(note['tags']),
                 card.card_type,
-                deck_name,
+                note['deck'],
                 card.difficulty,
-                source
+                note['source']
             ])
+            rows += 1
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                if on_cards:
+                    on_cards(rows)
+                rows = 0
+                yield self._drain(buffer)
+        
+        if on_cards:
+            on_cards(rows)
+        yield self._drain(buffer)
+    
+    def iter_anki_notes(
+        self,
+        document_id: Optional[UUID] = None,
+        chapter_ids: Optional[List[UUID]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Anki note fields of each card, with the card and its latest SRS record"""
+        for card, srs in self._iter_cards_with_srs_for_export(document_id, chapter_ids):
+            yield {'card': card, 'srs': srs, **self._anki_note_fields(card)}
+    
+    def _anki_note_fields(self, card: Card) -> Dict[str, Any]:
+        """Front, back, tags, deck and source of a card as exported to Anki"""
+        # Get document and chapter info for tags and deck
+        chapter = card.knowledge.chapter
+        document = chapter.document
+        
+        # Create tags from entities and knowledge type
+        tags = []
+        if card.knowledge.entities:
+            tags.extend(card.knowledge.entities[:3])  # Limit to 3 entities
+        tags.append(f"type:{card.knowledge.kind}")
+        tags.append(f"difficulty:{self._difficulty_to_tag(card.difficulty)}")
+        
+        # Format front and back based on card type
+        front, back = self._format_card_content(card)
         
-        return output.getvalue()
+        return {
+            'front': front,
+            'back': back,
+            'tags': tags,
+            # Create deck name from document
+            'deck': f"{document.filename}::{chapter.title}",
+            # Create source reference
+            'source': f"Page {card.knowledge.anchors.get('page', 'N/A')} - {chapter.title}"
+        }
     
     def export_notion_csv(self, document_id: Optional[UUID] = None, chapter_ids: Optional[List[UUID]] = None) -> str:
         """
@@ -78,23 +141,34 @@ class ExportService:
         Notion format with proper field mapping:
         Question, Answer, Category, Difficulty, Source Document, Chapter, Page, Created Date, Last Reviewed
         """
-        cards = self._get_cards_for_export(document_id, chapter_ids)
+        return ''.join(self.iter_notion_csv(document_id, chapter_ids))
+    
+    def iter_notion_csv(
+        self,
+        document_id: Optional[UUID] = None,
+        chapter_ids: Optional[List[UUID]] = None,
+        header: bool = True,
+        on_cards: Optional[Callable[[int], None]] = None
+    ) -> Iterator[str]:
+        """
+        Notion CSV export in chunks, written as cards are read
         
-        output = io.StringIO()
-        writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+        ``on_cards`` is called with the number of cards in each chunk
+        before it is yielded.
+        """
+        buffer, writer = self._csv_writer()
+        rows = 0
         
         # Write header with Notion-friendly column names
-        writer.writerow([
-            'Question', 'Answer', 'Category', 'Difficulty', 'Source Document', 
-            'Chapter', 'Page', 'Knowledge Type', 'Entities', 'Created Date', 'Last Reviewed'
-        ])
+        if header:
+            writer.writerow(NOTION_CSV_HEADER)
+            yield self._drain(buffer)
         
-        for card in cards:
+        for card, srs in self._iter_cards_with_srs_for_export(document_id, chapter_ids):
             chapter = card.knowledge.chapter
             document = chapter.document
             
-            # Get SRS info for last reviewed
-            srs = self.db.query(SRS).filter(SRS.card_id == card.id).first()
+            # Latest SRS record for last reviewed
             last_reviewed = srs.last_reviewed.isoformat() if srs and srs.last_reviewed else ""
             
             # Format content
@@ -113,20 +187,37 @@ class ExportService:
                 card.created_at.isoformat(),
                 last_reviewed
             ])
-        
-        return output.getvalue()
+            rows += 1
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                if on_cards:
+                    on_cards(rows)
+                rows = 0
+                yield self._drain(buffer)
+        
+        if on_cards:
+            on_cards(rows)
+        yield self._drain(buffer)
     
     def export_jsonl_backup(self, document_id: Optional[UUID] = None) -> str:
         """
         Export complete data in JSONL format for backup
         Each line is a JSON object representing a complete document with all related data
         """
-        if document_id:
-            documents = self.db.query(Document).filter(Document.id == document_id).all()
-        else:
-            documents = self.db.query(Document).all()
+        return ''.join(self.iter_jsonl_backup(document_id))
+    
+    def iter_jsonl_backup(
+        self,
+        document_id: Optional[UUID] = None,
+        on_cards: Optional[Callable[[int], None]] = None
+    ) -> Iterator[str]:
+        """
+        JSONL backup export, one line per document as it is read
         
-        output = io.StringIO()
+        ``on_cards`` is called with the number of cards of each line
+        before it is yielded.
+        """
+        stmt = backup_documents_statement(document_id)
+        documents = self.db.execute(stmt.execution_options(yield_per=BACKUP_DOCUMENT_BATCH_SIZE)).scalars()
         
         for document in documents:
             # Build complete document data structure
@@ -153,14 +244,8 @@ class ExportService:
                 }
             }
             
-            # Get chapters with all related data
-            chapters = self.db.query(Chapter).filter(Chapter.document_id == document.id)\
-                .options(
-                    joinedload(Chapter.figures),
-                    joinedload(Chapter.knowledge_points).joinedload(Knowledge.cards).joinedload(Card.srs_records)
-                ).all()
-            
-            for chapter in chapters:
+            # Chapters with all related data, loaded with the batch
+            for chapter in document.chapters:
                 chapter_data = {
                     'id': str(chapter.id),
                     'title': chapter.title,
@@ -244,51 +329,34 @@ class ExportService:
                 doc_data['export_metadata']['total_chapters'] += 1
             
             # Write document as single JSON line
-            output.write(json.dumps(doc_data, ensure_ascii=False) + '\n')
-        
-        return output.getvalue()
+            if on_cards:
+                on_cards(doc_data['export_metadata']['total_cards'])
+            yield json.dumps(doc_data, ensure_ascii=False) + '\n'
     
     def validate_jsonl_backup(self, jsonl_content: str) -> Dict[str, Any]:
         """
         Validate JSONL backup format without importing
         Returns validation results
         """
+        return self.validate_jsonl_stream(io.StringIO(jsonl_content.strip()))
+    
+    def validate_jsonl_stream(self, lines: Iterable[Union[str, bytes]]) -> Dict[str, Any]:
+        """
+        Validate a JSONL backup read line by line, e.g. from an open file
+        Returns validation results
+        """
         errors = []
         warnings = []
         valid_lines = 0
         total_lines = 0
         
         try:
-            lines = jsonl_content.strip().split('\n')
-            total_lines = len([line for line in lines if line.strip()])
-            
-            for line_num, line in enumerate(lines, 1):
-                if not line.strip():
-                    continue
-                
-                try:
-                    doc_data = json.loads(line)
-                    
-                    # Validate document structure
-                    if not self._validate_document_structure(doc_data):
-                        errors.append(f"Line {line_num}: Invalid document structure")
-                        continue
-                    
-                    # Validate required fields
-                    if not self._validate_required_fields(doc_data):
-                        errors.append(f"Line {line_num}: Missing required fields")
-                        continue
-                    
-                    # Check for potential data issues
-                    line_warnings = self._validate_data_quality(doc_data, line_num)
-                    warnings.extend(line_warnings)
-                    
+            for line_num, doc_data, line_errors, line_warnings in self._parse_backup_lines(lines):
+                total_lines += 1
+                errors.extend(line_errors)
+                warnings.extend(line_warnings)
+                if doc_data is not None:
                     valid_lines += 1
-                    
-                except json.JSONDecodeError as e:
-                    errors.append(f"Line {line_num}: Invalid JSON - {str(e)}")
-                except Exception as e:
-                    errors.append(f"Line {line_num}: Validation error - {str(e)}")
         
         except Exception as e:
             errors.append(f"General validation error: {str(e)}")
@@ -314,86 +382,254 @@ class ExportService:
         Import data from JSONL backup format
         Returns summary of imported data
         """
-        imported_docs = 0
-        imported_chapters = 0
-        imported_figures = 0
-        imported_knowledge = 0
-        imported_cards = 0
-        errors = []
+        return self.import_jsonl_stream(io.StringIO(jsonl_content.strip()))
+    
+    def import_jsonl_stream(
+        self,
+        lines: Iterable[Union[str, bytes]],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Import a JSONL backup read line by line, e.g. from an open file
+        
+        Each line is parsed and validated as it is read. Valid documents
+        are buffered until about ``batch_size`` rows are pending, then
+        inserted with one bulk INSERT per table and committed. A failing
+        batch is rolled back and retried a document at a time, so only the
+        failing lines are reported. Documents that already exist are skipped. ``on_progress`` is called with the
+        running totals after every batch.
+        
+        Returns summary of imported data
+        """
+        batch_size = batch_size or IMPORT_BATCH_SIZE
+        result = {
+            'imported_documents': 0,
+            'imported_chapters': 0,
+            'imported_figures': 0,
+            'imported_knowledge': 0,
+            'imported_cards': 0,
+            'imported_srs_records': 0,
+            'lines_read': 0,
+            'bytes_read': 0,
+            'errors': [],
+            'warnings': []
+        }
+        pending: List[Tuple[int, Dict[Any, List[Dict[str, Any]]]]] = []
+        pending_rows = 0
         
         try:
-            lines = jsonl_content.strip().split('\n')
-            
-            for line_num, line in enumerate(lines, 1):
-                if not line.strip():
+            for line_num, doc_data, line_errors, line_warnings in self._parse_backup_lines(lines, result):
+                result['errors'].extend(line_errors)
+                result['warnings'].extend(line_warnings)
+                if doc_data is None:
                     continue
                 
                 try:
-                    doc_data = json.loads(line)
-                    
-                    # Import document
-                    document = self._import_document(doc_data['document'])
-                    imported_docs += 1
-                    
-                    # Import chapters and related data
-                    for chapter_data in doc_data['chapters']:
-                        chapter = self._import_chapter(chapter_data, document.id)
-                        imported_chapters += 1
-                        
-                        # Import figures
-                        for figure_data in chapter_data['figures']:
-                            self._import_figure(figure_data, chapter.id)
-                            imported_figures += 1
-                        
-                        # Import knowledge points
-                        for knowledge_data in chapter_data['knowledge_points']:
-                            knowledge = self._import_knowledge(knowledge_data, chapter.id)
-                            imported_knowledge += 1
-                            
-                            # Import cards
-                            for card_data in knowledge_data['cards']:
-                                card = self._import_card(card_data, knowledge.id)
-                                imported_cards += 1
-                                
-                                # Import SRS records
-                                for srs_data in card_data['srs_records']:
-                                    self._import_srs(srs_data, card.id)
-                    
-                    self.db.commit()
-                    
-                except json.JSONDecodeError as e:
-                    errors.append(f"Line {line_num}: Invalid JSON - {str(e)}")
+                    rows = self._backup_rows(doc_data)
                 except Exception as e:
-                    errors.append(f"Line {line_num}: Import error - {str(e)}")
-                    self.db.rollback()
+                    result['errors'].append(f"Line {line_num}: Import error - {str(e)}")
+                    continue
+                pending.append((line_num, rows))
+                pending_rows += sum(len(table_rows) for table_rows in rows.values())
+                if pending_rows >= batch_size:
+                    self._flush_import_batch(pending, result)
+                    pending, pending_rows = [], 0
+                    if on_progress:
+                        on_progress(self._import_progress(result))
+            
+            if pending:
+                self._flush_import_batch(pending, result)
         
         except Exception as e:
-            errors.append(f"General import error: {str(e)}")
+            result['errors'].append(f"General import error: {str(e)}")
             self.db.rollback()
         
-        return {
-            'imported_documents': imported_docs,
-            'imported_chapters': imported_chapters,
-            'imported_figures': imported_figures,
-            'imported_knowledge': imported_knowledge,
-            'imported_cards': imported_cards,
-            'errors': errors
+        if on_progress:
+            on_progress(self._import_progress(result))
+        return result
+    
+    def _parse_backup_lines(
+        self,
+        lines: Iterable[Union[str, bytes]],
+        counters: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Tuple[int, Optional[Dict[str, Any]], List[str], List[str]]]:
+        """
+        Parse and validate backup lines one at a time
+        
+        Yields (line number, document data or None, errors, warnings) for
+        every non-empty line. Lines and bytes read are counted in
+        ``counters`` when given.
+        """
+        for line_num, line in enumerate(lines, 1):
+            if counters is not None:
+                counters['lines_read'] = line_num
+                counters['bytes_read'] += len(line)
+            
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode('utf-8')
+                except UnicodeDecodeError as e:
+                    yield line_num, None, [f"Line {line_num}: Invalid UTF-8 - {str(e)}"], []
+                    continue
+            
+            if not line.strip():
+                continue
+            
+            try:
+                doc_data = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, None, [f"Line {line_num}: Invalid JSON - {str(e)}"], []
+                continue
+            
+            try:
+                # Validate document structure
+                if not self._validate_document_structure(doc_data):
+                    yield line_num, None, [f"Line {line_num}: Invalid document structure"], []
+                    continue
+                
+                # Validate required fields
+                if not self._validate_required_fields(doc_data):
+                    yield line_num, None, [f"Line {line_num}: Missing required fields"], []
+                    continue
+            except Exception as e:
+                yield line_num, None, [f"Line {line_num}: Validation error - {str(e)}"], []
+                continue
+            
+            # Check for potential data issues
+            yield line_num, doc_data, [], self._validate_data_quality(doc_data, line_num)
+    
+    def _backup_rows(self, doc_data: Dict[str, Any]) -> Dict[Any, List[Dict[str, Any]]]:
+        """Rows of every table for one backup document, keyed by model"""
+        rows = {model: [] for model in IMPORT_MODELS}
+        document = self._document_row(doc_data['document'])
+        rows[Document].append(document)
+        
+        for chapter_data in doc_data['chapters']:
+            chapter = self._chapter_row(chapter_data, document['id'])
+            rows[Chapter].append(chapter)
+            
+            for figure_data in chapter_data.get('figures', []):
+                rows[Figure].append(self._figure_row(figure_data, chapter['id']))
+            
+            for knowledge_data in chapter_data.get('knowledge_points', []):
+                knowledge = self._knowledge_row(knowledge_data, chapter['id'])
+                rows[Knowledge].append(knowledge)
+                
+                for card_data in knowledge_data.get('cards', []):
+                    card = self._card_row(card_data, knowledge['id'])
+                    rows[Card].append(card)
+                    
+                    for srs_data in card_data.get('srs_records', []):
+                        rows[SRS].append(self._srs_row(srs_data, card['id']))
+        
+        return rows
+    
+    def _flush_import_batch(
+        self,
+        pending: List[Tuple[int, Dict[Any, List[Dict[str, Any]]]]],
+        result: Dict[str, Any]
+    ) -> None:
+        """
+        Insert the pending documents with one bulk INSERT per table and commit
+        
+        Documents that already exist, or that appeared earlier in the batch,
+        are skipped. If the batch fails, its documents are inserted and
+        committed one at a time, so only the failing ones are reported.
+        """
+        document_ids = [rows[Document][0]['id'] for _, rows in pending]
+        seen = {
+            str(document_id) for document_id in self.db.execute(
+                select(Document.id).where(Document.id.in_(document_ids))
+            ).scalars()
         }
+        
+        documents = []
+        for line_num, rows in pending:
+            document_id = rows[Document][0]['id']
+            if str(document_id) in seen:
+                result['warnings'].append(f"Line {line_num}: Document {document_id} already exists, skipped")
+                continue
+            seen.add(str(document_id))
+            documents.append((line_num, rows))
+        if not documents:
+            return
+        
+        try:
+            self._insert_import_rows([rows for _, rows in documents], result)
+        except Exception:
+            self.db.rollback()
+            for line_num, rows in documents:
+                try:
+                    self._insert_import_rows([rows], result)
+                except Exception as e:
+                    self.db.rollback()
+                    result['errors'].append(f"Line {line_num}: Import error - {str(e)}")
+    
+    def _insert_import_rows(self, documents: List[Dict[Any, List[Dict[str, Any]]]], result: Dict[str, Any]) -> None:
+        """Insert the rows of documents with one bulk INSERT per table, commit and count them"""
+        batch = {model: [] for model in IMPORT_MODELS}
+        for rows in documents:
+            for model, table_rows in rows.items():
+                batch[model].extend(table_rows)
+        
+        # Parents first, so foreign keys resolve
+        for model in IMPORT_MODELS:
+            if batch[model]:
+                self.db.execute(insert(model), batch[model])
+        self.db.commit()
+        
+        for model, key in IMPORT_MODELS.items():
+            result[key] += len(batch[model])
+    
+    @staticmethod
+    def _import_progress(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Running totals of an import, as reported to ``on_progress``"""
+        progress = {
+            key: value for key, value in result.items()
+            if key not in ('errors', 'warnings')
+        }
+        progress['error_count'] = len(result['errors'])
+        progress['warning_count'] = len(result['warnings'])
+        return progress
     
     def _get_cards_for_export(self, document_id: Optional[UUID] = None, chapter_ids: Optional[List[UUID]] = None) -> List[Card]:
         """Get cards for export based on filters"""
-        query = self.db.query(Card).join(Knowledge).join(Chapter).join(Document)\
-            .options(
-                joinedload(Card.knowledge).joinedload(Knowledge.chapter).joinedload(Chapter.document)
-            )
-        
-        if document_id:
-            query = query.filter(Document.id == document_id)
-        
-        if chapter_ids:
-            query = query.filter(Chapter.id.in_(chapter_ids))
+        return list(self._iter_cards_for_export(document_id, chapter_ids))
+    
+    def _iter_cards_for_export(self, document_id: Optional[UUID] = None, chapter_ids: Optional[List[UUID]] = None) -> Iterator[Card]:
+        """
+        Cards for export based on filters, read in batches
         
-        return query.all()
+        Rows are fetched ``EXPORT_BATCH_SIZE`` at a time (through a
+        server-side cursor where the driver supports one), with knowledge,
+        chapter and document loaded from the same joined rows.
+        """
+        stmt = export_cards_statement(document_id, chapter_ids)
+        return iter(self.db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)).scalars())
+    
+    def _iter_cards_with_srs_for_export(
+        self,
+        document_id: Optional[UUID] = None,
+        chapter_ids: Optional[List[UUID]] = None
+    ) -> Iterator[Tuple[Card, Optional[SRS]]]:
+        """Cards for export with their latest SRS record, read in batches"""
+        stmt = export_cards_statement(document_id, chapter_ids, with_srs=True)
+        return iter(self.db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)))
+    
+    @staticmethod
+    def _csv_writer() -> tuple[io.StringIO, Any]:
+        """CSV writer over a buffer that is drained as the export proceeds"""
+        buffer = io.StringIO()
+        return buffer, csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> str:
+        """Return and clear the buffered text"""
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
     
     def _format_card_content(self, card: Card) -> tuple[str, str]:
         """Format card content based on card type"""
@@ -449,109 +685,80 @@ class ExportService:
         else:
             return category_map.get((knowledge_type, card_type), f"{knowledge_type.title()} - {card_type.title()}")
     
-    def _import_document(self, doc_data: Dict[str, Any]) -> Document:
-        """Import document from backup data"""
-        # Check if document already exists
-        existing = self.db.query(Document).filter(Document.id == doc_data['id']).first()
-        if existing:
-            return existing
-        
-        document = Document(
-            id=doc_data['id'],
-            filename=doc_data['filename'],
-            file_type=doc_data['file_type'],
-            file_path=doc_data['file_path'],
-            file_size=doc_data['file_size'],
-            status=doc_data['status'],
-            doc_metadata=doc_data['doc_metadata']
-        )
-        
-        self.db.add(document)
-        self.db.flush()
-        return document
-    
-    def _import_chapter(self, chapter_data: Dict[str, Any], document_id: UUID) -> Chapter:
-        """Import chapter from backup data"""
-        chapter = Chapter(
-            id=chapter_data['id'],
-            document_id=document_id,
-            title=chapter_data['title'],
-            level=chapter_data['level'],
-            order_index=chapter_data['order_index'],
-            page_start=chapter_data['page_start'],
-            page_end=chapter_data['page_end'],
-            content=chapter_data['content']
-        )
-        
-        self.db.add(chapter)
-        self.db.flush()
-        return chapter
-    
-    def _import_figure(self, figure_data: Dict[str, Any], chapter_id: UUID) -> Figure:
-        """Import figure from backup data"""
-        figure = Figure(
-            id=figure_data['id'],
-            chapter_id=chapter_id,
-            image_path=figure_data['image_path'],
-            caption=figure_data['caption'],
-            page_number=figure_data['page_number'],
-            bbox=figure_data['bbox'],
-            image_format=figure_data['image_format']
-        )
-        
-        self.db.add(figure)
-        self.db.flush()
-        return figure
-    
-    def _import_knowledge(self, knowledge_data: Dict[str, Any], chapter_id: UUID) -> Knowledge:
-        """Import knowledge from backup data"""
-        knowledge = Knowledge(
-            id=knowledge_data['id'],
-            chapter_id=chapter_id,
-            kind=knowledge_data['kind'],
-            text=knowledge_data['text'],
-            entities=knowledge_data['entities'],
-            anchors=knowledge_data['anchors'],
-            confidence_score=knowledge_data['confidence_score']
-        )
-        
-        self.db.add(knowledge)
-        self.db.flush()
-        return knowledge
-    
-    def _import_card(self, card_data: Dict[str, Any], knowledge_id: UUID) -> Card:
-        """Import card from backup data"""
-        card = Card(
-            id=card_data['id'],
-            knowledge_id=knowledge_id,
-            card_type=card_data['card_type'],
-            front=card_data['front'],
-            back=card_data['back'],
-            difficulty=card_data['difficulty'],
-            card_metadata=card_data['card_metadata']
-        )
-        
-        self.db.add(card)
-        self.db.flush()
-        return card
-    
-    def _import_srs(self, srs_data: Dict[str, Any], card_id: UUID) -> SRS:
-        """Import SRS record from backup data"""
-        srs = SRS(
-            id=srs_data['id'],
-            card_id=card_id,
-            user_id=srs_data['user_id'],
-            ease_factor=srs_data['ease_factor'],
-            interval=srs_data['interval'],
-            repetitions=srs_data['repetitions'],
-            due_date=datetime.fromisoformat(srs_data['due_date']),
-            last_reviewed=datetime.fromisoformat(srs_data['last_reviewed']) if srs_data['last_reviewed'] else None,
-            last_grade=srs_data['last_grade']
-        )
-        
-        self.db.add(srs)
-        self.db.flush()
-        return srs
+    def _document_row(self, doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Document row from backup data"""
+        return {
+            'id': UUID(doc_data['id']),
+            'filename': doc_data['filename'],
+            'file_type': doc_data['file_type'],
+            'file_path': doc_data.get('file_path', ''),
+            'file_size': doc_data.get('file_size', 0),
+            'status': doc_data['status'],
+            'doc_metadata': doc_data.get('doc_metadata') or {}
+        }
+    
+    def _chapter_row(self, chapter_data: Dict[str, Any], document_id: UUID) -> Dict[str, Any]:
+        """Chapter row from backup data"""
+        return {
+            'id': UUID(chapter_data['id']),
+            'document_id': document_id,
+            'title': chapter_data['title'],
+            'level': chapter_data['level'],
+            'order_index': chapter_data['order_index'],
+            'page_start': chapter_data.get('page_start'),
+            'page_end': chapter_data.get('page_end'),
+            'content': chapter_data.get('content')
+        }
+    
+    def _figure_row(self, figure_data: Dict[str, Any], chapter_id: UUID) -> Dict[str, Any]:
+        """Figure row from backup data"""
+        return {
+            'id': UUID(figure_data['id']),
+            'chapter_id': chapter_id,
+            'image_path': figure_data['image_path'],
+            'caption': figure_data.get('caption'),
+            'page_number': figure_data.get('page_number'),
+            'bbox': figure_data.get('bbox'),
+            'image_format': figure_data.get('image_format')
+        }
+    
+    def _knowledge_row(self, knowledge_data: Dict[str, Any], chapter_id: UUID) -> Dict[str, Any]:
+        """Knowledge row from backup data"""
+        return {
+            'id': UUID(knowledge_data['id']),
+            'chapter_id': chapter_id,
+            'kind': knowledge_data['kind'],
+            'text': knowledge_data['text'],
+            'entities': knowledge_data.get('entities') or [],
+            'anchors': knowledge_data.get('anchors') or {},
+            'confidence_score': knowledge_data.get('confidence_score')
+        }
+    
+    def _card_row(self, card_data: Dict[str, Any], knowledge_id: UUID) -> Dict[str, Any]:
+        """Card row from backup data"""
+        return {
+            'id': UUID(card_data['id']),
+            'knowledge_id': knowledge_id,
+            'card_type': card_data['card_type'],
+            'front': card_data['front'],
+            'back': card_data['back'],
+            'difficulty': card_data.get('difficulty', 1.0),
+            'card_metadata': card_data.get('card_metadata') or {}
+        }
+    
+    def _srs_row(self, srs_data: Dict[str, Any], card_id: UUID) -> Dict[str, Any]:
+        """SRS row from backup data"""
+        return {
+            'id': UUID(srs_data['id']),
+            'card_id': card_id,
+            'user_id': UUID(srs_data['user_id']) if srs_data.get('user_id') else None,
+            'ease_factor': srs_data['ease_factor'],
+            'interval': srs_data['interval'],
+            'repetitions': srs_data['repetitions'],
+            'due_date': datetime.fromisoformat(srs_data['due_date']),
+            'last_reviewed': datetime.fromisoformat(srs_data['last_reviewed']) if srs_data.get('last_reviewed') else None,
+            'last_grade': srs_data.get('last_grade')
+        }
     
     def _validate_document_structure(self, doc_data: Dict[str, Any]) -> bool:
         """Validate basic document structure"""
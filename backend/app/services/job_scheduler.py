@@ -0,0 +1,276 @@
+"""
+Size-aware scheduling for document processing jobs
+
+Documents are classified into size classes by page count and file size. Each
+class has its own RQ queue, a concurrency limit (enforced by how many worker
+processes listen on the class queue) and a timeout derived from the expected
+processing time. Queue positions and start-time estimates are kept in O(1)
+Redis counters instead of scanning queue contents.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SizeClass:
+    """A class of documents processed under the same limits"""
+    name: str
+    max_pages: Optional[int]        # Inclusive upper bound, None for unbounded
+    max_bytes: Optional[int]        # Inclusive upper bound, None for unbounded
+    max_concurrency: int            # Max worker processes serving this class
+    min_timeout: int                # Seconds
+    max_timeout: int                # Seconds
+
+    @property
+    def queue_name(self) -> str:
+        return f"document_processing_{self.name}"
+
+    def accepts(self, page_count: Optional[int], file_size: Optional[int]) -> bool:
+        """Check whether a document fits into this class"""
+        if self.max_pages is not None and page_count is not None and page_count > self.max_pages:
+            return False
+        if self.max_bytes is not None and file_size is not None and file_size > self.max_bytes:
+            return False
+        return True
+
+
+# Ordered from smallest to largest
+DEFAULT_SIZE_CLASSES = (
+    SizeClass("small", max_pages=50, max_bytes=5 * 1024 * 1024,
+              max_concurrency=4, min_timeout=5 * 60, max_timeout=15 * 60),
+    SizeClass("medium", max_pages=300, max_bytes=30 * 1024 * 1024,
+              max_concurrency=2, min_timeout=15 * 60, max_timeout=60 * 60),
+    SizeClass("large", max_pages=None, max_bytes=None,
+              max_concurrency=1, min_timeout=30 * 60, max_timeout=6 * 60 * 60),
+)
+
+# Initial processing-speed assumption until real durations have been observed
+DEFAULT_SECONDS_PER_PAGE = 2.0
+# Timeouts allow this multiple of the expected duration
+TIMEOUT_SAFETY_FACTOR = 3.0
+# Weight of the newest observation in moving averages
+EWMA_ALPHA = 0.2
+
+# Rough page sizes for formats without a cheap page count
+BYTES_PER_PAGE = {
+    "pdf": 100 * 1024,
+    "docx": 15 * 1024,
+    "md": 3 * 1024,
+    "txt": 3 * 1024,
+}
+
+
+class JobScheduler:
+    """Classifies documents and tracks queue progress for size-class queues"""
+
+    KEY_PREFIX = "scheduler"
+
+    def __init__(self, redis_conn, size_classes: Sequence[SizeClass] = DEFAULT_SIZE_CLASSES):
+        self.redis_conn = redis_conn
+        self.size_classes = tuple(size_classes)
+        self._by_name = {size_class.name: size_class for size_class in self.size_classes}
+
+    # Classification
+
+    @staticmethod
+    def estimate_page_count(file_path: Optional[str], file_size: Optional[int]) -> Optional[int]:
+        """Get the page count of a PDF, or estimate it from the file size for other formats"""
+        if not file_path:
+            return None
+
+        path = Path(file_path)
+        file_type = path.suffix.lower().lstrip('.')
+
+        if file_type == "pdf":
+            try:
+                import fitz  # PyMuPDF
+                with fitz.open(str(path)) as doc:
+                    return doc.page_count
+            except Exception as e:
+                logger.debug(f"Could not read page count of {path.name}: {e}")
+
+        if file_size is None:
+            try:
+                file_size = path.stat().st_size
+            except OSError:
+                return None
+
+        bytes_per_page = BYTES_PER_PAGE.get(file_type, BYTES_PER_PAGE["txt"])
+        return max(1, math.ceil(file_size / bytes_per_page))
+
+    def classify(self, page_count: Optional[int], file_size: Optional[int]) -> SizeClass:
+        """Get the smallest size class that accepts the document"""
+        for size_class in self.size_classes:
+            if size_class.accepts(page_count, file_size):
+                return size_class
+        return self.size_classes[-1]
+
+    def get_size_class(self, name: Optional[str]) -> Optional[SizeClass]:
+        """Look up a size class by name"""
+        return self._by_name.get(name) if name else None
+
+    def timeout_for(self, size_class: SizeClass, page_count: Optional[int]) -> int:
+        """Timeout in seconds scaled to the expected processing time"""
+        pages = page_count or size_class.max_pages or 1
+        expected = pages * self.seconds_per_page()
+        timeout = int(expected * TIMEOUT_SAFETY_FACTOR)
+        return max(size_class.min_timeout, min(size_class.max_timeout, timeout))
+
+    # Redis-backed statistics
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.KEY_PREFIX,) + parts)
+
+    def _get_float(self, key: str, default: float) -> float:
+        try:
+            value = self.redis_conn.get(key)
+            return float(value) if value is not None else default
+        except Exception:
+            return default
+
+    def seconds_per_page(self) -> float:
+        """Observed average processing time per page"""
+        return self._get_float(self._key("seconds_per_page"), DEFAULT_SECONDS_PER_PAGE)
+
+    def average_job_seconds(self, size_class: SizeClass) -> float:
+        """Observed average job duration for a size class"""
+        default_pages = size_class.max_pages or 1000
+        default = default_pages / 2 * DEFAULT_SECONDS_PER_PAGE
+        return self._get_float(self._key(size_class.name, "avg_job_seconds"), default)
+
+    def take_ticket(self, size_class: SizeClass) -> int:
+        """Allocate the next ticket number of a class queue"""
+        return int(self.redis_conn.incr(self._key(size_class.name, "enqueued")))
+
+    def build_job_meta(
+        self,
+        size_class: SizeClass,
+        page_count: Optional[int],
+        file_size: Optional[int]
+    ) -> Dict:
+        """Scheduling metadata stored on the RQ job"""
+        return {
+            "size_class": size_class.name,
+            "page_count": page_count,
+            "file_size": file_size,
+            "ticket": self.take_ticket(size_class),
+        }
+
+    def mark_dequeued(self, job) -> None:
+        """Record that a job left its queue (started or cancelled)"""
+        try:
+            meta = getattr(job, "meta", None) or {}
+            size_class = self.get_size_class(meta.get("size_class"))
+            if size_class is None or meta.get("dequeued"):
+                return
+            self.redis_conn.incr(self._key(size_class.name, "dequeued"))
+            job.meta["dequeued"] = True
+            job.save_meta()
+        except Exception as e:
+            logger.warning(f"Failed to record dequeue of job {getattr(job, 'id', None)}: {e}")
+
+    def record_completion(self, job, duration_seconds: float) -> None:
+        """Update moving averages with the duration of a finished job"""
+        try:
+            meta = getattr(job, "meta", None) or {}
+            size_class = self.get_size_class(meta.get("size_class"))
+            if size_class is None:
+                return
+
+            self._update_average(self._key(size_class.name, "avg_job_seconds"),
+                                 duration_seconds, self.average_job_seconds(size_class))
+
+            page_count = meta.get("page_count")
+            if page_count:
+                self._update_average(self._key("seconds_per_page"),
+                                     duration_seconds / page_count, self.seconds_per_page())
+        except Exception as e:
+            logger.warning(f"Failed to record completion of job {getattr(job, 'id', None)}: {e}")
+
+    def _update_average(self, key: str, value: float, current: float) -> None:
+        updated = (1 - EWMA_ALPHA) * current + EWMA_ALPHA * value
+        self.redis_conn.set(key, updated)
+
+    def estimate_start(self, job) -> Optional[Dict]:
+        """
+        Estimate queue position and start time of a queued job.
+
+        The position is the difference between the job's ticket and the
+        number of jobs that have left the class queue, so no queue scan is
+        needed. Jobs enqueued at the front for priority make it approximate.
+        """
+        meta = getattr(job, "meta", None) or {}
+        size_class = self.get_size_class(meta.get("size_class"))
+        ticket = meta.get("ticket")
+        if size_class is None or ticket is None:
+            return None
+
+        dequeued = int(self._get_float(self._key(size_class.name, "dequeued"), 0))
+        position = max(1, int(ticket) - dequeued)
+        waves_ahead = (position - 1) // max(1, size_class.max_concurrency)
+        wait_seconds = waves_ahead * self.average_job_seconds(size_class)
+
+        return {
+            "size_class": size_class.name,
+            "queue_position": position,
+            "estimated_wait_seconds": round(wait_seconds, 1),
+            "estimated_start_time": (datetime.utcnow() + timedelta(seconds=wait_seconds)).isoformat(),
+        }
+
+    # Worker assignment
+
+    def plan_worker_queues(self, processes: int, shared_queues: Sequence[str] = ()) -> List[List[str]]:
+        """
+        Assign queues to worker processes within the per-class concurrency limits.
+
+        Each worker has a home class and falls back to the smallest class,
+        so idle capacity flows to small jobs while larger classes never exceed
+        their limit. The smallest class therefore has no upper limit.
+        ``shared_queues`` (e.g. priority and legacy queues) are served first
+        by every worker.
+        """
+        processes = max(1, processes)
+        allocation = {size_class.name: 0 for size_class in self.size_classes}
+        remaining = processes
+
+        # One worker per class first so every class makes progress
+        for size_class in self.size_classes:
+            if remaining == 0:
+                break
+            allocation[size_class.name] += 1
+            remaining -= 1
+
+        # Fill up to the limits, then give the rest to the smallest class
+        while remaining:
+            assigned = False
+            for size_class in self.size_classes:
+                if remaining and allocation[size_class.name] < size_class.max_concurrency:
+                    allocation[size_class.name] += 1
+                    remaining -= 1
+                    assigned = True
+            if not assigned:
+                allocation[self.size_classes[0].name] += remaining
+                remaining = 0
+
+        smallest = self.size_classes[0]
+        plan = []
+        for size_class in self.size_classes:
+            queues = [size_class.queue_name]
+            if size_class is not smallest:
+                queues.append(smallest.queue_name)
+            plan.extend([list(shared_queues) + queues] * allocation[size_class.name])
+
+        # With fewer workers than classes, the last worker also serves the
+        # remaining larger classes, at the lowest priority
+        unserved = [sc.queue_name for sc in self.size_classes if allocation[sc.name] == 0]
+        if unserved:
+            plan[-1] = plan[-1] + unserved
+
+        return plan
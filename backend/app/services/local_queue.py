@@ -0,0 +1,807 @@
+"""
+Embedded job queue backed by SQLite
+
+Local replacement for Redis/RQ on single-node and test deployments. Jobs are
+stored durably in a SQLite database in WAL mode, so the pre-forked worker
+pool can claim jobs from several processes at once and queued jobs survive
+restarts. Queues, jobs, registries and workers expose the subset of the RQ
+API that QueueService and the job functions use, and the store answers the
+Redis counter commands used by JobScheduler, so both work unchanged on either
+backend.
+"""
+
+import importlib
+import logging
+import os
+import pickle
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from rq.exceptions import NoSuchJobError
+from rq.job import JobStatus
+from rq.timeouts import JobTimeoutException
+
+logger = logging.getLogger(__name__)
+
+# Defaults matching RQ
+DEFAULT_JOB_TIMEOUT = 180
+DEFAULT_RESULT_TTL = 500
+DEFAULT_FAILURE_TTL = 365 * 24 * 60 * 60
+
+# Workers without a heartbeat for this long are considered dead
+WORKER_TTL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    status TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    func_name TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    meta BLOB,
+    result BLOB,
+    exc_info TEXT,
+    description TEXT,
+    timeout INTEGER,
+    retries_left INTEGER NOT NULL DEFAULT 0,
+    allow_dependency_failure INTEGER NOT NULL DEFAULT 0,
+    result_ttl INTEGER,
+    failure_ttl INTEGER,
+    worker_name TEXT,
+    created_at TEXT NOT NULL,
+    enqueued_at TEXT,
+    started_at TEXT,
+    ended_at TEXT,
+    expires_at TEXT,
+    scheduled_for TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, queue, position);
+CREATE INDEX IF NOT EXISTS ix_jobs_expires ON jobs (expires_at);
+CREATE TABLE IF NOT EXISTS job_dependencies (
+    job_id TEXT NOT NULL,
+    depends_on TEXT NOT NULL,
+    PRIMARY KEY (job_id, depends_on)
+);
+CREATE INDEX IF NOT EXISTS ix_job_dependencies_depends_on ON job_dependencies (depends_on);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    queues TEXT NOT NULL,
+    state TEXT NOT NULL,
+    current_job_id TEXT,
+    birth_date TEXT NOT NULL,
+    last_heartbeat TEXT NOT NULL
+);
+"""
+
+_JOB_COLUMNS = (
+    "id, queue, status, func_name, payload, meta, result, exc_info, description, timeout, "
+    "retries_left, worker_name, created_at, enqueued_at, started_at, ended_at"
+)
+
+_current_job: Optional["LocalJob"] = None
+
+
+def get_current_job() -> Optional["LocalJob"]:
+    """Get the local job executing in this process, if any"""
+    return _current_job
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class LocalJobStore:
+    """
+    Durable job storage in a SQLite database.
+
+    Connections are opened lazily per process, so a store created before
+    forking can be used by the forked workers. Also implements ``ping``,
+    ``get``, ``set``, ``incr`` and ``info`` so it can stand in for the Redis
+    connection.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Add columns introduced after a job database was created"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "scheduled_for" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN scheduled_for TEXT")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction holding the database lock from the start"""
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    # Redis-compatible commands used by the queue service and scheduler
+
+    def ping(self) -> bool:
+        self.connection.execute("SELECT 1")
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self.connection.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row["value"].encode() if row else None
+
+    def set(self, key: str, value: Any) -> bool:
+        self.connection.execute(
+            "INSERT INTO counters (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+        return True
+
+    def incr(self, key: str) -> int:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO counters (key, value) VALUES (?, '1') "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key,)
+            )
+            row = conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return int(row["value"])
+
+    def info(self) -> Dict[str, Any]:
+        size = sum(
+            candidate.stat().st_size
+            for candidate in (self.path, Path(f"{self.path}-wal"))
+            if candidate.exists()
+        )
+        return {"used_memory_human": f"{size / (1024 * 1024):.2f}M", "backend": "sqlite"}
+
+    # Jobs
+
+    def insert_job(
+        self,
+        job_id: str,
+        queue: str,
+        func_name: str,
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        meta: Dict[str, Any],
+        description: Optional[str],
+        timeout: int,
+        retries: int,
+        result_ttl: int,
+        failure_ttl: int,
+        at_front: bool,
+        depends_on: Sequence[str],
+        allow_dependency_failure: bool,
+        scheduled_for: Optional[datetime] = None
+    ) -> None:
+        """Store a new job, replacing an earlier job with the same ID"""
+        payload = pickle.dumps((tuple(args), dict(kwargs)))
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM job_dependencies WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+            pending = [
+                dependency for dependency in depends_on
+                if not self._dependency_satisfied(conn, dependency, allow_dependency_failure)
+            ]
+            for dependency in pending:
+                conn.execute(
+                    "INSERT OR IGNORE INTO job_dependencies (job_id, depends_on) VALUES (?, ?)",
+                    (job_id, dependency)
+                )
+
+            if pending:
+                status = JobStatus.DEFERRED
+            elif scheduled_for is not None:
+                status = JobStatus.SCHEDULED
+            else:
+                status = JobStatus.QUEUED
+            now = _now()
+            conn.execute(
+                "INSERT INTO jobs (id, queue, status, position, func_name, payload, meta, description, "
+                "timeout, retries_left, allow_dependency_failure, result_ttl, failure_ttl, "
+                "created_at, enqueued_at, scheduled_for) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, queue, status.value, self._next_position(conn, queue, at_front),
+                    func_name, payload, pickle.dumps(meta), description, timeout, retries,
+                    int(allow_dependency_failure), result_ttl, failure_ttl, now,
+                    now if status == JobStatus.QUEUED else None,
+                    scheduled_for.isoformat() if scheduled_for else None
+                )
+            )
+
+    def fetch_job(self, job_id: str) -> Optional[sqlite3.Row]:
+        return self.connection.execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+    def save_meta(self, job_id: str, meta: Dict[str, Any]) -> None:
+        self.connection.execute("UPDATE jobs SET meta = ? WHERE id = ?", (pickle.dumps(meta), job_id))
+
+    def claim(self, queue_names: Sequence[str], worker_name: str) -> Optional[sqlite3.Row]:
+        """Atomically take the next queued job, from the first non-empty queue"""
+        if not queue_names:
+            return None
+        placeholders = ", ".join("?" for _ in queue_names)
+        order = " ".join(f"WHEN ? THEN {index}" for index in range(len(queue_names)))
+
+        with self.transaction() as conn:
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = ? AND queue IN ({placeholders}) "
+                f"ORDER BY CASE queue {order} END, position LIMIT 1",
+                (JobStatus.QUEUED.value, *queue_names, *queue_names)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_name = ?, started_at = ? WHERE id = ?",
+                (JobStatus.STARTED.value, worker_name, _now(), row["id"])
+            )
+        return self.fetch_job(row["id"])
+
+    def finish(self, job_id: str, result: Any) -> None:
+        """Store the result of a successful job and release its dependents"""
+        with self.transaction() as conn:
+            ttl = conn.execute("SELECT result_ttl FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, ended_at = ?, expires_at = ? WHERE id = ?",
+                (
+                    JobStatus.FINISHED.value, pickle.dumps(result), _now(),
+                    self._expiry(ttl["result_ttl"] if ttl else None), job_id
+                )
+            )
+            self._release_dependents(conn, job_id)
+
+    def fail(self, job_id: str, exc_info: str) -> bool:
+        """
+        Record a job failure.
+
+        Returns True when the job was put back on its queue for a retry.
+        """
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT queue, retries_left, failure_ttl FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return False
+
+            if row["retries_left"] > 0:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, retries_left = retries_left - 1, exc_info = ?, "
+                    "position = ?, worker_name = NULL, started_at = NULL, enqueued_at = ? WHERE id = ?",
+                    (
+                        JobStatus.QUEUED.value, exc_info,
+                        self._next_position(conn, row["queue"], False), _now(), job_id
+                    )
+                )
+                return True
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, exc_info = ?, ended_at = ?, expires_at = ? WHERE id = ?",
+                (JobStatus.FAILED.value, exc_info, _now(), self._expiry(row["failure_ttl"]), job_id)
+            )
+            self._release_dependents(conn, job_id)
+            return False
+
+    def cancel(self, job_id: str) -> bool:
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, ended_at = ? WHERE id = ? AND status IN (?, ?, ?)",
+                (
+                    JobStatus.CANCELED.value, _now(), job_id,
+                    JobStatus.QUEUED.value, JobStatus.DEFERRED.value, JobStatus.STARTED.value
+                )
+            )
+            conn.execute("DELETE FROM job_dependencies WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def delete(self, job_id: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM job_dependencies WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def count(self, queue: str, status: JobStatus) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status = ?", (queue, status.value)
+        ).fetchone()[0]
+
+    def job_ids(self, queue: str, status: JobStatus) -> List[str]:
+        rows = self.connection.execute(
+            "SELECT id FROM jobs WHERE queue = ? AND status = ? ORDER BY position", (queue, status.value)
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def recover_abandoned_jobs(self) -> int:
+        """Fail (or retry) started jobs whose worker stopped sending heartbeats"""
+        cutoff = (datetime.utcnow() - timedelta(seconds=WORKER_TTL)).isoformat()
+        rows = self.connection.execute(
+            "SELECT jobs.id FROM jobs LEFT JOIN workers ON workers.name = jobs.worker_name "
+            "WHERE jobs.status = ? AND (workers.name IS NULL OR workers.last_heartbeat < ?)",
+            (JobStatus.STARTED.value, cutoff)
+        ).fetchall()
+        for row in rows:
+            logger.warning(f"Job {row['id']} was abandoned by its worker")
+            self.fail(row["id"], "Worker stopped while executing the job")
+        return len(rows)
+
+    def promote_scheduled_jobs(self) -> int:
+        """Queue scheduled jobs whose time has come"""
+        now = _now()
+        cursor = self.connection.execute(
+            "UPDATE jobs SET status = ?, enqueued_at = ? WHERE status = ? AND scheduled_for <= ?",
+            (JobStatus.QUEUED.value, now, JobStatus.SCHEDULED.value, now)
+        )
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """Delete finished and failed jobs whose results have expired"""
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM job_dependencies WHERE depends_on IN "
+                "(SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?)",
+                (_now(),)
+            )
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (_now(),)
+            )
+        return cursor.rowcount
+
+    # Workers
+
+    def heartbeat(
+        self,
+        name: str,
+        queue_names: Sequence[str],
+        state: str,
+        current_job_id: Optional[str] = None
+    ) -> None:
+        now = _now()
+        self.connection.execute(
+            "INSERT INTO workers (name, queues, state, current_job_id, birth_date, last_heartbeat) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET state = excluded.state, "
+            "current_job_id = excluded.current_job_id, last_heartbeat = excluded.last_heartbeat",
+            (name, ",".join(queue_names), state, current_job_id, now, now)
+        )
+
+    def unregister_worker(self, name: str) -> None:
+        self.connection.execute("DELETE FROM workers WHERE name = ?", (name,))
+
+    def live_workers(self) -> List[sqlite3.Row]:
+        cutoff = (datetime.utcnow() - timedelta(seconds=WORKER_TTL)).isoformat()
+        self.connection.execute("DELETE FROM workers WHERE last_heartbeat < ?", (cutoff,))
+        return self.connection.execute("SELECT * FROM workers ORDER BY name").fetchall()
+
+    # Helpers
+
+    @staticmethod
+    def _next_position(conn: sqlite3.Connection, queue: str, at_front: bool) -> int:
+        if at_front:
+            row = conn.execute("SELECT MIN(position) FROM jobs WHERE queue = ?", (queue,)).fetchone()
+            return (row[0] or 0) - 1
+        row = conn.execute("SELECT MAX(position) FROM jobs WHERE queue = ?", (queue,)).fetchone()
+        return (row[0] or 0) + 1
+
+    @staticmethod
+    def _expiry(ttl: Optional[int]) -> Optional[str]:
+        if ttl is None or ttl < 0:
+            return None
+        return (datetime.utcnow() + timedelta(seconds=ttl)).isoformat()
+
+    @staticmethod
+    def _dependency_satisfied(conn: sqlite3.Connection, job_id: str, allow_failure: bool) -> bool:
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return True  # Expired or deleted
+        if row["status"] == JobStatus.FINISHED.value:
+            return True
+        return allow_failure and row["status"] in (JobStatus.FAILED.value, JobStatus.CANCELED.value)
+
+    def _release_dependents(self, conn: sqlite3.Connection, job_id: str) -> None:
+        """Queue deferred jobs whose last pending dependency just ended"""
+        dependents = conn.execute(
+            "SELECT jobs.id, jobs.queue, jobs.allow_dependency_failure FROM job_dependencies "
+            "JOIN jobs ON jobs.id = job_dependencies.job_id "
+            "WHERE job_dependencies.depends_on = ? AND jobs.status = ?",
+            (job_id, JobStatus.DEFERRED.value)
+        ).fetchall()
+
+        for dependent in dependents:
+            allow_failure = bool(dependent["allow_dependency_failure"])
+            if not self._dependency_satisfied(conn, job_id, allow_failure):
+                continue  # Stays deferred, like RQ
+            conn.execute(
+                "DELETE FROM job_dependencies WHERE job_id = ? AND depends_on = ?",
+                (dependent["id"], job_id)
+            )
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM job_dependencies WHERE job_id = ?", (dependent["id"],)
+            ).fetchone()[0]
+            if remaining == 0:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, position = ?, enqueued_at = ? WHERE id = ?",
+                    (
+                        JobStatus.QUEUED.value,
+                        self._next_position(conn, dependent["queue"], False),
+                        _now(), dependent["id"]
+                    )
+                )
+
+
+class LocalJob:
+    """A job stored in a LocalJobStore, with the RQ Job attributes in use"""
+
+    def __init__(self, row: sqlite3.Row, connection: LocalJobStore):
+        self.connection = connection
+        self._load(row)
+
+    def _load(self, row: sqlite3.Row) -> None:
+        self.id: str = row["id"]
+        self.origin: str = row["queue"]
+        self.func_name: str = row["func_name"]
+        self.args, self.kwargs = pickle.loads(row["payload"])
+        self.meta: Dict[str, Any] = pickle.loads(row["meta"]) if row["meta"] else {}
+        self._result = row["result"]
+        self._status = row["status"]
+        self.exc_info: Optional[str] = row["exc_info"]
+        self.description: Optional[str] = row["description"]
+        self.timeout: Optional[int] = row["timeout"]
+        self.retries_left: int = row["retries_left"]
+        self.worker_name: Optional[str] = row["worker_name"]
+        self.created_at = _parse_time(row["created_at"])
+        self.enqueued_at = _parse_time(row["enqueued_at"])
+        self.started_at = _parse_time(row["started_at"])
+        self.ended_at = _parse_time(row["ended_at"])
+
+    @classmethod
+    def fetch(cls, job_id: str, connection: LocalJobStore) -> "LocalJob":
+        row = connection.fetch_job(job_id)
+        if row is None:
+            raise NoSuchJobError(f"No such job: {job_id}")
+        return cls(row, connection)
+
+    @property
+    def result(self) -> Any:
+        return pickle.loads(self._result) if self._result is not None else None
+
+    def return_value(self) -> Any:
+        return self.result
+
+    def get_status(self, refresh: bool = True) -> JobStatus:
+        if refresh:
+            self.refresh()
+        return JobStatus(self._status)
+
+    def refresh(self) -> None:
+        row = self.connection.fetch_job(self.id)
+        if row is None:
+            raise NoSuchJobError(f"No such job: {self.id}")
+        self._load(row)
+
+    def save_meta(self) -> None:
+        self.connection.save_meta(self.id, self.meta)
+
+    def cancel(self) -> None:
+        self.connection.cancel(self.id)
+
+    def perform(self) -> Any:
+        module_name, _, func_name = self.func_name.rpartition(".")
+        func = importlib.import_module(module_name)
+        for attribute in func_name.split("."):
+            func = getattr(func, attribute)
+        return func(*self.args, **self.kwargs)
+
+
+class LocalJobRegistry:
+    """Jobs of a queue in one status (RQ registry counterpart)"""
+
+    def __init__(self, queue: "LocalQueue", status: JobStatus):
+        self.queue = queue
+        self.status = status
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def count(self) -> int:
+        return self.queue.connection.count(self.queue.name, self.status)
+
+    def get_job_ids(self) -> List[str]:
+        return self.queue.connection.job_ids(self.queue.name, self.status)
+
+    def remove(self, job: Union[str, LocalJob], delete_job: bool = False) -> None:
+        self.queue.connection.delete(job if isinstance(job, str) else job.id)
+
+
+class LocalQueue:
+    """A named queue in a LocalJobStore with RQ's enqueue API"""
+
+    job_class = LocalJob
+
+    def __init__(self, name: str = "default", connection: Optional[LocalJobStore] = None):
+        if connection is None:
+            raise ValueError("LocalQueue needs a LocalJobStore connection")
+        self.name = name
+        self.connection = connection
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def count(self) -> int:
+        return self.connection.count(self.name, JobStatus.QUEUED)
+
+    @property
+    def job_ids(self) -> List[str]:
+        return self.connection.job_ids(self.name, JobStatus.QUEUED)
+
+    @property
+    def failed_job_registry(self) -> LocalJobRegistry:
+        return LocalJobRegistry(self, JobStatus.FAILED)
+
+    @property
+    def scheduled_job_registry(self) -> LocalJobRegistry:
+        return LocalJobRegistry(self, JobStatus.SCHEDULED)
+
+    @property
+    def started_job_registry(self) -> LocalJobRegistry:
+        return LocalJobRegistry(self, JobStatus.STARTED)
+
+    @property
+    def finished_job_registry(self) -> LocalJobRegistry:
+        return LocalJobRegistry(self, JobStatus.FINISHED)
+
+    @property
+    def deferred_job_registry(self) -> LocalJobRegistry:
+        return LocalJobRegistry(self, JobStatus.DEFERRED)
+
+    def enqueue(
+        self,
+        f: Union[Callable, str],
+        *args: Any,
+        job_timeout: Optional[int] = None,
+        job_id: Optional[str] = None,
+        retry=None,
+        description: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        at_front: bool = False,
+        depends_on=None,
+        result_ttl: Optional[int] = None,
+        failure_ttl: Optional[int] = None,
+        _scheduled_for: Optional[datetime] = None,
+        **kwargs: Any
+    ) -> LocalJob:
+        """
+        Enqueue a function call.
+
+        ``retry`` and ``depends_on`` accept RQ's Retry and Dependency objects
+        (or job IDs), so callers do not need to know the backend.
+        """
+        func_name = f if isinstance(f, str) else f"{f.__module__}.{f.__qualname__}"
+        job_id = job_id or os.urandom(16).hex()
+        dependency_ids, allow_failure = self._dependencies(depends_on)
+
+        self.connection.insert_job(
+            job_id=job_id,
+            queue=self.name,
+            func_name=func_name,
+            args=args,
+            kwargs=kwargs,
+            meta=meta or {},
+            description=description or func_name,
+            timeout=job_timeout or DEFAULT_JOB_TIMEOUT,
+            retries=getattr(retry, "max", 0) if retry else 0,
+            result_ttl=DEFAULT_RESULT_TTL if result_ttl is None else result_ttl,
+            failure_ttl=DEFAULT_FAILURE_TTL if failure_ttl is None else failure_ttl,
+            at_front=at_front,
+            depends_on=dependency_ids,
+            allow_dependency_failure=allow_failure,
+            scheduled_for=_scheduled_for
+        )
+        return LocalJob.fetch(job_id, self.connection)
+
+    def enqueue_at(self, scheduled_time: datetime, f: Union[Callable, str], *args: Any, **kwargs: Any) -> LocalJob:
+        """
+        Enqueue a function call to run at ``scheduled_time`` (naive UTC).
+
+        Scheduled jobs are queued by the worker started ``with_scheduler``.
+        """
+        return self.enqueue(f, *args, _scheduled_for=scheduled_time, **kwargs)
+
+    @staticmethod
+    def _dependencies(depends_on) -> tuple:
+        if depends_on is None:
+            return [], False
+        allow_failure = bool(getattr(depends_on, "allow_failure", False))
+        jobs = getattr(depends_on, "dependencies", depends_on)
+        if isinstance(jobs, (str, LocalJob)):
+            jobs = [jobs]
+        return [job if isinstance(job, str) else job.id for job in jobs], allow_failure
+
+
+class LocalWorker:
+    """
+    Worker executing jobs from local queues in the current process.
+
+    Mirrors RQ's SimpleWorker: jobs run in-process, so a worker started by
+    the pre-forked WorkerPool reuses the warm per-process runtime. Job
+    timeouts are enforced with SIGALRM where available.
+    """
+
+    POLL_INTERVAL = 0.5
+    HEARTBEAT_INTERVAL = 10.0
+    MAINTENANCE_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        queues: Sequence[Union[str, LocalQueue]],
+        connection: LocalJobStore,
+        name: Optional[str] = None
+    ):
+        self.connection = connection
+        self.queue_names = [queue if isinstance(queue, str) else queue.name for queue in queues]
+        self.name = name or f"{socket.gethostname()}.{os.getpid()}"
+        self.state = "starting"
+        self.current_job_id: Optional[str] = None
+        self.birth_date: Optional[datetime] = None
+        self.last_heartbeat: Optional[datetime] = None
+        self.jobs_executed = 0
+        self._stopping = False
+
+    @classmethod
+    def all(cls, connection: LocalJobStore) -> List["LocalWorker"]:
+        """Workers with a recent heartbeat"""
+        workers = []
+        for row in connection.live_workers():
+            worker = cls(row["queues"].split(","), connection, name=row["name"])
+            worker.state = row["state"]
+            worker.current_job_id = row["current_job_id"]
+            worker.birth_date = _parse_time(row["birth_date"])
+            worker.last_heartbeat = _parse_time(row["last_heartbeat"])
+            workers.append(worker)
+        return workers
+
+    @property
+    def queues(self) -> List[LocalQueue]:
+        return [LocalQueue(name, connection=self.connection) for name in self.queue_names]
+
+    def get_state(self) -> str:
+        return self.state
+
+    def get_current_job_id(self) -> Optional[str]:
+        return self.current_job_id
+
+    def request_stop(self, signum=None, frame=None) -> None:
+        """Stop after the current job"""
+        self._stopping = True
+
+    def work(self, burst: bool = False, with_scheduler: bool = False, max_jobs: Optional[int] = None) -> bool:
+        """
+        Execute jobs until stopped (or, with ``burst``, until the queues are empty).
+
+        The worker started ``with_scheduler`` also queues scheduled jobs,
+        recovers jobs abandoned by dead workers and purges expired results.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.request_stop)
+
+        self._set_state("idle")
+        last_heartbeat = last_maintenance = 0.0
+
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                if with_scheduler and now - last_maintenance >= self.MAINTENANCE_INTERVAL:
+                    self.connection.promote_scheduled_jobs()
+                    self.connection.recover_abandoned_jobs()
+                    self.connection.purge_expired()
+                    last_maintenance = now
+
+                row = self.connection.claim(self.queue_names, self.name)
+                if row is None:
+                    if burst:
+                        break
+                    if now - last_heartbeat >= self.HEARTBEAT_INTERVAL:
+                        self._set_state("idle")
+                        last_heartbeat = now
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+
+                self.execute_job(LocalJob(row, self.connection))
+                last_heartbeat = time.monotonic()
+                if max_jobs is not None and self.jobs_executed >= max_jobs:
+                    break
+        finally:
+            self.connection.unregister_worker(self.name)
+
+        return self.jobs_executed > 0
+
+    def execute_job(self, job: LocalJob) -> None:
+        """Run a claimed job and record its outcome"""
+        global _current_job
+        self._set_state("busy", job.id)
+        _current_job = job
+        use_alarm = hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+        # Keep the heartbeat going during long jobs so they are not taken for abandoned
+        job_done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_during, args=(job, job_done), daemon=True)
+        heartbeat.start()
+
+        try:
+            if use_alarm and job.timeout and job.timeout > 0:
+                signal.signal(signal.SIGALRM, self._handle_timeout)
+                signal.alarm(int(job.timeout))
+            result = job.perform()
+        except Exception:
+            exc_info = traceback.format_exc()
+            retried = self.connection.fail(job.id, exc_info)
+            logger.error(f"Job {job.id} failed{' (will retry)' if retried else ''}: {exc_info.splitlines()[-1]}")
+        else:
+            self.connection.finish(job.id, result)
+        finally:
+            if use_alarm:
+                signal.alarm(0)
+            job_done.set()
+            heartbeat.join()
+            _current_job = None
+            self.jobs_executed += 1
+            self._set_state("idle")
+
+    def _heartbeat_during(self, job: LocalJob, job_done: threading.Event) -> None:
+        while not job_done.wait(self.HEARTBEAT_INTERVAL):
+            try:
+                self.connection.heartbeat(self.name, self.queue_names, "busy", job.id)
+            except sqlite3.Error as e:
+                logger.warning(f"Worker heartbeat failed: {e}")
+
+    def _handle_timeout(self, signum, frame) -> None:
+        raise JobTimeoutException("Job exceeded maximum timeout value")
+
+    def _set_state(self, state: str, current_job_id: Optional[str] = None) -> None:
+        self.state = state
+        self.current_job_id = current_job_id
+        self.connection.heartbeat(self.name, self.queue_names, state, current_job_id)
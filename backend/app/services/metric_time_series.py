@@ -0,0 +1,267 @@
+"""
+Metric Time-Series Store
+
+Columnar, fixed-capacity storage for the samples recorded by the
+performance monitoring service. Each metric type has a ring buffer of
+NumPy timestamp and value columns, so window queries are a binary search
+over the timestamp index plus vectorized reductions over the window, and
+memory stays bounded however long the sampler runs. Per-minute and
+per-hour rollups (count, sum, sum of squares, min, max) are maintained on
+every append and answer trend queries over longer horizons than the raw
+buffer holds.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Raw samples kept per metric type (about 5.8 days at one sample per 5 seconds)
+DEFAULT_RAW_CAPACITY = 100_000
+# Rollup buckets kept per metric type: 7 days of minutes, 30 days of hours
+MINUTE_ROLLUP_CAPACITY = 7 * 24 * 60
+HOUR_ROLLUP_CAPACITY = 30 * 24
+
+
+@dataclass
+class WindowStats:
+    """Summary of the samples of a window"""
+    count: int
+    mean: float
+    std_dev: float
+    min: float
+    max: float
+    last: Optional[float]
+
+
+class RingSeries:
+    """
+    Raw samples of one metric type in a ring buffer
+
+    Timestamps are epoch seconds. While samples arrive in time order the
+    two contiguous segments of the ring stay sorted and windows are found
+    by binary search; after an older sample is appended, windows fall back
+    to a vectorized mask over the buffer until the samples in time order
+    written since fill the ring.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RAW_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.sequence = np.zeros(capacity, dtype=np.int64)
+        # Context and tags of each sample, for callers that need whole metrics
+        self.context = np.empty(capacity, dtype=object)
+        self.tags = np.empty(capacity, dtype=object)
+        self.next = 0
+        self.size = 0
+        # Number of latest samples in time order
+        self.sorted_run = 0
+
+    def append(self, timestamp: float, value: float, sequence: int,
+               context: Optional[Dict[str, Any]] = None, tags: Optional[Dict[str, str]] = None) -> None:
+        if self.size and timestamp < self.timestamps[(self.next - 1) % self.capacity]:
+            self.sorted_run = 1
+        else:
+            self.sorted_run += 1
+
+        position = self.next
+        self.timestamps[position] = timestamp
+        self.values[position] = value
+        self.sequence[position] = sequence
+        self.context[position] = context
+        self.tags[position] = tags
+        self.next = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _segments(self) -> List[slice]:
+        """Slices of the buffer in append order"""
+        if self.size < self.capacity:
+            return [slice(0, self.size)]
+        return [slice(self.next, self.capacity), slice(0, self.next)]
+
+    def window_positions(self, since: float, until: Optional[float] = None) -> np.ndarray:
+        """Buffer positions of the samples with ``since <= timestamp < until``, in append order"""
+        until = np.inf if until is None else until
+        if self.sorted_run < self.size:
+            order = np.concatenate([np.arange(s.start, s.stop) for s in self._segments()])
+            stamps = self.timestamps[order]
+            return order[(stamps >= since) & (stamps < until)]
+
+        positions = []
+        for segment in self._segments():
+            stamps = self.timestamps[segment]
+            start = np.searchsorted(stamps, since, side='left')
+            stop = np.searchsorted(stamps, until, side='left')
+            if start < stop:
+                positions.append(np.arange(segment.start + start, segment.start + stop))
+        return np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+
+    def window(self, since: float, until: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and values of a window"""
+        positions = self.window_positions(since, until)
+        return self.timestamps[positions], self.values[positions]
+
+
+class RollupSeries:
+    """
+    Fixed-width time buckets of one metric type
+
+    Buckets are direct-mapped to slots by bucket number, so appends are
+    O(1) also when samples arrive out of order; a slot is reset when a
+    newer bucket takes it over.
+    """
+
+    def __init__(self, width: int, capacity: int):
+        self.width = width
+        self.capacity = capacity
+        self.bucket = np.full(capacity, -1, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.sum = np.zeros(capacity, dtype=np.float64)
+        self.sum_squares = np.zeros(capacity, dtype=np.float64)
+        self.min = np.zeros(capacity, dtype=np.float64)
+        self.max = np.zeros(capacity, dtype=np.float64)
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = int(timestamp // self.width)
+        slot = bucket % self.capacity
+        if self.bucket[slot] != bucket:
+            if self.bucket[slot] > bucket:
+                # Older than the retained range
+                return
+            self.bucket[slot] = bucket
+            self.count[slot] = 0
+            self.sum[slot] = self.sum_squares[slot] = 0.0
+            self.min[slot] = value
+            self.max[slot] = value
+        self.count[slot] += 1
+        self.sum[slot] += value
+        self.sum_squares[slot] += value * value
+        if value < self.min[slot]:
+            self.min[slot] = value
+        if value > self.max[slot]:
+            self.max[slot] = value
+
+    def window(self, since: float, until: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Buckets overlapping ``[since, until)``, oldest first"""
+        first = since // self.width
+        last = np.inf if until is None else until / self.width
+        slots = np.flatnonzero((self.bucket >= first) & (self.bucket < last))
+        slots = slots[np.argsort(self.bucket[slots])]
+        return {
+            'start': self.bucket[slots] * self.width,
+            'count': self.count[slots],
+            'sum': self.sum[slots],
+            'sum_squares': self.sum_squares[slots],
+            'min': self.min[slots],
+            'max': self.max[slots],
+        }
+
+
+class MetricTimeSeriesStore:
+    """Raw ring buffers and 1m/1h rollups of each metric type"""
+
+    ROLLUP_WIDTHS = {'1m': 60, '1h': 3600}
+
+    def __init__(self, metric_factory: Callable[..., Any], raw_capacity: int = DEFAULT_RAW_CAPACITY,
+                 minute_capacity: int = MINUTE_ROLLUP_CAPACITY, hour_capacity: int = HOUR_ROLLUP_CAPACITY):
+        """
+        Args:
+            metric_factory: Builds a metric object from metric_type, value,
+                timestamp, context and tags keyword arguments
+        """
+        self.metric_factory = metric_factory
+        self.raw_capacity = raw_capacity
+        self.rollup_capacities = {'1m': minute_capacity, '1h': hour_capacity}
+        self.raw: Dict[Any, RingSeries] = {}
+        self.rollups: Dict[Any, Dict[str, RollupSeries]] = {}
+        self.total_recorded = 0
+
+    def append(self, metric) -> None:
+        """Record a ``PerformanceMetric``"""
+        self.record(metric.metric_type, metric.timestamp.timestamp(), metric.value, metric.context, metric.tags)
+
+    def record(self, metric_type, timestamp: float, value: float,
+               context: Optional[Dict[str, Any]] = None, tags: Optional[Dict[str, str]] = None) -> None:
+        if metric_type not in self.raw:
+            self.raw[metric_type] = RingSeries(self.raw_capacity)
+            self.rollups[metric_type] = {
+                name: RollupSeries(width, self.rollup_capacities[name])
+                for name, width in self.ROLLUP_WIDTHS.items()
+            }
+        self.raw[metric_type].append(timestamp, value, self.total_recorded, context, tags)
+        for rollup in self.rollups[metric_type].values():
+            rollup.add(timestamp, value)
+        self.total_recorded += 1
+
+    def __len__(self) -> int:
+        return sum(len(series) for series in self.raw.values())
+
+    def metric_types(self) -> List[Any]:
+        return list(self.raw)
+
+    def values(self, metric_type, since: datetime, until: Optional[datetime] = None) -> np.ndarray:
+        """Values of a metric type in a window, in append order"""
+        series = self.raw.get(metric_type)
+        if series is None:
+            return np.empty(0)
+        return series.window(since.timestamp(), until.timestamp() if until else None)[1]
+
+    def series(self, metric_type, since: datetime,
+               until: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps (epoch seconds) and values of a metric type in a window"""
+        series = self.raw.get(metric_type)
+        if series is None:
+            return np.empty(0), np.empty(0)
+        return series.window(since.timestamp(), until.timestamp() if until else None)
+
+    def stats(self, metric_type, since: datetime, until: Optional[datetime] = None) -> Optional[WindowStats]:
+        """Count, mean, standard deviation, min, max and last value of a window"""
+        values = self.values(metric_type, since, until)
+        if not len(values):
+            return None
+        return WindowStats(
+            count=len(values),
+            mean=float(values.mean()),
+            std_dev=float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            min=float(values.min()),
+            max=float(values.max()),
+            last=float(values[-1])
+        )
+
+    def rollup(self, metric_type, resolution: str, since: datetime,
+               until: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """Rollup buckets ('1m' or '1h') of a metric type in a window"""
+        if metric_type not in self.rollups:
+            return RollupSeries(self.ROLLUP_WIDTHS[resolution], 1).window(0, 0)
+        return self.rollups[metric_type][resolution].window(since.timestamp(), until.timestamp() if until else None)
+
+    def metrics(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Any]:
+        """Samples of all metric types in a window as metric objects, in append order"""
+        rows = []
+        for metric_type, series in self.raw.items():
+            positions = series.window_positions(
+                since.timestamp() if since else -np.inf, until.timestamp() if until else None
+            )
+            rows.extend((series.sequence[p], metric_type, series, p) for p in positions)
+        rows.sort(key=lambda row: row[0])
+        return [
+            self.metric_factory(
+                metric_type=metric_type,
+                value=float(series.values[p]),
+                timestamp=datetime.fromtimestamp(series.timestamps[p]),
+                context=series.context[p] or {},
+                tags=series.tags[p] or {}
+            )
+            for _, metric_type, series, p in rows
+        ]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.metrics())
+
+    def __getitem__(self, index: int) -> Any:
+        return self.metrics()[index]
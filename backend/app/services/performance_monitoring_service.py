@@ -17,6 +17,10 @@ import statistics
 import json
 from pathlib import Path
 
+import numpy as np
+
+from .metric_time_series import MetricTimeSeriesStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -106,12 +110,15 @@ class PerformanceMonitoringService:
     """Main performance monitoring service"""
     
     def __init__(self):
-        self.metrics_storage: List[PerformanceMetric] = []
         self.baselines: Dict[PerformanceMetricType, PerformanceBaseline] = {}
         self.alerts: List[PerformanceAlert] = []
         self.monitoring_active = False
         self.monitoring_interval = 5  # seconds
         self.data_retention_days = 30
+        # Bounded columnar store: raw samples per metric type plus 1m/1h rollups
+        self.metrics_storage = MetricTimeSeriesStore(
+            PerformanceMetric, hour_capacity=self.data_retention_days * 24
+        )
         
         # Performance thresholds
         self.thresholds = {
@@ -148,33 +155,33 @@ class PerformanceMonitoringService:
         await self._check_performance_alerts(metric)
         
         # Update baselines periodically
-        if len(self.metrics_storage) % 100 == 0:
+        if self.metrics_storage.total_recorded % 100 == 0:
             await self._update_baselines()
             
     async def get_current_performance_status(self) -> Dict[str, Any]:
         """Get current performance status"""
-        recent_metrics = self._get_recent_metrics(minutes=5)
+        since = datetime.now() - timedelta(minutes=5)
         
         status = {
             "timestamp": datetime.now().isoformat(),
             "monitoring_active": self.monitoring_active,
-            "metrics_count": len(recent_metrics),
+            "metrics_count": 0,
             "active_alerts": len([a for a in self.alerts if 
                                 (datetime.now() - a.timestamp).seconds < 3600]),
             "performance_summary": {}
         }
         
         # Calculate summary statistics for each metric type
-        for metric_type in PerformanceMetricType:
-            type_metrics = [m for m in recent_metrics if m.metric_type == metric_type]
-            if type_metrics:
-                values = [m.value for m in type_metrics]
+        for metric_type in self.metrics_storage.metric_types():
+            stats = self.metrics_storage.stats(metric_type, since)
+            if stats:
+                status["metrics_count"] += stats.count
                 status["performance_summary"][metric_type.value] = {
-                    "current": values[-1] if values else None,
-                    "average": statistics.mean(values),
-                    "min": min(values),
-                    "max": max(values),
-                    "count": len(values)
+                    "current": stats.last,
+                    "average": stats.mean,
+                    "min": stats.min,
+                    "max": stats.max,
+                    "count": stats.count
                 }
                 
         return status
@@ -187,14 +194,12 @@ class PerformanceMonitoringService:
             return None
             
         baseline = self.baselines[metric_type]
-        recent_metrics = self._get_recent_metrics(hours=lookback_hours)
-        type_metrics = [m for m in recent_metrics if m.metric_type == metric_type]
+        recent_values = self.metrics_storage.values(metric_type, datetime.now() - timedelta(hours=lookback_hours))
         
-        if len(type_metrics) < 10:  # Need sufficient data
+        if len(recent_values) < 10:  # Need sufficient data
             return None
             
-        recent_values = [m.value for m in type_metrics]
-        recent_mean = statistics.mean(recent_values)
+        recent_mean = float(recent_values.mean())
         
         # Calculate regression score
         regression_threshold = 1.5  # 50% worse than baseline
@@ -217,13 +222,12 @@ class PerformanceMonitoringService:
     async def generate_optimization_suggestions(self) -> List[OptimizationSuggestion]:
         """Generate automated optimization suggestions"""
         suggestions = []
-        recent_metrics = self._get_recent_metrics(hours=1)
+        since = datetime.now() - timedelta(hours=1)
         
         # Analyze CPU usage patterns
-        cpu_metrics = [m for m in recent_metrics 
-                      if m.metric_type == PerformanceMetricType.CPU_USAGE]
-        if cpu_metrics:
-            avg_cpu = statistics.mean([m.value for m in cpu_metrics])
+        cpu_stats = self.metrics_storage.stats(PerformanceMetricType.CPU_USAGE, since)
+        if cpu_stats:
+            avg_cpu = cpu_stats.mean
             if avg_cpu > 70:
                 suggestions.append(OptimizationSuggestion(
                     suggestion_id=f"cpu_opt_{int(time.time())}",
@@ -243,10 +247,9 @@ class PerformanceMonitoringService:
                 ))
                 
         # Analyze memory usage
-        memory_metrics = [m for m in recent_metrics 
-                         if m.metric_type == PerformanceMetricType.MEMORY_USAGE]
-        if memory_metrics:
-            avg_memory = statistics.mean([m.value for m in memory_metrics])
+        memory_stats = self.metrics_storage.stats(PerformanceMetricType.MEMORY_USAGE, since)
+        if memory_stats:
+            avg_memory = memory_stats.mean
             if avg_memory > 80:
                 suggestions.append(OptimizationSuggestion(
                     suggestion_id=f"mem_opt_{int(time.time())}",
@@ -266,10 +269,9 @@ class PerformanceMonitoringService:
                 ))
                 
         # Analyze document processing times
-        doc_metrics = [m for m in recent_metrics 
-                      if m.metric_type == PerformanceMetricType.DOCUMENT_PROCESSING_TIME]
-        if doc_metrics:
-            avg_processing = statistics.mean([m.value for m in doc_metrics])
+        doc_stats = self.metrics_storage.stats(PerformanceMetricType.DOCUMENT_PROCESSING_TIME, since)
+        if doc_stats:
+            avg_processing = doc_stats.mean
             if avg_processing > 20:
                 suggestions.append(OptimizationSuggestion(
                     suggestion_id=f"doc_opt_{int(time.time())}",
@@ -315,31 +317,22 @@ class PerformanceMonitoringService:
                                    metric_type: PerformanceMetricType,
                                    hours: int = 24) -> Dict[str, Any]:
         """Get performance trends for a metric type"""
-        metrics = self._get_recent_metrics(hours=hours)
-        type_metrics = [m for m in metrics if m.metric_type == metric_type]
+        # Hourly averages from the hourly rollups
+        hourly = self.metrics_storage.rollup(metric_type, '1h', datetime.now() - timedelta(hours=hours))
         
-        if not type_metrics:
+        if not len(hourly['count']):
             return {"error": "No data available"}
             
-        # Sort by timestamp
-        type_metrics.sort(key=lambda x: x.timestamp)
-        
-        # Calculate hourly averages
-        hourly_data = {}
-        for metric in type_metrics:
-            hour_key = metric.timestamp.replace(minute=0, second=0, microsecond=0)
-            if hour_key not in hourly_data:
-                hourly_data[hour_key] = []
-            hourly_data[hour_key].append(metric.value)
-            
         trend_data = []
-        for hour, values in sorted(hourly_data.items()):
+        for start, count, total, low, high in zip(
+            hourly['start'], hourly['count'], hourly['sum'], hourly['min'], hourly['max']
+        ):
             trend_data.append({
-                "timestamp": hour.isoformat(),
-                "average": statistics.mean(values),
-                "min": min(values),
-                "max": max(values),
-                "count": len(values)
+                "timestamp": datetime.fromtimestamp(int(start)).isoformat(),
+                "average": float(total / count),
+                "min": float(low),
+                "max": float(high),
+                "count": int(count)
             })
             
         # Calculate trend direction
@@ -355,9 +348,9 @@ class PerformanceMonitoringService:
             "trend_direction": trend_direction,
             "data_points": trend_data,
             "summary": {
-                "total_samples": len(type_metrics),
+                "total_samples": int(hourly['count'].sum()),
                 "time_range_hours": hours,
-                "overall_average": statistics.mean([m.value for m in type_metrics])
+                "overall_average": float(hourly['sum'].sum() / hourly['count'].sum())
             }
         }
         
@@ -454,35 +447,27 @@ class PerformanceMonitoringService:
         else:
             cutoff = datetime.now() - timedelta(hours=1)
             
-        return [m for m in self.metrics_storage if m.timestamp >= cutoff]
+        return self.metrics_storage.metrics(since=cutoff)
         
     async def _update_baselines(self):
         """Update performance baselines"""
         # Use last 7 days of data for baselines
-        baseline_metrics = self._get_recent_metrics(hours=24*7)
+        since = datetime.now() - timedelta(hours=24*7)
         
-        for metric_type in PerformanceMetricType:
-            type_metrics = [m for m in baseline_metrics if m.metric_type == metric_type]
+        for metric_type in self.metrics_storage.metric_types():
+            values = self.metrics_storage.values(metric_type, since)
             
-            if len(type_metrics) >= 50:  # Need sufficient data
-                values = [m.value for m in type_metrics]
-                
+            if len(values) >= 50:  # Need sufficient data
                 self.baselines[metric_type] = PerformanceBaseline(
                     metric_type=metric_type,
-                    mean=statistics.mean(values),
-                    std_dev=statistics.stdev(values) if len(values) > 1 else 0,
-                    percentile_95=self._percentile(values, 95),
-                    percentile_99=self._percentile(values, 99),
+                    mean=float(values.mean()),
+                    std_dev=float(values.std(ddof=1)) if len(values) > 1 else 0,
+                    percentile_95=float(np.percentile(values, 95, method='lower')),
+                    percentile_99=float(np.percentile(values, 99, method='lower')),
                     sample_count=len(values),
                     last_updated=datetime.now()
                 )
                 
-    def _percentile(self, values: List[float], percentile: int) -> float:
-        """Calculate percentile of values"""
-        sorted_values = sorted(values)
-        index = int(len(sorted_values) * percentile / 100)
-        return sorted_values[min(index, len(sorted_values) - 1)]
-        
     async def _analyze_component_bottleneck(self, 
                                           component: str, 
                                           metrics: List[PerformanceMetric]) -> Optional[BottleneckAnalysis]:
@@ -544,11 +529,7 @@ class PerformanceMonitoringService:
                 # Clean up every 6 hours
                 await asyncio.sleep(21600)
                 
-                cutoff = datetime.now() - timedelta(days=self.data_retention_days)
-                
-                # Remove old metrics
-                self.metrics_storage = [m for m in self.metrics_storage 
-                                      if m.timestamp >= cutoff]
+                # Metrics are bounded by the ring buffers and rollups of the store
                 
                 # Remove old alerts
                 alert_cutoff = datetime.now() - timedelta(days=7)
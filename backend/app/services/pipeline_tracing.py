@@ -0,0 +1,368 @@
+"""
+Document Processing Pipeline Tracing
+
+Nested spans over the stages of the processing pipeline (parse, chapter
+extraction, and per chapter segment, extract, generate and persist), kept
+in process for the run of one document. Spans carry the counts recorded by
+the pipeline plus the database time, model time and peak RSS measured
+while they were open; database and model time of a span include those of
+its children. A per-stage summary is stored in the document's metadata and
+the spans can be appended as OpenTelemetry (OTLP/JSON) export requests to
+a local collector file.
+"""
+
+import json
+import logging
+import os
+import secrets
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional
+
+import psutil
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..core.config import settings
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Key of the trace context and stage summary in a document's metadata
+TRACE_METADATA_KEY = "trace"
+
+SERVICE_NAME = "document-processing-pipeline"
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("pipeline_span", default=None)
+_process = psutil.Process()
+
+
+@dataclass
+class Span:
+    """One timed operation of a pipeline run"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    db_time: float = 0.0
+    db_statements: int = 0
+    model_time: float = 0.0
+    peak_rss_mb: float = 0.0
+    parent: Optional["Span"] = field(default=None, repr=False)
+    tracer: Optional["PipelineTracer"] = field(default=None, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration(self) -> float:
+        """Seconds the span was open (so far, if it is still open)"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def finish(self) -> None:
+        self.end_ns = time.time_ns()
+        if self.parent is not None:
+            self.parent.db_time += self.db_time
+            self.parent.db_statements += self.db_statements
+            self.parent.model_time += self.model_time
+            self.parent.peak_rss_mb = max(self.parent.peak_rss_mb, self.peak_rss_mb)
+
+
+class PipelineTracer:
+    """
+    Collects the spans of one pipeline run
+
+    Spans nest through a context variable, so a span opened in a coroutine
+    (or a task it starts) becomes the child of the span open around it. A
+    run continued by other jobs, like the chapter-range parts of a
+    fanned-out document, passes ``trace_id`` and ``parent_span_id`` to join
+    the trace of the run that split it.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None, parent_span_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_span_id = parent_span_id
+        self.spans: List[Span] = []
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[str, Any]]) -> "PipelineTracer":
+        """Tracer continuing the trace recorded in a document's metadata"""
+        context = (metadata or {}).get(TRACE_METADATA_KEY) or {}
+        return cls(context.get("trace_id"), context.get("root_span_id"))
+
+    @contextmanager
+    def span(self, name: str, memory: Optional[ContextManager] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Open a span for the duration of the block
+
+        ``memory`` is entered around the block as well, for the memory
+        tracking hooks of ``DocumentProcessingMemoryMonitor``. Exceptions
+        mark the span as failed and propagate.
+        """
+        parent = _current_span.get()
+        if parent is not None and parent.trace_id != self.trace_id:
+            parent = None
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else self.parent_span_id,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+            parent=parent,
+            tracer=self
+        )
+        self.spans.append(span)
+        token = _current_span.set(span)
+        high_water = _max_rss_mb()
+        span.peak_rss_mb = _rss_mb()
+        try:
+            with memory or nullcontext():
+                yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.peak_rss_mb = max(span.peak_rss_mb, _rss_mb())
+            # A new process high-water mark was reached inside this span
+            new_high_water = _max_rss_mb()
+            if new_high_water > high_water:
+                span.peak_rss_mb = max(span.peak_rss_mb, new_high_water)
+            span.finish()
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    def context(self) -> Dict[str, Any]:
+        """Trace context other jobs continue the trace from"""
+        return {
+            "trace_id": self.trace_id,
+            "root_span_id": self.root.span_id if self.root else self.parent_span_id
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals of the spans per span name, for the document status
+
+        Spans still open, like the root span while the final status is
+        written, count with their time so far.
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, _empty_stage())
+            stage["count"] += 1
+            stage["errors"] += 1 if span.error else 0
+            stage["duration_ms"] += span.duration * 1000
+            stage["db_time_ms"] += span.db_time * 1000
+            stage["db_statements"] += span.db_statements
+            stage["model_time_ms"] += span.model_time * 1000
+            stage["peak_rss_mb"] = max(stage["peak_rss_mb"], span.peak_rss_mb)
+            for key, value in span.attributes.items():
+                if key.endswith("_count") and isinstance(value, int):
+                    stage[key] = stage.get(key, 0) + value
+        return {**self.context(), "stages": _rounded(stages)}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Finished spans as an OTLP/JSON ``ExportTraceServiceRequest``"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": SERVICE_NAME,
+                    "process.pid": os.getpid()
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [_otlp_span(span) for span in self.spans if span.end_ns is not None]
+                }]
+            }]
+        }
+
+    def export(self, path: Optional[str] = None) -> bool:
+        """
+        Append the spans as one line of OTLP/JSON to the collector file
+
+        The file uses the layout of the OpenTelemetry Collector's file
+        exporter, which its ``otlpjsonfile`` receiver reads back. Returns
+        False when no file is configured or writing fails; tracing never
+        fails a pipeline run.
+        """
+        path = path or settings.pipeline_trace_file
+        if not path or not self.spans:
+            return False
+        try:
+            target = Path(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "a", encoding="utf-8") as collector:
+                collector.write(json.dumps(self.to_otlp(), separators=(",", ":")) + "\n")
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to export pipeline trace {self.trace_id}: {e}")
+            return False
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def trace_span(name: str, memory: Optional[ContextManager] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Open a child span of the current span
+
+    Outside a traced run the block still runs (with ``memory`` entered) and
+    gets a span that is not recorded anywhere.
+    """
+    parent = _current_span.get()
+    if parent is None or parent.tracer is None:
+        with memory or nullcontext():
+            yield Span(name, "", "", None, time.time_ns(), attributes=dict(attributes))
+        return
+    with parent.tracer.span(name, memory, **attributes) as span:
+        yield span
+
+
+@contextmanager
+def model_time() -> Iterator[None]:
+    """Count the time spent in the block as model time of the current span"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span = _current_span.get()
+        if span is not None:
+            span.model_time += time.perf_counter() - start
+
+
+def merge_trace_summaries(summaries: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Combine the summaries of runs of the same trace
+
+    Used for fanned-out documents, whose stages are spread over the run that
+    split them, the part jobs and the coordinator.
+    """
+    merged: Dict[str, Any] = {"stages": {}}
+    for summary in summaries:
+        if not summary:
+            continue
+        for key in ("trace_id", "root_span_id"):
+            merged.setdefault(key, summary.get(key))
+        for name, stage in summary.get("stages", {}).items():
+            target = merged["stages"].setdefault(name, _empty_stage())
+            for key, value in stage.items():
+                if key == "peak_rss_mb":
+                    target[key] = max(target[key], value)
+                else:
+                    target[key] = target.get(key, 0) + value
+    merged["stages"] = _rounded(merged["stages"])
+    return merged
+
+
+def _empty_stage() -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "errors": 0,
+        "duration_ms": 0.0,
+        "db_time_ms": 0.0,
+        "db_statements": 0,
+        "model_time_ms": 0.0,
+        "peak_rss_mb": 0.0,
+    }
+
+
+def _rounded(stages: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {key: round(value, 3) if isinstance(value, float) else value for key, value in stage.items()}
+        for name, stage in stages.items()
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        return _process.memory_info().rss / 1024 / 1024
+    except psutil.Error:
+        return 0.0
+
+
+def _max_rss_mb() -> float:
+    """High-water mark of the process RSS (0 where unavailable)"""
+    if resource is None:
+        return 0.0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    attributes = {
+        **{f"pipeline.{key}": value for key, value in span.attributes.items()},
+        "db.time_ms": round(span.db_time * 1000, 3),
+        "db.statements": span.db_statements,
+        "model.time_ms": round(span.model_time * 1000, 3),
+        "process.peak_rss_mb": round(span.peak_rss_mb, 3),
+    }
+    status = {"code": STATUS_CODE_ERROR, "message": span.error} if span.error else {"code": STATUS_CODE_OK}
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_span_id or "",
+        "name": span.name,
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(attributes),
+        "status": status,
+    }
+
+
+# Database time of the statements executed while a span is open
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is not None:
+        context._pipeline_span_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_pipeline_span_start", None)
+    span = _current_span.get()
+    if start is not None and span is not None:
+        span.db_time += time.perf_counter() - start
+        span.db_statements += 1
@@ -0,0 +1,203 @@
+"""
+Processing checkpoints for the document pipeline.
+
+Checkpoints record which pipeline stages have completed for a document so that
+retries resume from the last completed stage instead of re-running the whole
+pipeline. They are persisted in ``Document.doc_metadata["checkpoints"]``.
+
+Document-level stages are ``parsed`` and ``chapters``; per-chapter stages are
+``segments``, ``knowledge`` and ``cards``. A chapter is complete once its
+``cards`` stage is recorded. Chapter fingerprints allow an updated source file
+to reuse the knowledge and cards of chapters whose content did not change.
+"""
+
+import copy
+import hashlib
+from enum import Enum
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class PipelineStage(str, Enum):
+    """Checkpointed pipeline stages"""
+    PARSED = "parsed"
+    CHAPTERS = "chapters"
+    SEGMENTS = "segments"
+    KNOWLEDGE = "knowledge"
+    CARDS = "cards"
+
+
+DOCUMENT_STAGES = (PipelineStage.PARSED, PipelineStage.CHAPTERS)
+CHAPTER_STAGES = (PipelineStage.SEGMENTS, PipelineStage.KNOWLEDGE, PipelineStage.CARDS)
+
+
+def compute_file_fingerprint(file_path: Path, chunk_size: int = 1024 * 1024) -> Optional[str]:
+    """Return a SHA-256 fingerprint of a file, or None if it cannot be read."""
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def compute_chapter_fingerprint(title: Optional[str], content: Optional[str]) -> str:
+    """Return a fingerprint identifying a chapter by its title and content."""
+    digest = hashlib.sha256()
+    digest.update((title or "").encode('utf-8'))
+    digest.update(b"\x00")
+    digest.update((content or "").encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ProcessingCheckpoint:
+    """Per-document record of completed pipeline stages"""
+
+    METADATA_KEY = "checkpoints"
+    VERSION = 1
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = copy.deepcopy(data) if data else {}
+        if data.get("version") != self.VERSION:
+            data = {}
+
+        self.source_fingerprint: Optional[str] = data.get("source_fingerprint")
+        self.stages: Dict[str, Dict[str, Any]] = data.get("stages", {})
+        self.chapters: Dict[str, Dict[str, Any]] = data.get("chapters", {})
+        self.previous_chapters: Dict[str, Dict[str, Any]] = data.get("previous_chapters", {})
+        self.resume_count: int = data.get("resume_count", 0)
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[str, Any]]) -> "ProcessingCheckpoint":
+        """Load the checkpoint stored in a document's metadata."""
+        return cls((metadata or {}).get(cls.METADATA_KEY))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the checkpoint for storage in ``doc_metadata``."""
+        return copy.deepcopy({
+            "version": self.VERSION,
+            "source_fingerprint": self.source_fingerprint,
+            "stages": self.stages,
+            "chapters": self.chapters,
+            "previous_chapters": self.previous_chapters,
+            "resume_count": self.resume_count,
+        })
+
+    def matches_source(self, source_fingerprint: Optional[str]) -> bool:
+        """Check whether the checkpoint was recorded for the given source file."""
+        return bool(source_fingerprint) and self.source_fingerprint == source_fingerprint
+
+    def restart(self, source_fingerprint: Optional[str], reuse_chapters: bool = True) -> None:
+        """
+        Discard recorded progress and start over for a (possibly changed) source.
+
+        Completed chapters are kept as reuse candidates keyed by fingerprint so
+        unchanged chapters of an updated document do not have to be redone.
+        """
+        previous = {}
+        if reuse_chapters:
+            previous = dict(self.previous_chapters)
+            for chapter_id, chapter in self.chapters.items():
+                fingerprint = chapter.get("fingerprint")
+                if fingerprint and self._chapter_stage_done(chapter, PipelineStage.CARDS):
+                    previous[fingerprint] = {"chapter_id": chapter_id, **chapter}
+
+        self.source_fingerprint = source_fingerprint
+        self.stages = {}
+        self.chapters = {}
+        self.previous_chapters = previous
+        self.resume_count = 0
+
+    def mark_resumed(self) -> None:
+        """Record that processing resumed from this checkpoint."""
+        self.resume_count += 1
+
+    # Document-level stages
+
+    def mark_stage(self, stage: PipelineStage, **details: Any) -> None:
+        """Record a completed document-level stage."""
+        self.stages[stage.value] = {
+            "completed_at": datetime.utcnow().isoformat(),
+            **details,
+        }
+
+    def is_stage_complete(self, stage: PipelineStage) -> bool:
+        """Check whether a document-level stage has completed."""
+        return stage.value in self.stages
+
+    def stage_details(self, stage: PipelineStage) -> Dict[str, Any]:
+        """Get the details recorded for a document-level stage."""
+        return self.stages.get(stage.value, {})
+
+    # Chapter-level stages
+
+    def mark_chapter_stage(self, chapter_id: str, stage: PipelineStage, **details: Any) -> None:
+        """Record a completed stage for a chapter."""
+        chapter = self.chapters.setdefault(chapter_id, {"stages": {}})
+        chapter.pop("error", None)
+        chapter["stages"][stage.value] = datetime.utcnow().isoformat()
+        chapter.update(details)
+
+    def mark_chapter_failed(self, chapter_id: str, error: str) -> None:
+        """Record a chapter failure so that only this chapter is redone on retry."""
+        chapter = self.chapters.setdefault(chapter_id, {"stages": {}})
+        chapter["error"] = error
+        chapter["failed_at"] = datetime.utcnow().isoformat()
+
+    def is_chapter_stage_complete(self, chapter_id: str, stage: PipelineStage) -> bool:
+        """Check whether a stage has completed for a chapter."""
+        return self._chapter_stage_done(self.chapters.get(chapter_id, {}), stage)
+
+    def is_chapter_complete(self, chapter_id: str) -> bool:
+        """Check whether a chapter went through the whole pipeline."""
+        return self.is_chapter_stage_complete(chapter_id, PipelineStage.CARDS)
+
+    def chapter_details(self, chapter_id: str) -> Dict[str, Any]:
+        """Get the details recorded for a chapter."""
+        return self.chapters.get(chapter_id, {})
+
+    def failed_chapters(self) -> List[str]:
+        """Get the IDs of chapters whose last attempt failed."""
+        return [chapter_id for chapter_id, chapter in self.chapters.items() if chapter.get("error")]
+
+    def merge_chapters(self, chapters: Dict[str, Dict[str, Any]]) -> None:
+        """Merge chapter progress recorded elsewhere, e.g. by a parallel part job."""
+        for chapter_id, chapter in chapters.items():
+            if chapter:
+                self.chapters[chapter_id] = copy.deepcopy(chapter)
+
+    def chapter_totals(self) -> Dict[str, int]:
+        """Sum the knowledge points and cards of all completed chapters."""
+        totals = {"chapters_completed": 0, "knowledge_points": 0, "cards": 0}
+        for chapter_id, chapter in self.chapters.items():
+            if self.is_chapter_complete(chapter_id):
+                totals["chapters_completed"] += 1
+                totals["knowledge_points"] += chapter.get("knowledge_points", 0)
+                totals["cards"] += chapter.get("cards", 0)
+        return totals
+
+    def take_reusable_chapter(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Pop the previously completed chapter with the given fingerprint, if any."""
+        return self.previous_chapters.pop(fingerprint, None)
+
+    def clear_reusable_chapters(self) -> None:
+        """Forget reuse candidates once previous chapters have been reconciled."""
+        self.previous_chapters = {}
+
+    def summary(self) -> Dict[str, Any]:
+        """Get a compact summary of checkpoint progress for status reporting."""
+        completed = sum(1 for chapter_id in self.chapters if self.is_chapter_complete(chapter_id))
+        return {
+            "completed_stages": [stage.value for stage in DOCUMENT_STAGES if self.is_stage_complete(stage)],
+            "chapters_total": self.stage_details(PipelineStage.CHAPTERS).get("chapter_count", len(self.chapters)),
+            "chapters_completed": completed,
+            "chapters_failed": len(self.failed_chapters()),
+            "resume_count": self.resume_count,
+        }
+
+    @staticmethod
+    def _chapter_stage_done(chapter: Dict[str, Any], stage: PipelineStage) -> bool:
+        return stage.value in chapter.get("stages", {})
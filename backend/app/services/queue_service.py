@@ -1,16 +1,24 @@
 """
 Redis Queue service for background processing
+
+Jobs go to Redis through RQ, or with the 'local' queue backend to an embedded
+SQLite job queue exposing the same API, for deployments without Redis.
 """
 
 import redis
 import logging
 from rq import Queue, Worker, Retry
+from rq.job import Dependency
 from rq.exceptions import NoSuchJobError
 from uuid import UUID
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
 
 from app.core.config import settings
+from app.services.job_scheduler import JobScheduler
+from app.services.document_fanout import ChapterRange, fanout_progress
+from app.services.export_jobs import ExportPart
+from app.services.local_queue import LocalJobStore, LocalQueue, LocalWorker
 
 logger = logging.getLogger(__name__)
 
@@ -18,17 +26,44 @@ logger = logging.getLogger(__name__)
 class QueueService:
     """Service for managing Redis Queue operations"""
     
-    def __init__(self):
+    # Seconds to keep results of fanned-out part jobs (longest job timeout plus slack)
+    PART_RESULT_TTL = 24 * 60 * 60
+    
+    # Seconds a backup import may run
+    BACKUP_IMPORT_TIMEOUT = 2 * 60 * 60
+    
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Args:
+            backend: 'rq' for Redis/RQ or 'local' for the embedded SQLite
+                queue; defaults to the configured queue backend
+        """
+        self.backend = backend or settings.queue_backend
         try:
-            self.redis_conn = redis.from_url(settings.redis_url)
+            if self.backend == 'local':
+                # The job store answers the Redis commands used here and by the scheduler
+                self.redis_conn = LocalJobStore(settings.local_queue_path)
+                queue_class, self.worker_class = LocalQueue, LocalWorker
+            elif self.backend == 'rq':
+                self.redis_conn = redis.from_url(settings.redis_url)
+                queue_class, self.worker_class = Queue, Worker
+            else:
+                raise ValueError(f"Unknown queue backend: {self.backend}")
             # Test connection
             self.redis_conn.ping()
             
             # Create queues with different priorities
-            self.queue = Queue('document_processing', connection=self.redis_conn)
-            self.priority_queue = Queue('priority_processing', connection=self.redis_conn)
+            self.queue = queue_class('document_processing', connection=self.redis_conn)
+            self.priority_queue = queue_class('priority_processing', connection=self.redis_conn)
+            
+            # Size-class queues used for new jobs
+            self.scheduler = JobScheduler(self.redis_conn)
+            self.size_queues = {
+                size_class.name: queue_class(size_class.queue_name, connection=self.redis_conn)
+                for size_class in self.scheduler.size_classes
+            }
             
-            logger.info("QueueService initialized successfully")
+            logger.info(f"QueueService initialized successfully ({self.backend} backend)")
         except Exception as e:
             logger.error(f"Failed to initialize QueueService: {e}")
             raise
@@ -37,17 +72,29 @@ class QueueService:
         self, 
         document_id: UUID, 
         priority: bool = False,
-        retry_attempts: int = 3
+        retry_attempts: int = 3,
+        resume: bool = True,
+        file_path: Optional[str] = None,
+        file_size: Optional[int] = None,
+        page_count: Optional[int] = None
     ) -> str:
         """
         Enqueue document for background processing
         
+        The document is classified by page count and file size and routed to
+        the queue of its size class, with a timeout scaled to its expected
+        processing time. Priority jobs go to the front of their class queue.
+        
         Requirements: 1.3, 6.1, 6.2, 6.3 - Background processing with RQ
         
         Args:
             document_id: UUID of document to process
-            priority: Whether to use priority queue
+            priority: Whether to put the job at the front of its queue
             retry_attempts: Number of retry attempts on failure
+            resume: Whether processing resumes from the document's checkpoints
+            file_path: Path of the document file, used to count pages
+            file_size: Size of the document file in bytes
+            page_count: Known page count (skips estimation)
         
         Returns:
             Job ID for tracking
@@ -55,8 +102,14 @@ class QueueService:
         try:
             from app.workers.document_processor import process_document
             
-            # Choose queue based on priority
-            queue = self.priority_queue if priority else self.queue
+            # Choose queue based on document size
+            if page_count is None:
+                page_count = self.scheduler.estimate_page_count(file_path, file_size)
+            size_class = self.scheduler.classify(page_count, file_size)
+            queue = self.size_queues[size_class.name]
+            
+            meta = self.scheduler.build_job_meta(size_class, page_count, file_size)
+            meta["priority"] = priority
             
             # Configure retry policy
             retry_policy = Retry(max=retry_attempts) if retry_attempts > 0 else None
@@ -64,19 +117,384 @@ class QueueService:
             job = queue.enqueue(
                 process_document,
                 str(document_id),
-                job_timeout='30m',  # 30 minute timeout
+                resume,
+                job_timeout=self.scheduler.timeout_for(size_class, page_count),
                 job_id=f"doc_process_{document_id}",
                 retry=retry_policy,
-                description=f"Process document {document_id}"
+                description=f"Process document {document_id}",
+                meta=meta,
+                at_front=priority
             )
             
-            logger.info(f"Enqueued document {document_id} for processing (job_id: {job.id})")
+            logger.info(
+                f"Enqueued document {document_id} for processing "
+                f"(job_id: {job.id}, size_class: {size_class.name}, pages: {page_count})"
+            )
             return job.id
             
         except Exception as e:
             logger.error(f"Failed to enqueue document {document_id}: {e}")
             raise
     
+    @staticmethod
+    def part_job_id(document_id: UUID, part_index: int) -> str:
+        """Job ID of a chapter-range part of a fanned-out document"""
+        return f"doc_process_{document_id}_part_{part_index}"
+    
+    @staticmethod
+    def coordinator_job_id(document_id: UUID) -> str:
+        """Job ID of the job that finishes a fanned-out document"""
+        return f"doc_process_{document_id}_finalize"
+    
+    async def enqueue_document_parts(
+        self,
+        document_id: UUID,
+        chapter_ranges: List[ChapterRange],
+        retry_attempts: int = 1
+    ) -> Dict:
+        """
+        Enqueue the chapter ranges of a large document as parallel jobs
+        
+        Each part is routed to the queue of its own size class. A coordinator
+        job depends on all parts (also when some fail) and merges their
+        results into the document.
+        
+        Args:
+            document_id: UUID of the document
+            chapter_ranges: Chapter ranges planned for the document
+            retry_attempts: Number of retry attempts per part
+        
+        Returns:
+            IDs of the part jobs and of the coordinator job
+        """
+        try:
+            from app.workers.document_processor import process_document_part, finalize_document
+            
+            retry_policy = Retry(max=retry_attempts) if retry_attempts > 0 else None
+            part_jobs = []
+            
+            for chapter_range in chapter_ranges:
+                size_class = self.scheduler.classify(chapter_range.page_count, None)
+                meta = self.scheduler.build_job_meta(size_class, chapter_range.page_count, None)
+                meta.update({
+                    "document_id": str(document_id),
+                    "part_index": chapter_range.index,
+                    "parts_total": len(chapter_ranges)
+                })
+                
+                part_jobs.append(self.size_queues[size_class.name].enqueue(
+                    process_document_part,
+                    str(document_id),
+                    chapter_range.index,
+                    chapter_range.chapter_ids,
+                    job_timeout=self.scheduler.timeout_for(size_class, chapter_range.page_count),
+                    job_id=self.part_job_id(document_id, chapter_range.index),
+                    retry=retry_policy,
+                    description=(
+                        f"Process document {document_id} part "
+                        f"{chapter_range.index + 1}/{len(chapter_ranges)}"
+                    ),
+                    meta=meta,
+                    # Results must outlive the slowest part, the coordinator reads them
+                    result_ttl=self.PART_RESULT_TTL,
+                    failure_ttl=self.PART_RESULT_TTL
+                ))
+            
+            part_job_ids = [job.id for job in part_jobs]
+            smallest = self.scheduler.size_classes[0]
+            coordinator = self.size_queues[smallest.name].enqueue(
+                finalize_document,
+                str(document_id),
+                part_job_ids,
+                job_timeout=smallest.min_timeout,
+                job_id=self.coordinator_job_id(document_id),
+                depends_on=Dependency(jobs=part_job_ids, allow_failure=True),
+                description=f"Finalize document {document_id}",
+                meta={"document_id": str(document_id)}
+            )
+            
+            logger.info(
+                f"Fanned out document {document_id} into {len(part_jobs)} parts "
+                f"(coordinator job_id: {coordinator.id})"
+            )
+            return {
+                "part_job_ids": part_job_ids,
+                "coordinator_job_id": coordinator.id
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to enqueue parts of document {document_id}: {e}")
+            raise
+    
+    def get_document_parts_progress(self, fanout: Dict) -> Dict:
+        """
+        Get per-part progress of a fanned-out document
+        
+        Args:
+            fanout: The fan-out plan stored in the document's metadata
+        """
+        parts = []
+        for part in fanout.get("parts", []):
+            job = self._fetch_job(part["job_id"])
+            progress = (job.meta.get("progress") or {}) if job else {}
+            parts.append({
+                "index": part["index"],
+                "job_id": part["job_id"],
+                "status": job.get_status() if job else None,
+                "page_count": part.get("page_count"),
+                "current_step": progress.get("current_step"),
+                "chapters_total": progress.get("chapters_total", part.get("chapter_count", 0)),
+                "chapters_completed": progress.get("chapters_completed", 0),
+                "chapters_failed": progress.get("chapters_failed", 0)
+            })
+        
+        return fanout_progress(parts)
+    
+    def cancel_document_jobs(self, document_id: UUID, fanout: Optional[Dict] = None) -> int:
+        """
+        Cancel the processing job of a document and, if it was fanned out,
+        its part and coordinator jobs
+        
+        Returns:
+            Number of jobs cancelled
+        """
+        job_ids = [f"doc_process_{document_id}"]
+        if fanout:
+            job_ids.extend(part["job_id"] for part in fanout.get("parts", []))
+            job_ids.append(self.coordinator_job_id(document_id))
+        return sum(1 for job_id in job_ids if self.cancel_job(job_id))
+    
+    def schedule_daily_review_queue_build(self, run_at: Optional[datetime] = None) -> str:
+        """
+        Schedule the job that materializes the daily review queues
+        
+        Runs by default ``review_queue_build_delay_minutes`` after the next
+        UTC day boundary. There is one job per day, so scheduling a day
+        twice replaces the earlier job.
+        
+        Returns:
+            Job ID for tracking
+        """
+        from app.workers.review_queues import build_daily_review_queues
+        
+        if run_at is None:
+            tomorrow = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            run_at = tomorrow + timedelta(minutes=settings.review_queue_build_delay_minutes)
+        
+        job = self.queue.enqueue_at(
+            run_at,
+            build_daily_review_queues,
+            job_id=f"review_queues_{run_at.date().isoformat()}",
+            description=f"Build daily review queues for {run_at.date().isoformat()}"
+        )
+        logger.info(f"Scheduled daily review queue build at {run_at.isoformat()} (job_id: {job.id})")
+        return job.id
+    
+    def schedule_sync_change_log_prune(self, run_at: Optional[datetime] = None) -> str:
+        """
+        Schedule the job that prunes the sync change log
+        
+        Runs by default at the next UTC day boundary, once per day.
+        
+        Returns:
+            Job ID for tracking
+        """
+        from app.workers.sync_maintenance import prune_sync_change_log
+        
+        if run_at is None:
+            run_at = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        
+        job = self.queue.enqueue_at(
+            run_at,
+            prune_sync_change_log,
+            job_id=f"sync_change_log_prune_{run_at.date().isoformat()}",
+            description=f"Prune sync change log on {run_at.date().isoformat()}"
+        )
+        logger.info(f"Scheduled sync change log pruning at {run_at.isoformat()} (job_id: {job.id})")
+        return job.id
+    
+    def schedule_merkle_tree_repair(self, run_at: Optional[datetime] = None) -> str:
+        """
+        Schedule the job that verifies and repairs the sync Merkle trees
+        
+        Runs by default at the next UTC day boundary, once per day.
+        
+        Returns:
+            Job ID for tracking
+        """
+        from app.workers.sync_maintenance import repair_merkle_trees
+        
+        if run_at is None:
+            run_at = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        
+        job = self.queue.enqueue_at(
+            run_at,
+            repair_merkle_trees,
+            job_id=f"merkle_tree_repair_{run_at.date().isoformat()}",
+            description=f"Repair sync Merkle trees on {run_at.date().isoformat()}"
+        )
+        logger.info(f"Scheduled Merkle tree repair at {run_at.isoformat()} (job_id: {job.id})")
+        return job.id
+    
+    def schedule_export_cleanup(self, run_at: Optional[datetime] = None) -> str:
+        """
+        Schedule the job that removes the files of expired background exports
+        
+        Runs by default at the start of the next UTC hour, once per hour.
+        
+        Returns:
+            Job ID for tracking
+        """
+        from app.workers.export_jobs import cleanup_exports
+        
+        if run_at is None:
+            run_at = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        
+        job = self.queue.enqueue_at(
+            run_at,
+            cleanup_exports,
+            job_id=f"export_cleanup_{run_at.strftime('%Y-%m-%dT%H')}",
+            description=f"Remove expired exports at {run_at.strftime('%Y-%m-%d %H:00')}"
+        )
+        logger.info(f"Scheduled export cleanup at {run_at.isoformat()} (job_id: {job.id})")
+        return job.id
+    
+    def enqueue_backup_import(self, import_id: UUID, file_path: str) -> str:
+        """
+        Enqueue the import of a JSONL backup saved at ``file_path``
+        
+        The worker deletes the file when done. Progress is reported in the
+        job status.
+        
+        Returns:
+            Job ID for tracking
+        """
+        from app.workers.backup_import import import_jsonl_backup_file
+        
+        job = self.queue.enqueue(
+            import_jsonl_backup_file,
+            file_path,
+            job_timeout=self.BACKUP_IMPORT_TIMEOUT,
+            job_id=f"backup_import_{import_id}",
+            description=f"Import backup {import_id}"
+        )
+        logger.info(f"Enqueued backup import {import_id} (job_id: {job.id})")
+        return job.id
+    
+    @staticmethod
+    def export_job_id(export_id: UUID) -> str:
+        """Job ID of the job that assembles a background export"""
+        return f"export_{export_id}_finalize"
+    
+    def enqueue_export(
+        self,
+        export_id: UUID,
+        export_format: str,
+        parts: List[ExportPart],
+        filename: str,
+        document_id: Optional[UUID] = None
+    ) -> Dict:
+        """
+        Enqueue a background export as parallel chapter-range jobs
+        
+        A coordinator job depends on all parts (also when some fail) and
+        assembles their files into the export file. The job results are
+        kept for ``export_retention_hours``; the export files are removed
+        by the cleanup job once they have expired.
+        
+        Returns:
+            IDs of the part jobs and of the coordinator job
+        """
+        from app.workers.export_jobs import render_export_part, finalize_export
+        
+        retention = settings.export_retention_hours * 60 * 60
+        part_jobs = [
+            self.queue.enqueue(
+                render_export_part,
+                str(export_id),
+                export_format,
+                part.index,
+                str(document_id) if document_id else None,
+                part.chapter_ids,
+                part.card_count,
+                job_timeout=settings.export_job_timeout_seconds,
+                job_id=f"export_{export_id}_part_{part.index}",
+                description=f"Export {export_id} part {part.index + 1}/{len(parts)}",
+                meta={"export_id": str(export_id), "part_index": part.index, "card_count": part.card_count},
+                # Results must outlive the slowest part, the coordinator reads them
+                result_ttl=retention + settings.export_job_timeout_seconds,
+                failure_ttl=retention + settings.export_job_timeout_seconds
+            )
+            for part in parts
+        ]
+        
+        part_job_ids = [job.id for job in part_jobs]
+        coordinator = self.queue.enqueue(
+            finalize_export,
+            str(export_id),
+            export_format,
+            part_job_ids,
+            filename,
+            job_timeout=settings.export_job_timeout_seconds,
+            job_id=self.export_job_id(export_id),
+            depends_on=Dependency(jobs=part_job_ids, allow_failure=True),
+            description=f"Assemble export {export_id}",
+            meta={"export_id": str(export_id), "format": export_format, "part_job_ids": part_job_ids},
+            result_ttl=retention,
+            failure_ttl=retention
+        )
+        
+        logger.info(f"Enqueued export {export_id} in {len(part_jobs)} parts (coordinator job_id: {coordinator.id})")
+        return {
+            "part_job_ids": part_job_ids,
+            "coordinator_job_id": coordinator.id
+        }
+    
+    def get_export_status(self, export_id: UUID) -> Optional[Dict]:
+        """
+        Get status and per-part progress of a background export
+        
+        Returns:
+            None if the export is unknown or expired
+        """
+        coordinator = self._fetch_job(self.export_job_id(export_id))
+        if not coordinator:
+            return None
+        
+        parts = []
+        for job_id in coordinator.meta.get("part_job_ids", []):
+            job = self._fetch_job(job_id)
+            progress = (job.meta.get("progress") or {}) if job else {}
+            parts.append({
+                "job_id": job_id,
+                "status": job.get_status() if job else None,
+                "cards_total": progress.get("cards_total", job.meta.get("card_count", 0) if job else 0),
+                "cards_written": progress.get("cards_written", 0)
+            })
+        
+        result = coordinator.result or {}
+        if result.get("status") in ("completed", "failed"):
+            status = result["status"]
+        elif coordinator.get_status() == "failed":
+            status = "failed"
+        elif any(part["status"] in ("started", "finished", "failed") for part in parts):
+            status = "running"
+        else:
+            status = "queued"
+        
+        return {
+            "export_id": str(export_id),
+            "format": coordinator.meta.get("format"),
+            "status": status,
+            "cards_total": sum(part["cards_total"] for part in parts),
+            "cards_written": sum(part["cards_written"] for part in parts),
+            "parts": parts,
+            "filename": result.get("filename"),
+            "path": result.get("path"),
+            "size": result.get("size"),
+            "error": result.get("error") or (coordinator.exc_info if status == "failed" else None)
+        }
+    
     def get_job_status(self, job_id: str) -> Optional[Dict]:
         """
         Get job status and progress
@@ -84,15 +502,7 @@ class QueueService:
         Requirements: 1.4, 1.5 - Status tracking and progress updates
         """
         try:
-            # Try to fetch from both queues
-            job = None
-            try:
-                job = self.queue.job_class.fetch(job_id, connection=self.redis_conn)
-            except NoSuchJobError:
-                try:
-                    job = self.priority_queue.job_class.fetch(job_id, connection=self.redis_conn)
-                except NoSuchJobError:
-                    pass
+            job = self._fetch_job(job_id)
             
             if job:
                 return {
@@ -105,12 +515,52 @@ class QueueService:
                     'exc_info': job.exc_info,
                     'description': job.description,
                     'timeout': job.timeout,
-                    'retry_attempts': getattr(job, 'retries_left', 0)
+                    'retry_attempts': getattr(job, 'retries_left', 0),
+                    'size_class': job.meta.get('size_class'),
+                    'page_count': job.meta.get('page_count'),
+                    'progress': job.meta.get('progress')
                 }
         except Exception as e:
             logger.error(f"Error fetching job status for {job_id}: {e}")
         return None
     
+    def _fetch_job(self, job_id: str):
+        """Fetch a job by ID (jobs are stored independently of their queue)"""
+        try:
+            return self.queue.job_class.fetch(job_id, connection=self.redis_conn)
+        except NoSuchJobError:
+            return None
+    
+    def _all_queues(self) -> Dict[str, Queue]:
+        """All queues served by document workers, keyed by queue name"""
+        queues = {
+            self.priority_queue.name: self.priority_queue,
+            self.queue.name: self.queue
+        }
+        for queue in self.size_queues.values():
+            queues[queue.name] = queue
+        return queues
+    
+    def get_queue_estimate(self, job_id: str) -> Optional[Dict]:
+        """
+        Get queue position and estimated start time of a queued job
+        
+        Uses the scheduler's ticket counters, so the cost does not depend on
+        the queue length.
+        """
+        try:
+            job = self._fetch_job(job_id)
+            if not job or job.get_status() != 'queued':
+                return None
+            
+            estimate = self.scheduler.estimate_start(job)
+            if estimate and job.meta.get('priority'):
+                estimate['queue_position'] = 1
+            return estimate
+        except Exception as e:
+            logger.error(f"Error estimating start of job {job_id}: {e}")
+            return None
+    
     def get_queue_info(self) -> Dict:
         """
         Get comprehensive queue information
@@ -118,25 +568,28 @@ class QueueService:
         Requirements: 6.2, 6.3 - Queue monitoring and responsiveness
         """
         try:
+            queues = {}
+            for name, queue in self._all_queues().items():
+                queues[name] = {
+                    'name': queue.name,
+                    'length': len(queue),
+                    'failed_jobs': len(queue.failed_job_registry),
+                    'scheduled_jobs': len(queue.scheduled_job_registry),
+                    'started_jobs': len(queue.started_job_registry),
+                    'finished_jobs': len(queue.finished_job_registry)
+                }
+            
+            for size_class in self.scheduler.size_classes:
+                queues[size_class.queue_name].update({
+                    'size_class': size_class.name,
+                    'max_concurrency': size_class.max_concurrency,
+                    'average_job_seconds': round(self.scheduler.average_job_seconds(size_class), 1)
+                })
+            
             return {
-                'queues': {
-                    'document_processing': {
-                        'name': self.queue.name,
-                        'length': len(self.queue),
-                        'failed_jobs': len(self.queue.failed_job_registry),
-                        'scheduled_jobs': len(self.queue.scheduled_job_registry),
-                        'started_jobs': len(self.queue.started_job_registry),
-                        'finished_jobs': len(self.queue.finished_job_registry)
-                    },
-                    'priority_processing': {
-                        'name': self.priority_queue.name,
-                        'length': len(self.priority_queue),
-                        'failed_jobs': len(self.priority_queue.failed_job_registry),
-                        'scheduled_jobs': len(self.priority_queue.scheduled_job_registry),
-                        'started_jobs': len(self.priority_queue.started_job_registry),
-                        'finished_jobs': len(self.priority_queue.finished_job_registry)
-                    }
-                },
+                'queues': queues,
+                'seconds_per_page': round(self.scheduler.seconds_per_page(), 3),
+                'backend': self.backend,
                 'redis_info': {
                     'connected': True,
                     'memory_usage': self.redis_conn.info().get('used_memory_human', 'unknown')
@@ -155,7 +608,7 @@ class QueueService:
         Clear failed jobs from the queue(s)
         
         Args:
-            queue_name: 'all', 'document_processing', or 'priority_processing'
+            queue_name: 'all' or the name of a single queue
         
         Returns:
             Dictionary with counts of cleared jobs per queue
@@ -163,23 +616,17 @@ class QueueService:
         try:
             results = {}
             
-            if queue_name in ['all', 'document_processing']:
-                failed_registry = self.queue.failed_job_registry
-                count = len(failed_registry)
-                # Clear failed jobs by removing them
-                for job_id in failed_registry.get_job_ids():
-                    failed_registry.remove(job_id)
-                results['document_processing'] = count
-                logger.info(f"Cleared {count} failed jobs from document_processing queue")
-            
-            if queue_name in ['all', 'priority_processing']:
-                failed_registry = self.priority_queue.failed_job_registry
+            for name, queue in self._all_queues().items():
+                if queue_name not in ['all', name]:
+                    continue
+                
+                failed_registry = queue.failed_job_registry
                 count = len(failed_registry)
                 # Clear failed jobs by removing them
                 for job_id in failed_registry.get_job_ids():
                     failed_registry.remove(job_id)
-                results['priority_processing'] = count
-                logger.info(f"Cleared {count} failed jobs from priority_processing queue")
+                results[name] = count
+                logger.info(f"Cleared {count} failed jobs from {name} queue")
             
             return results
             
@@ -203,16 +650,14 @@ class QueueService:
         Requirements: 5.3, 5.5 - Error handling and recovery
         """
         try:
-            # Try to cancel from both queues
-            for queue in [self.queue, self.priority_queue]:
-                try:
-                    job = queue.job_class.fetch(job_id, connection=self.redis_conn)
-                    if job:
-                        job.cancel()
-                        logger.info(f"Cancelled job {job_id}")
-                        return True
-                except NoSuchJobError:
-                    continue
+            job = self._fetch_job(job_id)
+            if job:
+                was_queued = job.get_status() == 'queued'
+                job.cancel()
+                if was_queued:
+                    self.scheduler.mark_dequeued(job)
+                logger.info(f"Cancelled job {job_id}")
+                return True
             
             logger.warning(f"Job {job_id} not found for cancellation")
             return False
@@ -228,7 +673,7 @@ class QueueService:
         Requirements: 6.2, 6.3 - System responsiveness monitoring
         """
         try:
-            workers = Worker.all(connection=self.redis_conn)
+            workers = self.worker_class.all(connection=self.redis_conn)
             return [
                 {
                     'name': worker.name,
@@ -259,20 +704,14 @@ class QueueService:
             workers = self.get_active_workers()
             
             # Calculate health metrics
-            total_pending = (
-                queue_info['queues']['document_processing']['length'] +
-                queue_info['queues']['priority_processing']['length']
-            )
-            
-            total_failed = (
-                queue_info['queues']['document_processing']['failed_jobs'] +
-                queue_info['queues']['priority_processing']['failed_jobs']
-            )
+            total_pending = sum(q['length'] for q in queue_info['queues'].values())
+            total_failed = sum(q['failed_jobs'] for q in queue_info['queues'].values())
             
             active_workers = len([w for w in workers if w['state'] == 'busy'])
             
             return {
                 'status': 'healthy',
+                'backend': self.backend,
                 'redis_connected': True,
                 'total_pending_jobs': total_pending,
                 'total_failed_jobs': total_failed,
@@ -286,6 +725,7 @@ class QueueService:
             logger.error(f"Queue health check failed: {e}")
             return {
                 'status': 'unhealthy',
+                'backend': self.backend,
                 'error': str(e),
                 'redis_connected': False,
                 'timestamp': datetime.utcnow().isoformat()
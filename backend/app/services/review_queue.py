@@ -0,0 +1,159 @@
+"""
+Review queue builder
+
+Selects the cards of a daily review in SQL. Only the top ``max_cards``
+candidates of each priority bucket are read (overdue cards by due date,
+cards due today by difficulty), with chapter titles joined into the same
+query, and the buckets are interleaved while rows are streamed.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..models.document import Chapter
+from ..models.knowledge import Knowledge
+from ..models.learning import SRS, Card
+
+# Rows fetched per round trip while streaming a bucket
+STREAM_BATCH_SIZE = 100
+
+
+@dataclass
+class ReviewCard:
+    """Card data for review session"""
+    srs_id: str
+    card_id: str
+    card_type: str
+    front: str
+    back: str
+    difficulty: float
+    due_date: datetime
+    days_overdue: int
+    metadata: dict
+    knowledge_text: Optional[str] = None
+    chapter_title: Optional[str] = None
+
+
+class ReviewQueueBuilder:
+    """Builds prioritized review queues from the SRS table"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def card_query(self):
+        """Projection of everything a ReviewCard needs, in one query"""
+        return (
+            self.db.query(
+                SRS.id.label('srs_id'),
+                SRS.due_date,
+                Card.id.label('card_id'),
+                Card.card_type,
+                Card.front,
+                Card.back,
+                Card.difficulty,
+                Card.card_metadata,
+                Knowledge.text.label('knowledge_text'),
+                Chapter.title.label('chapter_title')
+            )
+            .join(Card, SRS.card_id == Card.id)
+            .join(Knowledge, Card.knowledge_id == Knowledge.id)
+            .outerjoin(Chapter, Knowledge.chapter_id == Chapter.id)
+        )
+
+    @staticmethod
+    def to_review_card(row, now: datetime) -> ReviewCard:
+        """Build a ReviewCard from a ``card_query`` row"""
+        return ReviewCard(
+            srs_id=str(row.srs_id),
+            card_id=str(row.card_id),
+            card_type=row.card_type.value,
+            front=row.front,
+            back=row.back,
+            difficulty=row.difficulty,
+            due_date=row.due_date,
+            days_overdue=max(0, (now.date() - row.due_date.date()).days),
+            metadata=row.card_metadata or {},
+            knowledge_text=row.knowledge_text,
+            chapter_title=row.chapter_title
+        )
+
+    def iter_review_cards(
+        self,
+        user_id: Optional[str] = None,
+        max_cards: int = 50,
+        prioritize_overdue: bool = True,
+        now: Optional[datetime] = None
+    ) -> Iterator[ReviewCard]:
+        """
+        Stream the review queue in review order
+
+        Overdue cards (most overdue first) are interleaved 2:1 with cards
+        due today (easiest first), or put before them when
+        ``prioritize_overdue`` is off. At most ``max_cards`` rows of each
+        bucket are read.
+        """
+        now = now or datetime.utcnow()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        query = self.card_query()
+        if user_id:
+            query = query.filter(SRS.user_id == user_id)
+
+        overdue = (
+            query.filter(SRS.due_date < today)
+            .order_by(SRS.due_date.asc(), Card.difficulty.asc())
+        )
+        due_today = (
+            query.filter(SRS.due_date >= today, SRS.due_date <= now)
+            .order_by(Card.difficulty.asc(), SRS.due_date.asc())
+        )
+
+        overdue_cards = self._stream(overdue, max_cards, now)
+        due_today_cards = self._stream(due_today, max_cards, now)
+
+        if prioritize_overdue:
+            cards = self.interleave(overdue_cards, due_today_cards)
+        else:
+            cards = self.chain(overdue_cards, due_today_cards)
+        return islice(cards, max_cards)
+
+    def build(
+        self,
+        user_id: Optional[str] = None,
+        max_cards: int = 50,
+        prioritize_overdue: bool = True,
+        now: Optional[datetime] = None
+    ) -> List[ReviewCard]:
+        """Get the review queue as a list"""
+        return list(self.iter_review_cards(user_id, max_cards, prioritize_overdue, now))
+
+    def _stream(self, query, limit: int, now: datetime) -> Iterator[ReviewCard]:
+        for row in query.limit(limit).yield_per(STREAM_BATCH_SIZE):
+            yield self.to_review_card(row, now)
+
+    @staticmethod
+    def chain(first: Iterable[ReviewCard], second: Iterable[ReviewCard]) -> Iterator[ReviewCard]:
+        """All overdue cards, then the cards due today"""
+        yield from first
+        yield from second
+
+    @staticmethod
+    def interleave(overdue: Iterable[ReviewCard], due_today: Iterable[ReviewCard]) -> Iterator[ReviewCard]:
+        """Two overdue cards, then one card due today, until both run out"""
+        overdue = iter(overdue)
+        due_today = iter(due_today)
+        while True:
+            taken = 0
+            for card in islice(overdue, 2):
+                taken += 1
+                yield card
+            card = next(due_today, None)
+            if card is not None:
+                taken += 1
+                yield card
+            if not taken:
+                return
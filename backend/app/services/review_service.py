@@ -6,18 +6,22 @@ and review statistics for the spaced repetition system.
 """
 
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Union
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc
 from uuid import UUID, uuid4
 import logging
+import threading
 from dataclasses import dataclass
 from enum import Enum
 
-from ..models.learning import SRS, Card
-from ..models.knowledge import Knowledge
-from ..core.database import get_db
+from ..models.learning import SRS
+from ..core.config import settings
+from ..core.database import SessionLocal, get_db
 from .srs_service import SRSService
+from .review_queue import ReviewCard, ReviewQueueBuilder
+from .daily_review_queue import DailyReviewQueueService
+from .review_session_store import ReviewSessionState, ReviewSessionStore, get_review_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -30,22 +34,6 @@ class ReviewSessionStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
-class ReviewCard:
-    """Card data for review session"""
-    srs_id: str
-    card_id: str
-    card_type: str
-    front: str
-    back: str
-    difficulty: float
-    due_date: datetime
-    days_overdue: int
-    metadata: dict
-    knowledge_text: Optional[str] = None
-    chapter_title: Optional[str] = None
-
-
 @dataclass
 class ReviewSession:
     """Review session data"""
@@ -76,10 +64,17 @@ class ReviewStats:
 class ReviewService:
     """Service for managing daily reviews and scheduling"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        session_store: Optional[ReviewSessionStore] = None,
+        write_behind: Optional[bool] = None
+    ):
         self.db = db
         self.srs_service = SRSService(db)
-        self._active_sessions: Dict[str, ReviewSession] = {}
+        self.queue_builder = ReviewQueueBuilder(db)
+        self.session_store = session_store if session_store is not None else get_review_session_store()
+        self.write_behind = settings.review_write_behind if write_behind is None else write_behind
     
     def get_daily_review_cards(
         self, 
@@ -98,52 +93,21 @@ class ReviewService:
         Returns:
             List of ReviewCard objects optimized for review
         """
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Build base query
-        query = (
-            self.db.query(SRS, Card, Knowledge)
-            .join(Card, SRS.card_id == Card.id)
-            .join(Knowledge, Card.knowledge_id == Knowledge.id)
-            .filter(SRS.due_date <= now)
-        )
-        
-        # Filter by user if specified
-        if user_id:
-            query = query.filter(SRS.user_id == user_id)
-        
-        # Get all due cards
-        due_cards = query.all()
-        
-        if not due_cards:
-            return []
+        if settings.review_queue_precompute:
+            cards = DailyReviewQueueService(self.db).get_review_cards(user_id, max_cards, prioritize_overdue)
+            if cards is not None:
+                return cards
+        return self.queue_builder.build(user_id, max_cards, prioritize_overdue)
+    
+    def _load_review_cards(self, srs_ids: List[str]) -> Dict[str, ReviewCard]:
+        """Load the cards of a session by SRS ID in a single query"""
+        if not srs_ids:
+            return {}
         
-        # Convert to ReviewCard objects
-        review_cards = []
-        for srs, card, knowledge in due_cards:
-            days_overdue = max(0, (now.date() - srs.due_date.date()).days)
-            
-            review_card = ReviewCard(
-                srs_id=str(srs.id),
-                card_id=str(card.id),
-                card_type=card.card_type.value,
-                front=card.front,
-                back=card.back,
-                difficulty=card.difficulty,
-                due_date=srs.due_date,
-                days_overdue=days_overdue,
-                metadata=card.card_metadata or {},
-                knowledge_text=knowledge.text,
-                chapter_title=getattr(knowledge.chapter, 'title', None) if hasattr(knowledge, 'chapter') else None
-            )
-            review_cards.append(review_card)
-        
-        # Optimize card order
-        review_cards = self._optimize_review_queue(review_cards, prioritize_overdue)
-        
-        # Limit to max_cards
-        return review_cards[:max_cards]
+        now = datetime.utcnow()
+        rows = self.queue_builder.card_query().filter(SRS.id.in_(srs_ids)).all()
+        cards = (self.queue_builder.to_review_card(row, now) for row in rows)
+        return {card.srs_id: card for card in cards}
     
     def _optimize_review_queue(
         self, 
@@ -153,6 +117,9 @@ class ReviewService:
         """
         Optimize the order of cards for review
         
+        Orders an in-memory list the way ReviewQueueBuilder orders the
+        queue it selects in SQL.
+        
         Optimization strategy:
         1. Prioritize overdue cards (most overdue first)
         2. Interleave different card types to maintain engagement
@@ -173,25 +140,8 @@ class ReviewService:
         due_today.sort(key=lambda c: c.difficulty)
         
         if prioritize_overdue:
-            # Start with most overdue, then interleave with due today
-            optimized = []
-            overdue_idx = 0
-            due_idx = 0
-            
-            # Add overdue cards first (2:1 ratio with due today)
-            while overdue_idx < len(overdue_cards) or due_idx < len(due_today):
-                # Add 2 overdue cards
-                for _ in range(2):
-                    if overdue_idx < len(overdue_cards):
-                        optimized.append(overdue_cards[overdue_idx])
-                        overdue_idx += 1
-                
-                # Add 1 due today card
-                if due_idx < len(due_today):
-                    optimized.append(due_today[due_idx])
-                    due_idx += 1
-            
-            return optimized
+            # Start with most overdue, then interleave with due today (2:1)
+            return list(ReviewQueueBuilder.interleave(overdue_cards, due_today))
         else:
             # Simple concatenation: overdue first, then due today
             return overdue_cards + due_today
@@ -213,57 +163,74 @@ class ReviewService:
         """
         # Get cards for review
         cards = self.get_daily_review_cards(user_id, max_cards)
+        now = datetime.utcnow()
         
-        if not cards:
-            # Create empty session
-            session = ReviewSession(
-                session_id=str(uuid4()),
-                user_id=user_id,
-                status=ReviewSessionStatus.COMPLETED,
-                cards=[],
-                current_index=0,
-                total_cards=0,
-                completed_cards=0,
-                start_time=datetime.utcnow(),
-                end_time=datetime.utcnow(),
-                session_stats={}
-            )
-        else:
-            # Create active session
-            session = ReviewSession(
-                session_id=str(uuid4()),
-                user_id=user_id,
-                status=ReviewSessionStatus.ACTIVE,
-                cards=cards,
-                current_index=0,
-                total_cards=len(cards),
-                completed_cards=0,
-                start_time=datetime.utcnow(),
-                end_time=None,
-                session_stats={
-                    'grades': [],
-                    'response_times': [],
-                    'card_types_reviewed': {},
-                    'chapters_reviewed': set()
-                }
-            )
+        # Only the card IDs and the cursor are stored; an empty session is
+        # created completed
+        state = ReviewSessionState(
+            session_id=str(uuid4()),
+            user_id=user_id,
+            status=(ReviewSessionStatus.ACTIVE if cards else ReviewSessionStatus.COMPLETED).value,
+            srs_ids=[card.srs_id for card in cards],
+            start_time=now,
+            end_time=None if cards else now
+        )
+        
+        # Store session in the shared store so any worker can continue it
+        self.session_store.save(state)
         
-        # Store session in memory for concurrent access
-        self._active_sessions[session.session_id] = session
+        logger.info(f"Started review session {state.session_id} with {len(cards)} cards")
+        return self._to_review_session(state, cards)
+    
+    def get_session(self, session_id: str) -> Optional[ReviewSession]:
+        """Get a review session with its cards loaded"""
+        state = self.session_store.get(session_id)
+        if not state:
+            return None
         
-        logger.info(f"Started review session {session.session_id} with {len(cards)} cards")
-        return session
+        cards_by_id = self._load_review_cards(state.srs_ids)
+        cards = [cards_by_id[srs_id] for srs_id in state.srs_ids if srs_id in cards_by_id]
+        # Cards deleted since the session started are left out, so the cursor
+        # counts only the remaining cards before it
+        current_index = sum(1 for srs_id in state.srs_ids[:state.current_index] if srs_id in cards_by_id)
+        return self._to_review_session(state, cards, current_index)
+    
+    def _to_review_session(
+        self,
+        state: ReviewSessionState,
+        cards: List[ReviewCard],
+        current_index: Optional[int] = None
+    ) -> ReviewSession:
+        """Build the session view of stored session state"""
+        return ReviewSession(
+            session_id=state.session_id,
+            user_id=state.user_id,
+            status=ReviewSessionStatus(state.status),
+            cards=cards,
+            current_index=state.current_index if current_index is None else current_index,
+            total_cards=state.total_cards,
+            completed_cards=state.completed_cards,
+            start_time=state.start_time,
+            end_time=state.end_time,
+            session_stats={
+                'grades': state.grades,
+                'response_times': state.response_times,
+                'card_types_reviewed': state.card_types_reviewed,
+                'chapters_reviewed': set(state.chapters_reviewed)
+            }
+        )
     
     def get_current_card(self, session_id: str) -> Optional[ReviewCard]:
         """Get the current card in a review session"""
-        session = self._active_sessions.get(session_id)
-        if not session or session.status != ReviewSessionStatus.ACTIVE:
+        state = self.session_store.get(session_id)
+        if not state or state.status != ReviewSessionStatus.ACTIVE.value:
             return None
         
-        if session.current_index >= len(session.cards):
+        srs_id = state.current_srs_id
+        if srs_id is None:
             return None
         
-        return session.cards[session.current_index]
+        return self._load_review_cards([srs_id]).get(srs_id)
     
     def grade_current_card(
         self, 
@@ -274,6 +241,10 @@ class ReviewService:
         """
         Grade the current card in a review session
         
+        The session cursor is advanced in the store before the card is
+        graded, so concurrent requests for the same session can never grade
+        a card twice; if grading fails the cursor is moved back.
+        
         Args:
             session_id: Review session ID
             grade: Grade from 0-5
@@ -282,105 +253,207 @@ class ReviewService:
         Returns:
             Dictionary with grading result and next card info
         """
-        session = self._active_sessions.get(session_id)
-        if not session or session.status != ReviewSessionStatus.ACTIVE:
+        state = self.session_store.get(session_id)
+        if not state or state.status != ReviewSessionStatus.ACTIVE.value:
             raise ValueError(f"Invalid or inactive session: {session_id}")
         
-        if session.current_index >= len(session.cards):
+        if state.current_srs_id is None:
             raise ValueError("No more cards in session")
         
-        current_card = session.cards[session.current_index]
+        # Load the current and the next card together
+        upcoming_ids = state.srs_ids[state.current_index:state.current_index + 2]
+        cards_by_id = self._load_review_cards(upcoming_ids)
+        current_card = cards_by_id.get(upcoming_ids[0])
+        if current_card is None:
+            raise ValueError(f"Card of session {session_id} no longer exists")
+        
+        previous = ReviewSessionState.from_dict(state.to_dict())
+        
+        # With write-behind the grade is buffered in the session and the
+        # resulting schedule is only computed for the response
+        if self.write_behind:
+            reviewed_at = datetime.utcnow()
+            try:
+                updated_srs = self.srs_service.preview_grade(current_card.srs_id, grade, reviewed_at)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+            state.pending_grades.append({
+                'srs_id': current_card.srs_id,
+                'grade': grade,
+                'reviewed_at': reviewed_at.isoformat()
+            })
+        
+        # Update session statistics
+        state.grades.append(grade)
+        if response_time_ms:
+            state.response_times.append(response_time_ms)
+        
+        # Track card types and chapters
+        card_type = current_card.card_type
+        state.card_types_reviewed[card_type] = state.card_types_reviewed.get(card_type, 0) + 1
+        if current_card.chapter_title and current_card.chapter_title not in state.chapters_reviewed:
+            state.chapters_reviewed.append(current_card.chapter_title)
+        
+        # Move to next card
+        state.current_index += 1
+        state.completed_cards += 1
+        
+        # Check if session is complete
+        if state.current_srs_id is None:
+            state.status = ReviewSessionStatus.COMPLETED.value
+            state.end_time = datetime.utcnow()
+        
+        if not self.session_store.save(state):
+            raise ValueError(f"Session {session_id} was updated concurrently, current card already graded")
+        
+        if self.write_behind:
+            if state.is_ended or self._flush_due(state):
+                self.flush_pending_grades(session_id)
+        else:
+            # Grade the card using SRS service
+            try:
+                updated_srs = self.srs_service.grade_card(current_card.srs_id, grade)
+            except Exception as e:
+                logger.error(f"Error grading card in session {session_id}: {e}")
+                previous.version = state.version
+                if not self.session_store.save(previous):
+                    logger.error(f"Could not restore review session {session_id} after failed grade")
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
         
-        # Grade the card using SRS service
-        try:
-            updated_srs = self.srs_service.grade_card(current_card.srs_id, grade)
-            
-            # Update session statistics
-            session.session_stats['grades'].append(grade)
-            if response_time_ms:
-                session.session_stats['response_times'].append(response_time_ms)
-            
-            # Track card types and chapters
-            card_type = current_card.card_type
-            session.session_stats['card_types_reviewed'][card_type] = \
-                session.session_stats['card_types_reviewed'].get(card_type, 0) + 1
-            
-            if current_card.chapter_title:
-                session.session_stats['chapters_reviewed'].add(current_card.chapter_title)
-            
-            # Move to next card
-            session.current_index += 1
-            session.completed_cards += 1
-            
-            # Check if session is complete
-            if session.current_index >= len(session.cards):
-                session.status = ReviewSessionStatus.COMPLETED
-                session.end_time = datetime.utcnow()
-                logger.info(f"Completed review session {session_id}")
-            
-            # Prepare response
-            result = {
-                'success': True,
-                'graded_card': {
-                    'card_id': current_card.card_id,
-                    'grade': grade,
-                    'new_due_date': updated_srs.due_date.isoformat(),
-                    'new_interval': updated_srs.interval,
-                    'ease_factor': updated_srs.ease_factor
-                },
-                'session_progress': {
-                    'completed': session.completed_cards,
-                    'total': session.total_cards,
-                    'remaining': session.total_cards - session.completed_cards,
-                    'progress_percent': round((session.completed_cards / session.total_cards) * 100, 1)
-                },
-                'next_card': None,
-                'session_complete': session.status == ReviewSessionStatus.COMPLETED
+        if state.status == ReviewSessionStatus.COMPLETED.value:
+            logger.info(f"Completed review session {session_id}")
+        
+        # Prepare response
+        result = {
+            'success': True,
+            'graded_card': {
+                'card_id': current_card.card_id,
+                'grade': grade,
+                'new_due_date': updated_srs.due_date.isoformat(),
+                'new_interval': updated_srs.interval,
+                'ease_factor': updated_srs.ease_factor,
+                'pending': self.write_behind
+            },
+            'session_progress': {
+                'completed': state.completed_cards,
+                'total': state.total_cards,
+                'remaining': state.total_cards - state.completed_cards,
+                'progress_percent': round((state.completed_cards / state.total_cards) * 100, 1)
+            },
+            'next_card': None,
+            'session_complete': state.status == ReviewSessionStatus.COMPLETED.value
+        }
+        
+        # Add next card info if available
+        next_card = cards_by_id.get(state.current_srs_id) if state.current_srs_id else None
+        if next_card:
+            result['next_card'] = {
+                'card_id': next_card.card_id,
+                'card_type': next_card.card_type,
+                'front': next_card.front,
+                'difficulty': next_card.difficulty,
+                'days_overdue': next_card.days_overdue
             }
+        
+        return result
+    
+    def _flush_due(self, state: ReviewSessionState) -> bool:
+        """Whether buffered grades should be written now"""
+        if not state.pending_grades:
+            return False
+        if len(state.pending_grades) >= settings.review_flush_max_pending:
+            return True
+        oldest = datetime.fromisoformat(state.pending_grades[0]['reviewed_at'])
+        return (datetime.utcnow() - oldest).total_seconds() >= settings.review_flush_interval_seconds
+    
+    def flush_pending_grades(self, session_id: str) -> int:
+        """
+        Write the buffered grades of a session in one batch
+        
+        Buffered grades carry their review time, so a batch that was written
+        but not removed from the session (e.g. after a concurrent update) is
+        skipped by the SRS service when it is flushed again.
+        
+        Returns:
+            Number of grades written
+        """
+        for _ in range(3):
+            state = self.session_store.get(session_id)
+            if not state or not state.pending_grades:
+                return 0
             
-            # Add next card info if available
-            if session.current_index < len(session.cards):
-                next_card = session.cards[session.current_index]
-                result['next_card'] = {
-                    'card_id': next_card.card_id,
-                    'card_type': next_card.card_type,
-                    'front': next_card.front,
-                    'difficulty': next_card.difficulty,
-                    'days_overdue': next_card.days_overdue
+            pending = state.pending_grades
+            self.srs_service.grade_cards_batch([
+                {
+                    'srs_id': entry['srs_id'],
+                    'grade': entry['grade'],
+                    'reviewed_at': datetime.fromisoformat(entry['reviewed_at'])
                 }
+                for entry in pending
+            ])
             
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error grading card in session {session_id}: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            state.pending_grades = []
+            if self.session_store.save(state):
+                logger.info(f"Flushed {len(pending)} buffered grades of review session {session_id}")
+                return len(pending)
+        
+        logger.warning(f"Buffered grades of review session {session_id} written but still pending")
+        return len(pending)
+    
+    def flush_due_sessions(self, include_recent: bool = False) -> int:
+        """
+        Write the buffered grades of all sessions whose oldest grade is due
+        
+        Grades are otherwise only flushed by the next grade of their session,
+        so those of abandoned sessions would never be written. With
+        ``include_recent`` every buffered grade is written, e.g. at shutdown.
+        
+        Returns:
+            Number of grades written
+        """
+        cutoff = None
+        if not include_recent:
+            cutoff = datetime.utcnow() - timedelta(seconds=settings.review_flush_interval_seconds)
+        
+        flushed = 0
+        for session_id in self.session_store.pending_sessions(cutoff):
+            try:
+                flushed += self.flush_pending_grades(session_id)
+            except Exception as e:
+                logger.error(f"Error flushing buffered grades of review session {session_id}: {e}")
+                self.db.rollback()
+        return flushed
     
     def get_session_progress(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get progress information for a review session"""
-        session = self._active_sessions.get(session_id)
-        if not session:
+        state = self.session_store.get(session_id)
+        if not state:
             return None
         
         # Calculate session statistics
-        grades = session.session_stats.get('grades', [])
-        response_times = session.session_stats.get('response_times', [])
+        grades = state.grades
+        response_times = state.response_times
         
         stats = {
             'session_id': session_id,
-            'status': session.status.value,
+            'status': state.status,
             'progress': {
-                'completed': session.completed_cards,
-                'total': session.total_cards,
-                'remaining': session.total_cards - session.completed_cards,
-                'progress_percent': round((session.completed_cards / session.total_cards) * 100, 1) if session.total_cards > 0 else 100
+                'completed': state.completed_cards,
+                'total': state.total_cards,
+                'remaining': state.total_cards - state.completed_cards,
+                'progress_percent': round((state.completed_cards / state.total_cards) * 100, 1) if state.total_cards > 0 else 100,
+                'pending_grades': len(state.pending_grades)
             },
             'timing': {
-                'start_time': session.start_time.isoformat(),
-                'end_time': session.end_time.isoformat() if session.end_time else None,
-                'duration_minutes': self._calculate_session_duration(session)
+                'start_time': state.start_time.isoformat(),
+                'end_time': state.end_time.isoformat() if state.end_time else None,
+                'duration_minutes': self._calculate_session_duration(state)
             },
             'performance': {
                 'average_grade': round(sum(grades) / len(grades), 2) if grades else 0,
@@ -389,47 +462,62 @@ class ReviewService:
                 'average_response_time_ms': round(sum(response_times) / len(response_times)) if response_times else 0
             },
             'content': {
-                'card_types_reviewed': session.session_stats.get('card_types_reviewed', {}),
-                'chapters_reviewed': list(session.session_stats.get('chapters_reviewed', set()))
+                'card_types_reviewed': state.card_types_reviewed,
+                'chapters_reviewed': list(state.chapters_reviewed)
             }
         }
         
         return stats
     
-    def _calculate_session_duration(self, session: ReviewSession) -> float:
+    def _calculate_session_duration(self, session: Union[ReviewSession, ReviewSessionState]) -> float:
         """Calculate session duration in minutes"""
         end_time = session.end_time or datetime.utcnow()
         duration = end_time - session.start_time
         return round(duration.total_seconds() / 60, 1)
     
+    def _transition(
+        self,
+        session_id: str,
+        from_statuses: Tuple[ReviewSessionStatus, ...],
+        to_status: ReviewSessionStatus
+    ) -> bool:
+        """Change the status of a stored session if it is in one of ``from_statuses``"""
+        state = self.session_store.get(session_id)
+        if not state or state.status not in {status.value for status in from_statuses}:
+            return False
+        
+        state.status = to_status.value
+        if state.is_ended:
+            state.end_time = datetime.utcnow()
+        if not self.session_store.save(state):
+            return False
+        
+        # Buffered grades are written whenever a session stops
+        if to_status != ReviewSessionStatus.ACTIVE:
+            self.flush_pending_grades(session_id)
+        return True
+    
     def pause_session(self, session_id: str) -> bool:
         """Pause a review session"""
-        session = self._active_sessions.get(session_id)
-        if not session or session.status != ReviewSessionStatus.ACTIVE:
+        if not self._transition(session_id, (ReviewSessionStatus.ACTIVE,), ReviewSessionStatus.PAUSED):
             return False
         
-        session.status = ReviewSessionStatus.PAUSED
         logger.info(f"Paused review session {session_id}")
         return True
     
     def resume_session(self, session_id: str) -> bool:
         """Resume a paused review session"""
-        session = self._active_sessions.get(session_id)
-        if not session or session.status != ReviewSessionStatus.PAUSED:
+        if not self._transition(session_id, (ReviewSessionStatus.PAUSED,), ReviewSessionStatus.ACTIVE):
             return False
         
-        session.status = ReviewSessionStatus.ACTIVE
         logger.info(f"Resumed review session {session_id}")
         return True
     
     def cancel_session(self, session_id: str) -> bool:
         """Cancel a review session"""
-        session = self._active_sessions.get(session_id)
-        if not session:
+        if not self._transition(session_id, tuple(ReviewSessionStatus), ReviewSessionStatus.CANCELLED):
             return False
         
-        session.status = ReviewSessionStatus.CANCELLED
-        session.end_time = datetime.utcnow()
         logger.info(f"Cancelled review session {session_id}")
         return True
     
@@ -437,55 +525,57 @@ class ReviewService:
         """
         Get comprehensive daily review statistics
         
+        The SRS statistics, today's grades and the upcoming-days histogram
+        are all computed by one aggregate query.
+        
         Returns:
             Dictionary with daily review statistics
         """
         now = datetime.utcnow()
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        count_where = self.srs_service.count_where
         
-        # Get basic SRS statistics
-        srs_stats = self.srs_service.get_review_statistics(user_id)
-        
-        # Get additional review-specific statistics
-        query = self.db.query(SRS)
-        if user_id:
-            query = query.filter(SRS.user_id == user_id)
+        # Cards reviewed today, by grade
+        reviewed_today = and_(
+            SRS.last_reviewed >= today,
+            SRS.last_reviewed < today + timedelta(days=1)
+        )
+        columns = [count_where(reviewed_today).label('reviewed_today')]
+        columns += [
+            count_where(and_(reviewed_today, SRS.last_grade == grade)).label(f'grade_{grade}')
+            for grade in range(6)
+        ]
         
-        # Cards reviewed today
-        reviewed_today = query.filter(
-            and_(
-                SRS.last_reviewed >= today,
-                SRS.last_reviewed < today + timedelta(days=1)
-            )
-        ).all()
+        # Upcoming reviews (next 7 days)
+        upcoming = and_(SRS.due_date > now, SRS.due_date <= now + timedelta(days=7))
+        columns += [
+            count_where(and_(
+                upcoming,
+                SRS.due_date >= now + timedelta(days=i),
+                SRS.due_date < now + timedelta(days=i + 1)
+            )).label(f'day_{i}')
+            for i in range(1, 8)
+        ]
+        
+        row = self.srs_service.aggregate_review_statistics(user_id, extra_columns=columns, now=now)
+        srs_stats = self.srs_service.format_review_statistics(row)
         
         # Calculate review performance
-        today_grades = [srs.last_grade for srs in reviewed_today if srs.last_grade is not None]
+        grade_counts = {grade: int(getattr(row, f'grade_{grade}')) for grade in range(6)}
+        graded = sum(grade_counts.values())
+        grade_total = sum(grade * count for grade, count in grade_counts.items())
+        correct = sum(count for grade, count in grade_counts.items() if grade >= 3)
         
-        # Upcoming reviews (next 7 days)
-        upcoming_query = query.filter(
-            and_(
-                SRS.due_date > now,
-                SRS.due_date <= now + timedelta(days=7)
-            )
-        )
-        upcoming_by_day = {}
-        for i in range(1, 8):
-            day_start = now + timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            day_count = upcoming_query.filter(
-                and_(SRS.due_date >= day_start, SRS.due_date < day_end)
-            ).count()
-            upcoming_by_day[f"day_{i}"] = day_count
+        upcoming_by_day = {f"day_{i}": int(getattr(row, f'day_{i}')) for i in range(1, 8)}
         
         # Combine all statistics
         daily_stats = {
             **srs_stats,
             'today_performance': {
-                'cards_reviewed': len(reviewed_today),
-                'average_grade': round(sum(today_grades) / len(today_grades), 2) if today_grades else 0,
-                'accuracy': round(sum(1 for g in today_grades if g >= 3) / len(today_grades) * 100, 1) if today_grades else 0,
-                'grade_distribution': {str(i): today_grades.count(i) for i in range(6)}
+                'cards_reviewed': int(row.reviewed_today),
+                'average_grade': round(grade_total / graded, 2) if graded else 0,
+                'accuracy': round(correct / graded * 100, 1) if graded else 0,
+                'grade_distribution': {str(grade): count for grade, count in grade_counts.items()}
             },
             'upcoming_reviews': {
                 'next_7_days': sum(upcoming_by_day.values()),
@@ -523,15 +613,66 @@ class ReviewService:
             Number of sessions cleaned up
         """
         cutoff_time = datetime.utcnow() - timedelta(hours=hours_old)
+        removed = self.session_store.cleanup_ended(cutoff_time)
         
-        sessions_to_remove = []
-        for session_id, session in self._active_sessions.items():
-            if (session.status in [ReviewSessionStatus.COMPLETED, ReviewSessionStatus.CANCELLED] and
-                session.end_time and session.end_time < cutoff_time):
-                sessions_to_remove.append(session_id)
-        
-        for session_id in sessions_to_remove:
-            del self._active_sessions[session_id]
-        
-        logger.info(f"Cleaned up {len(sessions_to_remove)} old review sessions")
-        return len(sessions_to_remove)
\ No newline at end of file
+        logger.info(f"Cleaned up {removed} old review sessions")
+        return removed
+
+
+class PendingGradeFlusher:
+    """
+    Background thread writing buffered grades no request flushes
+    
+    Checks every half flush interval, so a buffered grade is written at most
+    one and a half intervals after it was given. Stopping writes all grades
+    still buffered.
+    """
+    
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        session_store: Optional[ReviewSessionStore] = None,
+        interval_seconds: Optional[float] = None
+    ):
+        self.session_factory = session_factory
+        self.session_store = session_store
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Start flushing in the background"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="review-grade-flusher", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> int:
+        """Stop the thread and write every buffered grade; returns the number written"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.flush(include_recent=True)
+    
+    def flush(self, include_recent: bool = False) -> int:
+        """Write the due buffered grades once"""
+        db = self.session_factory()
+        try:
+            service = ReviewService(db, session_store=self.session_store, write_behind=True)
+            return service.flush_due_sessions(include_recent)
+        except Exception as e:
+            logger.error(f"Error flushing buffered review grades: {e}")
+            return 0
+        finally:
+            db.close()
+    
+    def _run(self) -> None:
+        interval = self.interval_seconds or settings.review_flush_interval_seconds
+        while not self._stop.wait(max(interval / 2, 0.1)):
+            self.flush()
+
+
+# Flusher of the API process, started when write-behind grading is enabled
+pending_grade_flusher = PendingGradeFlusher()
@@ -0,0 +1,409 @@
+"""
+Review session storage
+
+Review sessions are kept in a store shared by all requests (and, with the
+Redis or SQLite store, by all API worker processes), so a session started by
+one request can be continued by any other without sticky routing. Only
+compact state is stored: the SRS record IDs of the session's cards, the
+cursor and running statistics. Card content is loaded from the database when
+needed.
+
+Saves are compare-and-set on a version number, so two requests racing on the
+same session cannot both advance it.
+
+Sessions holding buffered (write-behind) grades are indexed by the review
+time of their oldest buffered grade, so a background flusher can find them,
+and are neither evicted nor expired until the grades have been written.
+"""
+
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ENDED_STATUSES = ("completed", "cancelled")
+
+
+@dataclass
+class ReviewSessionState:
+    """Compact, serializable state of a review session"""
+    session_id: str
+    user_id: Optional[str]
+    status: str
+    srs_ids: List[str]
+    start_time: datetime
+    current_index: int = 0
+    completed_cards: int = 0
+    end_time: Optional[datetime] = None
+    grades: List[int] = field(default_factory=list)
+    response_times: List[int] = field(default_factory=list)
+    card_types_reviewed: Dict[str, int] = field(default_factory=dict)
+    chapters_reviewed: List[str] = field(default_factory=list)
+    pending_grades: List[Dict[str, Any]] = field(default_factory=list)
+    version: int = 0
+
+    @property
+    def total_cards(self) -> int:
+        return len(self.srs_ids)
+
+    @property
+    def is_ended(self) -> bool:
+        return self.status in ENDED_STATUSES
+
+    @property
+    def pending_since(self) -> Optional[float]:
+        """Timestamp of the oldest buffered grade, None when nothing is buffered"""
+        if not self.pending_grades:
+            return None
+        return min(datetime.fromisoformat(entry["reviewed_at"]) for entry in self.pending_grades).timestamp()
+
+    @property
+    def current_srs_id(self) -> Optional[str]:
+        if self.current_index < len(self.srs_ids):
+            return self.srs_ids[self.current_index]
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["start_time"] = self.start_time.isoformat()
+        data["end_time"] = self.end_time.isoformat() if self.end_time else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ReviewSessionState":
+        data = dict(data)
+        data["start_time"] = datetime.fromisoformat(data["start_time"])
+        data["end_time"] = datetime.fromisoformat(data["end_time"]) if data.get("end_time") else None
+        return cls(**data)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: Union[str, bytes]) -> "ReviewSessionState":
+        return cls.from_dict(json.loads(payload))
+
+
+class ReviewSessionStore(ABC):
+    """Interface of review session stores"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ReviewSessionState]:
+        """Load a session, or None if it does not exist or expired"""
+        pass
+
+    @abstractmethod
+    def save(self, state: ReviewSessionState) -> bool:
+        """
+        Store a session if it was not changed since it was loaded.
+
+        Returns False when the stored version differs from ``state.version``
+        (or the session expired); on success the version is incremented.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session"""
+        pass
+
+    @abstractmethod
+    def cleanup_ended(self, cutoff: datetime) -> int:
+        """Remove completed or cancelled sessions that ended before ``cutoff``"""
+        pass
+
+    @abstractmethod
+    def pending_sessions(self, reviewed_before: Optional[datetime] = None) -> List[str]:
+        """IDs of sessions with buffered grades reviewed before ``reviewed_before`` (any when None)"""
+        pass
+
+
+class InMemoryReviewSessionStore(ReviewSessionStore):
+    """
+    Process-local store for single-worker deployments and tests.
+
+    Least recently used sessions are evicted beyond ``max_sessions``, idle
+    sessions expire after ``ttl_seconds``, and ended sessions are indexed by
+    end time so cleanup does not scan every session. Sessions with buffered
+    grades are skipped by eviction, expiry and cleanup.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: int = 24 * 60 * 60):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires_at, state dict)
+        self._ended: List[tuple] = []  # heap of (end timestamp, session id)
+        self._pending: Dict[str, float] = {}  # id -> timestamp of the oldest buffered grade
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[ReviewSessionState]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.monotonic() and session_id not in self._pending:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return ReviewSessionState.from_dict(data)
+
+    def save(self, state: ReviewSessionState) -> bool:
+        with self._lock:
+            entry = self._sessions.get(state.session_id)
+            stored_version = entry[1]["version"] if entry else 0
+            if stored_version != state.version or (entry is None and state.version > 0):
+                return False
+
+            state.version += 1
+            self._sessions[state.session_id] = (time.monotonic() + self.ttl_seconds, state.to_dict())
+            self._sessions.move_to_end(state.session_id)
+            if state.is_ended and state.end_time:
+                heapq.heappush(self._ended, (state.end_time.timestamp(), state.session_id))
+            if state.pending_grades:
+                self._pending[state.session_id] = state.pending_since
+            else:
+                self._pending.pop(state.session_id, None)
+
+            excess = len(self._sessions) - self.max_sessions
+            if excess > 0:
+                evicted = []
+                for session_id in self._sessions:
+                    if len(evicted) == excess:
+                        break
+                    if session_id not in self._pending:
+                        evicted.append(session_id)
+                for session_id in evicted:
+                    del self._sessions[session_id]
+            return True
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            self._pending.pop(session_id, None)
+            return self._sessions.pop(session_id, None) is not None
+
+    def cleanup_ended(self, cutoff: datetime) -> int:
+        cutoff_ts = cutoff.timestamp()
+        removed = 0
+        with self._lock:
+            while self._ended and self._ended[0][0] < cutoff_ts:
+                end_ts, session_id = heapq.heappop(self._ended)
+                entry = self._sessions.get(session_id)
+                if entry is None or session_id in self._pending:
+                    continue
+                data = entry[1]
+                # Skip stale index entries of sessions that were changed later
+                end_time = data.get("end_time")
+                if data["status"] in ENDED_STATUSES and end_time and \
+                        datetime.fromisoformat(end_time).timestamp() == end_ts:
+                    del self._sessions[session_id]
+                    removed += 1
+        return removed
+
+    def pending_sessions(self, reviewed_before: Optional[datetime] = None) -> List[str]:
+        cutoff = reviewed_before.timestamp() if reviewed_before else float("inf")
+        with self._lock:
+            return [session_id for session_id, since in self._pending.items() if since <= cutoff]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class RedisReviewSessionStore(ReviewSessionStore):
+    """
+    Store shared by all API workers through Redis (or a compatible client).
+
+    Sessions are JSON strings with a TTL; ended sessions are indexed in a
+    sorted set by end time for cleanup, and sessions with buffered grades in
+    another one by the time of their oldest grade. The latter have no TTL.
+    """
+
+    def __init__(self, redis_conn, ttl_seconds: int = 24 * 60 * 60, key_prefix: str = "review_session:"):
+        self.redis_conn = redis_conn
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.ended_key = f"{key_prefix}ended"
+        self.pending_key = f"{key_prefix}pending"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    def get(self, session_id: str) -> Optional[ReviewSessionState]:
+        payload = self.redis_conn.get(self._key(session_id))
+        return ReviewSessionState.from_json(payload) if payload else None
+
+    def save(self, state: ReviewSessionState) -> bool:
+        from redis.exceptions import WatchError
+
+        key = self._key(state.session_id)
+        with self.redis_conn.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                stored_version = json.loads(current)["version"] if current else 0
+                if stored_version != state.version or (current is None and state.version > 0):
+                    pipe.unwatch()
+                    return False
+
+                payload = ReviewSessionState.from_dict({**state.to_dict(), "version": state.version + 1})
+                pipe.multi()
+                if state.pending_grades:
+                    pipe.set(key, payload.to_json())
+                    pipe.zadd(self.pending_key, {state.session_id: state.pending_since})
+                else:
+                    pipe.set(key, payload.to_json(), ex=self.ttl_seconds)
+                    pipe.zrem(self.pending_key, state.session_id)
+                if state.is_ended and state.end_time:
+                    pipe.zadd(self.ended_key, {state.session_id: state.end_time.timestamp()})
+                pipe.execute()
+            except WatchError:
+                return False
+
+        state.version += 1
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        self.redis_conn.zrem(self.ended_key, session_id)
+        self.redis_conn.zrem(self.pending_key, session_id)
+        return bool(self.redis_conn.delete(self._key(session_id)))
+
+    def cleanup_ended(self, cutoff: datetime) -> int:
+        session_ids = self._decode(self.redis_conn.zrangebyscore(self.ended_key, "-inf", cutoff.timestamp()))
+        pending = set(self.pending_sessions())
+        session_ids = [sid for sid in session_ids if sid not in pending]
+        if not session_ids:
+            return 0
+        removed = self.redis_conn.delete(*[self._key(sid) for sid in session_ids])
+        self.redis_conn.zrem(self.ended_key, *session_ids)
+        return int(removed)
+
+    def pending_sessions(self, reviewed_before: Optional[datetime] = None) -> List[str]:
+        cutoff = reviewed_before.timestamp() if reviewed_before else "+inf"
+        return self._decode(self.redis_conn.zrangebyscore(self.pending_key, "-inf", cutoff))
+
+    @staticmethod
+    def _decode(session_ids: List[Union[str, bytes]]) -> List[str]:
+        return [sid.decode() if isinstance(sid, bytes) else sid for sid in session_ids]
+
+
+class SQLiteReviewSessionStore(ReviewSessionStore):
+    """Store shared by API workers on one node through a SQLite file"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS review_sessions (
+        session_id TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        ended_at REAL,
+        expires_at REAL NOT NULL,
+        pending_since REAL
+    );
+    CREATE INDEX IF NOT EXISTS ix_review_sessions_ended_at ON review_sessions (ended_at);
+    CREATE INDEX IF NOT EXISTS ix_review_sessions_expires_at ON review_sessions (expires_at);
+    CREATE INDEX IF NOT EXISTS ix_review_sessions_pending_since ON review_sessions (pending_since);
+    """
+    # Sessions with buffered grades do not expire
+    LIVE = "(expires_at > ? OR pending_since IS NOT NULL)"
+
+    def __init__(self, path: Union[str, Path], ttl_seconds: int = 24 * 60 * 60):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id: str) -> Optional[ReviewSessionState]:
+        row = self.connection.execute(
+            f"SELECT state FROM review_sessions WHERE session_id = ? AND {self.LIVE}",
+            (session_id, time.time())
+        ).fetchone()
+        return ReviewSessionState.from_json(row[0]) if row else None
+
+    def save(self, state: ReviewSessionState) -> bool:
+        payload = ReviewSessionState.from_dict({**state.to_dict(), "version": state.version + 1})
+        ended_at = state.end_time.timestamp() if state.is_ended and state.end_time else None
+        expires_at = time.time() + self.ttl_seconds
+
+        if state.version == 0:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO review_sessions "
+                "(session_id, state, version, ended_at, expires_at, pending_since) VALUES (?, ?, 1, ?, ?, ?)",
+                (state.session_id, payload.to_json(), ended_at, expires_at, state.pending_since)
+            )
+        else:
+            cursor = self.connection.execute(
+                "UPDATE review_sessions SET state = ?, version = version + 1, ended_at = ?, expires_at = ?, "
+                f"pending_since = ? WHERE session_id = ? AND version = ? AND {self.LIVE}",
+                (payload.to_json(), ended_at, expires_at, state.pending_since,
+                 state.session_id, state.version, time.time())
+            )
+
+        if cursor.rowcount != 1:
+            return False
+        state.version += 1
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        cursor = self.connection.execute("DELETE FROM review_sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def cleanup_ended(self, cutoff: datetime) -> int:
+        cursor = self.connection.execute(
+            "DELETE FROM review_sessions WHERE ended_at < ? AND pending_since IS NULL", (cutoff.timestamp(),)
+        )
+        self.connection.execute(
+            "DELETE FROM review_sessions WHERE expires_at <= ? AND pending_since IS NULL", (time.time(),)
+        )
+        return cursor.rowcount
+
+    def pending_sessions(self, reviewed_before: Optional[datetime] = None) -> List[str]:
+        cutoff = reviewed_before.timestamp() if reviewed_before else float("inf")
+        rows = self.connection.execute(
+            "SELECT session_id FROM review_sessions WHERE pending_since <= ?", (cutoff,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+_store: Optional[ReviewSessionStore] = None
+
+
+def get_review_session_store() -> ReviewSessionStore:
+    """Get the configured review session store of this process"""
+    global _store
+    if _store is None:
+        backend = settings.review_session_store
+        ttl_seconds = settings.review_session_ttl_hours * 60 * 60
+
+        if backend == "redis":
+            import redis
+            _store = RedisReviewSessionStore(redis.from_url(settings.redis_url), ttl_seconds=ttl_seconds)
+        elif backend == "sqlite":
+            _store = SQLiteReviewSessionStore(settings.review_session_path, ttl_seconds=ttl_seconds)
+        else:
+            _store = InMemoryReviewSessionStore(ttl_seconds=ttl_seconds)
+
+        logger.info(f"Using {backend} review session store")
+    return _store
@@ -0,0 +1,274 @@
+"""
+Columnar spaced repetition scheduling
+
+Schedulers update whole decks at once: SRS state is held as NumPy arrays
+(ease factor, interval, repetitions, due date) and a review is applied to
+every selected card in one vectorized step. Used for bulk grading and
+rescheduling, replaying imported review histories and workload forecasts.
+
+Algorithms are registered by name with ``register_scheduler``; the one
+used by the services, for single and bulk grading alike, is chosen with
+the ``srs_scheduler`` setting. SM-2 is the only algorithm shipped; others
+such as FSRS plug in by subclassing ``Scheduler``.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+import numpy as np
+
+from ..core.config import settings
+
+# Datetimes are kept at microsecond resolution, like the database columns
+DATETIME_DTYPE = "datetime64[us]"
+ONE_DAY = np.timedelta64(1, "D")
+
+# Grade distribution assumed by forecasts when a deck has no review history
+DEFAULT_GRADE_PROBABILITIES = (0.02, 0.03, 0.05, 0.20, 0.40, 0.30)
+
+
+def to_datetime64(values: Sequence[Optional[datetime]]) -> np.ndarray:
+    """Naive UTC datetimes (None for missing) as a datetime64 array"""
+    return np.array(values, dtype=DATETIME_DTYPE)
+
+
+@dataclass
+class ScheduleState:
+    """SRS state of many cards, one array element per card"""
+    ease_factor: np.ndarray  # float64
+    interval: np.ndarray  # int64, days
+    repetitions: np.ndarray  # int64
+    due_date: np.ndarray  # datetime64[us]
+    last_reviewed: np.ndarray  # datetime64[us], NaT when never reviewed
+    last_grade: np.ndarray  # int64, -1 when never graded
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Any]) -> "ScheduleState":
+        """Build the state from SRS rows or objects"""
+        return cls(
+            ease_factor=np.array([row.ease_factor for row in rows], dtype=np.float64),
+            interval=np.array([row.interval for row in rows], dtype=np.int64),
+            repetitions=np.array([row.repetitions for row in rows], dtype=np.int64),
+            due_date=to_datetime64([row.due_date for row in rows]),
+            last_reviewed=to_datetime64([row.last_reviewed for row in rows]),
+            last_grade=np.array(
+                [-1 if row.last_grade is None else row.last_grade for row in rows], dtype=np.int64
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.ease_factor)
+
+    def take(self, index: np.ndarray) -> "ScheduleState":
+        """Copy of the state of the selected cards"""
+        return ScheduleState(**{field.name: getattr(self, field.name)[index] for field in fields(self)})
+
+    def to_mappings(self, ids: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Parameter sets of a bulk UPDATE of the SRS table, one per card"""
+        columns = {field.name: getattr(self, field.name).tolist() for field in fields(self)}
+        return [
+            {
+                'id': srs_id,
+                'ease_factor': columns['ease_factor'][i],
+                'interval': columns['interval'][i],
+                'repetitions': columns['repetitions'][i],
+                'due_date': columns['due_date'][i],
+                'last_reviewed': columns['last_reviewed'][i],
+                'last_grade': None if columns['last_grade'][i] < 0 else columns['last_grade'][i]
+            }
+            for i, srs_id in enumerate(ids)
+        ]
+
+
+@dataclass
+class ReplayResult:
+    """Outcome of each replayed review, in the order the reviews were given"""
+    applied: np.ndarray
+    ease_factor: np.ndarray
+    interval: np.ndarray
+    repetitions: np.ndarray
+    due_date: np.ndarray
+
+
+class Scheduler(ABC):
+    """Base class of vectorized scheduling algorithms"""
+
+    name: str = ""
+
+    @abstractmethod
+    def new_state(self, count: int, now: datetime) -> ScheduleState:
+        """State of ``count`` cards that were never reviewed, due at ``now``"""
+        pass
+
+    @abstractmethod
+    def review(self, state: ScheduleState, index: np.ndarray, grades: np.ndarray, reviewed_at: np.ndarray) -> None:
+        """
+        Apply one review to each selected card, in place
+
+        ``index`` selects distinct cards of ``state``; ``grades`` and
+        ``reviewed_at`` hold the grade and review time of each of them.
+        """
+        pass
+
+    def replay(
+        self,
+        state: ScheduleState,
+        positions: np.ndarray,
+        grades: np.ndarray,
+        reviewed_at: np.ndarray,
+        check_stale: Optional[np.ndarray] = None
+    ) -> ReplayResult:
+        """
+        Apply a sequence of reviews, possibly several per card, in place
+
+        Reviews are applied in order of ``reviewed_at``, then in the order
+        given. They are processed in rounds, where round ``k`` holds the
+        ``k``-th review of every card, so each round is one vectorized step.
+        A review flagged in ``check_stale`` (all by default) that is not
+        newer than the card's last review is skipped.
+
+        Args:
+            state: State of the reviewed cards
+            positions: Index in ``state`` of the card of each review
+            grades: Grade of each review
+            reviewed_at: Review time of each review (datetime64)
+            check_stale: Reviews to skip when already applied
+        """
+        count = len(positions)
+        if check_stale is None:
+            check_stale = np.ones(count, dtype=bool)
+        result = ReplayResult(
+            applied=np.zeros(count, dtype=bool),
+            ease_factor=np.empty(count, dtype=np.float64),
+            interval=np.empty(count, dtype=np.int64),
+            repetitions=np.empty(count, dtype=np.int64),
+            due_date=np.empty(count, dtype=DATETIME_DTYPE)
+        )
+        if not count:
+            return result
+
+        # Review order, then the rank of each review among those of its card
+        order = np.lexsort((np.arange(count), reviewed_at))
+        by_card = order[np.argsort(positions[order], kind="stable")]
+        sorted_positions = positions[by_card]
+        starts = np.flatnonzero(np.r_[True, sorted_positions[1:] != sorted_positions[:-1]])
+        group_sizes = np.diff(np.r_[starts, count])
+        rank = np.empty(count, dtype=np.int64)
+        rank[by_card] = np.arange(count) - np.repeat(starts, group_sizes)
+
+        for round_index in range(int(rank.max()) + 1):
+            reviews = np.flatnonzero(rank == round_index)
+            cards = positions[reviews]
+            stale = check_stale[reviews] & (reviewed_at[reviews] <= state.last_reviewed[cards])
+            applied, applied_cards = reviews[~stale], cards[~stale]
+
+            state.last_reviewed[applied_cards] = reviewed_at[applied]
+            state.last_grade[applied_cards] = grades[applied]
+            self.review(state, applied_cards, grades[applied], reviewed_at[applied])
+
+            result.applied[applied] = True
+            result.ease_factor[reviews] = state.ease_factor[cards]
+            result.interval[reviews] = state.interval[cards]
+            result.repetitions[reviews] = state.repetitions[cards]
+            result.due_date[reviews] = state.due_date[cards]
+        return result
+
+    def simulate(
+        self,
+        state: ScheduleState,
+        days: int,
+        now: datetime,
+        grade_probabilities: Sequence[float] = DEFAULT_GRADE_PROBABILITIES,
+        seed: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Simulate the reviews of the next ``days`` days, in place
+
+        Every card due by the end of a day is reviewed that day (on the
+        first day at ``now``, later at midnight UTC) with a grade drawn
+        from ``grade_probabilities``.
+
+        Returns:
+            Per-day arrays of review and lapse (grade < 3) counts
+        """
+        rng = np.random.default_rng(seed)
+        probabilities = np.asarray(grade_probabilities, dtype=np.float64)
+        probabilities = probabilities / probabilities.sum()
+        start = np.datetime64(now.replace(hour=0, minute=0, second=0, microsecond=0), "us")
+        reviews = np.zeros(days, dtype=np.int64)
+        lapses = np.zeros(days, dtype=np.int64)
+
+        for day in range(days):
+            day_start = start + day * ONE_DAY
+            due = np.flatnonzero(state.due_date < day_start + ONE_DAY)
+            if not len(due):
+                continue
+            grades = rng.choice(len(probabilities), size=len(due), p=probabilities)
+            review_time = np.datetime64(now, "us") if day == 0 else day_start
+            self.review(state, due, grades, np.full(len(due), review_time, dtype=DATETIME_DTYPE))
+            reviews[day] = len(due)
+            lapses[day] = np.count_nonzero(grades < 3)
+        return {'reviews': reviews, 'lapses': lapses}
+
+
+SCHEDULERS: Dict[str, Type[Scheduler]] = {}
+
+
+def register_scheduler(cls: Type[Scheduler]) -> Type[Scheduler]:
+    """Class decorator making a scheduler available by its name"""
+    SCHEDULERS[cls.name] = cls
+    return cls
+
+
+def get_scheduler(name: Optional[str] = None) -> Scheduler:
+    """Scheduler registered under ``name`` (the configured one by default)"""
+    name = name or settings.srs_scheduler
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown SRS scheduler: {name}")
+    return SCHEDULERS[name]()
+
+
+@register_scheduler
+class SM2Scheduler(Scheduler):
+    """
+    SM-2: a failed review (grade < 3) restarts the card at one day; passed
+    reviews go to 1 day, 6 days, then the previous interval times the
+    ease factor, which falls with lower grades (never below 1.3)
+    """
+
+    name = "sm2"
+    INITIAL_EASE = 2.5
+    MIN_EASE = 1.3
+    LAPSE_EASE_PENALTY = 0.2
+
+    def new_state(self, count: int, now: datetime) -> ScheduleState:
+        return ScheduleState(
+            ease_factor=np.full(count, self.INITIAL_EASE),
+            interval=np.ones(count, dtype=np.int64),
+            repetitions=np.zeros(count, dtype=np.int64),
+            due_date=np.full(count, np.datetime64(now, "us")),
+            last_reviewed=np.full(count, np.datetime64("NaT"), dtype=DATETIME_DTYPE),
+            last_grade=np.full(count, -1, dtype=np.int64)
+        )
+
+    def review(self, state: ScheduleState, index: np.ndarray, grades: np.ndarray, reviewed_at: np.ndarray) -> None:
+        ease = state.ease_factor[index]
+        interval = state.interval[index]
+        repetitions = state.repetitions[index]
+        passed = grades >= 3
+
+        # Poor performance resets learning progress
+        repetitions = np.where(passed, repetitions + 1, 0)
+        grown = np.trunc(interval * ease).astype(np.int64)
+        interval = np.select([~passed | (repetitions == 1), repetitions == 2], [1, 6], grown)
+
+        missed = (5 - grades).astype(np.float64)
+        adjustment = np.where(passed, 0.1 * missed * (0.08 * missed + 0.02), self.LAPSE_EASE_PENALTY)
+        ease = np.maximum(self.MIN_EASE, ease - adjustment)
+
+        state.ease_factor[index] = ease
+        state.interval[index] = interval
+        state.repetitions[index] = repetitions
+        state.due_date[index] = reviewed_at + interval * ONE_DAY
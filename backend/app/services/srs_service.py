@@ -1,21 +1,36 @@
 """
-Spaced Repetition System (SRS) service implementing SM-2 algorithm
+Spaced Repetition System (SRS) service; scheduling is done by the
+configured scheduler of ``srs_scheduler`` (SM-2 by default)
 """
 
-from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, update, case, func
 
+from ..models.document import Chapter
+from ..models.knowledge import Knowledge
 from ..models.learning import SRS, Card
+from ..core.config import settings
 from ..core.database import get_db
+from .daily_review_queue import SRSChange, apply_srs_changes
+from .srs_scheduler import DEFAULT_GRADE_PROBABILITIES, ReplayResult, ScheduleState, get_scheduler, to_datetime64
 
 
 class SRSService:
     """Service for managing spaced repetition system"""
     
-    def __init__(self, db: Session):
+    # SRS IDs per IN (...) query when loading many records
+    ID_CHUNK_SIZE = 500
+    # Graded cards needed to forecast with a deck's own grade distribution
+    MIN_FORECAST_HISTORY = 20
+    
+    def __init__(self, db: Session, scheduler: Optional[str] = None):
         self.db = db
+        self.scheduler = get_scheduler(scheduler)
     
     def create_srs_record(self, card_id: str, user_id: Optional[str] = None) -> SRS:
         """Create a new SRS record for a card"""
@@ -38,7 +53,7 @@ class SRSService:
     
     def grade_card(self, srs_id: str, grade: int) -> SRS:
         """
-        Grade a card and update SRS parameters using SM-2 algorithm
+        Grade a card and update SRS parameters using the configured scheduler
         
         Args:
             srs_id: SRS record ID
@@ -51,64 +66,283 @@ class SRSService:
         Returns:
             Updated SRS record
         """
-        if not (0 <= grade <= 5):
-            raise ValueError("Grade must be between 0 and 5")
+        self._validate_grade(grade)
         
         srs = self.db.query(SRS).filter(SRS.id == srs_id).first()
         if not srs:
             raise ValueError(f"SRS record not found: {srs_id}")
         
-        # Update last reviewed and grade
-        srs.last_reviewed = datetime.utcnow()
-        srs.last_grade = grade
-        
-        # Apply SM-2 algorithm
-        srs = self._apply_sm2_algorithm(srs, grade)
+        # Same scheduler as batch grading, so both schedule a grade alike
+        self._review(srs, grade, datetime.utcnow())
         
         self.db.commit()
         self.db.refresh(srs)
         
         return srs
     
-    def _apply_sm2_algorithm(self, srs: SRS, grade: int) -> SRS:
+    def grade_cards_batch(self, grades: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply many grades in one transaction
+        
+        All SRS records are read with one query, the scheduler replays the
+        grades over their columns in memory and the results are written
+        with a single bulk UPDATE. Repeated grades of the same card are
+        applied in review order: by ``reviewed_at`` when given, otherwise in
+        submission order. A grade with a ``reviewed_at`` not newer than the
+        card's last review was already applied (e.g. a retried upload) and
+        is skipped.
+        
+        Args:
+            grades: Dictionaries with ``srs_id``, ``grade`` and an optional
+                    ``reviewed_at`` datetime
+        
+        Returns:
+            One result per grade, in submission order
         """
-        Apply SM-2 algorithm to update SRS parameters
-        
-        SM-2 Algorithm:
-        1. If grade < 3: reset repetitions to 0, interval to 1
-        2. If grade >= 3:
-           - If repetitions == 0: interval = 1
-           - If repetitions == 1: interval = 6
-           - If repetitions > 1: interval = previous_interval * ease_factor
-        3. Update ease factor based on grade
-        4. Calculate next due date
+        replay = self._replay_grades(grades)
+        if replay is None:
+            return []
+        
+        due_dates = replay.due_date.tolist()
+        return [
+            {
+                'srs_id': str(entry['srs_id']),
+                'grade': entry['grade'],
+                'applied': bool(replay.applied[i]),
+                'new_due_date': due_dates[i].isoformat(),
+                'new_interval': int(replay.interval[i]),
+                'ease_factor': float(replay.ease_factor[i]),
+                'repetitions': int(replay.repetitions[i])
+            }
+            for i, entry in enumerate(grades)
+        ]
+    
+    def import_review_history(self, reviews: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Replay a review history, e.g. exported from another flashcard app
+        
+        Every review needs a ``reviewed_at``. Reviews not newer than a
+        card's last review are skipped, so importing the same history twice
+        changes nothing.
+        
+        Returns:
+            Counts of imported, applied and skipped reviews and of cards
         """
+        if any(entry.get('reviewed_at') is None for entry in reviews):
+            raise ValueError("Imported reviews need a reviewed_at time")
+        
+        replay = self._replay_grades(reviews)
+        applied = int(replay.applied.sum()) if replay is not None else 0
+        return {
+            'reviews': len(reviews),
+            'applied': applied,
+            'skipped': len(reviews) - applied,
+            'cards': len({str(entry['srs_id']) for entry in reviews})
+        }
+    
+    def _replay_grades(self, grades: List[Dict[str, Any]]) -> Optional[ReplayResult]:
+        """Validate, replay and write grades; None when there are none"""
+        for entry in grades:
+            self._validate_grade(entry['grade'])
+        
+        srs_ids = {str(entry['srs_id']) for entry in grades}
+        if not srs_ids:
+            return None
+        
+        rows = self._load_schedule_rows(srs_ids)
+        row_index = {str(row.id): i for i, row in enumerate(rows)}
+        missing = srs_ids - row_index.keys()
+        if missing:
+            raise ValueError(f"SRS record not found: {', '.join(sorted(missing))}")
         
-        # Poor performance (quality < 3): reset learning progress
-        if grade < 3:
-            srs.repetitions = 0
-            srs.interval = 1
-            srs.ease_factor = max(1.3, srs.ease_factor - 0.2)
+        now = datetime.utcnow()
+        reviewed = [self._to_naive_utc(entry.get('reviewed_at')) for entry in grades]
+        positions = np.array([row_index[str(entry['srs_id'])] for entry in grades], dtype=np.int64)
+        
+        state = ScheduleState.from_rows(rows)
+        replay = self.scheduler.replay(
+            state,
+            positions,
+            np.array([entry['grade'] for entry in grades], dtype=np.int64),
+            to_datetime64([reviewed_at or now for reviewed_at in reviewed]),
+            check_stale=np.array([reviewed_at is not None for reviewed_at in reviewed])
+        )
+        
+        changed = np.unique(positions[replay.applied])
+        if len(changed):
+            self._write_schedule(rows, state, changed)
+        self.db.commit()
+        
+        return replay
+    
+    def reset_deck(
+        self,
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        all_cards: bool = False
+    ) -> int:
+        """
+        Reset the learning progress of every card of a user or document
+        
+        Without a user or document, every card is reset only when
+        ``all_cards`` is set.
+        
+        Returns:
+            Number of SRS records reset
+        """
+        if not user_id and not document_id and not all_cards:
+            raise ValueError("Specify a user or document to reset, or all_cards=True")
+        
+        query = self.db.query(SRS.id, SRS.card_id, SRS.user_id)
+        if document_id:
+            query = (
+                query.join(Card, SRS.card_id == Card.id)
+                .join(Knowledge, Card.knowledge_id == Knowledge.id)
+                .join(Chapter, Knowledge.chapter_id == Chapter.id)
+                .filter(Chapter.document_id == document_id)
+            )
+        if user_id:
+            query = query.filter(SRS.user_id == user_id)
+        rows = query.all()
+        
+        if rows:
+            state = self.scheduler.new_state(len(rows), datetime.utcnow())
+            self._write_schedule(rows, state, np.arange(len(rows)))
+        self.db.commit()
+        
+        return len(rows)
+    
+    def forecast_workload(self, user_id: Optional[str] = None, days: int = 30, seed: int = 0) -> Dict[str, Any]:
+        """
+        Forecast the number of reviews of each of the next ``days`` days
+        
+        Simulates the scheduler over the whole deck, assuming every due card
+        is reviewed on time with grades drawn from the deck's distribution
+        of last grades.
+        """
+        query = self.db.query(
+            SRS.ease_factor, SRS.interval, SRS.repetitions,
+            SRS.due_date, SRS.last_reviewed, SRS.last_grade
+        )
+        if user_id:
+            query = query.filter(SRS.user_id == user_id)
+        state = ScheduleState.from_rows(query.all())
+        
+        graded = state.last_grade[state.last_grade >= 0]
+        if len(graded) >= self.MIN_FORECAST_HISTORY:
+            probabilities = np.bincount(graded, minlength=6) / len(graded)
         else:
-            # Good performance: advance in the schedule
-            srs.repetitions += 1
-            
-            if srs.repetitions == 1:
-                srs.interval = 1
-            elif srs.repetitions == 2:
-                srs.interval = 6
-            else:
-                srs.interval = int(srs.interval * srs.ease_factor)
-            
-            # Update ease factor based on performance
-            ease_adjustment = 0.1 * (5 - grade) * (0.08 * (5 - grade) + 0.02)
-            srs.ease_factor = max(1.3, srs.ease_factor - ease_adjustment)
+            probabilities = np.asarray(DEFAULT_GRADE_PROBABILITIES)
         
-        # Calculate next due date
-        srs.due_date = datetime.utcnow() + timedelta(days=srs.interval)
+        now = datetime.utcnow()
+        start = time.perf_counter()
+        simulation = self.scheduler.simulate(state, days, now, probabilities, seed=seed)
+        simulation_ms = (time.perf_counter() - start) * 1000
         
+        today = now.date()
+        reviews = simulation['reviews']
+        return {
+            'scheduler': self.scheduler.name,
+            'total_cards': len(state),
+            'grade_probabilities': [round(float(p), 3) for p in probabilities],
+            'forecast': [
+                {
+                    'date': (today + timedelta(days=day)).isoformat(),
+                    'reviews': int(reviews[day]),
+                    'lapses': int(simulation['lapses'][day])
+                }
+                for day in range(days)
+            ],
+            'total_reviews': int(reviews.sum()),
+            'average_per_day': round(float(reviews.mean()), 1) if days else 0.0,
+            'peak_reviews': int(reviews.max()) if days else 0,
+            'simulation_ms': round(simulation_ms, 2)
+        }
+    
+    def _load_schedule_rows(self, srs_ids) -> List[Any]:
+        """Schedule columns of the given SRS records, read in chunks of IDs"""
+        srs_ids = list(srs_ids)
+        rows = []
+        for offset in range(0, len(srs_ids), self.ID_CHUNK_SIZE):
+            rows.extend(
+                self.db.query(
+                    SRS.id, SRS.card_id, SRS.user_id, SRS.ease_factor, SRS.interval,
+                    SRS.repetitions, SRS.due_date, SRS.last_reviewed, SRS.last_grade
+                )
+                .filter(SRS.id.in_(srs_ids[offset:offset + self.ID_CHUNK_SIZE]))
+                .all()
+            )
+        return rows
+    
+    def _write_schedule(self, rows: List[Any], state: ScheduleState, index: np.ndarray) -> None:
+        """Write the state of the selected rows with one bulk UPDATE"""
+        changed = state.take(index)
+        ids = [rows[i].id for i in index]
+        self.db.execute(update(SRS), changed.to_mappings(ids))
+        
+        # The bulk UPDATE bypasses the ORM flush that maintains the daily queues
+        if settings.review_queue_precompute:
+            apply_srs_changes(self.db.connection(), [
+                SRSChange(rows[i].id, rows[i].user_id, rows[i].card_id, due_date)
+                for i, due_date in zip(index, changed.due_date.tolist())
+            ])
+    
+    def preview_grade(self, srs_id: str, grade: int, reviewed_at: Optional[datetime] = None) -> SimpleNamespace:
+        """
+        Compute the schedule a grade would produce without saving it
+        
+        Uses the scheduler that applies the grade when it is written, so
+        buffered grades are shown with the schedule they will get.
+        """
+        self._validate_grade(grade)
+        
+        rows = self._load_schedule_rows([srs_id])
+        if not rows:
+            raise ValueError(f"SRS record not found: {srs_id}")
+        
+        replay = self.scheduler.replay(
+            ScheduleState.from_rows(rows),
+            np.zeros(1, dtype=np.int64),
+            np.array([grade], dtype=np.int64),
+            to_datetime64([self._to_naive_utc(reviewed_at) or datetime.utcnow()]),
+            check_stale=np.zeros(1, dtype=bool)
+        )
+        return SimpleNamespace(
+            ease_factor=float(replay.ease_factor[0]),
+            interval=int(replay.interval[0]),
+            repetitions=int(replay.repetitions[0]),
+            due_date=replay.due_date[0].item()
+        )
+    
+    @staticmethod
+    def _validate_grade(grade: int) -> None:
+        if not (0 <= grade <= 5):
+            raise ValueError("Grade must be between 0 and 5")
+    
+    @staticmethod
+    def _to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+        """Stored datetimes are naive UTC"""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    
+    def _review(self, srs: SRS, grade: int, reviewed_at: datetime) -> SRS:
+        """Apply one review to an SRS record in memory with the scheduler"""
+        state = ScheduleState.from_rows([srs])
+        self.scheduler.review(state, np.zeros(1, dtype=np.int64), np.array([grade]), to_datetime64([reviewed_at]))
+        
+        srs.ease_factor = float(state.ease_factor[0])
+        srs.interval = int(state.interval[0])
+        srs.repetitions = int(state.repetitions[0])
+        srs.due_date = state.due_date[0].item()
+        srs.last_reviewed = reviewed_at
+        srs.last_grade = grade
         return srs
     
+    def _apply_sm2_algorithm(self, srs: SRS, grade: int) -> SRS:
+        """Apply a grade given now to an SRS record in memory"""
+        return self._review(srs, grade, datetime.utcnow())
+    
     def get_due_cards(self, user_id: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[SRS, Card]]:
         """
         Get cards that are due for review
@@ -187,14 +421,54 @@ class SRSService:
         Returns:
             Dictionary with review statistics
         """
-        query = self.db.query(SRS)
+        row = self.aggregate_review_statistics(user_id)
+        return self.format_review_statistics(row)
+    
+    def aggregate_review_statistics(
+        self,
+        user_id: Optional[str] = None,
+        extra_columns: Optional[List[Any]] = None,
+        now: Optional[datetime] = None
+    ):
+        """
+        Compute the review statistics of a user in a single aggregate query
+        
+        Card states are counted with CASE buckets instead of loading the SRS
+        table. Callers can add their own aggregate columns (see
+        ``count_where``) to the same query.
+        
+        Returns:
+            Result row with the statistics columns and the extra columns
+        """
+        now = now or datetime.utcnow()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        
+        query = self.db.query(
+            func.count(SRS.id).label('total_cards'),
+            self.count_where(and_(SRS.due_date >= today, SRS.due_date < tomorrow)).label('due_today'),
+            self.count_where(SRS.due_date < today).label('overdue'),
+            self.count_where(SRS.repetitions < 2).label('learning'),
+            self.count_where(SRS.repetitions >= 2).label('mature'),
+            func.avg(SRS.ease_factor).label('average_ease_factor'),
+            func.avg(SRS.interval).label('average_interval'),
+            *(extra_columns or [])
+        )
         
         if user_id:
             query = query.filter(SRS.user_id == user_id)
         
-        all_cards = query.all()
-        
-        if not all_cards:
+        return query.one()
+    
+    @staticmethod
+    def count_where(condition):
+        """Aggregate column counting the SRS rows matching ``condition``"""
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    
+    @staticmethod
+    def format_review_statistics(row) -> dict:
+        """Build the statistics dictionary from an aggregate row"""
+        if not row.total_cards:
             return {
                 'total_cards': 0,
                 'due_today': 0,
@@ -205,28 +479,14 @@ class SRSService:
                 'average_interval': 0.0
             }
         
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        tomorrow = today + timedelta(days=1)
-        
-        # Count different card states
-        due_today = sum(1 for srs in all_cards if today <= srs.due_date < tomorrow)
-        overdue = sum(1 for srs in all_cards if srs.due_date < today)
-        learning = sum(1 for srs in all_cards if srs.repetitions < 2)
-        mature = sum(1 for srs in all_cards if srs.repetitions >= 2)
-        
-        # Calculate averages
-        total_ease = sum(srs.ease_factor for srs in all_cards)
-        total_interval = sum(srs.interval for srs in all_cards)
-        
         return {
-            'total_cards': len(all_cards),
-            'due_today': due_today,
-            'overdue': overdue,
-            'learning': learning,
-            'mature': mature,
-            'average_ease_factor': round(total_ease / len(all_cards), 2),
-            'average_interval': round(total_interval / len(all_cards), 1)
+            'total_cards': int(row.total_cards),
+            'due_today': int(row.due_today),
+            'overdue': int(row.overdue),
+            'learning': int(row.learning),
+            'mature': int(row.mature),
+            'average_ease_factor': round(float(row.average_ease_factor), 2),
+            'average_interval': round(float(row.average_interval), 1)
         }
     
     def get_srs_record(self, card_id: str, user_id: Optional[str] = None) -> Optional[SRS]:
@@ -0,0 +1,232 @@
+"""
+Sync change log
+
+Every create, update and delete of a synced entity appends a row to
+``sync_change_log`` in the same transaction: the changed fields of
+creates and updates, and a tombstone for deletes. Rows are numbered by a
+monotonically increasing sequence number, so a client pulls everything
+after the last number it has seen with a range scan on the primary key.
+
+Changes made through the unit of work are recorded after each flush.
+ORM-enabled bulk statements (``session.execute(update(Model), rows)`` and
+criteria UPDATE/DELETE) bypass the flush and are recorded as they
+execute. Core statements on a plain connection are not recorded.
+Listeners registered with ``register_change_listener`` see the logged
+rows once the changes are written, in the same transaction.
+
+Entries are kept for ``sync_change_log_retention_days``; a daily job
+prunes older ones.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import Connection, delete, event, func, insert, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from ..core.config import settings
+from ..models.document import Document, Chapter, Figure
+from ..models.knowledge import Knowledge
+from ..models.learning import Card, SRS
+from ..models.sync import SyncChangeLog
+
+logger = logging.getLogger(__name__)
+
+# Synced entity types and their models
+SYNC_ENTITY_MODELS = {
+    "document": Document,
+    "chapter": Chapter,
+    "figure": Figure,
+    "knowledge": Knowledge,
+    "card": Card,
+    "srs": SRS
+}
+
+_ENTITY_TYPES = {model: entity_type for entity_type, model in SYNC_ENTITY_MODELS.items()}
+_TABLE_ENTITY_TYPES = {model.__table__: entity_type for entity_type, model in SYNC_ENTITY_MODELS.items()}
+
+# Session.info key of the client whose pushed changes a session applies
+SYNC_CLIENT_ID_KEY = "sync_client_id"
+
+ChangeListener = Callable[[Connection, List[Dict[str, Any]]], None]
+CHANGE_LISTENERS: List[ChangeListener] = []
+
+
+def register_change_listener(listener: ChangeListener) -> ChangeListener:
+    """Call ``listener`` with the connection and rows of every change log write"""
+    CHANGE_LISTENERS.append(listener)
+    return listener
+
+
+def prune_change_log(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Delete change log entries older than the retention period
+
+    The latest entry is always kept, so the log still tells the latest
+    sequence number. Returns the number of entries deleted.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.sync_change_log_retention_days)
+    result = db.execute(
+        delete(SyncChangeLog)
+        .where(
+            SyncChangeLog.created_at < cutoff,
+            SyncChangeLog.seq < select(func.max(SyncChangeLog.seq)).scalar_subquery()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def serialize_value(value: Any) -> Any:
+    """Column value in its JSON form"""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _log_row(session: Session, entity_type: str, entity_id: Any, operation: str,
+             changes: Optional[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "operation": operation,
+        "changes": changes,
+        "client_id": session.info.get(SYNC_CLIENT_ID_KEY),
+        "created_at": now
+    }
+
+
+def record_changes(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """Append change log rows in the session's transaction"""
+    if not rows:
+        return
+    connection = session.connection()
+    connection.execute(insert(SyncChangeLog), rows)
+    for listener in CHANGE_LISTENERS:
+        listener(connection, rows)
+
+
+def _created_fields(obj: Any) -> Dict[str, Any]:
+    # Server-side defaults are expired after the INSERT and left out
+    # rather than loaded back
+    state = inspect(obj)
+    return {
+        attr.columns[0].name: serialize_value(state.dict[attr.key])
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _updated_fields(obj: Any) -> Dict[str, Any]:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.added:
+            changes[attr.columns[0].name] = serialize_value(history.added[0])
+    return changes
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_changes(session: Session, flush_context) -> None:
+    """Log the entities created, updated and deleted by a flush"""
+    if not settings.sync_change_log_enabled:
+        return
+
+    now = datetime.utcnow()
+    rows = []
+    for obj in session.new:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type:
+            rows.append(_log_row(session, entity_type, obj.id, "create", _created_fields(obj), now))
+    for obj in session.dirty:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if not entity_type:
+            continue
+        changes = _updated_fields(obj)
+        if changes:
+            rows.append(_log_row(session, entity_type, obj.id, "update", changes, now))
+    for obj in session.deleted:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type:
+            rows.append(_log_row(session, entity_type, obj.id, "delete", None, now))
+
+    record_changes(session, rows)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_changes(orm_execute_state: ORMExecuteState):
+    """Log the rows written by ORM-enabled bulk INSERT, UPDATE and DELETE statements"""
+    state = orm_execute_state
+    if not settings.sync_change_log_enabled or not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    table = getattr(state.statement, "table", None)
+    entity_type = _TABLE_ENTITY_TYPES.get(table)
+    if not entity_type:
+        return None
+
+    session = state.session
+    now = datetime.utcnow()
+    parameters = state.parameters
+    bulk_rows = parameters if isinstance(parameters, list) else None
+
+    # Rows are logged after they are written, so listeners read their new state
+    if state.is_insert:
+        if not bulk_rows or not all("id" in row for row in bulk_rows):
+            logger.warning(f"Bulk insert into {table.name} without primary keys is not in the sync change log")
+            return None
+        result = state.invoke_statement()
+        record_changes(session, [
+            _log_row(session, entity_type, row["id"], "create",
+                     {key: serialize_value(value) for key, value in row.items()}, now)
+            for row in bulk_rows
+        ])
+        return result
+
+    if bulk_rows and state.statement.whereclause is None:
+        # UPDATE by primary key, one parameter set per row
+        result = state.invoke_statement()
+        record_changes(session, [
+            _log_row(session, entity_type, row["id"], "update",
+                     {key: serialize_value(value) for key, value in row.items() if key != "id"}, now)
+            for row in bulk_rows
+        ])
+        return result
+
+    # Criteria statement: find the affected rows before they change
+    ids_stmt = select(table.c.id)
+    if state.statement.whereclause is not None:
+        ids_stmt = ids_stmt.where(state.statement.whereclause)
+    entity_ids = list(session.connection().execute(ids_stmt, parameters or {}).scalars())
+    if not entity_ids:
+        return None
+
+    if state.is_delete:
+        record_changes(session, [
+            _log_row(session, entity_type, entity_id, "delete", None, now) for entity_id in entity_ids
+        ])
+        return None
+
+    # Log the new values of the SET columns, as the database computed them
+    result = state.invoke_statement()
+    values = getattr(state.statement, "_values", None) or {}
+    columns = [table.c[getattr(key, "name", key)] for key in values] or list(table.c)
+    rows = session.connection().execute(
+        select(table.c.id, *columns).where(table.c.id.in_(entity_ids))
+    ).all()
+    record_changes(session, [
+        _log_row(session, entity_type, row.id, "update",
+                 {column.name: serialize_value(row._mapping[column]) for column in columns}, now)
+        for row in rows
+    ])
+    return result
+
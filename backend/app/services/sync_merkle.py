@@ -0,0 +1,236 @@
+"""
+Merkle trees of synced entities
+
+Each synced entity type has a two-level hash tree. The leaves are
+entity hashes: the SHA-256 of the entity's canonical JSON (columns
+except ``created_at`` and ``updated_at``, keys sorted, no whitespace).
+Leaves are grouped into ``MERKLE_BUCKETS`` buckets by the first byte of
+the entity ID, so each bucket covers a contiguous range of IDs. A
+bucket's hash is the XOR of its leaf hashes, and the root is the SHA-256
+of all bucket hashes in bucket order, with empty buckets as zeros.
+
+Leaves are upserted as a change log listener, in the transaction of the
+write, which already holds the entity's row lock; no rows are shared
+between entities. Bucket hashes are combined from the leaves when a tree
+is read. Clients compare roots, then bucket hashes, and then fetch only
+the leaves and entities of the buckets that differ. A background job
+rehashes every entity and repairs leaves that drifted, e.g. from rows
+written around the ORM.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping
+from uuid import UUID
+
+from sqlalchemy import Connection, delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.sync import SyncEntityHash
+from .sync_change_log import SYNC_ENTITY_MODELS, register_change_listener, serialize_value
+
+logger = logging.getLogger(__name__)
+
+MERKLE_BUCKETS = 256
+EMPTY_HASH = "0" * 64
+
+# Columns left out of entity hashes
+UNHASHED_COLUMNS = ("created_at", "updated_at")
+
+ID_CHUNK_SIZE = 500
+
+
+def entity_bucket(entity_id: Any) -> int:
+    """Bucket of an entity: the first byte of its ID"""
+    return UUID(str(entity_id)).int >> 120
+
+
+def entity_hash(data: Dict[str, Any]) -> str:
+    """Leaf hash of an entity from its serialized columns"""
+    canonical = {key: value for key, value in data.items() if key not in UNHASHED_COLUMNS}
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def root_hash(bucket_hashes: Iterable[str]) -> str:
+    """Root of a tree from its bucket hashes, in bucket order"""
+    return hashlib.sha256(b"".join(bytes.fromhex(value) for value in bucket_hashes)).hexdigest()
+
+
+def _chunks(values: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(values), ID_CHUNK_SIZE):
+        yield values[start:start + ID_CHUNK_SIZE]
+
+
+def _current_hashes(connection: Connection, entity_type: str, entity_ids: List[UUID]) -> Dict[UUID, str]:
+    """Entity hashes computed from the rows as they are now"""
+    table = SYNC_ENTITY_MODELS[entity_type].__table__
+    hashes = {}
+    for chunk in _chunks(entity_ids):
+        for row in connection.execute(select(table).where(table.c.id.in_(chunk))).mappings():
+            hashes[row["id"]] = _row_hash(row)
+    return hashes
+
+
+def _row_hash(row: Mapping[str, Any]) -> str:
+    return entity_hash({key: serialize_value(value) for key, value in row.items()})
+
+
+def _upsert_leaves(connection: Connection, entity_type: str, hashes: Dict[UUID, str]) -> None:
+    """Insert or replace the leaves of entities"""
+    rows = [
+        {"entity_type": entity_type, "entity_id": entity_id, "bucket": entity_bucket(entity_id), "hash": value}
+        for entity_id, value in hashes.items()
+    ]
+    dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(connection.dialect.name)
+    if dialect_insert is None:
+        _delete_leaves(connection, entity_type, list(hashes))
+        connection.execute(insert(SyncEntityHash), rows)
+        return
+    stmt = dialect_insert(SyncEntityHash)
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SyncEntityHash.entity_type, SyncEntityHash.entity_id],
+            set_={"hash": stmt.excluded.hash}
+        ),
+        rows
+    )
+
+
+def _delete_leaves(connection: Connection, entity_type: str, entity_ids: List[UUID]) -> None:
+    for chunk in _chunks(entity_ids):
+        connection.execute(delete(SyncEntityHash).where(
+            SyncEntityHash.entity_type == entity_type,
+            SyncEntityHash.entity_id.in_(chunk)
+        ))
+
+
+def update_entity_hashes(
+    connection: Connection,
+    entity_type: str,
+    entity_ids: Iterable[Any],
+    deleted_ids: Iterable[Any] = ()
+) -> None:
+    """
+    Rehash entities after they were written or deleted
+
+    Leaves of the entities are upserted, and removed for entities that no
+    longer exist. Entities in ``deleted_ids`` lose their leaf even if their
+    row has not been deleted yet.
+    """
+    deleted_ids = {UUID(str(entity_id)) for entity_id in deleted_ids}
+    entity_ids = list({UUID(str(entity_id)) for entity_id in entity_ids} | deleted_ids)
+    if not entity_ids:
+        return
+
+    new = _current_hashes(connection, entity_type, [i for i in entity_ids if i not in deleted_ids])
+    if new:
+        _upsert_leaves(connection, entity_type, new)
+    missing = [entity_id for entity_id in entity_ids if entity_id not in new]
+    if missing:
+        _delete_leaves(connection, entity_type, missing)
+
+
+@register_change_listener
+def _update_merkle_trees(connection: Connection, rows: List[Dict[str, Any]]) -> None:
+    """Keep the leaves of the logged entities current"""
+    # The last logged operation of an entity decides whether it still exists
+    operations: Dict[str, Dict[Any, str]] = defaultdict(dict)
+    for row in rows:
+        operations[row["entity_type"]][row["entity_id"]] = row["operation"]
+    for entity_type, entity_operations in operations.items():
+        update_entity_hashes(
+            connection,
+            entity_type,
+            entity_operations,
+            deleted_ids=[entity_id for entity_id, operation in entity_operations.items() if operation == "delete"]
+        )
+
+
+def repair_tree(db: Session, entity_type: str) -> int:
+    """
+    Rehash every entity of a type and fix the leaves that differ
+
+    Entities are read in ID order a chunk at a time, each chunk locked
+    and committed on its own so concurrent writes of the same entities
+    wait instead of racing the repair. Leaves of entities that no longer
+    exist are deleted. Used for data written before the trees were
+    maintained and for rows written by statements the change log does not
+    see. Returns the number of leaves inserted, updated or deleted.
+    """
+    table = SYNC_ENTITY_MODELS[entity_type].__table__
+    repaired = 0
+    last_id = None
+    while True:
+        stmt = select(table).order_by(table.c.id).limit(ID_CHUNK_SIZE).with_for_update()
+        if last_id is not None:
+            stmt = stmt.where(table.c.id > last_id)
+        rows = db.execute(stmt).mappings().all()
+        if not rows:
+            break
+        hashes = {row["id"]: _row_hash(row) for row in rows}
+        stored = dict(db.execute(
+            select(SyncEntityHash.entity_id, SyncEntityHash.hash).where(
+                SyncEntityHash.entity_type == entity_type,
+                SyncEntityHash.entity_id.in_(list(hashes))
+            )
+        ).all())
+        drifted = {entity_id: value for entity_id, value in hashes.items() if stored.get(entity_id) != value}
+        if drifted:
+            _upsert_leaves(db.connection(), entity_type, drifted)
+        db.commit()
+        repaired += len(drifted)
+        last_id = rows[-1]["id"]
+
+    result = db.execute(delete(SyncEntityHash).where(
+        SyncEntityHash.entity_type == entity_type,
+        SyncEntityHash.entity_id.not_in(select(table.c.id))
+    ))
+    db.commit()
+    repaired += result.rowcount
+    if repaired:
+        logger.warning(f"Repaired {repaired} Merkle tree leaves of {entity_type} entities")
+    return repaired
+
+
+class MerkleTreeService:
+    """Reads the Merkle trees of synced entity types"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_bucket_hashes(self, entity_type: str) -> List[str]:
+        """Hash of every bucket of a tree, in bucket order, combined from its leaves"""
+        hashes = [0] * MERKLE_BUCKETS
+        result = await self.db.stream(
+            select(SyncEntityHash.bucket, SyncEntityHash.hash)
+            .where(SyncEntityHash.entity_type == entity_type)
+        )
+        async for bucket, value in result:
+            hashes[bucket] ^= int(value, 16)
+        return [format(value, "064x") for value in hashes]
+
+    async def get_root(self, entity_type: str) -> str:
+        """Root hash of a tree"""
+        return root_hash(await self.get_bucket_hashes(entity_type))
+
+    async def get_leaves(self, entity_type: str, bucket: int) -> Dict[str, str]:
+        """Hash of every entity of a bucket, by entity ID"""
+        result = await self.db.execute(
+            select(SyncEntityHash.entity_id, SyncEntityHash.hash)
+            .where(SyncEntityHash.entity_type == entity_type, SyncEntityHash.bucket == bucket)
+            .order_by(SyncEntityHash.entity_id)
+        )
+        return {str(entity_id): value for entity_id, value in result.all()}
+
+    async def diff_buckets(self, entity_type: str, client_hashes: Dict[int, str]) -> List[int]:
+        """Buckets whose hash differs from the client's (missing client buckets count as empty)"""
+        server_hashes = await self.get_bucket_hashes(entity_type)
+        return [
+            bucket for bucket, value in enumerate(server_hashes)
+            if client_hashes.get(bucket, EMPTY_HASH) != value
+        ]
@@ -3,18 +3,24 @@ Cross-platform data synchronization service
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func, text
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timezone
+from sqlalchemy import select, func
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
-import json
-import hashlib
 from dataclasses import dataclass
 
-from app.models.document import Document, Chapter, Figure
-from app.models.knowledge import Knowledge
+from app.models.document import Document
 from app.models.learning import Card, SRS
 from app.models.base import BaseModel
+from app.models.sync import SyncChangeLog, SyncEntityHash
+from app.core.config import settings
+from app.services.sync_change_log import SYNC_ENTITY_MODELS, serialize_value
+from app.services.sync_merkle import MerkleTreeService
+
+
+class SyncHistoryExpired(Exception):
+    """The change log no longer holds every change since a client's last sync"""
+    pass
 
 
 @dataclass
@@ -39,87 +45,144 @@ class SyncMetadata:
     pending_changes: int
 
 
+@dataclass
+class SyncChangePage:
+    """Changes read from the change log, and the cursor to continue from"""
+    changes: List[SyncChange]
+    last_seq: int
+    has_more: bool
+
+
 class SyncService:
     """Service for handling cross-platform data synchronization"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.entity_models = {
-            "document": Document,
-            "chapter": Chapter,
-            "figure": Figure,
-            "knowledge": Knowledge,
-            "card": Card,
-            "srs": SRS
-        }
-    
-    async def get_changes_since(
-        self, 
-        last_sync_time: Optional[datetime],
-        client_id: str,
-        platform: str
-    ) -> List[SyncChange]:
-        """Get all changes since the last sync time"""
-        changes = []
-        
-        # If no last sync time, this is a full sync
-        if not last_sync_time:
-            return await self.get_full_sync_data(client_id, platform)
-        
-        # Get changes for each entity type
-        for entity_type, model_class in self.entity_models.items():
-            entity_changes = await self._get_entity_changes_since(
-                model_class, entity_type, last_sync_time, client_id
-            )
-            changes.extend(entity_changes)
-        
-        # Sort by timestamp
-        changes.sort(key=lambda x: x.timestamp)
-        
-        return changes
+        self.entity_models = SYNC_ENTITY_MODELS
     
-    async def _get_entity_changes_since(
+    async def get_changes_after(
         self,
-        model_class: BaseModel,
-        entity_type: str,
-        since_time: datetime,
-        client_id: str
-    ) -> List[SyncChange]:
-        """Get changes for a specific entity type since given time"""
-        changes = []
-        
-        # Get updated/created entities
-        stmt = select(model_class).where(
-            or_(
-                model_class.created_at > since_time,
-                model_class.updated_at > since_time
+        after_seq: int,
+        limit: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> SyncChangePage:
+        """
+        Page of logged changes after a sequence number
+        
+        Entries are read in sequence order with a range scan on the change
+        log's primary key, and the entries of one entity within the page are
+        merged into one change. A transaction still in flight may hold a
+        lower sequence number than one already committed, so the page stops
+        at a gap in the numbers until the entry after it is older than
+        ``sync_settle_seconds``; gaps left by rollbacks are skipped then.
+        """
+        limit = limit or settings.sync_pull_page_size
+        now = now or datetime.utcnow()
+        stmt = (
+            select(
+                SyncChangeLog.seq,
+                SyncChangeLog.entity_type,
+                SyncChangeLog.entity_id,
+                SyncChangeLog.operation,
+                SyncChangeLog.changes,
+                SyncChangeLog.client_id,
+                SyncChangeLog.created_at
             )
+            .where(SyncChangeLog.seq > after_seq)
+            .order_by(SyncChangeLog.seq)
+            .limit(limit + 1)
         )
-        
         result = await self.db.execute(stmt)
-        entities = result.scalars().all()
-        
-        for entity in entities:
-            # Determine operation type
-            operation = "create" if entity.created_at > since_time else "update"
-            
-            # Convert entity to dict
-            entity_data = await self._entity_to_dict(entity)
+        rows = result.all()
+        
+        settled_before = now - timedelta(seconds=settings.sync_settle_seconds)
+        page = []
+        last_seq = after_seq
+        for row in rows[:limit]:
+            if row.seq != last_seq + 1 and row.created_at > settled_before:
+                break
+            page.append(row)
+            last_seq = row.seq
+        
+        return SyncChangePage(
+            changes=self._coalesce_log_entries(page),
+            last_seq=last_seq,
+            has_more=len(page) == limit and len(rows) > limit
+        )
+    
+    async def get_changes_since(
+        self,
+        last_sync_time: datetime,
+        client_id: str,
+        platform: str,
+        limit: Optional[int] = None
+    ) -> SyncChangePage:
+        """Page of changes logged after a point in time, for clients without a sync token"""
+        after_seq = await self.get_seq_before(last_sync_time)
+        return await self.get_changes_after(after_seq, limit)
+    
+    async def check_history(self, after_seq: int) -> None:
+        """
+        Raise SyncHistoryExpired when entries after ``after_seq`` were pruned
+        
+        Checked before pulling after a sync token; the client then has to
+        pull without a token for a full sync.
+        """
+        result = await self.db.execute(select(func.min(SyncChangeLog.seq)))
+        first_seq = result.scalar()
+        if first_seq is not None and after_seq < first_seq - 1:
+            raise SyncHistoryExpired(f"Change log entries after {after_seq} were pruned")
+    
+    async def get_seq_before(self, last_sync_time: datetime, now: Optional[datetime] = None) -> int:
+        """
+        Sequence number to pull after for changes logged after a point in time
+        
+        Raises SyncHistoryExpired when entries logged since then may have been pruned.
+        """
+        if last_sync_time.tzinfo is not None:
+            last_sync_time = last_sync_time.astimezone(timezone.utc).replace(tzinfo=None)
+        now = now or datetime.utcnow()
+        if last_sync_time < now - timedelta(days=settings.sync_change_log_retention_days):
+            raise SyncHistoryExpired(f"Change log entries since {last_sync_time.isoformat()} may have been pruned")
+        
+        stmt = select(func.min(SyncChangeLog.seq)).where(SyncChangeLog.created_at > last_sync_time)
+        result = await self.db.execute(stmt)
+        first_seq = result.scalar()
+        return first_seq - 1 if first_seq is not None else await self.get_latest_seq()
+    
+    async def get_latest_seq(self) -> int:
+        """Sequence number of the latest change log entry"""
+        result = await self.db.execute(select(func.max(SyncChangeLog.seq)))
+        return result.scalar() or 0
+    
+    @staticmethod
+    def _coalesce_log_entries(rows: List[Any]) -> List[SyncChange]:
+        """One change per entity, in sequence order, from change log entries"""
+        changes: Dict[tuple, SyncChange] = {}
+        for row in rows:
+            key = (row.entity_type, row.entity_id)
+            change = changes.get(key)
+            if change is None or row.operation == "delete" or change.operation == "delete":
+                # Deletes (and re-creates) take the position of their own entry
+                changes.pop(key, None)
+                changes[key] = SyncChange(
+                    id=str(row.entity_id),
+                    entity_type=row.entity_type,
+                    operation=row.operation,
+                    data=dict(row.changes or {}),
+                    timestamp=row.created_at,
+                    client_id=row.client_id or "server",
+                    version=row.seq
+                )
+                continue
             
-            change = SyncChange(
-                id=str(entity.id),
-                entity_type=entity_type,
-                operation=operation,
-                data=entity_data,
-                timestamp=max(entity.created_at, entity.updated_at),
-                client_id="server",  # Server-originated change
-                version=1
-            )
-            changes.append(change)
+            change.data.update(row.changes or {})
+            change.timestamp = row.created_at
+            change.version = row.seq
+            if change.client_id != (row.client_id or "server"):
+                change.client_id = "server"
         
-        # TODO: Handle deleted entities (would need soft delete tracking)
-        
-        return changes
+        return list(changes.values())
     
     async def apply_change(self, change: SyncChange) -> SyncChange:
         """Apply a sync change to the database"""
@@ -222,46 +285,65 @@ class SyncService:
     
     async def _entity_to_dict(self, entity: BaseModel) -> Dict[str, Any]:
         """Convert entity to dictionary for sync"""
-        data = {}
-        
-        for column in entity.__table__.columns:
-            value = getattr(entity, column.name)
-            
-            # Convert special types to serializable formats
-            if isinstance(value, UUID):
-                data[column.name] = str(value)
-            elif isinstance(value, datetime):
-                data[column.name] = value.isoformat()
-            elif hasattr(value, "value"):  # Enum
-                data[column.name] = value.value
-            else:
-                data[column.name] = value
-        
-        return data
+        return {
+            column.name: serialize_value(getattr(entity, column.name))
+            for column in entity.__table__.columns
+        }
+    
+    async def iter_full_sync(
+        self,
+        batch_size: Optional[int] = None,
+        start_type: Optional[str] = None,
+        after_id: Optional[Any] = None
+    ) -> AsyncIterator[Tuple[str, List[SyncChange], Any]]:
+        """
+        All data in batches of one entity type
+        
+        Types follow in dependency order and entities in ID order, read a
+        batch at a time as plain rows, so memory stays bounded by the batch
+        size. Yields the entity type, changes and last ID of each batch;
+        ``start_type`` and ``after_id`` continue after a yielded batch.
+        """
+        batch_size = batch_size or settings.sync_pull_page_size
+        entity_types = list(self.entity_models)
+        if start_type is not None and start_type not in self.entity_models:
+            raise ValueError(f"Unknown entity type: {start_type}")
+        start = entity_types.index(start_type) if start_type else 0
+        
+        for entity_type in entity_types[start:]:
+            table = self.entity_models[entity_type].__table__
+            last_id = after_id if entity_type == start_type else None
+            while True:
+                stmt = select(table).order_by(table.c.id).limit(batch_size)
+                if last_id is not None:
+                    stmt = stmt.where(table.c.id > last_id)
+                result = await self.db.execute(stmt)
+                rows = result.mappings().all()
+                if not rows:
+                    break
+                
+                changes = [
+                    SyncChange(
+                        id=str(row["id"]),
+                        entity_type=entity_type,
+                        operation="create",
+                        data={key: serialize_value(value) for key, value in row.items()},
+                        timestamp=row["created_at"],
+                        client_id="server",
+                        version=1
+                    )
+                    for row in rows
+                ]
+                last_id = rows[-1]["id"]
+                yield entity_type, changes, last_id
+                if len(rows) < batch_size:
+                    break
     
     async def get_full_sync_data(self, client_id: str, platform: str) -> List[SyncChange]:
         """Get all data for full synchronization"""
         changes = []
-        
-        for entity_type, model_class in self.entity_models.items():
-            stmt = select(model_class).order_by(model_class.created_at)
-            result = await self.db.execute(stmt)
-            entities = result.scalars().all()
-            
-            for entity in entities:
-                entity_data = await self._entity_to_dict(entity)
-                
-                change = SyncChange(
-                    id=str(entity.id),
-                    entity_type=entity_type,
-                    operation="create",
-                    data=entity_data,
-                    timestamp=entity.created_at,
-                    client_id="server",
-                    version=1
-                )
-                changes.append(change)
-        
+        async for _, batch, _ in self.iter_full_sync():
+            changes.extend(batch)
         return changes
     
     async def update_sync_metadata(
@@ -286,27 +368,35 @@ class SyncService:
         }
     
     async def calculate_entity_checksum(self, entity_type: str, client_id: str) -> str:
-        """Calculate checksum for entity type to validate consistency"""
-        model_class = self.entity_models.get(entity_type)
-        if not model_class:
+        """Merkle root of an entity type, to validate consistency"""
+        if entity_type not in self.entity_models:
             return ""
         
-        # Get all entities of this type
-        stmt = select(model_class).order_by(model_class.id)
+        return await MerkleTreeService(self.db).get_root(entity_type)
+    
+    async def get_bucket_changes(self, entity_type: str, bucket: int) -> List[SyncChange]:
+        """Current data of the entities in one Merkle tree bucket"""
+        model_class = self.entity_models[entity_type]
+        stmt = select(model_class).where(model_class.id.in_(
+            select(SyncEntityHash.entity_id).where(
+                SyncEntityHash.entity_type == entity_type,
+                SyncEntityHash.bucket == bucket
+            )
+        )).order_by(model_class.id)
         result = await self.db.execute(stmt)
-        entities = result.scalars().all()
-        
-        # Create checksum from entity data
-        checksum_data = []
-        for entity in entities:
-            entity_data = await self._entity_to_dict(entity)
-            # Remove timestamps for consistency check
-            entity_data.pop("created_at", None)
-            entity_data.pop("updated_at", None)
-            checksum_data.append(json.dumps(entity_data, sort_keys=True))
-        
-        combined_data = "|".join(checksum_data)
-        return hashlib.sha256(combined_data.encode()).hexdigest()
+        
+        return [
+            SyncChange(
+                id=str(entity.id),
+                entity_type=entity_type,
+                operation="update",
+                data=await self._entity_to_dict(entity),
+                timestamp=entity.updated_at,
+                client_id="server",
+                version=1
+            )
+            for entity in result.scalars().all()
+        ]
     
     async def reset_sync_metadata(self, client_id: str, platform: str) -> None:
         """Reset sync metadata for full sync"""
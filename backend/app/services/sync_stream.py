@@ -0,0 +1,156 @@
+"""
+Streamed sync payloads
+
+Full syncs and delta pulls can be sent as NDJSON: one JSON object per
+line, written as batches are read from the database, so neither the
+server nor the client holds the whole payload. The stream is compressed
+with zstd (when ``zstandard`` is installed) or gzip, as negotiated from
+``Accept-Encoding``, and flushed after every line.
+
+Full sync lines:
+
+    {"type": "start", "sync_token": "..."}
+    {"type": "batch", "entity_type": "card", "changes": [...], "cursor": "..."}
+    {"type": "end", "next_sync_token": "...", "total_changes": 123}
+
+A full sync interrupted after a batch is resumed by passing that batch's
+``cursor``. The resumed stream keeps the sync token of the first request,
+so changes made in between are pulled afterwards.
+"""
+
+import base64
+import json
+import logging
+import zlib
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .sync_service import SyncService
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_sync_cursor(sync_token: int, entity_type: str, last_id: Any) -> str:
+    """Opaque cursor pointing after the last entity of a full sync batch"""
+    payload = json.dumps([sync_token, entity_type, str(last_id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str) -> Tuple[int, str, UUID]:
+    """(sync token, entity type, last ID) of a full sync cursor"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sync_token, entity_type, last_id = json.loads(payload)
+        return int(sync_token), str(entity_type), UUID(last_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported encoding of an Accept-Encoding header, None for identity"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    supported = ["zstd", "gzip"] if ZSTD_AVAILABLE else ["gzip"]
+    candidates = [
+        name for name in supported
+        if accepted.get(name, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda name: accepted.get(name, accepted.get("*", 0.0)))
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Compress a stream, flushing after every chunk so clients can decode each line as it arrives"""
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor().compressobj()
+        flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        async for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(flush_block)
+        yield compressor.flush()
+    else:
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        async for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def _line(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload, separators=(",", ":"), default=str) + "\n").encode()
+
+
+def _changes(changes: List[Any]) -> List[Dict[str, Any]]:
+    return [asdict(change) for change in changes]
+
+
+async def ndjson_full_sync(
+    sync_service: SyncService,
+    cursor: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """NDJSON lines of a full sync, starting after ``cursor`` if given"""
+    if cursor:
+        sync_token, start_type, after_id = decode_sync_cursor(cursor)
+    else:
+        # Changes logged while the data is read are pulled again later
+        sync_token, start_type, after_id = await sync_service.get_latest_seq(), None, None
+
+    yield _line({"type": "start", "sync_token": str(sync_token)})
+    total = 0
+    async for entity_type, changes, last_id in sync_service.iter_full_sync(batch_size, start_type, after_id):
+        total += len(changes)
+        yield _line({
+            "type": "batch",
+            "entity_type": entity_type,
+            "changes": _changes(changes),
+            "cursor": encode_sync_cursor(sync_token, entity_type, last_id)
+        })
+    yield _line({"type": "end", "next_sync_token": str(sync_token), "total_changes": total})
+
+
+async def ndjson_pull(
+    sync_service: SyncService,
+    after_seq: int,
+    limit: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """NDJSON lines of every change log page after ``after_seq``"""
+    total = 0
+    while True:
+        page = await sync_service.get_changes_after(after_seq, limit)
+        after_seq = page.last_seq
+        if page.changes:
+            total += len(page.changes)
+            yield _line({
+                "type": "batch",
+                "changes": _changes(page.changes),
+                "next_sync_token": str(after_seq)
+            })
+        if not page.has_more:
+            break
+    yield _line({"type": "end", "next_sync_token": str(after_seq), "total_changes": total})
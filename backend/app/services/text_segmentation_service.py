@@ -14,6 +14,9 @@ from nltk.corpus import stopwords
 
 from ..parsers.base import TextBlock
 
+# NLTK data only needs to be checked (and downloaded) once per process
+_nltk_data_checked = False
+
 
 @dataclass
 class TextSegment:
@@ -66,6 +69,10 @@ class TextSegmentationService:
     
     def _ensure_nltk_data(self):
         """Ensure required NLTK data is downloaded."""
+        global _nltk_data_checked
+        if _nltk_data_checked:
+            return
+        
         try:
             nltk.data.find('tokenizers/punkt')
         except LookupError:
@@ -75,6 +82,8 @@ class TextSegmentationService:
             nltk.data.find('corpora/stopwords')
         except LookupError:
             nltk.download('stopwords', quiet=True)
+        
+        _nltk_data_checked = True
     
     async def segment_text_blocks(
         self, 
@@ -0,0 +1,389 @@
+"""
+Continuous sampling profiler for the API process and the RQ workers
+
+A daemon thread reads the stacks of all other threads of the process at a
+fixed rate and counts them as folded stacks, grouped by the endpoint or job
+they were sampled in. Samples are statistical: a function's share of the
+samples of a label estimates its share of that label's CPU (and blocking)
+time. Each process writes its stacks to the profile directory, so the API can
+serve the profile of all processes as collapsed stacks for flame graphs or as
+a speedscope file.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Label of samples taken outside a registered endpoint or a labelled job
+OTHER_LABEL = "(other)"
+# Labels tracked before new ones are counted under OTHER_LABEL
+MAX_LABELS = 200
+# Distinct stacks kept per label before new ones are counted as TRUNCATED_STACK
+MAX_STACKS_PER_LABEL = 5000
+TRUNCATED_STACK = ("(truncated)",)
+# Innermost frames kept of deeper stacks
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of threads waiting for work; these samples are not recorded
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+}
+
+_FRAME_NAME = re.compile(r"^(.*) \((.*):(\d+)\)$")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling every thread of the process
+
+    Samples are taken from a thread with ``sys._current_frames()`` rather
+    than from a signal handler: handlers only ever see the main thread, and
+    the workers already use SIGALRM for job timeouts. A sample is attributed
+    to the innermost frame of a registered endpoint on its stack, which keeps
+    interleaved async requests apart, or else to the label of its thread.
+    """
+
+    # Seconds between the snapshots a process writes to the profile directory
+    SNAPSHOT_INTERVAL_SECONDS = 10.0
+    # Snapshot intervals after which a snapshot is left by an exited or
+    # restarted process, and removed
+    STALE_SNAPSHOT_INTERVALS = 3
+
+    def __init__(self, hz: Optional[int] = None):
+        self.hz = hz or settings.profiler_hz
+        self.role = "api"
+        self.directory: Optional[Path] = None
+        self.code_labels: Dict[Any, str] = {}
+        self.thread_labels: Dict[int, str] = {}
+        self.stacks: Dict[str, Dict[Tuple[str, ...], int]] = {}
+        self.samples = 0
+        self.idle_samples = 0
+        self.sampling_time = 0.0
+        # Wall time of earlier runs; the current run counts from started_at
+        self.run_time = 0.0
+        self.started_at: Optional[float] = None
+        self.last_snapshot = 0.0
+        self._frames: Dict[Any, Tuple[str, bool]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, role: str = "api", directory: Optional[str] = None) -> None:
+        """
+        Start sampling in this process
+
+        ``directory`` (default ``settings.profiler_dir``) receives the
+        process's snapshots as ``<role>-<pid>.json``; pass an empty string to
+        keep the profile in memory only.
+        """
+        if self.running:
+            return
+        directory = settings.profiler_dir if directory is None else directory
+        self.role = role
+        self.directory = Path(directory) if directory else None
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started at {self.hz} Hz ({role}, pid {os.getpid()})")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.run_time += time.time() - self.started_at
+        self.started_at = None
+        if self.directory is not None:
+            self.write_snapshot()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks = {}
+            self.samples = 0
+            self.idle_samples = 0
+            self.sampling_time = 0.0
+            self.run_time = 0.0
+            self.started_at = time.time() if self.running else None
+
+    def register_routes(self, app) -> None:
+        """Attribute the samples taken inside each route's endpoint to "METHOD path" """
+        for route in getattr(app, "routes", []):
+            endpoint = getattr(route, "endpoint", None)
+            methods = getattr(route, "methods", None)
+            if endpoint is None or not methods:
+                continue
+            label = f"{'|'.join(sorted(methods))} {route.path}"
+            while endpoint is not None:
+                code = getattr(endpoint, "__code__", None)
+                if code is not None:
+                    self.code_labels[code] = label
+                endpoint = getattr(endpoint, "__wrapped__", None)
+
+    @contextmanager
+    def label(self, name: str) -> Iterator[None]:
+        """Attribute the samples of the current thread to ``name`` inside the block"""
+        if not self.running:
+            yield
+            return
+        thread_id = threading.get_ident()
+        previous = self.thread_labels.get(thread_id)
+        self.thread_labels[thread_id] = name
+        try:
+            yield
+        finally:
+            if previous is None:
+                self.thread_labels.pop(thread_id, None)
+            else:
+                self.thread_labels[thread_id] = previous
+
+    def sample(self) -> None:
+        """Record the current stack of every thread but the sampling one"""
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        with self._lock:
+            self.samples += 1
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                if self._frame(frame.f_code)[1]:
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                label = None
+                while frame is not None:
+                    code = frame.f_code
+                    if label is None:
+                        label = self.code_labels.get(code)
+                    if len(stack) < MAX_STACK_DEPTH:
+                        stack.append(self._frame(code)[0])
+                    frame = frame.f_back
+                stack.reverse()
+                self._record(label or self.thread_labels.get(thread_id) or OTHER_LABEL, tuple(stack))
+
+    def _frame(self, code) -> Tuple[str, bool]:
+        """Folded-stack name of a code object and whether it is an idle leaf"""
+        cached = self._frames.get(code)
+        if cached is None:
+            filename = _short_path(code.co_filename)
+            name = getattr(code, "co_qualname", code.co_name).replace(";", ":")
+            cached = self._frames[code] = (
+                f"{name} ({filename}:{code.co_firstlineno})",
+                (os.path.basename(filename), code.co_name) in IDLE_FRAMES
+            )
+        return cached
+
+    def _record(self, label: str, stack: Tuple[str, ...]) -> None:
+        stacks = self.stacks.get(label)
+        if stacks is None:
+            if len(self.stacks) >= MAX_LABELS:
+                label = OTHER_LABEL
+            stacks = self.stacks.setdefault(label, {})
+        if stack not in stacks and len(stacks) >= MAX_STACKS_PER_LABEL:
+            stack = TRUNCATED_STACK
+        stacks[stack] = stacks.get(stack, 0) + 1
+
+    def _run(self) -> None:
+        interval = 1.0 / self.hz
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                self.sample()
+            except Exception as e:  # pragma: no cover - never let sampling take down a process
+                logger.warning(f"Profiler sample failed: {e}")
+            self.sampling_time += time.perf_counter() - start
+            if self.directory is not None and time.time() - self.last_snapshot >= self.SNAPSHOT_INTERVAL_SECONDS:
+                self.write_snapshot()
+            next_sample += interval
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                # Skip the samples missed while the process held the GIL
+                next_sample = time.perf_counter()
+                delay = 0
+            self._stop.wait(delay)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the profiler has been sampling"""
+        return self.run_time + (time.time() - self.started_at if self.started_at else 0.0)
+
+    @property
+    def overhead(self) -> float:
+        """Share of wall time spent taking samples"""
+        elapsed = self.elapsed
+        return self.sampling_time / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stacks = {
+                label: {";".join(stack): count for stack, count in label_stacks.items()}
+                for label, label_stacks in self.stacks.items()
+            }
+            return {
+                "role": self.role,
+                "pid": os.getpid(),
+                "hz": self.hz,
+                "running": self.running,
+                "elapsed": self.elapsed,
+                "samples": self.samples,
+                "idle_samples": self.idle_samples,
+                "sampling_time": self.sampling_time,
+                "overhead": self.overhead,
+                "stacks": stacks
+            }
+
+    def write_snapshot(self) -> None:
+        """Write this process's stacks for the API to merge"""
+        self.last_snapshot = time.time()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{self.role}-{os.getpid()}.json"
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(self.to_dict()))
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Failed to write profiler snapshot: {e}")
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """
+        Profile of this process followed by the snapshots of the other processes
+
+        Running profilers rewrite their snapshot every interval, so snapshots
+        not written for a few intervals are removed instead of merged.
+        """
+        profiles = [self.to_dict()]
+        directory = self.directory or (Path(settings.profiler_dir) if settings.profiler_dir else None)
+        if directory is None or not directory.is_dir():
+            return profiles
+        own = f"{self.role}-{os.getpid()}"
+        stale_before = time.time() - self.SNAPSHOT_INTERVAL_SECONDS * self.STALE_SNAPSHOT_INTERVALS
+        for path in sorted(directory.glob("*.json")):
+            if path.stem == own:
+                continue
+            try:
+                if path.stat().st_mtime < stale_before:
+                    path.unlink()
+                    continue
+                profiles.append(json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping profiler snapshot {path}: {e}")
+        return profiles
+
+
+def merge_stacks(profiles: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Folded stacks per label, summed over the profiles of several processes"""
+    merged: Dict[str, Dict[str, int]] = {}
+    for profile in profiles:
+        for label, stacks in profile.get("stacks", {}).items():
+            target = merged.setdefault(label, {})
+            for stack, count in stacks.items():
+                target[stack] = target.get(stack, 0) + count
+    return merged
+
+
+def label_samples(stacks: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    """Samples per label, most sampled first"""
+    totals = {label: sum(label_stacks.values()) for label, label_stacks in stacks.items()}
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def to_collapsed(stacks: Dict[str, Dict[str, int]], label: Optional[str] = None) -> str:
+    """
+    Stacks in the collapsed format of flamegraph.pl (``frame;frame count``)
+
+    Without ``label`` every label becomes the root frame of its stacks, so
+    one flame graph shows all endpoints and jobs side by side.
+    """
+    lines = []
+    for stack_label, label_stacks in stacks.items():
+        if label is not None and stack_label != label:
+            continue
+        prefix = "" if label is not None else f"{stack_label.replace(';', ':')};"
+        for stack, count in label_stacks.items():
+            lines.append(f"{prefix}{stack} {count}")
+    return "\n".join(sorted(lines)) + ("\n" if lines else "")
+
+
+def to_speedscope(stacks: Dict[str, Dict[str, int]], hz: int, label: Optional[str] = None,
+                  name: str = "price-action") -> Dict[str, Any]:
+    """Stacks as a speedscope file, with one sampled profile per label weighted in seconds"""
+    frames = []
+    frame_index: Dict[str, int] = {}
+    profiles = []
+    for stack_label, label_stacks in stacks.items():
+        if label is not None and stack_label != label:
+            continue
+        samples = []
+        weights = []
+        for stack, count in label_stacks.items():
+            indices = []
+            for frame in stack.split(";"):
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    frames.append(_speedscope_frame(frame))
+                indices.append(index)
+            samples.append(indices)
+            weights.append(count / hz)
+        profiles.append({
+            "type": "sampled",
+            "name": stack_label,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": __name__
+    }
+
+
+def _speedscope_frame(frame: str) -> Dict[str, Any]:
+    match = _FRAME_NAME.match(frame)
+    if match is None:
+        return {"name": frame}
+    return {"name": match.group(1), "file": match.group(2), "line": int(match.group(3))}
+
+
+def _short_path(filename: str) -> str:
+    """File path relative to the longest ``sys.path`` entry containing it"""
+    for prefix in _path_prefixes():
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+def _path_prefixes() -> List[str]:
+    entries = {os.path.abspath(entry or os.getcwd()) for entry in sys.path}
+    return sorted((entry.rstrip(os.sep) + os.sep for entry in entries), key=len, reverse=True)
+
+
+# Global profiler; started by the API and the workers when profiler_enabled is set
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,46 @@
+"""
+Backup import worker
+"""
+
+import logging
+import os
+
+from rq import get_current_job
+
+from app.core.database import SessionLocal
+from app.services.export_service import ExportService
+from app.services.local_queue import get_current_job as get_current_local_job
+
+logger = logging.getLogger(__name__)
+
+
+def import_jsonl_backup_file(file_path: str, delete_file: bool = True) -> dict:
+    """
+    Background worker function importing a JSONL backup from disk.
+
+    The file is read line by line and inserted in batches. Progress,
+    including bytes read out of ``bytes_total``, is published in the job's
+    meta after every batch.
+    """
+    job = get_current_job() or get_current_local_job()
+    bytes_total = os.path.getsize(file_path)
+
+    def report_progress(progress: dict) -> None:
+        if job:
+            job.meta['progress'] = {**progress, 'bytes_total': bytes_total}
+            job.save_meta()
+
+    db = SessionLocal()
+    try:
+        with open(file_path, 'rb') as backup:
+            result = ExportService(db).import_jsonl_stream(backup, on_progress=report_progress)
+    finally:
+        db.close()
+        if delete_file:
+            os.remove(file_path)
+
+    logger.info(
+        f"Imported backup {file_path}: {result['imported_documents']} documents, "
+        f"{result['imported_cards']} cards, {len(result['errors'])} errors"
+    )
+    return result
@@ -2,29 +2,166 @@
 Document processing worker
 """
 
-import asyncio
 import logging
+import time
+from typing import List
 from uuid import UUID
 
-from app.services.document_processing_pipeline import DocumentProcessingPipeline
+from rq import get_current_job
+from rq.exceptions import NoSuchJobError
+
+from app.core.config import settings
+from app.services.job_scheduler import JobScheduler
+from app.services.local_queue import get_current_job as get_current_local_job
+from app.workers.runtime import get_worker_runtime
 
 logger = logging.getLogger(__name__)
 
 
-def process_document(document_id_str: str) -> dict:
+def process_document(document_id_str: str, resume: bool = True) -> dict:
     """
     Background worker function to process a document through the complete pipeline.
     
-    This is the main entry point for RQ workers.
+    This is the main entry point for RQ workers. With ``resume`` the pipeline
+    continues from the document's last processing checkpoint. Jobs run on the
+    process-wide worker runtime, so models, the event loop and the pipeline
+    are reused across jobs. Large documents may be fanned out into
+    chapter-range jobs, in which case this job only parses the document.
+    Failures are raised so the queue's retry policy resumes the document.
     Requirements: 2.1, 2.2, 2.3, 2.4, 2.5 - Complete document processing pipeline
     """
     document_id = UUID(document_id_str)
     
+    # Keep the scheduler's queue positions and duration estimates current
+    job = _current_job()
+    scheduler = JobScheduler(job.connection) if job else None
+    if scheduler:
+        scheduler.mark_dequeued(job)
+    
     # Run async processing in sync context (required by RQ)
-    return asyncio.run(_process_document_async(document_id))
+    start = time.perf_counter()
+    result = get_worker_runtime().run(
+        _process_document_async(document_id, resume, allow_fan_out=settings.fanout_enabled)
+    )
+    
+    # A fanned-out job only covered parsing, which says little about speed per page
+    fanned_out = (result.get('pipeline_result') or {}).get('fanned_out')
+    if scheduler and not fanned_out:
+        scheduler.record_completion(job, time.perf_counter() - start)
+    
+    return result
+
+
+def process_document_part(document_id_str: str, part_index: int, chapter_ids: List[str]) -> dict:
+    """
+    Background worker function processing one chapter range of a large document.
+    
+    Progress is published in the job's meta after every chapter stage.
+    Failures are raised so the queue retries the part; retries resume from the
+    chapters already checkpointed, and the coordinator runs once the last
+    attempt has finished or failed.
+    Requirements: 2.3, 2.4, 2.5 - Knowledge extraction and card generation
+    """
+    document_id = UUID(document_id_str)
+    
+    job = _current_job()
+    scheduler = JobScheduler(job.connection) if job else None
+    if scheduler:
+        scheduler.mark_dequeued(job)
+    
+    def report_progress(progress: dict) -> None:
+        if job:
+            job.meta['progress'] = progress
+            job.save_meta()
+    
+    logger.info(f"Processing part {part_index} of document {document_id} ({len(chapter_ids)} chapters)")
+    
+    start = time.perf_counter()
+    try:
+        pipeline = get_worker_runtime().pipeline
+        pipeline_result = get_worker_runtime().run(
+            pipeline.process_document_part(document_id, chapter_ids, on_progress=report_progress)
+        )
+    except Exception as e:
+        logger.error(f"Error processing part {part_index} of document {document_id}: {str(e)}")
+        raise
+    
+    if scheduler:
+        scheduler.record_completion(job, time.perf_counter() - start)
+    
+    return {
+        'document_id': str(document_id),
+        'part_index': part_index,
+        'status': 'completed',
+        'pipeline_result': pipeline_result
+    }
 
 
-async def _process_document_async(document_id: UUID) -> dict:
+def finalize_document(document_id_str: str, part_job_ids: List[str]) -> dict:
+    """
+    Background worker function finishing a fanned-out document.
+    
+    Runs once all part jobs have finished or failed, merges their chapter
+    checkpoints and sets the document's final status.
+    Requirements: 1.4, 1.5 - Status tracking
+    """
+    document_id = UUID(document_id_str)
+    job = _current_job()
+    part_results = _collect_part_results(job, part_job_ids) if job else []
+    
+    try:
+        pipeline = get_worker_runtime().pipeline
+        result = get_worker_runtime().run(
+            pipeline.finalize_fanned_out_document(document_id, part_results)
+        )
+        return {
+            'document_id': str(document_id),
+            'status': 'completed',
+            'pipeline_result': result
+        }
+    except Exception as e:
+        logger.error(f"Error finalizing document {document_id}: {str(e)}")
+        return {
+            'document_id': str(document_id),
+            'status': 'failed',
+            'error': str(e)
+        }
+
+
+def _current_job():
+    """The job being executed, on either queue backend"""
+    return get_current_job() or get_current_local_job()
+
+
+def _collect_part_results(job, part_job_ids: List[str]) -> List[dict]:
+    """Status, result and last reported progress of each part job"""
+    parts = []
+    for index, job_id in enumerate(part_job_ids):
+        try:
+            # Part jobs live in the same backend as the coordinator job
+            part_job = type(job).fetch(job_id, connection=job.connection)
+        except NoSuchJobError:
+            parts.append({'index': index, 'job_id': job_id, 'status': 'missing'})
+            continue
+        
+        # Failed parts raised; the last line of the traceback names the error
+        exc_info = part_job.exc_info or ''
+        parts.append({
+            'index': index,
+            'job_id': job_id,
+            'status': part_job.get_status(),
+            'result': part_job.result,
+            'error': exc_info.strip().splitlines()[-1] if exc_info.strip() else None,
+            'progress': part_job.meta.get('progress')
+        })
+    return parts
+
+
+async def _process_document_async(
+    document_id: UUID,
+    resume: bool = True,
+    allow_fan_out: bool = False
+) -> dict:
     """
     Async document processing implementation using the DocumentProcessingPipeline.
     
@@ -39,11 +176,13 @@ async def _process_document_async(document_id: UUID) -> dict:
     logger.info(f"Starting complete pipeline processing for document {document_id}")
     
     try:
-        # Initialize the processing pipeline
-        pipeline = DocumentProcessingPipeline()
+        # Reuse the warm processing pipeline of this worker process
+        pipeline = get_worker_runtime().pipeline
         
         # Process the document through the complete pipeline
-        result = await pipeline.process_document(document_id)
+        result = await pipeline.process_document(
+            document_id, resume=resume, allow_fan_out=allow_fan_out
+        )
         
         logger.info(f"Successfully processed document {document_id} through complete pipeline")
         
@@ -55,9 +194,4 @@ async def _process_document_async(document_id: UUID) -> dict:
         
     except Exception as e:
         logger.error(f"Error processing document {document_id} through pipeline: {str(e)}")
-        
-        return {
-            'document_id': str(document_id),
-            'status': 'failed',
-            'error': str(e)
-        }
\ No newline at end of file
+        raise
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Background export workers
+"""
+
+import logging
+from typing import List, Optional
+from uuid import UUID
+
+from rq import get_current_job
+from rq.exceptions import NoSuchJobError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.export_jobs import assemble_export, export_storage, remove_expired_exports, render_part
+from app.services.local_queue import get_current_job as get_current_local_job
+
+logger = logging.getLogger(__name__)
+
+
+def render_export_part(
+    export_id: str,
+    export_format: str,
+    part_index: int,
+    document_id: Optional[str] = None,
+    chapter_ids: Optional[List[str]] = None,
+    card_count: int = 0
+) -> dict:
+    """
+    Background worker function rendering one chapter range of an export.
+
+    Cards written out of ``card_count`` are published in the job's meta
+    while the part file is written.
+    """
+    job = get_current_job() or get_current_local_job()
+
+    def report_progress(cards_written: int) -> None:
+        if job:
+            job.meta['progress'] = {'cards_written': cards_written, 'cards_total': card_count}
+            job.save_meta()
+
+    db = SessionLocal()
+    try:
+        part = render_part(
+            db,
+            export_storage(),
+            export_id,
+            export_format,
+            part_index,
+            document_id=UUID(document_id) if document_id else None,
+            chapter_ids=[UUID(chapter_id) for chapter_id in chapter_ids] if chapter_ids else None,
+            on_progress=report_progress
+        )
+        return {'status': 'completed', 'part_index': part_index, **part}
+    except Exception as e:
+        logger.error(f"Error rendering part {part_index} of export {export_id}: {str(e)}")
+        return {'status': 'failed', 'part_index': part_index, 'error': str(e)}
+    finally:
+        db.close()
+
+
+def finalize_export(export_id: str, export_format: str, part_job_ids: List[str], filename: str) -> dict:
+    """
+    Background worker function assembling an export from its parts.
+
+    Runs once all part jobs have finished or failed. The export fails if
+    any part did not complete.
+    """
+    job = get_current_job() or get_current_local_job()
+    part_results = [_part_result(job, job_id) for job_id in part_job_ids] if job else []
+    failed = [
+        result.get('error') or f"part {index} {result.get('status')}"
+        for index, result in enumerate(part_results) if result.get('status') != 'completed'
+    ]
+    if failed or not part_results:
+        logger.error(f"Export {export_id} failed: {failed}")
+        return {'status': 'failed', 'error': '; '.join(failed) or 'No parts rendered'}
+
+    try:
+        export_file = assemble_export(
+            export_storage(), export_id, export_format, [result['path'] for result in part_results], filename
+        )
+    except Exception as e:
+        logger.error(f"Error assembling export {export_id}: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+    cards = sum(result['cards'] for result in part_results)
+    logger.info(f"Export {export_id} completed: {cards} cards, {export_file['size']} bytes")
+    return {'status': 'completed', 'filename': filename, 'cards': cards, **export_file}
+
+
+def _part_result(job, job_id: str) -> dict:
+    """Result of a part job, or its status if it has none"""
+    try:
+        # Part jobs live in the same backend as the coordinator job
+        part_job = type(job).fetch(job_id, connection=job.connection)
+    except NoSuchJobError:
+        return {'status': 'missing'}
+    return part_job.result or {'status': part_job.get_status()}
+
+
+def cleanup_exports(reschedule: bool = True) -> dict:
+    """
+    Background worker function removing the files of exports whose job
+    results have expired, so downloads and files expire together.
+    
+    Runs once an hour and schedules its next run, so one job is pending at
+    any time.
+    """
+    from app.services.queue_service import QueueService
+    
+    queue_service = QueueService()
+    removed = remove_expired_exports(
+        export_storage(),
+        lambda export_id: queue_service.get_export_status(UUID(export_id)) is not None,
+        # Exports whose jobs are still being enqueued have no status yet
+        min_age_seconds=settings.export_job_timeout_seconds
+    )
+    
+    logger.info(f"Removed {removed} expired exports")
+    result = {'exports_removed': removed}
+    if reschedule:
+        result['next_job_id'] = queue_service.schedule_export_cleanup()
+    
+    return result
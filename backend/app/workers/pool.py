@@ -0,0 +1,172 @@
+"""
+Pre-forked pool of RQ workers
+
+The parent process loads NLP models once and then forks worker processes,
+which share the loaded models copy-on-write. Each child runs an RQ
+SimpleWorker, executing jobs in-process on a long-lived WorkerRuntime instead
+of forking a fresh work horse per job. Each process can listen on its own
+list of queues, which is how per-size-class concurrency limits are enforced.
+With the 'local' queue backend the children run LocalWorkers on the embedded
+SQLite job queue instead, so the pool doubles as the local process pool.
+"""
+
+import gc
+import logging
+import os
+import signal
+import time
+from typing import Dict, List, Optional
+
+import redis
+from rq import SimpleWorker
+
+from app.core.config import settings
+from app.services.local_queue import LocalJobStore, LocalWorker
+from app.utils.sampling_profiler import sampling_profiler
+from app.workers.runtime import get_worker_runtime
+
+logger = logging.getLogger(__name__)
+
+
+class ProfiledJobsMixin:
+    """Attributes the profiler samples taken while a job runs to its function"""
+
+    def execute_job(self, job, *args, **kwargs):
+        with sampling_profiler.label(f"job {job.func_name}"):
+            return super().execute_job(job, *args, **kwargs)
+
+
+class ProfiledSimpleWorker(ProfiledJobsMixin, SimpleWorker):
+    pass
+
+
+class ProfiledLocalWorker(ProfiledJobsMixin, LocalWorker):
+    pass
+
+
+class WorkerPool:
+    """Supervisor for a fixed number of forked RQ worker processes"""
+
+    # Children that exit sooner than this after starting are restarted with a delay
+    MIN_CHILD_LIFETIME_SECONDS = 5.0
+
+    def __init__(
+        self,
+        queue_plan: List[List[str]],
+        redis_url: str,
+        preload_models: bool = True,
+        name: str = "document-worker",
+        backend: str = "rq",
+        local_queue_path: Optional[str] = None
+    ):
+        if not queue_plan:
+            raise ValueError("Worker pool needs at least one process")
+        self.queue_plan = queue_plan  # Queue names per worker process
+        self.redis_url = redis_url
+        self.backend = backend
+        self.local_queue_path = local_queue_path
+        self.processes = len(queue_plan)
+        self.preload_models = preload_models
+        self.name = name
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self._started_at: Dict[int, float] = {}
+        self._stopping = False
+
+    def run(self) -> None:
+        """Warm up, fork the workers and supervise them until shutdown (blocking)"""
+        runtime = get_worker_runtime()
+        if self.preload_models:
+            timings = runtime.warm_up()
+            logger.info(f"Preloaded models before forking: {timings}")
+
+        # Move everything allocated so far out of the GC's reach so that
+        # collections in the children do not touch (and copy) shared pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+
+        for index in range(self.processes):
+            self._spawn(index)
+
+        logger.info(f"Started {self.processes} worker processes: {self.queue_plan}")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            index = self.children.pop(pid, None)
+            started_at = self._started_at.pop(pid, time.monotonic())
+            if index is None:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                logger.info(f"Worker process {pid} exited with code {exit_code}")
+                continue
+
+            logger.warning(f"Worker process {pid} died with code {exit_code}, restarting")
+            if time.monotonic() - started_at < self.MIN_CHILD_LIFETIME_SECONDS:
+                time.sleep(self.MIN_CHILD_LIFETIME_SECONDS)
+            self._spawn(index)
+
+        logger.info("Worker pool stopped")
+
+    def _spawn(self, index: int) -> Optional[int]:
+        """Fork a worker process"""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                exit_code = self._run_child(index)
+            except Exception as e:
+                logger.error(f"Worker process {os.getpid()} failed: {e}")
+            finally:
+                os._exit(exit_code)
+
+        self.children[pid] = index
+        self._started_at[pid] = time.monotonic()
+        return pid
+
+    def _run_child(self, index: int) -> int:
+        """Body of a forked worker process"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        get_worker_runtime().after_fork()
+        if settings.profiler_enabled:
+            sampling_profiler.start("worker")
+
+        worker_name = f"{self.name}-{index}-{os.getpid()}"
+        if self.backend == "local":
+            worker = ProfiledLocalWorker(
+                self.queue_plan[index],
+                connection=LocalJobStore(self.local_queue_path),
+                name=worker_name
+            )
+        else:
+            worker = ProfiledSimpleWorker(
+                self.queue_plan[index],
+                connection=redis.from_url(self.redis_url),
+                name=worker_name
+            )
+        # Only one process needs to run the scheduler for delayed/retried jobs
+        worker.work(with_scheduler=index == 0)
+
+        sampling_profiler.stop()
+        get_worker_runtime().close()
+        return 0
+
+    def _handle_shutdown(self, signum, frame) -> None:
+        """Forward shutdown signals to the workers and stop restarting them"""
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
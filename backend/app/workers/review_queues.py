@@ -0,0 +1,30 @@
+"""
+Daily review queue worker
+"""
+
+import logging
+
+from app.core.database import SessionLocal
+from app.services.daily_review_queue import DailyReviewQueueService
+
+logger = logging.getLogger(__name__)
+
+
+def build_daily_review_queues(reschedule: bool = True) -> dict:
+    """
+    Background worker function materializing the daily review queues of all users.
+    
+    Runs shortly after each UTC day boundary and schedules its next run, so
+    one job is pending at any time.
+    """
+    db = SessionLocal()
+    try:
+        result = DailyReviewQueueService(db).build_all()
+    finally:
+        db.close()
+    
+    if reschedule:
+        from app.services.queue_service import QueueService
+        result['next_job_id'] = QueueService().schedule_daily_review_queue_build()
+    
+    return result
@@ -0,0 +1,55 @@
+"""
+Sync change log maintenance worker
+"""
+
+import logging
+
+from app.core.database import SessionLocal
+from app.services.sync_change_log import SYNC_ENTITY_MODELS, prune_change_log
+from app.services.sync_merkle import repair_tree
+
+logger = logging.getLogger(__name__)
+
+
+def prune_sync_change_log(reschedule: bool = True) -> dict:
+    """
+    Background worker function deleting change log entries past their retention.
+    
+    Runs once a day and schedules its next run, so one job is pending at
+    any time.
+    """
+    db = SessionLocal()
+    try:
+        deleted = prune_change_log(db)
+    finally:
+        db.close()
+    
+    logger.info(f"Pruned {deleted} sync change log entries")
+    result = {'entries_deleted': deleted}
+    if reschedule:
+        from app.services.queue_service import QueueService
+        result['next_job_id'] = QueueService().schedule_sync_change_log_prune()
+    
+    return result
+
+
+def repair_merkle_trees(reschedule: bool = True) -> dict:
+    """
+    Background worker function rehashing every synced entity and fixing
+    the Merkle tree leaves that differ.
+    
+    Runs once a day and schedules its next run, so one job is pending at
+    any time.
+    """
+    db = SessionLocal()
+    try:
+        repaired = {entity_type: repair_tree(db, entity_type) for entity_type in SYNC_ENTITY_MODELS}
+    finally:
+        db.close()
+    
+    result = {'leaves_repaired': repaired}
+    if reschedule:
+        from app.services.queue_service import QueueService
+        result['next_job_id'] = QueueService().schedule_merkle_tree_repair()
+    
+    return result
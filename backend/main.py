@@ -15,9 +15,16 @@ from app.api.health import router as health_router
 from app.api.documents import router as documents_router
 from app.api.queue import router as queue_router
 from app.routes.cards import router as cards_router
+from app.api.monitoring import metrics_router, profile_router
+
+# Import middleware
+from app.middleware import PerformanceMiddleware
 
 # Import database initialization
 from app.core.database import init_db, create_tables
+from app.core.config import settings
+from app.services.review_service import pending_grade_flusher
+from app.utils.sampling_profiler import sampling_profiler
 
 # Ensure upload directory exists and is consistent with Docker volume
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
@@ -41,6 +48,20 @@ async def startup_event():
         logging.warning(f"Database initialization failed: {e}")
         logging.warning("Application will continue without database connection")
 
+    if settings.profiler_enabled:
+        sampling_profiler.register_routes(app)
+        sampling_profiler.start("api")
+
+    if settings.review_write_behind:
+        pending_grade_flusher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write buffered review grades and the final profile of this process"""
+    if settings.review_write_behind:
+        pending_grade_flusher.stop()
+    sampling_profiler.stop()
+
 # Configure CORS using environment variable
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 app.add_middleware(
@@ -51,6 +72,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histograms, exposed at /metrics
+app.add_middleware(PerformanceMiddleware)
+
 # Global exception handlers for better error reporting
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -87,6 +111,8 @@ app.include_router(health_router, prefix="/api", tags=["health"])
 app.include_router(documents_router, tags=["documents"])
 app.include_router(queue_router, tags=["queue"])
 app.include_router(cards_router)
+app.include_router(metrics_router)
+app.include_router(profile_router)
 
 @app.get("/")
 async def root():
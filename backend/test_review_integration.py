@@ -273,8 +273,8 @@ async def test_concurrent_sessions(db):
     
     # Verify sessions are independent
     assert session1.session_id != session2.session_id
-    assert session1.session_id in review_service._active_sessions
-    assert session2.session_id in review_service._active_sessions
+    assert review_service.get_session(session1.session_id) is not None
+    assert review_service.get_session(session2.session_id) is not None
     
     # Grade cards in both sessions if available
     if session1.total_cards > 0:
@@ -289,8 +289,8 @@ async def test_concurrent_sessions(db):
     
     # Verify sessions remain independent
     if session1.total_cards > 0 and session2.total_cards > 0:
-        s1 = review_service._active_sessions[session1.session_id]
-        s2 = review_service._active_sessions[session2.session_id]
+        s1 = review_service.get_session(session1.session_id)
+        s2 = review_service.get_session(session2.session_id)
         
         assert s1.completed_cards == 1
         assert s2.completed_cards == 1
@@ -375,19 +375,17 @@ async def test_session_cleanup(db):
         print("  - Completed a test session")
     
     # Manually set end time to past for testing
-    if session.session_id in review_service._active_sessions:
-        review_service._active_sessions[session.session_id].end_time = \
-            datetime.utcnow() - timedelta(hours=25)
+    state = review_service.session_store.get(session.session_id)
+    if state is not None:
+        state.end_time = datetime.utcnow() - timedelta(hours=25)
+        review_service.session_store.save(state)
         print("  - Set session end time to 25 hours ago")
     
-    # Count sessions before cleanup
-    sessions_before = len(review_service._active_sessions)
-    
     # Cleanup old sessions
     cleaned_count = review_service.cleanup_completed_sessions(hours_old=24)
     
     print(f"  - Cleaned up {cleaned_count} old sessions")
-    print(f"  - Sessions before: {sessions_before}, after: {len(review_service._active_sessions)}")
+    print(f"  - Session still stored: {review_service.get_session(session.session_id) is not None}")
     
     print("✓ Session cleanup working correctly")
 
@@ -1,14 +1,21 @@
 """
-Factory classes for creating test data using factory_boy.
+Factory classes for creating test data using factory_boy, and builders of
+small SQLite test databases.
 """
 import factory
 from factory import Faker, SubFactory
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 from uuid import uuid4
 
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.database import Base
 from app.models.document import Document, Chapter, Figure
-from app.models.knowledge import Knowledge
-from app.models.learning import Card, SRS
+from app.models.knowledge import Knowledge, KnowledgeType
+from app.models.learning import Card, SRS, CardType
 
 
 class DocumentFactory(factory.Factory):
@@ -204,4 +211,69 @@ class OverdueCardSRSFactory(SRSFactory):
     
     due_date = factory.LazyFunction(lambda: datetime.now() - timedelta(days=3))
     interval = 7
-    repetitions = 2
\ No newline at end of file
+    repetitions = 2
+
+
+# Database builders
+#
+# Documents are built as unsaved object graphs (chapters, knowledge points,
+# cards and SRS records attached through their relationships), so the same
+# builders serve sync and async sessions: add the document and commit.
+
+def sqlite_engine(path) -> Engine:
+    """Engine of a SQLite database file with all tables created"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+async def async_sqlite_engine(path) -> AsyncEngine:
+    """Async engine of a SQLite database file with all tables created"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def make_document(filename: str = "notes.md", chapters: int = 1, first_chapter: int = 1) -> Document:
+    """A document with empty chapters "Chapter <n>", numbered from ``first_chapter``"""
+    return Document(
+        filename=filename,
+        file_type=filename.rsplit(".", 1)[-1],
+        file_path=filename,
+        file_size=1,
+        chapters=[
+            Chapter(title=f"Chapter {index}", level=1, order_index=index)
+            for index in range(first_chapter, first_chapter + chapters)
+        ]
+    )
+
+
+def add_figure(chapter: Chapter, image_path: str, page_number: int = 1, **columns) -> Figure:
+    """Figure added to a chapter"""
+    figure = Figure(image_path=image_path, page_number=page_number, **columns)
+    chapter.figures.append(figure)
+    return figure
+
+
+def add_knowledge(chapter: Chapter, text: str = "Fact", kind: KnowledgeType = KnowledgeType.FACT, **columns) -> Knowledge:
+    """Knowledge point added to a chapter"""
+    knowledge = Knowledge(kind=kind, text=text, **columns)
+    chapter.knowledge_points.append(knowledge)
+    return knowledge
+
+
+def add_card(
+    knowledge: Knowledge,
+    front: str,
+    back: str = "A",
+    card_type: CardType = CardType.QA,
+    srs: Optional[Dict[str, Any]] = None,
+    **columns
+) -> Card:
+    """Card added to a knowledge point, with an SRS record of the ``srs`` columns unless None"""
+    card = Card(card_type=card_type, front=front, back=back, **columns)
+    knowledge.cards.append(card)
+    if srs is not None:
+        card.srs_records.append(SRS(**srs))
+    return card
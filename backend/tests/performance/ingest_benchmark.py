@@ -0,0 +1,217 @@
+"""
+Reproducible ingest benchmark.
+
+Runs synthetic documents of fixed size and content through the stages of
+the document processing pipeline (parse, chapter extraction, and per chapter
+segmentation, knowledge extraction and card generation) without the
+database, so only the processing itself is measured. Stage times and peak
+memory come from the pipeline's tracing spans. Results are stored in the
+PerformanceBaselineManager format, and the processing times of the current
+runs are compared with the stored history by PerformanceRegressionDetector.
+"""
+
+import gc
+import random
+import time
+import uuid
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.models.knowledge import Knowledge
+from app.parsers.factory import get_parser_for_file
+from app.services.card_generation_service import CardGenerationService
+from app.services.chapter_service import ChapterExtractor
+from app.services.knowledge_extraction_service import KnowledgeExtractionService
+from app.services.performance_regression_detector import (
+    PerformanceRegressionDetector,
+    RegressionDetectionResult,
+)
+from app.services.pipeline_tracing import PipelineTracer, trace_span
+from app.services.text_segmentation_service import TextSegmentationService
+from tests.test_data.performance_baseline_manager import PerformanceMetric
+
+# Page counts of the benchmark documents
+INGEST_CASES = {"small": 5, "medium": 20, "large": 50}
+INGEST_FORMATS = ("pdf", "docx", "md")
+INGEST_SEED = 1234
+INGEST_STAGES = ("parse", "extract_chapters", "segment", "extract", "generate")
+
+# Metric the regression gate compares; higher is slower
+GATED_METRIC = "ingest_processing_time"
+# Most recent stored runs the current runs are compared with
+BASELINE_SAMPLES = 30
+# Timed runs per document, after one warm-up run
+RUNS_PER_CASE = 10
+# Fewer stored runs than this only record a baseline; with the current runs
+# they must reach the detector's minimum of 30 samples
+MIN_BASELINE_SAMPLES = 20
+# Significant slowdowns smaller than this are measurement noise, not regressions
+MIN_SLOWDOWN_PERCENT = 5.0
+
+
+@dataclass
+class IngestRun:
+    """Counts, stage times and peak memory of one document run."""
+    test_case: str
+    file_format: str
+    pages: int
+    seconds: float
+    counts: Dict[str, int]
+    stages: Dict[str, Dict[str, Any]]
+
+    def stage_seconds(self, stage: str) -> float:
+        return self.stages.get(stage, {}).get("duration_ms", 0.0) / 1000
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        """
+        Throughput of the run: pages over the whole run, and segments,
+        knowledge points and cards over the stage producing them.
+        """
+        def per_second(count: int, seconds: float) -> float:
+            return count / seconds if seconds > 0 else 0.0
+
+        return {
+            "pages_per_second": per_second(self.pages, self.seconds),
+            "segments_per_second": per_second(self.counts["segments"], self.stage_seconds("segment")),
+            "knowledge_per_second": per_second(self.counts["knowledge"], self.stage_seconds("extract")),
+            "cards_per_second": per_second(self.counts["cards"], self.stage_seconds("generate")),
+        }
+
+    def to_metrics(self, environment: str) -> List[PerformanceMetric]:
+        """The run as PerformanceBaselineManager metrics."""
+        timestamp = datetime.now().isoformat()
+        metadata = {"file_format": self.file_format, "pages": self.pages, **self.counts}
+
+        def metric(name: str, value: float, unit: str) -> PerformanceMetric:
+            return PerformanceMetric(name, value, unit, timestamp, self.test_case, environment, metadata)
+
+        metrics = [metric(GATED_METRIC, self.seconds, "seconds")]
+        metrics.extend(metric(name, value, "per_second") for name, value in self.rates.items())
+        for stage in INGEST_STAGES:
+            if stage in self.stages:
+                metrics.append(metric(f"ingest_{stage}_time", self.stages[stage]["duration_ms"], "milliseconds"))
+                metrics.append(metric(f"ingest_{stage}_peak_memory", self.stages[stage]["peak_rss_mb"], "megabytes"))
+        return metrics
+
+
+class IngestBenchmark:
+    """Pipeline stages with their services loaded once, as in a warm worker."""
+
+    def __init__(self):
+        self.chapter_extractor = ChapterExtractor()
+        self.text_segmentation = TextSegmentationService()
+        self.knowledge_extraction = KnowledgeExtractionService()
+        self.card_generation = CardGenerationService()
+
+    async def run(self, path: Path, test_case: str, pages: int, seed: int = INGEST_SEED) -> IngestRun:
+        """Process one document and return what each stage produced and cost."""
+        # Card generation picks distractors and templates at random
+        random.seed(seed)
+        gc.collect()
+        counts = {"chapters": 0, "segments": 0, "knowledge": 0, "cards": 0}
+        tracer = PipelineTracer()
+
+        start = time.perf_counter()
+        with tracer.span("ingest", file_format=path.suffix.lstrip(".")):
+            with trace_span("parse", page_count=pages):
+                parsed_content = await get_parser_for_file(path).parse(path)
+            with trace_span("extract_chapters"):
+                chapters = await self.chapter_extractor.extract_chapters(path, parsed_content)
+            counts["chapters"] = len(chapters)
+
+            for chapter in chapters:
+                chapter_id = str(uuid.UUID(int=chapter.order_index))
+                content = "\n\n".join(block.text for block in chapter.content_blocks)
+                with trace_span("segment"):
+                    segments = await self.text_segmentation.segment_text(
+                        content, chapter_id, chapter.page_start or 1
+                    )
+                with trace_span("extract"):
+                    extracted = await self.knowledge_extraction.extract_knowledge_from_segments(
+                        segments, chapter_id
+                    )
+                # Unsaved rows, as the pipeline hands to card generation after persisting them
+                knowledge_points = [
+                    Knowledge(
+                        id=uuid.UUID(int=(chapter.order_index << 32) + index),
+                        chapter_id=uuid.UUID(chapter_id),
+                        kind=point.kind,
+                        text=point.text,
+                        entities=point.entities,
+                        anchors=point.anchors,
+                        confidence_score=point.confidence
+                    )
+                    for index, point in enumerate(extracted)
+                ]
+                with trace_span("generate"):
+                    cards = await self.card_generation.generate_cards_from_knowledge(knowledge_points)
+
+                counts["segments"] += len(segments)
+                counts["knowledge"] += len(knowledge_points)
+                counts["cards"] += len(cards)
+        seconds = time.perf_counter() - start
+
+        return IngestRun(
+            test_case=test_case,
+            file_format=path.suffix.lstrip("."),
+            pages=pages,
+            seconds=seconds,
+            counts=counts,
+            stages=tracer.summary()["stages"]
+        )
+
+
+def session_metrics(runs: List[IngestRun], environment: str) -> List[PerformanceMetric]:
+    """
+    Metrics to store for the runs of one document: the processing time of
+    every run, which the regression gate compares, and the mean of each
+    other metric over the runs.
+    """
+    per_run = [run.to_metrics(environment) for run in runs]
+    metrics = [metric for run_metrics in per_run for metric in run_metrics if metric.name == GATED_METRIC]
+    for index, metric in enumerate(per_run[0]):
+        if metric.name != GATED_METRIC:
+            values = [run_metrics[index].value for run_metrics in per_run]
+            metrics.append(replace(metric, value=sum(values) / len(values)))
+    return metrics
+
+
+def detector_series(baseline: List[float], current: List[float],
+                    comparison_window_hours: float) -> List[Dict[str, Any]]:
+    """
+    Detector input with the stored runs before its comparison window and
+    the current runs inside it, each side in the order it was measured.
+    """
+    now = datetime.now()
+    cutoff = now - timedelta(hours=comparison_window_hours)
+    return [
+        {"timestamp": cutoff - timedelta(seconds=len(baseline) - index), "value": value}
+        for index, value in enumerate(baseline)
+    ] + [
+        {"timestamp": now - timedelta(seconds=len(current) - 1 - index), "value": value}
+        for index, value in enumerate(current)
+    ]
+
+
+async def check_slowdown(detector: PerformanceRegressionDetector, baseline: List[float],
+                         current: List[float], metric_name: str = GATED_METRIC
+                         ) -> Tuple[bool, RegressionDetectionResult]:
+    """
+    Whether the current runs are significantly slower than the stored ones.
+
+    Only the detector's significance test gates: its anomaly and trend
+    checks flag outliers within either side, which say nothing about this
+    change.
+    """
+    result = await detector.detect_regression(
+        detector_series(baseline, current, detector.comparison_window_hours), metric_name
+    )
+    statistical = result.analysis_details.get("statistical", {})
+    slowdown = (
+        bool(statistical.get("significant_degradation"))
+        and result.degradation_percentage > MIN_SLOWDOWN_PERCENT
+    )
+    return slowdown, result
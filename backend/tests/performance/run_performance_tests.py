@@ -87,6 +87,16 @@ class PerformanceTestRunner:
                     "error_rate": 0.05,
                 }
             ),
+            "ingest_benchmark": PerformanceTestSuite(
+                name="Ingest Benchmark",
+                test_modules=[
+                    "backend/tests/performance/test_ingest_benchmark.py"
+                ],
+                thresholds={
+                    "min_slowdown_percent": 5.0,
+                    "significance_level": 0.05,
+                }
+            ),
         }
         
     def get_system_info(self) -> Dict[str, Any]:
@@ -236,7 +246,7 @@ def main():
     parser = argparse.ArgumentParser(description="Run performance tests")
     parser.add_argument(
         "--suite", 
-        choices=["document_processing", "search_performance", "memory_monitoring", "concurrent_users", "all"],
+        choices=["document_processing", "search_performance", "memory_monitoring", "concurrent_users", "ingest_benchmark", "all"],
         default="all",
         help="Test suite to run"
     )
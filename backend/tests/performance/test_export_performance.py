@@ -0,0 +1,149 @@
+"""Export benchmarks: joined SRS projection and batched backup loading vs. per-row queries."""
+
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from app.core.database import Base
+from app.models.document import Chapter, Document, Figure
+from app.models.knowledge import Knowledge
+from app.models.learning import Card, SRS
+from app.services.export_service import ExportService
+
+DOCUMENTS = 10
+CHAPTERS_PER_DOCUMENT = 10
+KNOWLEDGE_PER_CHAPTER = 10
+CARDS_PER_KNOWLEDGE = 100
+TOTAL_CARDS = DOCUMENTS * CHAPTERS_PER_DOCUMENT * KNOWLEDGE_PER_CHAPTER * CARDS_PER_KNOWLEDGE
+
+
+def per_card_last_reviewed(db):
+    """The previous Notion export lookup: one SRS query per card"""
+    values = []
+    for card in ExportService(db)._iter_cards_for_export():
+        srs = db.query(SRS).filter(SRS.card_id == card.id).first()
+        values.append(srs.last_reviewed.isoformat() if srs and srs.last_reviewed else "")
+    return values
+
+
+def joined_chapter_trees(db):
+    """The previous backup loading: one joined chapter query per document"""
+    chapters = 0
+    for document in db.query(Document).all():
+        chapters += len(
+            db.query(Chapter).filter(Chapter.document_id == document.id)
+            .options(
+                joinedload(Chapter.figures),
+                joinedload(Chapter.knowledge_points).joinedload(Knowledge.cards).joinedload(Card.srs_records)
+            ).all()
+        )
+    return chapters
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    """100k cards over ten documents, some with several SRS records"""
+    path = tmp_path_factory.mktemp("export") / "export.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    stamps = {'created_at': now, 'updated_at': now}
+    rows = {Document: [], Chapter: [], Figure: [], Knowledge: [], Card: [], SRS: []}
+    for d in range(DOCUMENTS):
+        document_id = str(uuid.uuid4())
+        rows[Document].append({'id': document_id, 'filename': f"book{d}.pdf", 'file_type': 'pdf',
+                               'file_path': f"book{d}.pdf", 'file_size': 1, 'status': 'completed', **stamps})
+        for c in range(CHAPTERS_PER_DOCUMENT):
+            chapter_id = str(uuid.uuid4())
+            rows[Chapter].append({'id': chapter_id, 'document_id': document_id, 'title': f"Chapter {c}",
+                                  'level': 1, 'order_index': c, **stamps})
+            rows[Figure].extend({'id': str(uuid.uuid4()), 'chapter_id': chapter_id, 'image_path': f"{chapter_id}-{f}.png",
+                                 'page_number': c, **stamps} for f in range(3))
+            for k in range(KNOWLEDGE_PER_CHAPTER):
+                knowledge_id = str(uuid.uuid4())
+                rows[Knowledge].append({'id': knowledge_id, 'chapter_id': chapter_id, 'kind': 'FACT',
+                                        'text': f"Fact {k}", 'entities': ['term'], 'anchors': {'page': c}, **stamps})
+                for i in range(CARDS_PER_KNOWLEDGE):
+                    card_id = str(uuid.uuid4())
+                    rows[Card].append({'id': card_id, 'knowledge_id': knowledge_id, 'card_type': 'QA',
+                                       'front': f"Question {i}", 'back': f"Answer {i}", 'difficulty': 1.5, **stamps})
+                    for _ in range(1 + (rng.random() < 0.3)):
+                        reviewed = rng.random() < 0.5
+                        rows[SRS].append({
+                            'id': str(uuid.uuid4()), 'card_id': card_id, 'ease_factor': 2.5, 'interval': 1,
+                            'repetitions': 0, 'due_date': now,
+                            'last_reviewed': now - timedelta(minutes=rng.randint(0, 10_000)) if reviewed else None,
+                            **stamps
+                        })
+    with engine.begin() as connection:
+        for model, model_rows in rows.items():
+            connection.execute(insert(model.__table__), model_rows)
+
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestExportPerformance:
+    """Exporting 100k cards."""
+
+    def test_notion_export_with_joined_srs(self, database):
+        """The latest SRS record must come from the card query, not one query per card."""
+        db = database()
+        start = time.perf_counter()
+        expected = per_card_last_reviewed(db)
+        per_card_seconds = time.perf_counter() - start
+        db.expunge_all()
+
+        queries = count_queries(db)
+        start = time.perf_counter()
+        content = ExportService(db).export_notion_csv()
+        joined_seconds = time.perf_counter() - start
+        db.close()
+
+        print(f"\nNotion CSV export, {TOTAL_CARDS} cards:")
+        print(f"  SRS query per card: {per_card_seconds * 1000:.0f}ms (lookups only)")
+        print(f"  Joined projection:  {joined_seconds * 1000:.0f}ms (whole export)")
+
+        assert len(expected) == content.count('\n') - 1 == TOTAL_CARDS
+        assert len(queries) == 1
+        assert joined_seconds < per_card_seconds
+
+    def test_jsonl_backup_with_batched_loading(self, database):
+        """Backups load each relationship level with IN batches instead of joined row products."""
+        db = database()
+        start = time.perf_counter()
+        assert joined_chapter_trees(db) == DOCUMENTS * CHAPTERS_PER_DOCUMENT
+        joined_seconds = time.perf_counter() - start
+        db.expunge_all()
+
+        queries = count_queries(db)
+        start = time.perf_counter()
+        total_cards = sum(
+            json.loads(line)['export_metadata']['total_cards']
+            for line in ExportService(db).iter_jsonl_backup()
+        )
+        batched_seconds = time.perf_counter() - start
+        db.close()
+
+        print(f"\nJSONL backup, {TOTAL_CARDS} cards:")
+        print(f"  Joined chapter trees: {joined_seconds * 1000:.0f}ms (loading only)")
+        print(f"  Batched selectin:     {batched_seconds * 1000:.0f}ms (whole export, {len(queries)} queries)")
+
+        assert total_cards == TOTAL_CARDS
+        # IN lists are chunked, so queries grow with rows / 500, not with rows
+        assert len(queries) < TOTAL_CARDS / 250
+        assert batched_seconds < joined_seconds
@@ -0,0 +1,119 @@
+"""End-to-end ingest throughput benchmarks with regression gating."""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from app.services.performance_regression_detector import PerformanceRegressionDetector
+from tests.test_data.performance_baseline_manager import PerformanceBaselineManager
+from tests.test_data.synthetic_data_generator import SyntheticDataGenerator
+from .ingest_benchmark import (
+    BASELINE_SAMPLES,
+    GATED_METRIC,
+    INGEST_CASES,
+    INGEST_FORMATS,
+    INGEST_SEED,
+    INGEST_STAGES,
+    MIN_BASELINE_SAMPLES,
+    RUNS_PER_CASE,
+    IngestBenchmark,
+    check_slowdown,
+    session_metrics,
+)
+
+# Stored runs are only comparable on the same machine, so each environment
+# keeps its own history; CI sets its name and keeps the directory between builds.
+# Runs are stored outside the source tree unless the baselines committed with
+# the tests are being updated.
+BENCHMARK_ENVIRONMENT = os.getenv("INGEST_BENCHMARK_ENV", "local")
+COMMITTED_BASELINE_DIR = Path(__file__).parent.parent / "test_data" / "performance" / "ingest"
+UPDATE_BASELINES = os.getenv("INGEST_BENCHMARK_UPDATE_BASELINES", "").lower() in ("1", "true", "yes")
+BASELINE_DIR = str(COMMITTED_BASELINE_DIR) if UPDATE_BASELINES else os.getenv(
+    "INGEST_BENCHMARK_DIR",
+    str(Path(tempfile.gettempdir()) / "ingest-benchmark")
+)
+
+
+@pytest.fixture(scope="module")
+def ingest_documents(tmp_path_factory):
+    """The same synthetic documents on every run and every machine."""
+    generator = SyntheticDataGenerator(str(tmp_path_factory.mktemp("ingest")))
+    return {
+        size: generator.generate_ingest_documents(pages, INGEST_FORMATS, seed=INGEST_SEED)
+        for size, pages in INGEST_CASES.items()
+    }
+
+
+@pytest.fixture(scope="module")
+def ingest_benchmark():
+    return IngestBenchmark()
+
+
+@pytest.fixture(scope="module")
+def baseline_manager():
+    directory = Path(BASELINE_DIR) / BENCHMARK_ENVIRONMENT
+    committed = COMMITTED_BASELINE_DIR / BENCHMARK_ENVIRONMENT
+    # A new output directory starts from the committed history of its environment
+    if directory != committed and committed.is_dir() and not directory.exists():
+        shutil.copytree(committed, directory)
+    return PerformanceBaselineManager(str(directory))
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+class TestIngestBenchmark:
+    """Throughput of synthetic documents through every pipeline stage."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("file_format", INGEST_FORMATS)
+    @pytest.mark.parametrize("size", list(INGEST_CASES))
+    async def test_ingest_throughput(self, size, file_format, ingest_documents,
+                                     ingest_benchmark, baseline_manager):
+        """Ingest must not get significantly slower than the stored runs."""
+        pages = INGEST_CASES[size]
+        test_case = f"{size}_{file_format}_{pages}_pages"
+        path = ingest_documents[size][file_format]
+
+        await ingest_benchmark.run(path, test_case, pages)
+        runs = [await ingest_benchmark.run(path, test_case, pages) for _ in range(RUNS_PER_CASE)]
+
+        # Same input, same output: a change in counts invalidates the comparison
+        assert len({tuple(sorted(run.counts.items())) for run in runs}) == 1, "Ingest output is not deterministic"
+        counts = runs[0].counts
+        assert counts["segments"] > 0 and counts["knowledge"] > 0 and counts["cards"] > 0
+
+        mean = {name: sum(run.rates[name] for run in runs) / len(runs) for name in runs[0].rates}
+        print(f"\nIngest {test_case} ({counts['chapters']} chapters, {counts['segments']} segments, "
+              f"{counts['knowledge']} knowledge points, {counts['cards']} cards):")
+        print(f"  Processing time: {min(run.seconds for run in runs):.3f}s best, "
+              f"{sum(run.seconds for run in runs) / len(runs):.3f}s mean")
+        for name, value in mean.items():
+            print(f"  {name}: {value:.1f}")
+        for stage in INGEST_STAGES:
+            print(f"  {stage}: {runs[-1].stages[stage]['duration_ms']:.1f}ms, "
+                  f"peak {max(run.stages[stage]['peak_rss_mb'] for run in runs):.1f}MB")
+
+        trends = baseline_manager.get_performance_trends(GATED_METRIC, test_case, days=90)
+        history = trends.get("values", [])[-BASELINE_SAMPLES:]
+        current = [run.seconds for run in runs]
+
+        if len(history) >= MIN_BASELINE_SAMPLES:
+            slowdown, result = await check_slowdown(PerformanceRegressionDetector(), history, current)
+            print(f"  Against {len(history)} stored runs: {result.degradation_percentage:+.1f}% "
+                  f"(p={result.statistical_significance:.4f})")
+            assert not slowdown, (
+                f"{test_case} is {result.degradation_percentage:.1f}% slower than its baseline "
+                f"(p={result.statistical_significance:.4f})"
+            )
+        else:
+            print(f"  Recording baseline ({len(history)} of {MIN_BASELINE_SAMPLES} stored runs)")
+
+        # Only runs that passed the gate become part of the baseline
+        metrics = session_metrics(runs, BENCHMARK_ENVIRONMENT)
+        for metric in metrics:
+            baseline_manager.record_performance_metric(metric)
+        for name in dict.fromkeys(metric.name for metric in metrics):
+            baseline_manager.update_baseline(name, test_case, BENCHMARK_ENVIRONMENT)
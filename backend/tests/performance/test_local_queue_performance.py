@@ -0,0 +1,83 @@
+"""Throughput benchmarks for the embedded SQLite job queue."""
+
+import os
+import time
+
+import pytest
+from rq.job import JobStatus
+
+from app.services.local_queue import LocalJobStore, LocalQueue, LocalWorker
+
+
+def noop(index):
+    return index
+
+
+class TestLocalQueuePerformance:
+    """Enqueue and execution throughput of the local queue backend."""
+
+    JOBS = 500
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = LocalJobStore(tmp_path / "jobs.db")
+        yield store
+        store.close()
+
+    def _enqueue(self, store, jobs):
+        queue = LocalQueue("benchmark", connection=store)
+        start = time.perf_counter()
+        for index in range(jobs):
+            queue.enqueue(noop, index, job_id=f"job-{index}")
+        return queue, time.perf_counter() - start
+
+    def test_single_worker_throughput(self, store):
+        """A single in-process worker should drain hundreds of jobs per second."""
+        queue, enqueue_seconds = self._enqueue(store, self.JOBS)
+
+        start = time.perf_counter()
+        LocalWorker(["benchmark"], connection=store).work(burst=True)
+        execute_seconds = time.perf_counter() - start
+
+        print("\nLocal queue, single worker:")
+        print(f"  Enqueue: {self.JOBS / enqueue_seconds:.0f} jobs/s")
+        print(f"  Execute: {self.JOBS / execute_seconds:.0f} jobs/s")
+
+        assert len(queue.finished_job_registry) == self.JOBS
+        assert self.JOBS / execute_seconds > 50
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() not available")
+    def test_forked_workers_claim_each_job_once(self, store):
+        """Concurrent worker processes must never run the same job twice."""
+        processes = 4
+        queue, _ = self._enqueue(store, self.JOBS)
+
+        start = time.perf_counter()
+        pids = []
+        for index in range(processes):
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 1
+                try:
+                    LocalWorker(["benchmark"], connection=store, name=f"bench-{index}").work(burst=True)
+                    exit_code = 0
+                finally:
+                    os._exit(exit_code)
+            pids.append(pid)
+
+        exit_codes = [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids]
+        execute_seconds = time.perf_counter() - start
+
+        rows = store.connection.execute(
+            "SELECT worker_name, COUNT(*) FROM jobs WHERE status = ? GROUP BY worker_name",
+            (JobStatus.FINISHED.value,)
+        ).fetchall()
+        per_worker = {row[0]: row[1] for row in rows}
+
+        print(f"\nLocal queue, {processes} forked workers:")
+        print(f"  Execute: {self.JOBS / execute_seconds:.0f} jobs/s")
+        print(f"  Jobs per worker: {per_worker}")
+
+        assert exit_codes == [0] * processes
+        assert sum(per_worker.values()) == self.JOBS
+        assert len(queue) == 0
@@ -0,0 +1,129 @@
+"""Review statistics benchmarks: aggregate query vs. loading every SRS row."""
+
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import and_, create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.learning import SRS
+from app.services.review_service import ReviewService
+from app.services.review_session_store import InMemoryReviewSessionStore
+
+CARDS_PER_USER = 50_000
+USERS = 2
+
+
+def row_by_row_daily_stats(db, user_id):
+    """The previous implementation: load all rows, count in Python, one count() per day"""
+    query = db.query(SRS).filter(SRS.user_id == user_id)
+    all_cards = query.all()
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+
+    stats = {
+        'total_cards': len(all_cards),
+        'due_today': sum(1 for srs in all_cards if today <= srs.due_date < tomorrow),
+        'overdue': sum(1 for srs in all_cards if srs.due_date < today),
+        'learning': sum(1 for srs in all_cards if srs.repetitions < 2),
+        'mature': sum(1 for srs in all_cards if srs.repetitions >= 2),
+        'average_ease_factor': round(sum(srs.ease_factor for srs in all_cards) / len(all_cards), 2),
+        'average_interval': round(sum(srs.interval for srs in all_cards) / len(all_cards), 1)
+    }
+
+    reviewed_today = query.filter(and_(SRS.last_reviewed >= today, SRS.last_reviewed < tomorrow)).all()
+    today_grades = [srs.last_grade for srs in reviewed_today if srs.last_grade is not None]
+    stats['grade_distribution'] = {str(i): today_grades.count(i) for i in range(6)}
+
+    upcoming_query = query.filter(and_(SRS.due_date > now, SRS.due_date <= now + timedelta(days=7)))
+    stats['by_day'] = {
+        f"day_{i}": upcoming_query.filter(and_(
+            SRS.due_date >= now + timedelta(days=i),
+            SRS.due_date < now + timedelta(days=i + 1)
+        )).count()
+        for i in range(1, 8)
+    }
+    return stats
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    """SRS records of two users with large decks"""
+    path = tmp_path_factory.mktemp("review_stats") / "srs.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    rows = []
+    for user_id in user_ids:
+        for _ in range(CARDS_PER_USER):
+            reviewed = rng.random() < 0.2
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'card_id': str(uuid.uuid4()),
+                'user_id': user_id,
+                'ease_factor': round(rng.uniform(1.3, 3.0), 2),
+                'interval': rng.randint(1, 120),
+                'repetitions': rng.randint(0, 8),
+                'due_date': now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60)),
+                'last_reviewed': now - timedelta(minutes=rng.randint(0, 48 * 60)) if reviewed else None,
+                'last_grade': rng.randint(0, 5) if reviewed else None,
+                'created_at': now,
+                'updated_at': now
+            })
+    with engine.begin() as connection:
+        connection.execute(insert(SRS.__table__), rows)
+
+    yield sessionmaker(bind=engine), user_ids
+    engine.dispose()
+
+
+class TestReviewStatisticsPerformance:
+    """Daily review statistics for users with large decks."""
+
+    def test_aggregate_matches_and_beats_row_by_row(self, database):
+        """The aggregate query must return the same numbers, faster."""
+        factory, user_ids = database
+        db = factory()
+        service = ReviewService(db, session_store=InMemoryReviewSessionStore())
+        user_id = user_ids[0]
+
+        start = time.perf_counter()
+        expected = row_by_row_daily_stats(db, user_id)
+        row_by_row_seconds = time.perf_counter() - start
+        db.expunge_all()
+
+        start = time.perf_counter()
+        stats = service.get_daily_review_stats(user_id)
+        aggregate_seconds = time.perf_counter() - start
+        db.close()
+
+        print(f"\nDaily review stats, {CARDS_PER_USER} cards:")
+        print(f"  Row by row: {row_by_row_seconds * 1000:.1f}ms")
+        print(f"  Aggregate:  {aggregate_seconds * 1000:.1f}ms")
+
+        for key in ('total_cards', 'due_today', 'overdue', 'learning', 'mature',
+                    'average_ease_factor', 'average_interval'):
+            assert stats[key] == expected[key], key
+        assert stats['today_performance']['grade_distribution'] == expected['grade_distribution']
+        assert stats['upcoming_reviews']['by_day'] == expected['by_day']
+        assert aggregate_seconds < row_by_row_seconds
+
+    def test_statistics_use_user_due_date_index(self, database):
+        """Per-user due-date filters should be served by the composite index."""
+        factory, user_ids = database
+        db = factory()
+        plan = db.execute(
+            text("EXPLAIN QUERY PLAN SELECT id FROM srs WHERE user_id = :user_id AND due_date < :now"),
+            {"user_id": user_ids[0], "now": datetime.utcnow()}
+        ).fetchall()
+        db.close()
+
+        assert any("ix_srs_user_id_due_date" in str(row) for row in plan)
@@ -0,0 +1,105 @@
+"""Worker startup and first-job latency benchmarks."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.workers.runtime import WorkerRuntime
+from .conftest import PerformanceMonitor, BenchmarkResult
+
+
+async def _noop_job(runtime: WorkerRuntime) -> dict:
+    """Minimal job touching the pipeline, so only runtime overhead is measured."""
+    return runtime.pipeline.get_processing_statistics()
+
+
+class TestWorkerRuntimePerformance:
+    """Compare per-job cold starts with a warm, long-lived worker runtime."""
+
+    def test_cold_vs_warm_pipeline_startup(self, performance_monitor: PerformanceMonitor):
+        """Building a second pipeline in a warm process must reuse loaded models."""
+        performance_monitor.start_monitoring()
+
+        cold_runtime = WorkerRuntime()
+        cold_timings = cold_runtime.warm_up(preload_embeddings=False)
+        performance_monitor.sample_metrics()
+
+        warm_runtime = WorkerRuntime()
+        warm_timings = warm_runtime.warm_up(preload_embeddings=False)
+
+        metrics = performance_monitor.stop_monitoring()
+        result = BenchmarkResult(
+            test_name="worker_pipeline_startup",
+            metrics=metrics,
+            threshold_passed=warm_timings["warm_up_seconds"] <= cold_timings["warm_up_seconds"],
+            threshold_values={"max_warm_seconds": cold_timings["warm_up_seconds"]}
+        )
+
+        print("\nWorker pipeline startup:")
+        print(f"  Cold (first in process): {cold_timings['warm_up_seconds'] * 1000:.1f}ms")
+        print(f"  Warm (models cached):    {warm_timings['warm_up_seconds'] * 1000:.1f}ms")
+        print(f"  Peak memory: {metrics.peak_memory_mb:.2f}MB")
+
+        assert result.threshold_passed, "Warm pipeline construction slower than cold start"
+
+    def test_persistent_loop_job_latency(self):
+        """Jobs on the persistent runtime should not pay per-job setup costs."""
+        runtime = WorkerRuntime()
+        runtime.warm_up(preload_embeddings=False)
+
+        jobs = 20
+        start = time.perf_counter()
+        for _ in range(jobs):
+            runtime.run(_noop_job(runtime))
+        warm_per_job = (time.perf_counter() - start) / jobs
+
+        start = time.perf_counter()
+        for _ in range(jobs):
+            # Previous behaviour: fresh pipeline and event loop per job
+            cold_runtime = WorkerRuntime()
+            asyncio.run(_noop_job(cold_runtime))
+        cold_per_job = (time.perf_counter() - start) / jobs
+        runtime.close()
+
+        print("\nPer-job overhead:")
+        print(f"  First job on runtime: {runtime.timings['first_job_seconds'] * 1000:.2f}ms")
+        print(f"  Persistent runtime:   {warm_per_job * 1000:.2f}ms/job")
+        print(f"  Fresh per job:        {cold_per_job * 1000:.2f}ms/job")
+
+        assert runtime.jobs_run == jobs
+        assert warm_per_job < cold_per_job
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() not available")
+    def test_forked_worker_first_job_latency(self):
+        """Forked children inherit warm models and start their first job quickly."""
+        parent_runtime = WorkerRuntime()
+        parent_timings = parent_runtime.warm_up(preload_embeddings=False)
+
+        read_fd, write_fd = os.pipe()
+        fork_start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            exit_code = 1
+            try:
+                parent_runtime.after_fork()
+                parent_runtime.run(_noop_job(parent_runtime))
+                elapsed = time.perf_counter() - fork_start
+                os.write(write_fd, f"{elapsed}".encode())
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        child_first_job = float(os.read(read_fd, 64).decode() or "nan")
+        os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+
+        print("\nForked worker startup:")
+        print(f"  Parent warm-up:            {parent_timings['warm_up_seconds'] * 1000:.1f}ms")
+        print(f"  Fork to first job done:    {child_first_job * 1000:.1f}ms")
+
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert child_first_job < parent_timings["warm_up_seconds"] + 1.0
@@ -0,0 +1,187 @@
+"""
+Tests for streamed, batched JSONL backup imports
+"""
+
+import io
+import json
+import os
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api import export as export_api
+from app.core.config import settings
+from app.models.document import Document, Chapter, Figure
+from app.models.knowledge import Knowledge
+from app.models.learning import Card, SRS
+from app.services.export_service import ExportService
+from app.services.local_queue import LocalWorker
+from tests.factories import add_card, add_figure, add_knowledge, make_document, sqlite_engine
+
+
+@pytest.fixture
+def backup(tmp_path):
+    """JSONL backup of four documents with two chapters of three cards"""
+    engine = sqlite_engine(tmp_path / "source.db")
+    session = sessionmaker(bind=engine)()
+    for d in range(4):
+        document = make_document(f"book{d}.pdf", chapters=2, first_chapter=0)
+        for c, chapter in enumerate(document.chapters):
+            add_figure(chapter, f"fig{d}{c}.png")
+            knowledge = add_knowledge(chapter, anchors={"page": 1})
+            for i in range(3):
+                add_card(knowledge, f"Q{d}.{c}.{i}", srs={"interval": i + 1})
+        session.add(document)
+    session.commit()
+    content = ExportService(session).export_jsonl_backup()
+    session.close()
+    engine.dispose()
+    return content
+
+
+@pytest.fixture
+def target(tmp_path):
+    """Session factory of an empty database"""
+    engine = sqlite_engine(tmp_path / "target.db")
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def table_counts(session):
+    return [session.execute(select(func.count()).select_from(model)).scalar() for model in (Document, Chapter, Figure, Knowledge, Card, SRS)]
+
+
+class TestStreamedImport:
+    """Test cases for ExportService.import_jsonl_stream"""
+
+    def test_round_trip_in_batches(self, backup, target):
+        """Test that a backup is restored with one INSERT per table and batch"""
+        db = target()
+        inserts, progress = [], []
+        event.listen(db.get_bind(), "before_cursor_execute",
+                     lambda *args: inserts.append(args[2]) if args[2].startswith("INSERT INTO documents") else None)
+
+        result = ExportService(db).import_jsonl_stream(
+            io.BytesIO(backup.encode()), on_progress=progress.append, batch_size=30
+        )
+
+        assert result["errors"] == []
+        assert table_counts(db) == [4, 8, 8, 8, 24, 24]
+        assert result["imported_cards"] == 24
+        assert result["imported_srs_records"] == 24
+        # Each document has 19 rows, so every second line fills a batch
+        assert len(inserts) == 2
+        assert [p["imported_documents"] for p in progress] == [2, 4, 4]
+        assert progress[-1]["bytes_read"] == len(backup.encode())
+        assert progress[-1]["lines_read"] == 4
+
+    def test_bad_lines_are_reported_and_skipped(self, backup, target):
+        """Test that invalid lines are reported by number while the others are imported"""
+        lines = backup.splitlines()
+        broken = json.loads(lines[1])
+        del broken["document"]["filename"]
+        content = "\n".join([lines[0], "{not json", json.dumps(broken), lines[2]]).encode() + b"\n\xff\xfe\n"
+        db = target()
+
+        result = ExportService(db).import_jsonl_stream(io.BytesIO(content))
+
+        assert result["imported_documents"] == 2
+        assert [error.split(" - ")[0] for error in result["errors"]] == [
+            "Line 2: Invalid JSON", "Line 3: Missing required fields", "Line 5: Invalid UTF-8"
+        ]
+        assert table_counts(db)[0] == 2
+
+    def test_existing_documents_are_skipped(self, backup, target):
+        """Test that importing a backup twice keeps one copy"""
+        db = target()
+        ExportService(db).import_jsonl_backup(backup)
+
+        result = ExportService(db).import_jsonl_backup(backup)
+
+        assert result["imported_documents"] == 0
+        assert result["errors"] == []
+        assert sum("already exists" in warning for warning in result["warnings"]) == 4
+        assert table_counts(db) == [4, 8, 8, 8, 24, 24]
+
+    def test_failed_document_does_not_fail_its_batch(self, backup, target):
+        """Test that a failing batch is retried a document at a time and only the bad line is reported"""
+        lines = backup.splitlines()
+        duplicate = json.loads(lines[3])
+        # A card ID already used by the second document
+        used_id = json.loads(lines[1])["chapters"][0]["knowledge_points"][0]["cards"][0]["id"]
+        duplicate["chapters"][0]["knowledge_points"][0]["cards"][0]["id"] = used_id
+        content = "\n".join(lines[:3] + [json.dumps(duplicate)])
+        db = target()
+
+        result = ExportService(db).import_jsonl_stream(io.StringIO(content), batch_size=38)
+
+        assert result["imported_documents"] == 3
+        assert result["imported_cards"] == 18
+        assert [error.split(" - ")[0] for error in result["errors"]] == ["Line 4: Import error"]
+        assert table_counts(db) == [3, 6, 6, 6, 18, 18]
+
+    def test_duplicate_document_in_batch_is_skipped(self, backup, target):
+        """Test that a document repeated within one batch is imported once"""
+        lines = backup.splitlines()
+        content = "\n".join([lines[0], lines[1], lines[0]])
+        db = target()
+
+        result = ExportService(db).import_jsonl_stream(io.StringIO(content))
+
+        assert result["imported_documents"] == 2
+        assert result["errors"] == []
+        assert [warning.split(":")[0] for warning in result["warnings"] if "already exists" in warning] == ["Line 3"]
+        assert table_counts(db) == [2, 4, 4, 4, 12, 12]
+
+    def test_validate_stream(self, backup):
+        """Test that validation reads lines and checks data quality on the fly"""
+        lines = backup.splitlines()
+        empty = json.loads(lines[0])
+        empty["chapters"] = []
+        content = "\n".join([json.dumps(empty), lines[1], "[]"]).encode()
+
+        result = ExportService(db=None).validate_jsonl_stream(io.BytesIO(content))
+
+        assert result["total_lines"] == 3
+        assert result["valid_lines"] == 2
+        assert result["errors"] == ["Line 3: Invalid document structure"]
+        assert result["warnings"] == ["Line 1: Document has no chapters"]
+
+
+class TestBackgroundImport:
+    """Test cases for imports queued through the job queue"""
+
+    @pytest.mark.asyncio
+    async def test_queued_import_reports_progress(self, backup, target, tmp_path, monkeypatch):
+        """Test that the upload is saved, imported by a worker and tracked in the job status"""
+        from app.services.queue_service import QueueService
+
+        monkeypatch.setattr(settings, "local_queue_path", str(tmp_path / "jobs.db"))
+        monkeypatch.setattr(settings, "queue_backend", "local")
+        monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+        monkeypatch.setattr("app.workers.backup_import.SessionLocal", target)
+        upload = UploadFile(io.BytesIO(backup.encode()), filename="backup.jsonl", size=len(backup))
+
+        response = await export_api.import_jsonl_backup(file=upload, validate_only=False, background=True, db=None)
+
+        job_id = response.summary["job_id"]
+        queue_service = QueueService()
+        assert os.listdir(tmp_path / "uploads" / "imports")
+        LocalWorker(["document_processing"], connection=queue_service.redis_conn, name="test-worker").work(burst=True)
+
+        status = queue_service.get_job_status(job_id)
+        assert status["result"]["imported_cards"] == 24
+        assert status["progress"]["bytes_read"] == status["progress"]["bytes_total"] == len(backup)
+        assert os.listdir(tmp_path / "uploads" / "imports") == []
+        assert table_counts(target())[0] == 4
+
+    @pytest.mark.asyncio
+    async def test_synchronous_import_streams_upload(self, backup, target):
+        """Test that the endpoint imports from the upload file without a job"""
+        upload = UploadFile(io.BytesIO(backup.encode()), filename="backup.jsonl", size=len(backup))
+
+        response = await export_api.import_jsonl_backup(file=upload, validate_only=False, background=False, db=target())
+
+        assert response.success is True
+        assert response.summary["imported_documents"] == 4
@@ -0,0 +1,155 @@
+"""
+Tests for keyset-paginated card listings
+"""
+
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.learning import CardType
+from app.services.card_listing import (
+    CardListFilters,
+    card_page_statement,
+    count_cards,
+    decode_cursor,
+    encode_cursor,
+    format_card_page,
+)
+from tests.factories import add_card, add_knowledge, async_sqlite_engine, make_document
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """30 cards in two chapters, several created at the same instant"""
+    engine = await async_sqlite_engine(tmp_path / "cards.db")
+    session = async_sessionmaker(engine, expire_on_commit=False)()
+    document = make_document(chapters=2, first_chapter=0)
+
+    created = datetime(2026, 1, 1)
+    for i in range(30):
+        knowledge = add_knowledge(document.chapters[i % 2], f"Fact {i} " + "x" * (i * 10))
+        add_card(
+            knowledge, f"Q{i}", f"A{i}",
+            card_type=CardType.CLOZE if i % 3 == 0 else CardType.QA,
+            difficulty=1.0 + (i % 5) * 0.5,
+            created_at=created + timedelta(minutes=i // 4)
+        )
+    session.add(document)
+    await session.commit()
+    yield session
+    await session.close()
+    await engine.dispose()
+
+
+async def list_all(db, filters, limit):
+    """Follow cursors until the last page"""
+    cards, cursor, pages = [], None, 0
+    while True:
+        rows = (await db.execute(card_page_statement(filters, limit, cursor=cursor))).all()
+        page, cursor = format_card_page(rows, limit)
+        cards.extend(page)
+        pages += 1
+        if cursor is None:
+            return cards, pages
+
+
+class TestCardListing:
+    """Test cases for the card listing queries"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("limit", [1, 4, 7, 30, 50])
+    async def test_cursor_pages_cover_every_card_once(self, db, limit):
+        """Test that pages are contiguous, newest first, with ties broken by ID"""
+        cards, pages = await list_all(db, CardListFilters(), limit)
+
+        keys = [(card["created_at"], card["id"]) for card in cards]
+        assert len(keys) == 30
+        assert keys == sorted(keys, reverse=True)
+        assert pages == -(-30 // limit)
+
+    @pytest.mark.asyncio
+    async def test_filters(self, db):
+        """Test type, difficulty and chapter filters with pagination"""
+        chapter_id = (await db.execute(text("SELECT id FROM chapters WHERE title = 'Chapter 1'"))).scalar()
+        filters = CardListFilters(chapter_id=chapter_id, card_type=CardType.QA, difficulty_min=1.5, difficulty_max=2.5)
+
+        cards, _ = await list_all(db, filters, 2)
+
+        assert cards
+        assert all(card["card_type"] == "qa" and 1.5 <= card["difficulty"] <= 2.5 for card in cards)
+        assert all(card["chapter"]["title"] == "Chapter 1" for card in cards)
+        assert (await count_cards(db, filters)) == (len(cards), False)
+
+    @pytest.mark.asyncio
+    async def test_knowledge_text_is_truncated_in_sql(self, db):
+        """Test that at most the preview of knowledge text is read"""
+        rows = (await db.execute(card_page_statement(CardListFilters(), 30))).all()
+
+        assert max(len(row.text_preview) for row in rows) == 200
+        cards, _ = format_card_page(rows, 30)
+        long_texts = [card["knowledge"]["text"] for card in cards if len(card["knowledge"]["text"]) > 200]
+        assert long_texts and all(text.endswith("...") and len(text) == 203 for text in long_texts)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("filters, index", [
+        (CardListFilters(), "ix_cards_created_at_id"),
+        (CardListFilters(card_type=CardType.QA, difficulty_min=1.5), "ix_cards_type_created_at_id_difficulty"),
+    ])
+    async def test_page_is_selected_from_covering_index(self, db, filters, index):
+        """Test that the page's card IDs are read from an index, without table rows"""
+        cursor = encode_cursor(datetime(2026, 1, 1, 0, 5), "ffffffff-ffff-ffff-ffff-ffffffffffff")
+        statement = card_page_statement(filters, 10, cursor=cursor)
+        compiled = statement.compile(compile_kwargs={"literal_binds": True})
+
+        plan = [row[3] for row in (await db.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))).all()]
+
+        assert any(f"COVERING INDEX {index}" in step for step in plan)
+
+    def test_invalid_cursor(self):
+        """Test that malformed cursors are rejected"""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor("not-a-cursor")
+
+
+class TestCardsEndpoint:
+    """Test cases for GET /api/cards"""
+
+    @pytest.fixture
+    def get_cards(self):
+        pytest.importorskip("jwt")  # needed by the API's access control
+        from app.api.documents import get_cards
+        return get_cards
+
+    @pytest.mark.asyncio
+    async def test_pages_and_total(self, db, get_cards):
+        """Test cursor links and the optional total"""
+        first = await get_cards(
+            document_id=None, chapter_id=None, card_type="qa", difficulty_min=None, difficulty_max=None,
+            limit=5, cursor=None, offset=0, total="approximate", db=db
+        )
+        second = await get_cards(
+            document_id=None, chapter_id=None, card_type="qa", difficulty_min=None, difficulty_max=None,
+            limit=5, cursor=first["next_cursor"], offset=0, total=None, db=db
+        )
+
+        assert first["total_cards"] == 5
+        assert first["has_more"] is True
+        # SQLite has no planner estimate, so the count is exact
+        assert (first["total"], first["total_is_estimate"]) == (20, False)
+        assert "total" not in second
+        assert not {card["id"] for card in first["cards"]} & {card["id"] for card in second["cards"]}
+        assert second["cards"][0]["created_at"] <= first["cards"][-1]["created_at"]
+
+    @pytest.mark.asyncio
+    async def test_bad_cursor_is_a_client_error(self, db, get_cards):
+        """Test that a malformed cursor gives 400"""
+        with pytest.raises(HTTPException) as error:
+            await get_cards(
+                document_id=None, chapter_id=None, card_type=None, difficulty_min=None, difficulty_max=None,
+                limit=5, cursor="garbage", offset=0, total=None, db=db
+            )
+
+        assert error.value.status_code == 400
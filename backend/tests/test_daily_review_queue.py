@@ -0,0 +1,229 @@
+"""
+Tests for precomputed daily review queues
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.document import Chapter
+from app.models.learning import SRS, DailyReviewQueue
+from app.services.daily_review_queue import DailyReviewQueueService, _queues_for_update
+from app.services.review_queue import ReviewQueueBuilder
+from app.services.review_service import ReviewService
+from app.services.review_session_store import InMemoryReviewSessionStore
+from app.services.srs_service import SRSService
+from app.workers import review_queues
+from tests.factories import add_card, add_knowledge, make_document, sqlite_engine
+
+USER_ID = "3f1c2b9e-8a4d-4c5e-9f6a-1b2c3d4e5f60"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlite_engine(tmp_path / "daily.db")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Database with 12 overdue, 9 due today and 5 future cards"""
+    db = sessionmaker(bind=engine)()
+    document = make_document()
+
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    due_dates = (
+        [today - timedelta(days=i + 1, hours=1) for i in range(12)]
+        + [today + (now - today) * (i / 10) for i in range(9)]
+        + [now + timedelta(days=i + 1) for i in range(5)]
+    )
+    for i, due_date in enumerate(due_dates):
+        add_due_card(document.chapters[0], i, due_date, user_id=USER_ID if i % 4 == 0 else None)
+    db.add(document)
+    db.commit()
+    yield db
+    db.close()
+
+
+def add_due_card(chapter, i, due_date, user_id=None, difficulty=None):
+    card = add_card(
+        add_knowledge(chapter, f"Fact {i}"), f"Q{i}", f"A{i}",
+        difficulty=round(3.0 - i * 0.1, 2) if difficulty is None else difficulty,
+        srs={"user_id": user_id, "due_date": due_date}
+    )
+    return card.srs_records[0]
+
+
+def srs_ids(cards):
+    return [card.srs_id for card in cards]
+
+
+class TestDailyReviewQueue:
+    """Test cases for building and reading daily review queues"""
+
+    @pytest.mark.parametrize("max_cards", [1, 5, 9, 20, 50])
+    @pytest.mark.parametrize("prioritize_overdue", [True, False])
+    @pytest.mark.parametrize("user_id", [None, USER_ID])
+    def test_matches_live_queue(self, db_session, max_cards, prioritize_overdue, user_id):
+        """Test that the stored queue gives the same cards as ranking live"""
+        service = DailyReviewQueueService(db_session)
+        service.build(user_id)
+
+        cards = service.get_review_cards(user_id, max_cards, prioritize_overdue)
+
+        live = ReviewQueueBuilder(db_session).build(user_id, max_cards, prioritize_overdue)
+        assert srs_ids(cards) == srs_ids(live)
+        assert cards[0].knowledge_text
+
+    def test_missing_queue_is_not_built_on_read(self, db_session):
+        """Test that reads without a queue for today fall back to the caller"""
+        service = DailyReviewQueueService(db_session)
+
+        assert service.get_review_cards(max_cards=5) is None
+        assert db_session.query(DailyReviewQueue).count() == 0
+
+    def test_truncated_queue_falls_back(self, db_session):
+        """Test that a truncated bucket only answers requests it can fill"""
+        service = DailyReviewQueueService(db_session, queue_size=4)
+        queue = service.build()
+
+        assert queue.overdue_complete is False
+        assert len(queue.overdue) == 4
+        assert srs_ids(service.get_review_cards(max_cards=4, prioritize_overdue=False)) == \
+            srs_ids(ReviewQueueBuilder(db_session).build(max_cards=4, prioritize_overdue=False))
+        assert service.get_review_cards(max_cards=5) is None
+
+    def test_session_start_is_a_keyed_read(self, engine, db_session):
+        """Test that starting a session reads the queue row and the selected cards only"""
+        DailyReviewQueueService(db_session).build()
+        review_service = ReviewService(db_session, session_store=InMemoryReviewSessionStore())
+        statements = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        session = review_service.start_review_session(max_cards=6)
+        event.remove(engine, "before_cursor_execute", record)
+
+        assert srs_ids(session.cards) == srs_ids(ReviewQueueBuilder(db_session).build(max_cards=6))
+        assert len(statements) == 2
+        assert "daily_review_queues" in statements[0]
+
+    def test_build_all_and_cleanup(self, db_session):
+        """Test that every user gets a queue and earlier days are dropped"""
+        service = DailyReviewQueueService(db_session)
+        service.build(now=datetime.utcnow() - timedelta(days=1))
+
+        result = service.build_all()
+
+        assert result['queues_built'] == 2
+        assert result['queues_deleted'] == 1
+        assert {queue.user_key for queue in db_session.query(DailyReviewQueue)} == {"", USER_ID}
+
+
+class TestIncrementalMaintenance:
+    """Test cases for adjusting stored queues as SRS records change"""
+
+    @pytest.fixture
+    def service(self, db_session):
+        service = DailyReviewQueueService(db_session)
+        service.build()
+        service.build(USER_ID)
+        return service
+
+    def assert_matches_live(self, db_session, service, user_id=None):
+        db_session.expire_all()
+        assert srs_ids(service.get_review_cards(user_id, max_cards=50)) == \
+            srs_ids(ReviewQueueBuilder(db_session).build(user_id, max_cards=50))
+
+    def test_graded_card_leaves_queue(self, db_session, service):
+        """Test that a graded card is removed from the user and all-users queues"""
+        first = service.get_review_cards(USER_ID, max_cards=1)[0]
+
+        SRSService(db_session).grade_card(first.srs_id, 4)
+
+        self.assert_matches_live(db_session, service, USER_ID)
+        self.assert_matches_live(db_session, service)
+        assert first.srs_id not in srs_ids(service.get_review_cards(max_cards=50))
+
+    def test_batch_grades_leave_queue(self, db_session, service):
+        """Test that bulk-updated grades are applied to the queues"""
+        cards = service.get_review_cards(max_cards=5)
+
+        SRSService(db_session).grade_cards_batch([{'srs_id': card.srs_id, 'grade': 5} for card in cards])
+
+        self.assert_matches_live(db_session, service)
+        assert not set(srs_ids(cards)) & set(srs_ids(service.get_review_cards(max_cards=50)))
+
+    def test_reset_and_new_cards_join_queue(self, db_session, service):
+        """Test that cards becoming due today are inserted in review order"""
+        future = db_session.query(SRS).filter(SRS.due_date > datetime.utcnow()).first()
+        SRSService(db_session).reset_card_progress(str(future.id))
+
+        chapter = db_session.query(Chapter).first()
+        add_due_card(chapter, 99, datetime.utcnow() - timedelta(days=3), user_id=USER_ID, difficulty=0.5)
+        add_due_card(chapter, 98, datetime.utcnow() - timedelta(minutes=1), difficulty=0.1)
+        db_session.commit()
+
+        self.assert_matches_live(db_session, service)
+        self.assert_matches_live(db_session, service, USER_ID)
+
+    def test_deleted_card_leaves_queue(self, db_session, service):
+        """Test that deleted SRS records are removed"""
+        srs_id = service.get_review_cards(max_cards=1)[0].srs_id
+        db_session.delete(db_session.query(SRS).filter(SRS.id == srs_id).one())
+        db_session.commit()
+
+        self.assert_matches_live(db_session, service)
+
+    def test_queue_rows_are_locked_for_update(self, db_session, service):
+        """Test that concurrent grades serialize on the queue rows they rewrite"""
+        statement = _queues_for_update({USER_ID, ""}, datetime.utcnow().date())
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert sql.endswith("FOR UPDATE")
+        assert "ORDER BY daily_review_queues.user_key" in sql
+
+    def test_disabled_precompute_leaves_queue_alone(self, db_session, service, monkeypatch):
+        """Test that the ORM hook is a no-op when precomputed queues are off"""
+        monkeypatch.setattr(settings, "review_queue_precompute", False)
+        srs_id = service.get_review_cards(max_cards=1)[0].srs_id
+
+        SRSService(db_session).grade_card(srs_id, 4)
+
+        db_session.expire_all()
+        assert srs_id in [entry[0] for entry in service.get_queue().overdue]
+        # The stale entry is detected on read
+        assert service.get_review_cards(max_cards=1) is None
+
+
+class TestDailyReviewQueueJob:
+    """Test cases for the background build job"""
+
+    def test_job_builds_queues(self, engine, db_session, monkeypatch):
+        """Test that the worker function builds the queue of every user"""
+        monkeypatch.setattr(review_queues, "SessionLocal", sessionmaker(bind=engine))
+
+        result = review_queues.build_daily_review_queues(reschedule=False)
+
+        assert result['queues_built'] == 2
+        assert db_session.query(DailyReviewQueue).count() == 2
+
+    def test_job_is_scheduled_after_midnight(self, tmp_path, monkeypatch):
+        """Test that the next build is scheduled on the local queue"""
+        from app.services.queue_service import QueueService
+
+        monkeypatch.setattr(settings, "local_queue_path", str(tmp_path / "jobs.db"))
+        queue_service = QueueService(backend="local")
+
+        job_id = queue_service.schedule_daily_review_queue_build()
+
+        tomorrow = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
+        assert job_id == f"review_queues_{tomorrow}"
+        assert queue_service.get_job_status(job_id)["status"] == "scheduled"
@@ -12,6 +12,12 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 import faker
+import fitz  # PyMuPDF
+from docx import Document
+
+# Size of the pages of the ingest benchmark documents
+INGEST_WORDS_PER_PAGE = 300
+INGEST_PAGES_PER_CHAPTER = 5
 
 
 class SyntheticDataGenerator:
@@ -598,6 +604,106 @@ class SyntheticDataGenerator:
             
         self._save_json("load_test_scenarios.json", scenarios)
         
+    def generate_ingest_documents(self, pages: int, formats: tuple = ("pdf", "docx", "md"),
+                                  seed: int = 0) -> Dict[str, Path]:
+        """
+        Generate documents of a fixed page count for the ingest benchmark
+        
+        The same seed always yields the same chapters and sentences, so runs
+        on different commits process identical input. Each page holds
+        INGEST_WORDS_PER_PAGE words of prose mixed with definitions, facts
+        and examples the knowledge extraction recognizes; a new chapter
+        starts every INGEST_PAGES_PER_CHAPTER pages. Markdown has no pages,
+        so its page count is the number of page-sized blocks of text.
+        """
+        output_dir = self.output_dir / "ingest"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        document_pages = self._ingest_pages(pages, seed)
+        
+        writers = {
+            "pdf": self._write_ingest_pdf,
+            "docx": self._write_ingest_docx,
+            "md": self._write_ingest_markdown,
+        }
+        documents = {}
+        for file_format in formats:
+            path = output_dir / f"ingest_{pages}_pages_seed_{seed}.{file_format}"
+            writers[file_format](path, document_pages)
+            documents[file_format] = path
+        return documents
+        
+    def _ingest_pages(self, pages: int, seed: int) -> List[Dict[str, Any]]:
+        """Heading (on the first page of a chapter) and paragraphs of each page"""
+        fake = faker.Faker()
+        fake.seed_instance(seed)
+        rng = random.Random(seed)
+        templates = [
+            "{term} is {definition}.",
+            "{term} refers to {definition}.",
+            "Research shows that {fact}.",
+            "For example, {fact}.",
+            "If {fact}, then {consequence}.",
+        ]
+        
+        document_pages = []
+        for page in range(pages):
+            heading = None
+            if page % INGEST_PAGES_PER_CHAPTER == 0:
+                chapter = page // INGEST_PAGES_PER_CHAPTER + 1
+                heading = f"Chapter {chapter}: {fake.catch_phrase().title()}"
+            
+            paragraphs = []
+            words = 0
+            while words < INGEST_WORDS_PER_PAGE:
+                sentences = fake.sentences(nb=rng.randint(3, 5))
+                sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(templates).format(
+                    term=fake.word().capitalize() + " " + fake.word(),
+                    definition=fake.sentence(nb_words=10).rstrip(".").lower(),
+                    fact=fake.sentence(nb_words=8).rstrip(".").lower(),
+                    consequence=fake.sentence(nb_words=6).rstrip(".").lower(),
+                ))
+                paragraph = " ".join(sentences)
+                paragraphs.append(paragraph)
+                words += len(paragraph.split())
+            document_pages.append({"heading": heading, "paragraphs": paragraphs})
+        return document_pages
+        
+    def _write_ingest_pdf(self, path: Path, document_pages: List[Dict[str, Any]]):
+        pdf = fitz.open()
+        for page_content in document_pages:
+            page = pdf.new_page()
+            top = 72
+            if page_content["heading"]:
+                page.insert_text((72, top), page_content["heading"], fontsize=18)
+                top += 36
+            page.insert_textbox(
+                fitz.Rect(72, top, page.rect.width - 72, page.rect.height - 72),
+                "\n\n".join(page_content["paragraphs"]),
+                fontsize=10
+            )
+        pdf.set_metadata({"title": path.stem, "producer": "synthetic_data_generator"})
+        pdf.save(str(path), garbage=3, deflate=True, no_new_id=True)
+        pdf.close()
+        
+    def _write_ingest_docx(self, path: Path, document_pages: List[Dict[str, Any]]):
+        document = Document()
+        for index, page_content in enumerate(document_pages):
+            if index:
+                document.add_page_break()
+            if page_content["heading"]:
+                document.add_heading(page_content["heading"], level=1)
+            for paragraph in page_content["paragraphs"]:
+                document.add_paragraph(paragraph)
+        document.save(str(path))
+        
+    def _write_ingest_markdown(self, path: Path, document_pages: List[Dict[str, Any]]):
+        blocks = []
+        for page_content in document_pages:
+            if page_content["heading"]:
+                blocks.append(f"# {page_content['heading']}")
+            blocks.extend(page_content["paragraphs"])
+        path.write_text("\n\n".join(blocks) + "\n", encoding="utf-8")
+        
     def _save_json(self, filename: str, data: Any):
         """Save data as JSON file"""
         filepath = self.output_dir / filename
@@ -0,0 +1,148 @@
+"""Tests for splitting large documents into chapter-range jobs."""
+
+import uuid
+from types import SimpleNamespace
+
+from app.services.document_fanout import (
+    chapter_page_count,
+    plan_chapter_ranges,
+    part_outcome,
+    fanout_progress,
+)
+from app.services.processing_checkpoint import ProcessingCheckpoint, PipelineStage
+
+
+def make_chapter(pages=None, content=""):
+    page_start, page_end = (1, pages) if pages else (None, None)
+    return SimpleNamespace(id=uuid.uuid4(), page_start=page_start, page_end=page_end, content=content)
+
+
+class TestPlanChapterRanges:
+    """Test cases for chapter range planning."""
+
+    def test_small_document_is_not_split(self):
+        """Test that documents below the page threshold stay in one job."""
+        chapters = [make_chapter(pages=20) for _ in range(5)]
+
+        assert plan_chapter_ranges(chapters, pages_per_part=50, max_parts=8, min_pages=200) == []
+
+    def test_single_chapter_is_not_split(self):
+        """Test that a single chapter cannot be fanned out."""
+        assert plan_chapter_ranges([make_chapter(pages=500)], pages_per_part=50, max_parts=8) == []
+
+    def test_ranges_are_contiguous_and_balanced(self):
+        """Test that ranges keep chapter order and similar page counts."""
+        chapters = [make_chapter(pages=pages) for pages in (40, 60, 50, 50, 30, 70, 50, 50)]
+
+        ranges = plan_chapter_ranges(chapters, pages_per_part=100, max_parts=8, min_pages=200)
+
+        assert len(ranges) == 4
+        assert [r.index for r in ranges] == [0, 1, 2, 3]
+        flattened = [chapter_id for r in ranges for chapter_id in r.chapter_ids]
+        assert flattened == [str(chapter.id) for chapter in chapters]
+        assert all(r.page_count == 100 for r in ranges)
+
+    def test_part_count_is_capped(self):
+        """Test that no more than max_parts jobs are planned."""
+        chapters = [make_chapter(pages=100) for _ in range(20)]
+
+        ranges = plan_chapter_ranges(chapters, pages_per_part=10, max_parts=3)
+
+        assert len(ranges) == 3
+        assert sum(len(r.chapter_ids) for r in ranges) == 20
+
+    def test_every_part_gets_a_chapter(self):
+        """Test that one huge chapter does not leave later parts empty."""
+        chapters = [make_chapter(pages=1000)] + [make_chapter(pages=1) for _ in range(3)]
+
+        ranges = plan_chapter_ranges(chapters, pages_per_part=100, max_parts=4)
+
+        assert len(ranges) == 4
+        assert all(len(r.chapter_ids) == 1 for r in ranges)
+
+    def test_page_count_estimated_from_content(self):
+        """Test page estimation for chapters without page numbers."""
+        assert chapter_page_count(make_chapter(content="x" * 7000)) == 3
+        assert chapter_page_count(make_chapter(content="")) == 1
+        assert chapter_page_count(make_chapter(pages=12)) == 12
+
+
+class TestPartOutcomes:
+    """Test cases for merging part job results."""
+
+    def test_finished_part_uses_result_chapters(self):
+        """Test that completed parts report their returned chapters."""
+        outcome = part_outcome({
+            "index": 0,
+            "job_id": "job-0",
+            "status": "finished",
+            "result": {"status": "completed", "pipeline_result": {"chapters": {"a": {"stages": {}}}}},
+            "progress": {"chapters": {"b": {"stages": {}}}},
+        })
+
+        assert outcome["status"] == "completed"
+        assert outcome["error"] is None
+        assert list(outcome["chapters"]) == ["a"]
+
+    def test_failed_part_keeps_reported_progress(self):
+        """Test that chapters finished before a crash are not lost."""
+        outcome = part_outcome({
+            "index": 1,
+            "job_id": "job-1",
+            "status": "failed",
+            "result": None,
+            "progress": {"chapters": {"b": {"stages": {"cards": "now"}}}},
+        })
+
+        assert outcome["status"] == "failed"
+        assert outcome["error"] == "failed"
+        assert list(outcome["chapters"]) == ["b"]
+
+    def test_failed_part_reports_raised_error(self):
+        """Test that a part failing after its retries reports the exception it raised."""
+        outcome = part_outcome({
+            "index": 1,
+            "status": "failed",
+            "result": None,
+            "error": "ProcessingError: Chapter processing failed: database unavailable",
+        })
+
+        assert outcome["status"] == "failed"
+        assert outcome["error"] == "ProcessingError: Chapter processing failed: database unavailable"
+
+    def test_pipeline_failure_reported_by_finished_job(self):
+        """Test that a job returning a failed status counts as failed."""
+        outcome = part_outcome({
+            "index": 2,
+            "status": "finished",
+            "result": {"status": "failed", "error": "database unavailable"},
+        })
+
+        assert outcome["status"] == "failed"
+        assert outcome["error"] == "database unavailable"
+
+    def test_progress_summary(self):
+        """Test aggregation of per-part progress."""
+        summary = fanout_progress([
+            {"status": "finished", "chapters_total": 3, "chapters_completed": 3},
+            {"status": "started", "chapters_total": 4, "chapters_completed": 1},
+        ])
+
+        assert summary["parts_total"] == 2
+        assert summary["parts_finished"] == 1
+        assert summary["chapters_total"] == 7
+        assert summary["chapters_completed"] == 4
+
+    def test_checkpoint_merges_part_chapters(self):
+        """Test that merged chapters count toward the document totals."""
+        part = ProcessingCheckpoint()
+        part.mark_chapter_stage("a", PipelineStage.KNOWLEDGE, knowledge_points=4)
+        part.mark_chapter_stage("a", PipelineStage.CARDS, cards=6)
+        part.mark_chapter_failed("b", "boom")
+
+        checkpoint = ProcessingCheckpoint()
+        checkpoint.merge_chapters({"a": part.chapter_details("a"), "b": part.chapter_details("b"), "c": {}})
+
+        assert checkpoint.chapter_totals() == {"chapters_completed": 1, "knowledge_points": 4, "cards": 6}
+        assert checkpoint.failed_chapters() == ["b"]
+        assert "c" not in checkpoint.chapters
@@ -0,0 +1,219 @@
+"""
+Tests for background exports rendered by parallel chapter-range jobs
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import zipfile
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from app.api import export as export_api
+from app.core.config import settings
+from app.models.learning import CardType
+from app.services.export_jobs import plan_export_parts
+from app.services.export_service import ExportService
+from app.services.local_queue import LocalWorker
+from app.workers.export_jobs import cleanup_exports
+from tests.factories import add_card, add_figure, add_knowledge, make_document, sqlite_engine
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Session factory of a document with four chapters of five cards, one an image card"""
+    engine = sqlite_engine(tmp_path / "export.db")
+    factory = sessionmaker(bind=engine)
+    session = factory()
+
+    image = tmp_path / "uploads" / "figure.png"
+    image.parent.mkdir()
+    image.write_bytes(b"\x89PNG image")
+
+    document = make_document("book.pdf", chapters=4, first_chapter=0)
+    for c, chapter in enumerate(document.chapters):
+        figure = add_figure(chapter, "figure.png", page_number=c, id=uuid4())
+        knowledge = add_knowledge(chapter, anchors={"page": c})
+        for i in range(5):
+            srs = {"interval": 6, "repetitions": i, "ease_factor": 2.5,
+                   "due_date": datetime.utcnow() + timedelta(days=6), "last_reviewed": datetime.utcnow()}
+            if c == 0 and i == 0:
+                add_card(knowledge, "figure.png", "The answer", CardType.IMAGE_HOTSPOT, srs,
+                         card_metadata={"question": "Where?", "figure_id": str(figure.id)})
+            else:
+                add_card(knowledge, f"Q{c}.{i}", f"A{c}.{i}", srs=srs)
+    session.add(document)
+    session.commit()
+    session.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch, database):
+    """Local queue with workers reading the test database and writing to a temporary export directory"""
+    from app.services.queue_service import QueueService
+
+    monkeypatch.setattr(settings, "local_queue_path", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(settings, "queue_backend", "local")
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "export_dir", str(tmp_path / "exports"))
+    monkeypatch.setattr(settings, "export_cards_per_part", 5)
+    monkeypatch.setattr("app.workers.export_jobs.SessionLocal", database)
+    return QueueService()
+
+
+async def run_export(queue, database, export_format):
+    """Start an export through the API, run its jobs and return its status"""
+    request = export_api.ExportJobRequest(format=export_format)
+    started = await export_api.create_export_job(request, db=database())
+    LocalWorker(["document_processing"], connection=queue.redis_conn, name="test-worker").work(burst=True)
+    return started, await export_api.get_export_job(started.export_id)
+
+
+class TestPlanExportParts:
+    """Test cases for splitting exports into chapter ranges"""
+
+    def test_ranges_balance_card_counts(self):
+        """Test that contiguous ranges get similar card counts"""
+        counts = [("a", 10), ("b", 30), ("c", 5), ("d", 5), ("e", 20), ("f", 10)]
+
+        parts = plan_export_parts(counts, cards_per_part=30, max_parts=8)
+
+        assert [part.chapter_ids for part in parts] == [["a", "b"], ["c", "d", "e"], ["f"]]
+        assert [part.card_count for part in parts] == [40, 30, 10]
+
+    def test_part_limits(self):
+        """Test that parts are capped by max_parts and chapters, and never empty"""
+        counts = [(str(i), 100) for i in range(10)]
+
+        assert len(plan_export_parts(counts, cards_per_part=10, max_parts=4)) == 4
+        assert len(plan_export_parts(counts[:2], cards_per_part=10, max_parts=4)) == 2
+        assert [part.to_dict() for part in plan_export_parts([], 10, 4)] == [
+            {"index": 0, "chapter_ids": [], "card_count": 0}
+        ]
+
+
+class TestBackgroundExport:
+    """Test cases for exports run by the job queue"""
+
+    @pytest.mark.asyncio
+    async def test_csv_export_matches_streamed_export(self, queue, database):
+        """Test that the parts are rendered in parallel jobs and joined after one header"""
+        started, status = await run_export(queue, database, "anki_csv")
+
+        assert len(started.parts) == 4
+        assert status.status == "completed"
+        assert status.cards_written == status.cards_total == 20
+        assert all(part["cards_written"] == 5 for part in status.parts)
+
+        response = await export_api.download_export_job(started.export_id)
+        with open(response.path, encoding="utf-8") as export_file:
+            rows = list(csv.reader(export_file))
+        streamed = list(csv.reader(io.StringIO(ExportService(database()).export_anki_csv())))
+        assert rows[0] == streamed[0]
+        assert sorted(rows[1:]) == sorted(streamed[1:])
+        assert not (response.path.parent / "parts").exists()
+
+    @pytest.mark.asyncio
+    async def test_apkg_export(self, queue, database):
+        """Test that the Anki package holds a note per card, scheduling and the figure image"""
+        started, status = await run_export(queue, database, "apkg")
+
+        assert status.status == "completed"
+        response = await export_api.download_export_job(started.export_id)
+        assert response.filename.endswith(".apkg")
+
+        with zipfile.ZipFile(response.path) as package:
+            media = json.loads(package.read("media"))
+            assert list(media) == ["0"] and media["0"].endswith(".png")
+            assert package.read("0") == b"\x89PNG image"
+            collection = package.extract("collection.anki2", response.path.parent)
+
+        connection = sqlite3.connect(collection)
+        assert connection.execute("SELECT count(*) FROM notes").fetchone()[0] == 20
+        assert connection.execute("SELECT ver FROM col").fetchone()[0] == 11
+        decks = json.loads(connection.execute("SELECT decks FROM col").fetchone()[0])
+        assert {deck["name"] for deck in decks.values()} == {"Default"} | {f"book.pdf::Chapter {c}" for c in range(4)}
+        image_fields = connection.execute("SELECT flds FROM notes WHERE flds LIKE '<img%'").fetchall()
+        assert image_fields[0][0].split("\x1f")[0] == f'<img src="{media["0"]}"><br>Where?'
+        # Cards with repetitions are review cards, the others new
+        assert connection.execute("SELECT type, count(*) FROM cards GROUP BY type").fetchall() == [(0, 4), (2, 16)]
+        assert connection.execute("SELECT DISTINCT ivl, factor FROM cards WHERE type = 2").fetchall() == [(6, 2500)]
+        connection.close()
+
+    @pytest.mark.asyncio
+    async def test_jsonl_export_is_one_part(self, queue, database):
+        """Test that backups are rendered by a single job"""
+        started, status = await run_export(queue, database, "jsonl")
+
+        assert len(started.parts) == 1
+        assert status.status == "completed"
+        assert status.cards_written == 20
+        response = await export_api.download_export_job(started.export_id)
+        with open(response.path, encoding="utf-8") as export_file:
+            assert json.loads(export_file.readline())["export_metadata"]["total_cards"] == 20
+
+    @pytest.mark.asyncio
+    async def test_pending_and_unknown_exports(self, queue, database):
+        """Test that unfinished exports cannot be downloaded and unknown ones are not found"""
+        started = await export_api.create_export_job(export_api.ExportJobRequest(format="notion_csv"), db=database())
+
+        status = await export_api.get_export_job(started.export_id)
+        assert status.status == "queued"
+        assert status.download_url is None
+        with pytest.raises(HTTPException) as pending:
+            await export_api.download_export_job(started.export_id)
+        assert pending.value.status_code == 409
+
+        with pytest.raises(HTTPException) as unknown:
+            await export_api.get_export_job("00000000-0000-0000-0000-000000000000")
+        assert unknown.value.status_code == 404
+
+        with pytest.raises(HTTPException) as invalid:
+            await export_api.create_export_job(export_api.ExportJobRequest(format="pdf"), db=database())
+        assert invalid.value.status_code == 400
+
+
+class TestExportCleanup:
+    """Test cases for removing the files of expired exports"""
+
+    @pytest.mark.asyncio
+    async def test_expired_exports_are_removed(self, queue, database, tmp_path):
+        """Test that only export directories whose jobs have expired are removed"""
+        expired, _ = await run_export(queue, database, "anki_csv")
+        current, _ = await run_export(queue, database, "notion_csv")
+        exports = tmp_path / "exports"
+        (exports / "not-an-export").mkdir()
+        for directory in exports.iterdir():
+            os.utime(directory, (0, 0))
+
+        with queue.redis_conn.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET expires_at = ? WHERE id LIKE ?",
+                ((datetime.utcnow() - timedelta(seconds=1)).isoformat(), f"export_{expired.export_id}%")
+            )
+        queue.redis_conn.purge_expired()
+
+        assert cleanup_exports(reschedule=False) == {"exports_removed": 1}
+        assert not (exports / expired.export_id).exists()
+        assert (exports / current.export_id).is_dir()
+        assert (exports / "not-an-export").is_dir()
+        response = await export_api.download_export_job(current.export_id)
+        assert response.path.is_file()
+
+    @pytest.mark.asyncio
+    async def test_recent_exports_are_kept(self, queue, database, tmp_path):
+        """Test that directories of exports still being enqueued are not removed"""
+        (tmp_path / "exports" / "00000000-0000-0000-0000-000000000000").mkdir(parents=True)
+
+        result = cleanup_exports()
+
+        assert result["exports_removed"] == 0
+        assert result["next_job_id"].startswith("export_cleanup_")
@@ -0,0 +1,114 @@
+"""
+Tests for export queries
+"""
+
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.document import Document, Chapter, Figure
+from app.models.knowledge import Knowledge, KnowledgeType
+from app.models.learning import Card, SRS, CardType
+from app.services.export_queries import export_cards_statement
+from app.services.export_service import ExportService
+
+REVIEWED = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Three documents with two chapters of five cards, each card with up to three SRS records"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for d in range(3):
+        document = Document(filename=f"book{d}.pdf", file_type="pdf", file_path=f"book{d}.pdf", file_size=1)
+        session.add(document)
+        session.flush()
+        for c in range(2):
+            chapter = Chapter(document_id=document.id, title=f"Chapter {c}", level=1, order_index=c)
+            session.add(chapter)
+            session.flush()
+            session.add_all([
+                Figure(chapter_id=chapter.id, image_path=f"fig{d}{c}{f}.png", page_number=1) for f in range(2)
+            ])
+            knowledge = Knowledge(chapter_id=chapter.id, kind=KnowledgeType.FACT, text="Fact", anchors={"page": 1})
+            session.add(knowledge)
+            session.flush()
+            for i in range(5):
+                card = Card(knowledge_id=knowledge.id, card_type=CardType.QA, front=f"Q{d}.{c}.{i}", back="A")
+                session.add(card)
+                session.flush()
+                # Card i has i % 3 reviewed records plus one never reviewed
+                session.add(SRS(card_id=card.id, due_date=REVIEWED))
+                for r in range(i % 3):
+                    session.add(SRS(card_id=card.id, due_date=REVIEWED, last_reviewed=REVIEWED - timedelta(days=r)))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestLatestSRS:
+    """Test cases for cards joined with their latest SRS record"""
+
+    def test_one_row_per_card_with_latest_review(self, db):
+        """Test that each card appears once with its most recently reviewed record"""
+        rows = db.execute(export_cards_statement(with_srs=True)).all()
+
+        assert len(rows) == 30
+        assert len({card.id for card, _ in rows}) == 30
+        for card, srs in rows:
+            index = int(card.front.rsplit(".", 1)[1])
+            assert srs.card_id == card.id
+            assert srs.last_reviewed == (REVIEWED if index % 3 else None)
+
+    def test_notion_export_runs_one_query(self, db, queries):
+        """Test that last reviewed dates come from the joined projection"""
+        content = ExportService(db).export_notion_csv()
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert len(rows) == 30
+        assert {row["Last Reviewed"] for row in rows} == {"", REVIEWED.isoformat()}
+        assert len(queries) == 1
+
+    def test_filters(self, db):
+        """Test that document and chapter filters apply to the projection"""
+        chapter = db.query(Chapter).filter(Chapter.title == "Chapter 1").first()
+
+        rows = db.execute(export_cards_statement(chapter_ids=[chapter.id], with_srs=True)).all()
+        by_document = db.execute(export_cards_statement(document_id=chapter.document_id)).all()
+
+        assert len(rows) == 5
+        assert len(by_document) == 10
+
+
+class TestBackupQueries:
+    """Test cases for batched JSONL backup loading"""
+
+    def test_query_count_does_not_grow_with_documents(self, db, queries):
+        """Test that documents are loaded in batches with one query per relationship level"""
+        lines = [json.loads(line) for line in ExportService(db).iter_jsonl_backup()]
+
+        assert len(lines) == 3
+        # Documents, chapters, figures, knowledge points, cards, SRS records
+        assert len(queries) == 6
+        for line in lines:
+            assert line["export_metadata"] == {
+                **line["export_metadata"],
+                "total_chapters": 2, "total_figures": 4, "total_knowledge": 2, "total_cards": 10
+            }
+            cards = [card for chapter in line["chapters"] for k in chapter["knowledge_points"] for card in k["cards"]]
+            assert sum(len(card["srs_records"]) for card in cards) == 18
@@ -0,0 +1,167 @@
+"""
+Tests for streamed CSV and JSONL exports
+"""
+
+import csv
+import io
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.export import export_anki_csv, export_jsonl_backup, router
+from app.core.database import get_db
+from app.models.knowledge import KnowledgeType
+from app.services import export_service as export_module
+from app.services.export_service import ExportService
+from tests.factories import add_card, add_knowledge, make_document, sqlite_engine
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Two documents with 30 cards each"""
+    engine = sqlite_engine(tmp_path / "export.db")
+    session = sessionmaker(bind=engine)()
+    for d in range(2):
+        document = make_document(f"book{d}.pdf")
+        knowledge = add_knowledge(document.chapters[0], "Term", KnowledgeType.DEFINITION,
+                                  entities=["term"], anchors={"page": d + 1})
+        for i in range(30):
+            add_card(knowledge, f"Q{d}.{i}", "A" * 200)
+        session.add(document)
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+async def collect(response):
+    return "".join([chunk async for chunk in response.body_iterator])
+
+
+class TestExportGenerators:
+    """Test cases for the chunked export generators"""
+
+    def test_header_is_yielded_first(self, db):
+        """Test that the header is available before any card is read"""
+        queries = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: queries.append(args[2]))
+        chunks = ExportService(db).iter_anki_csv()
+
+        first = next(chunks)
+
+        assert first.startswith('"Front","Back","Tags"')
+        assert first.count("\n") == 1
+        assert queries == []
+
+    @pytest.mark.parametrize("method", ["anki_csv", "notion_csv"])
+    def test_chunks_are_bounded(self, db, monkeypatch, method):
+        """Test that rows are flushed in chunks of about EXPORT_CHUNK_SIZE"""
+        monkeypatch.setattr(export_module, "EXPORT_CHUNK_SIZE", 1024)
+        service = ExportService(db)
+
+        chunks = list(getattr(service, f"iter_{method}")())
+
+        assert len(chunks) > 3
+        assert all(len(chunk) < 2048 for chunk in chunks)
+        assert "".join(chunks) == getattr(service, f"export_{method}")()
+        assert len(list(csv.reader(io.StringIO("".join(chunks))))) == 61
+
+    def test_cards_are_read_in_batches(self, db, monkeypatch):
+        """Test that the card query is fetched in yield_per batches with its parents"""
+        monkeypatch.setattr(export_module, "EXPORT_BATCH_SIZE", 7)
+        queries = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+        cards = list(ExportService(db)._iter_cards_for_export())
+        filenames = {card.knowledge.chapter.document.filename for card in cards}
+
+        assert len(cards) == 60
+        assert filenames == {"book0.pdf", "book1.pdf"}
+        # Parents come from the joined rows, without lazy loads
+        assert len(queries) == 1
+
+    def test_jsonl_one_line_per_document(self, db):
+        """Test that each document is yielded as its own line"""
+        lines = list(ExportService(db).iter_jsonl_backup())
+
+        assert len(lines) == 2
+        assert all(line.endswith("\n") for line in lines)
+        assert sorted(len(json.loads(line)["chapters"][0]["knowledge_points"][0]["cards"]) for line in lines) == [30, 30]
+
+
+class TestExportEndpoints:
+    """Test cases for the streamed export responses"""
+
+    @pytest.mark.asyncio
+    async def test_csv_response_streams_generator(self, db):
+        """Test that the CSV endpoint streams the generator output"""
+        response = await export_anki_csv(document_id=None, chapter_ids=None, db=db)
+
+        assert response.media_type == "text/csv"
+        assert await collect(response) == ExportService(db).export_anki_csv()
+
+    @pytest.mark.asyncio
+    async def test_jsonl_response_streams_generator(self, db):
+        """Test that the JSONL endpoint streams one line per document"""
+        response = await export_jsonl_backup(document_id=None, db=db)
+
+        assert len((await collect(response)).splitlines()) == 2
+
+
+def used_after_teardown(*args):
+    raise AssertionError("Request session used after the endpoint returned")
+
+
+class TestStreamingThroughApp:
+    """Test cases for streamed exports sent by the application"""
+
+    @pytest.fixture
+    def client(self, db):
+        """
+        App whose request sessions must not be used once the response has
+        started, as FastAPI 0.106-0.117 closes them before streaming
+        """
+        sessions = []
+
+        def request_session():
+            session = Session(bind=db.get_bind())
+            sessions.append(session)
+            try:
+                yield session
+            finally:
+                session.close()
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_db] = request_session
+
+        @app.middleware("http")
+        async def close_sessions_when_endpoint_returns(request, call_next):
+            response = await call_next(request)
+            for session in sessions:
+                session.close()
+                event.listen(session, "after_begin", used_after_teardown)
+            return response
+
+        return TestClient(app)
+
+    @pytest.mark.parametrize("path", ["/export/csv?format=notion", "/export/csv/anki", "/export/csv/notion"])
+    def test_csv_streams_after_teardown(self, client, path):
+        """Test that streamed CSV exports read through their own session"""
+        with client.stream("GET", path) as response:
+            rows = list(csv.reader(io.StringIO(response.read().decode())))
+
+        assert response.status_code == 200
+        assert len(rows) == 61
+
+    @pytest.mark.parametrize("path", ["/export/jsonl", "/export/jsonl/backup"])
+    def test_jsonl_streams_after_teardown(self, client, path):
+        """Test that streamed JSONL exports read through their own session"""
+        with client.stream("GET", path) as response:
+            lines = list(response.iter_lines())
+
+        assert response.status_code == 200
+        assert len(lines) == 2
@@ -0,0 +1,145 @@
+"""Tests for size-aware job scheduling."""
+
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.job_scheduler import (
+    JobScheduler,
+    DEFAULT_SIZE_CLASSES,
+    DEFAULT_SECONDS_PER_PAGE,
+)
+
+
+class InMemoryRedis:
+    """Minimal stand-in for the Redis commands used by the scheduler."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = str(value).encode()
+
+    def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+def make_job(meta):
+    job = MagicMock()
+    job.id = "doc_process_test"
+    job.meta = meta
+    return job
+
+
+class TestJobScheduler:
+    """Test cases for JobScheduler."""
+
+    @pytest.fixture
+    def scheduler(self):
+        return JobScheduler(InMemoryRedis())
+
+    def test_classify_by_pages_and_size(self, scheduler):
+        """Test that documents land in the smallest class that fits."""
+        assert scheduler.classify(10, 1024).name == "small"
+        assert scheduler.classify(120, 1024).name == "medium"
+        assert scheduler.classify(10, 20 * 1024 * 1024).name == "medium"
+        assert scheduler.classify(1000, None).name == "large"
+        assert scheduler.classify(None, None).name == "small"
+
+    def test_estimate_page_count_from_size(self):
+        """Test page estimation for formats without a page count."""
+        assert JobScheduler.estimate_page_count("/docs/notes.md", 30 * 1024) == 10
+        assert JobScheduler.estimate_page_count("/docs/notes.md", 10) == 1
+        assert JobScheduler.estimate_page_count(None, 1024) is None
+
+    def test_estimate_page_count_reads_file_size(self):
+        """Test that the file size is read from disk when not given."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "notes.txt"
+            path.write_bytes(b"x" * 7 * 1024)
+
+            assert JobScheduler.estimate_page_count(str(path), None) == 3
+
+    def test_timeout_scales_with_pages(self, scheduler):
+        """Test adaptive timeouts within class bounds."""
+        small, medium, large = DEFAULT_SIZE_CLASSES
+
+        assert scheduler.timeout_for(small, 1) == small.min_timeout
+        assert scheduler.timeout_for(large, 100000) == large.max_timeout
+
+        pages = 250
+        expected = int(pages * DEFAULT_SECONDS_PER_PAGE * 3)
+        assert scheduler.timeout_for(medium, pages) == max(medium.min_timeout, expected)
+
+    def test_timeout_adapts_to_observed_speed(self, scheduler):
+        """Test that recorded durations change future timeouts."""
+        large = DEFAULT_SIZE_CLASSES[-1]
+        before = scheduler.timeout_for(large, 2000)
+
+        for _ in range(20):
+            scheduler.record_completion(
+                make_job({"size_class": "large", "page_count": 2000}), 2000 * 10.0
+            )
+
+        assert scheduler.seconds_per_page() > DEFAULT_SECONDS_PER_PAGE
+        assert scheduler.timeout_for(large, 2000) > before
+
+    def test_queue_position_from_tickets(self, scheduler):
+        """Test O(1) queue positions from ticket counters."""
+        small = DEFAULT_SIZE_CLASSES[0]
+        jobs = [make_job(scheduler.build_job_meta(small, 5, 1024)) for _ in range(6)]
+
+        assert scheduler.estimate_start(jobs[0])["queue_position"] == 1
+        assert scheduler.estimate_start(jobs[5])["queue_position"] == 6
+
+        scheduler.mark_dequeued(jobs[0])
+        scheduler.mark_dequeued(jobs[0])  # Counted once per job
+        jobs[0].save_meta.assert_called_once()
+
+        estimate = scheduler.estimate_start(jobs[5])
+        assert estimate["queue_position"] == 5
+        assert estimate["size_class"] == "small"
+        # Four small jobs run concurrently, so the fifth waits one round
+        assert estimate["estimated_wait_seconds"] == pytest.approx(
+            scheduler.average_job_seconds(small), rel=0.01
+        )
+
+    def test_estimate_without_scheduling_meta(self, scheduler):
+        """Test that jobs enqueued before size classes have no estimate."""
+        assert scheduler.estimate_start(make_job({})) is None
+
+    def test_worker_plan_respects_concurrency_limits(self, scheduler):
+        """Test that large jobs never get more workers than their limit."""
+        plan = scheduler.plan_worker_queues(12, shared_queues=["priority_processing"])
+
+        assert len(plan) == 12
+        assert all(queues[0] == "priority_processing" for queues in plan)
+
+        for size_class in DEFAULT_SIZE_CLASSES:
+            serving = sum(1 for queues in plan if size_class.queue_name in queues)
+            if size_class.name != "small":
+                assert serving <= size_class.max_concurrency
+            assert serving >= 1
+
+    def test_worker_plan_with_single_process(self, scheduler):
+        """Test that a single worker serves every class, small first."""
+        plan = scheduler.plan_worker_queues(1)
+
+        assert plan == [[size_class.queue_name for size_class in DEFAULT_SIZE_CLASSES]]
+
+    def test_worker_plan_with_fewer_processes_than_classes(self, scheduler):
+        """Test that unserved classes are picked up by the last worker."""
+        small, medium, large = DEFAULT_SIZE_CLASSES
+        plan = scheduler.plan_worker_queues(2)
+
+        assert plan == [
+            [small.queue_name],
+            [medium.queue_name, small.queue_name, large.queue_name],
+        ]
@@ -0,0 +1,266 @@
+"""Tests for the embedded SQLite job queue backend."""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from rq import Retry
+from rq.exceptions import NoSuchJobError
+from rq.job import Dependency, JobStatus
+
+from app.core.config import settings
+from app.services.job_scheduler import JobScheduler
+from app.services.local_queue import (
+    LocalJob,
+    LocalJobStore,
+    LocalQueue,
+    LocalWorker,
+    get_current_job,
+)
+
+CALLS = []
+
+
+def add(a, b):
+    CALLS.append((a, b))
+    return a + b
+
+
+def fail_always():
+    CALLS.append("fail")
+    raise RuntimeError("boom")
+
+
+def report_progress(step):
+    job = get_current_job()
+    job.meta["step"] = step
+    job.save_meta()
+    return job.id
+
+
+def sleep_for(seconds):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def store(tmp_path):
+    CALLS.clear()
+    store = LocalJobStore(tmp_path / "jobs.db")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def queue(store):
+    return LocalQueue("default", connection=store)
+
+
+def drain(store, queue_names=("default",)):
+    LocalWorker(list(queue_names), connection=store, name="test-worker").work(burst=True)
+
+
+class TestLocalQueue:
+    """Test cases for enqueueing and executing local jobs."""
+
+    def test_enqueue_and_execute(self, store, queue):
+        """Test that a job runs once and keeps its result."""
+        job = queue.enqueue(add, 2, 3, job_id="job-add", meta={"source": "test"})
+
+        assert job.get_status() == JobStatus.QUEUED
+        assert len(queue) == 1
+
+        drain(store)
+
+        job = LocalJob.fetch("job-add", connection=store)
+        assert job.get_status() == JobStatus.FINISHED
+        assert job.result == 5
+        assert job.meta == {"source": "test"}
+        assert job.started_at is not None and job.ended_at is not None
+        assert len(queue) == 0
+        assert len(queue.finished_job_registry) == 1
+
+    def test_fetch_missing_job(self, store):
+        """Test that unknown jobs raise like RQ."""
+        with pytest.raises(NoSuchJobError):
+            LocalJob.fetch("missing", connection=store)
+
+    def test_queue_order(self, store, queue):
+        """Test FIFO order, at_front jobs and queue priority."""
+        urgent_queue = LocalQueue("urgent", connection=store)
+        queue.enqueue(add, 1, 0)
+        queue.enqueue(add, 2, 0)
+        queue.enqueue(add, 3, 0, at_front=True)
+        urgent_queue.enqueue(add, 4, 0)
+
+        drain(store, queue_names=("urgent", "default"))
+
+        assert CALLS == [(4, 0), (3, 0), (1, 0), (2, 0)]
+
+    def test_retry_then_fail(self, store, queue):
+        """Test that failed jobs are retried before landing in the failed registry."""
+        queue.enqueue(fail_always, job_id="job-fail", retry=Retry(max=2))
+
+        drain(store)
+
+        job = LocalJob.fetch("job-fail", connection=store)
+        assert CALLS == ["fail"] * 3
+        assert job.get_status() == JobStatus.FAILED
+        assert "RuntimeError: boom" in job.exc_info
+        assert queue.failed_job_registry.get_job_ids() == ["job-fail"]
+
+    def test_dependencies_allowing_failure(self, store, queue):
+        """Test that a coordinator runs after all parts, even failed ones."""
+        parts = [queue.enqueue(add, 1, 1), queue.enqueue(fail_always)]
+        coordinator = queue.enqueue(
+            add, 10, 10, job_id="coordinator",
+            depends_on=Dependency(jobs=[part.id for part in parts], allow_failure=True)
+        )
+        assert coordinator.get_status() == JobStatus.DEFERRED
+
+        drain(store)
+
+        assert CALLS[-1] == (10, 10)
+        assert coordinator.get_status() == JobStatus.FINISHED
+
+    def test_failed_dependency_blocks_dependent(self, store, queue):
+        """Test that dependents stay deferred when a dependency fails."""
+        part = queue.enqueue(fail_always)
+        dependent = queue.enqueue(add, 1, 2, depends_on=part)
+
+        drain(store)
+
+        assert dependent.get_status() == JobStatus.DEFERRED
+        assert (1, 2) not in CALLS
+
+    def test_cancel(self, store, queue):
+        """Test that cancelled jobs are never executed."""
+        job = queue.enqueue(add, 5, 5)
+        job.cancel()
+
+        drain(store)
+
+        assert job.get_status() == JobStatus.CANCELED
+        assert CALLS == []
+
+    def test_job_meta_from_inside_job(self, store, queue):
+        """Test that running jobs can publish progress through their meta."""
+        job = queue.enqueue(report_progress, "parsing")
+
+        drain(store)
+
+        job = LocalJob.fetch(job.id, connection=store)
+        assert job.meta["step"] == "parsing"
+        assert job.result == job.id
+        assert get_current_job() is None
+
+    def test_timeout(self, store, queue):
+        """Test that jobs exceeding their timeout fail."""
+        job = queue.enqueue(sleep_for, 5, job_timeout=1)
+
+        start = time.monotonic()
+        drain(store)
+
+        assert time.monotonic() - start < 4
+        assert job.get_status() == JobStatus.FAILED
+        assert "JobTimeoutException" in LocalJob.fetch(job.id, connection=store).exc_info
+
+    def test_abandoned_jobs_are_recovered(self, store, queue):
+        """Test that jobs of dead workers are retried."""
+        job = queue.enqueue(add, 7, 7, retry=Retry(max=1))
+        store.claim(["default"], "dead-worker")
+        assert job.get_status() == JobStatus.STARTED
+
+        assert store.recover_abandoned_jobs() == 1
+        assert job.get_status() == JobStatus.QUEUED
+
+        drain(store)
+        assert job.get_status() == JobStatus.FINISHED
+
+    def test_expired_results_are_purged(self, store, queue):
+        """Test that results are deleted after their TTL."""
+        kept = queue.enqueue(add, 1, 1)
+        expired = queue.enqueue(add, 2, 2, result_ttl=0)
+
+        drain(store)
+        time.sleep(0.01)
+
+        assert store.purge_expired() == 1
+        assert kept.get_status() == JobStatus.FINISHED
+        with pytest.raises(NoSuchJobError):
+            expired.refresh()
+
+    def test_scheduled_jobs_wait_for_their_time(self, store, queue):
+        """Test that scheduled jobs are queued by the scheduling worker once due."""
+        later = queue.enqueue_at(datetime.utcnow() + timedelta(hours=1), add, 1, 2)
+        due = queue.enqueue_at(datetime.utcnow() - timedelta(seconds=1), add, 3, 4)
+        assert due.get_status() == JobStatus.SCHEDULED
+
+        drain(store)
+        assert CALLS == []
+
+        LocalWorker(["default"], connection=store, name="scheduler").work(burst=True, with_scheduler=True)
+
+        assert CALLS == [(3, 4)]
+        assert due.get_status() == JobStatus.FINISHED
+        assert later.get_status() == JobStatus.SCHEDULED
+        assert later.id in queue.scheduled_job_registry.get_job_ids()
+
+    def test_workers_are_registered(self, store):
+        """Test worker listing for health checks."""
+        store.heartbeat("worker-1", ["default"], "busy", "job-1")
+
+        workers = LocalWorker.all(connection=store)
+
+        assert [worker.name for worker in workers] == ["worker-1"]
+        assert workers[0].get_state() == "busy"
+        assert workers[0].get_current_job_id() == "job-1"
+        assert [queue.name for queue in workers[0].queues] == ["default"]
+
+    def test_store_counters_back_job_scheduler(self, store):
+        """Test that the scheduler's Redis commands work on the store."""
+        scheduler = JobScheduler(store)
+        small = scheduler.size_classes[0]
+
+        assert scheduler.take_ticket(small) == 1
+        assert scheduler.take_ticket(small) == 2
+        store.set("scheduler:seconds_per_page", 3.5)
+        assert scheduler.seconds_per_page() == 3.5
+
+
+class TestQueueServiceLocalBackend:
+    """Test cases for QueueService on the local backend."""
+
+    @pytest.fixture
+    def queue_service(self, tmp_path, monkeypatch):
+        from app.services.queue_service import QueueService
+
+        monkeypatch.setattr(settings, "local_queue_path", str(tmp_path / "jobs.db"))
+        return QueueService(backend="local")
+
+    @pytest.mark.asyncio
+    async def test_enqueue_status_and_cancel(self, queue_service):
+        """Test the document processing API without Redis."""
+        document_id = uuid.uuid4()
+
+        job_id = await queue_service.enqueue_document_processing(
+            document_id, file_path="/docs/notes.md", file_size=1024
+        )
+
+        status = queue_service.get_job_by_document_id(document_id)
+        assert status["id"] == job_id
+        assert status["status"] == JobStatus.QUEUED
+        assert status["size_class"] == "small"
+        assert queue_service.get_queue_estimate(job_id)["queue_position"] == 1
+
+        assert queue_service.cancel_job(job_id) is True
+        assert queue_service.get_job_status(job_id)["status"] == JobStatus.CANCELED
+
+    def test_health_check(self, queue_service):
+        """Test that health checks report the local backend."""
+        health = queue_service.health_check()
+
+        assert health["status"] == "healthy"
+        assert health["backend"] == "local"
+        assert health["total_pending_jobs"] == 0
+        assert "small" in str(health["queue_info"]["queues"])
@@ -0,0 +1,127 @@
+"""
+Tests for the ring-buffer time-series store of the performance monitoring service
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.metric_time_series import MetricTimeSeriesStore, RingSeries
+from app.services.performance_monitoring_service import (
+    PerformanceMetric, PerformanceMetricType, PerformanceMonitoringService
+)
+
+CPU = PerformanceMetricType.CPU_USAGE
+MEMORY = PerformanceMetricType.MEMORY_USAGE
+
+
+def metric(metric_type, value, timestamp, component="system"):
+    return PerformanceMetric(metric_type=metric_type, value=value, timestamp=timestamp,
+                             context={"component": component}, tags={})
+
+
+class TestRingSeries:
+    """Test cases for RingSeries"""
+
+    @pytest.mark.parametrize("shuffled", [False, True])
+    def test_windows_match_a_scan(self, shuffled):
+        """Test that windows hold the retained samples in range, in order and out of order"""
+        rng = random.Random(3)
+        stamps = [float(t) for t in range(250)]
+        if shuffled:
+            rng.shuffle(stamps)
+        series = RingSeries(capacity=100)
+        for sequence, stamp in enumerate(stamps):
+            series.append(stamp, stamp * 2, sequence)
+
+        retained = stamps[-100:]
+        for since, until in [(0, None), (160, 190), (220, 400), (300, None)]:
+            timestamps, values = series.window(since, until)
+            expected = [t for t in retained if t >= since and (until is None or t < until)]
+            assert list(timestamps) == expected
+            assert list(values) == [t * 2 for t in expected]
+
+    def test_ring_sorts_again_after_wrapping(self):
+        """Test that binary search resumes once in-order samples fill the ring"""
+        series = RingSeries(capacity=10)
+        for t in [5.0, 1.0] + [float(t) for t in range(10, 18)]:
+            series.append(t, t, 0)
+        assert series.sorted_run < series.size
+
+        # Evicts 5.0, the only sample out of order
+        series.append(18.0, 18.0, 0)
+
+        assert series.sorted_run >= series.size
+        assert list(series.window(12, 15)[0]) == [12.0, 13.0, 14.0]
+
+
+class TestMetricTimeSeriesStore:
+    """Test cases for MetricTimeSeriesStore"""
+
+    def test_memory_is_bounded(self):
+        """Test that raw samples are capped per metric type while the rollups keep counting"""
+        store = MetricTimeSeriesStore(PerformanceMetric, raw_capacity=1000)
+        start = datetime.now() - timedelta(hours=3)
+        for i in range(5000):
+            store.append(metric(CPU, float(i % 100), start + timedelta(seconds=2 * i)))
+
+        assert len(store) == 1000
+        assert store.raw[CPU].timestamps.shape == (1000,)
+        minutes = store.rollup(CPU, "1m", start)
+        assert minutes["count"].sum() == 5000
+        assert minutes["count"].max() == 30
+
+    def test_stats_and_hourly_rollups(self):
+        """Test window statistics and hourly rollups against the raw values"""
+        store = MetricTimeSeriesStore(PerformanceMetric)
+        start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        values = np.random.default_rng(5).normal(50, 5, 360)
+        for i, value in enumerate(values):
+            store.append(metric(MEMORY, float(value), start + timedelta(seconds=20 * i)))
+        store.append(metric(CPU, 10.0, start))
+
+        stats = store.stats(MEMORY, start + timedelta(hours=1))
+        assert stats.count == 180
+        assert stats.mean == pytest.approx(values[180:].mean())
+        assert stats.std_dev == pytest.approx(values[180:].std(ddof=1))
+        assert stats.last == pytest.approx(values[-1])
+
+        hours = store.rollup(MEMORY, "1h", start)
+        assert list(hours["count"]) == [180, 180]
+        assert hours["sum"][0] / 180 == pytest.approx(values[:180].mean())
+        assert hours["max"][1] == pytest.approx(values[180:].max())
+
+    def test_metrics_in_append_order(self):
+        """Test that whole metrics are rebuilt across types in the order they were recorded"""
+        store = MetricTimeSeriesStore(PerformanceMetric)
+        now = datetime.now()
+        store.append(metric(CPU, 1.0, now, component="api"))
+        store.append(metric(MEMORY, 2.0, now - timedelta(minutes=1)))
+        store.append(metric(CPU, 3.0, now))
+
+        assert [m.value for m in store.metrics(since=now - timedelta(minutes=5))] == [1.0, 2.0, 3.0]
+        assert store[0].context == {"component": "api"}
+        assert [m.value for m in store.metrics(since=now - timedelta(seconds=1))] == [1.0, 3.0]
+
+
+class TestMonitoringServiceStore:
+    """Test cases for the monitoring service on top of the store"""
+
+    @pytest.mark.asyncio
+    async def test_baselines_and_trends(self):
+        """Test that baselines and trends are computed from the store"""
+        service = PerformanceMonitoringService()
+        start = datetime.now() - timedelta(hours=2)
+        for i in range(100):
+            await service.record_metric(metric(MEMORY, 40.0 + i % 20, start + timedelta(minutes=i)))
+
+        baseline = service.baselines[MEMORY]
+        assert baseline.sample_count == 100
+        assert baseline.mean == pytest.approx(49.5)
+        assert baseline.percentile_95 == 58.0
+
+        trends = await service.get_performance_trends(MEMORY, hours=3)
+        assert trends["summary"]["total_samples"] == 100
+        assert sum(point["count"] for point in trends["data_points"]) == 100
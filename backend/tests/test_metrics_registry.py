@@ -0,0 +1,217 @@
+"""
+Tests for the latency sketches behind PerformanceMiddleware
+"""
+
+import json
+import random
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.middleware import performance
+from app.middleware.metrics_registry import (
+    OVERFLOW_ENDPOINT,
+    RELATIVE_ACCURACY,
+    UNMATCHED_ENDPOINT,
+    LatencySketch,
+    MetricsRegistry,
+)
+
+
+@pytest.fixture
+def latencies():
+    rng = random.Random(7)
+    return [rng.lognormvariate(-3, 1) for _ in range(20000)]
+
+
+class TestLatencySketch:
+    """Test cases for LatencySketch"""
+
+    def test_quantiles_within_relative_accuracy(self, latencies):
+        """Test that quantiles are within the sketch's relative accuracy of the exact ones"""
+        sketch = LatencySketch()
+        for latency in latencies:
+            sketch.record(latency)
+
+        ordered = sorted(latencies)
+        for q in (0.5, 0.9, 0.95, 0.99, 0.999):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact * 1.01
+        assert sketch.count == len(latencies)
+        assert sketch.mean == pytest.approx(sum(latencies) / len(latencies))
+
+    def test_memory_is_fixed(self, latencies):
+        """Test that the bucket array does not grow with values, including out-of-range ones"""
+        sketch = LatencySketch()
+        buckets = len(sketch.counts)
+        for latency in latencies + [0.0, 1e-9, 5e3]:
+            sketch.record(latency)
+
+        assert len(sketch.counts) == buckets
+        assert sketch.max == 5e3 and sketch.min == 0.0
+
+    def test_merge_equals_single_sketch(self, latencies):
+        """Test that merging sketches of parts gives the sketch of the whole"""
+        whole, first, second = LatencySketch(), LatencySketch(), LatencySketch()
+        for index, latency in enumerate(latencies):
+            whole.record(latency)
+            (first if index % 3 else second).record(latency)
+
+        first.merge(LatencySketch.from_dict(json.loads(json.dumps(second.to_dict()))))
+
+        assert first.counts == whole.counts
+        assert first.quantile(0.99) == whole.quantile(0.99)
+        with pytest.raises(ValueError):
+            first.merge(LatencySketch(relative_accuracy=0.02))
+
+
+class TestMetricsRegistry:
+    """Test cases for MetricsRegistry"""
+
+    def test_prometheus_exposition(self):
+        """Test that series are rendered as cumulative histogram buckets per label set"""
+        registry = MetricsRegistry()
+        for latency in (0.003, 0.02, 0.02, 0.7):
+            registry.record("GET", "/documents/{document_id}", 200, latency)
+        registry.record("POST", "/export/jobs", 500, 0.2)
+
+        lines = registry.render_prometheus().splitlines()
+
+        labels = 'method="GET",endpoint="/documents/{document_id}",status="200"'
+        assert "# TYPE http_request_duration_seconds histogram" in lines
+        assert f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1' in lines
+        assert f'http_request_duration_seconds_bucket{{{labels},le="0.025"}} 3' in lines
+        assert f'http_request_duration_seconds_bucket{{{labels},le="1.0"}} 4' in lines
+        assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in lines
+        assert f'http_request_duration_seconds_count{{{labels}}} 4' in lines
+        assert 'http_request_duration_seconds_count{method="POST",endpoint="/export/jobs",status="500"} 1' in lines
+
+    def test_worker_snapshots_are_merged(self, tmp_path, monkeypatch):
+        """Test that /metrics merges the snapshots written by other worker processes"""
+        monkeypatch.setattr(settings, "metrics_multiprocess_dir", str(tmp_path))
+        other_worker = MetricsRegistry()
+        other_worker.record("GET", "/api/health", 200, 0.01)
+        (tmp_path / "1.json").write_text(json.dumps(other_worker.to_dict()))
+        metrics = performance.PerformanceMetrics()
+
+        metrics.add_request_time("/api/health", "GET", 0.02, 200)
+
+        merged = metrics.collect_registry()
+        assert merged.series[("GET", "/api/health", 200)].count == 2
+        # Each worker writes its own snapshot, which it skips when merging
+        assert len(list(tmp_path.glob("*.json"))) == 2
+        assert metrics.collect_registry().series[("GET", "/api/health", 200)].count == 2
+
+    def test_snapshots_of_exited_workers_are_removed(self, tmp_path, monkeypatch):
+        """Test that latencies of workers that are gone are not merged"""
+        monkeypatch.setattr(settings, "metrics_multiprocess_dir", str(tmp_path))
+        exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                                capture_output=True, text=True, check=True)
+        other_worker = MetricsRegistry()
+        other_worker.record("GET", "/api/health", 200, 0.01)
+        snapshot = tmp_path / f"{exited.stdout.strip()}.json"
+        snapshot.write_text(json.dumps(other_worker.to_dict()))
+
+        merged = performance.PerformanceMetrics().collect_registry()
+
+        assert merged.series == {}
+        assert not snapshot.exists()
+
+    def test_reset_clears_all_workers(self, tmp_path, monkeypatch):
+        """Test that a reset removes the snapshots and other workers drop their latencies"""
+        monkeypatch.setattr(settings, "metrics_multiprocess_dir", str(tmp_path))
+        monkeypatch.setattr(performance, "performance_metrics", performance.PerformanceMetrics())
+        other_worker = performance.PerformanceMetrics()
+        other_worker.add_request_time("/api/health", "GET", 0.01, 200)
+        (tmp_path / "1.json").write_text(json.dumps(other_worker.registry.to_dict()))
+
+        performance.reset_performance_stats()
+
+        assert list(tmp_path.glob("*.json")) == []
+        assert performance.performance_metrics.collect_registry().series == {}
+        other_worker.write_snapshot()
+        assert other_worker.registry.series == {}
+
+
+    def test_series_are_capped(self):
+        """Test that requests of new endpoints past the cap share the overflow series"""
+        registry = MetricsRegistry(max_series=3)
+        for index in range(5):
+            registry.record("GET", f"/reports/{index}", 200, 0.01)
+        registry.record("GET", "/reports/0", 200, 0.01)
+
+        assert len(registry.series) == 4
+        assert registry.series[("GET", "/reports/0", 200)].count == 2
+        assert registry.series[("GET", OVERFLOW_ENDPOINT, 200)].count == 2
+
+        other_worker = MetricsRegistry()
+        other_worker.record("GET", "/reports/9", 200, 0.01)
+        registry.merge(other_worker)
+        assert registry.series[("GET", OVERFLOW_ENDPOINT, 200)].count == 3
+
+
+class TestPerformanceMiddleware:
+    """Test cases for the recorded request statistics"""
+
+    def test_requests_are_recorded_by_route(self, monkeypatch):
+        """Test that requests are keyed by route template and status and summarized from sketches"""
+        monkeypatch.setattr(performance, "performance_metrics", performance.PerformanceMetrics())
+        app = FastAPI()
+        app.add_middleware(performance.PerformanceMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            return {"item_id": item_id}
+
+        client = TestClient(app)
+        for item_id in range(30):
+            client.get(f"/items/{item_id}")
+        client.get("/items/not-a-number")
+
+        stats = performance.performance_metrics.get_stats()
+        endpoint = stats["endpoints"]["GET /items/{item_id}"]
+        assert endpoint["count"] == 31
+        assert endpoint["error_count"] == 1
+        assert endpoint["status_counts"] == {"200": 30, "422": 1}
+        assert endpoint["min_time"] <= endpoint["p50_time"] <= endpoint["p99_time"] <= endpoint["max_time"]
+        assert stats["summary"]["total_requests"] == stats["summary"]["recent_requests_5min"] == 31
+        assert 'status="422"' in performance.get_prometheus_metrics()
+
+    def test_unmatched_paths_share_one_series(self, monkeypatch):
+        """Test that requests matching no route are not keyed by their path"""
+        monkeypatch.setattr(performance, "performance_metrics", performance.PerformanceMetrics())
+        app = FastAPI()
+        app.add_middleware(performance.PerformanceMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            return {"item_id": item_id}
+
+        client = TestClient(app)
+        for index in range(200):
+            assert client.get(f"/wp-admin/probe-{index}.php").status_code == 404
+        client.get("/items/1")
+
+        metrics = performance.performance_metrics
+        assert set(metrics.registry.series) == {
+            ("GET", UNMATCHED_ENDPOINT, 404),
+            ("GET", "/items/{item_id}", 200),
+        }
+        assert set(metrics.endpoint_queries) == {("GET", UNMATCHED_ENDPOINT), ("GET", "/items/{item_id}")}
+        assert metrics.get_stats()["endpoints"][f"GET {UNMATCHED_ENDPOINT}"]["count"] == 200
+
+    def test_endpoint_queries_are_capped(self, monkeypatch):
+        """Test that database time per endpoint is bounded like the latency series"""
+        metrics = performance.PerformanceMetrics()
+        metrics.registry.max_series = 2
+        for index in range(4):
+            request_queries = performance.RequestQueries({"type": "http"})
+            metrics.add_request_queries(f"/reports/{index}", "GET", request_queries, 0.01)
+
+        assert set(metrics.endpoint_queries) == {
+            ("GET", "/reports/0"), ("GET", "/reports/1"), ("GET", OVERFLOW_ENDPOINT)
+        }
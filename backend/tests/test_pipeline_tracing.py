@@ -0,0 +1,169 @@
+"""
+Tests for the spans of document processing runs
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.services.pipeline_tracing import (
+    STATUS_CODE_ERROR,
+    TRACE_METADATA_KEY,
+    PipelineTracer,
+    merge_trace_summaries,
+    model_time,
+    trace_span,
+)
+
+
+class TestPipelineTracer:
+    """Test cases for PipelineTracer"""
+
+    def test_spans_nest_and_roll_up(self):
+        """Test that child spans link to their parent and add their model time to it"""
+        tracer = PipelineTracer()
+        with tracer.span("process_document", document_id="doc-1") as root:
+            for segments in (3, 5):
+                with trace_span("chapter") as chapter:
+                    with trace_span("segment") as segment, model_time():
+                        time.sleep(0.01)
+                        segment.set(segment_count=segments)
+
+        spans = {span.name: span for span in tracer.spans}
+        assert spans["chapter"].parent_span_id == root.span_id
+        assert spans["segment"].parent_span_id == chapter.span_id
+        assert {span.trace_id for span in tracer.spans} == {tracer.trace_id}
+        assert root.model_time >= 0.02
+        assert root.peak_rss_mb >= segment.peak_rss_mb > 0
+
+        stages = tracer.summary()["stages"]
+        assert stages["chapter"]["count"] == stages["segment"]["count"] == 2
+        assert stages["segment"]["segment_count"] == 8
+        assert stages["segment"]["model_time_ms"] >= 20
+        assert stages["process_document"]["model_time_ms"] == pytest.approx(stages["segment"]["model_time_ms"])
+
+    def test_spans_follow_tasks(self):
+        """Test that spans opened in concurrent tasks nest under the span that started them"""
+        tracer = PipelineTracer()
+
+        async def chapter(index):
+            with trace_span("chapter", index=index):
+                await asyncio.sleep(0.01)
+
+        async def run():
+            with tracer.span("process_document") as root:
+                await asyncio.gather(chapter(0), chapter(1))
+            return root
+
+        root = asyncio.run(run())
+
+        chapters = [span for span in tracer.spans if span.name == "chapter"]
+        assert [span.parent_span_id for span in chapters] == [root.span_id] * 2
+
+    def test_untraced_spans_are_not_recorded(self):
+        """Test that code using trace_span also runs outside a traced run"""
+        with trace_span("segment") as span:
+            span.set(segment_count=1)
+        assert span.tracer is None
+
+    def test_database_time_is_attributed(self, tmp_path):
+        """Test that statements of sync and async engines count towards the open span"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        tracer = PipelineTracer()
+
+        async def persist():
+            async with async_engine.begin() as conn:
+                await conn.execute(text("CREATE TABLE cards (id INTEGER)"))
+                await conn.execute(text("INSERT INTO cards VALUES (1)"))
+            await async_engine.dispose()
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with tracer.span("process_document") as root:
+                with trace_span("parse") as parse:
+                    conn.execute(text("SELECT 1"))
+                    conn.execute(text("SELECT 2"))
+                with trace_span("persist") as persist_span:
+                    asyncio.run(persist())
+
+        assert parse.db_statements == 2
+        assert persist_span.db_statements == 2
+        assert root.db_statements == 4
+        assert root.db_time >= parse.db_time + persist_span.db_time > 0
+
+
+class TestTraceExport:
+    """Test cases for the summary and OTLP/JSON export"""
+
+    def test_failed_span_is_exported(self, tmp_path):
+        """Test that spans are appended as OTLP/JSON with the error status of a failed stage"""
+        collector = tmp_path / "traces" / "pipeline.jsonl"
+        tracer = PipelineTracer()
+        with pytest.raises(ValueError):
+            with tracer.span("process_document"):
+                with trace_span("parse") as parse:
+                    parse.set(page_count=12)
+                    raise ValueError("corrupt file")
+
+        assert tracer.export(str(collector))
+        assert tracer.export(str(collector))
+
+        lines = collector.read_text().splitlines()
+        assert len(lines) == 2
+        request = json.loads(lines[0])
+        resource = request["resourceSpans"][0]
+        spans = {span["name"]: span for span in resource["scopeSpans"][0]["spans"]}
+        assert {"key": "service.name", "value": {"stringValue": "document-processing-pipeline"}} in (
+            resource["resource"]["attributes"]
+        )
+        assert spans["parse"]["parentSpanId"] == spans["process_document"]["spanId"]
+        assert spans["parse"]["status"] == {"code": STATUS_CODE_ERROR, "message": "ValueError: corrupt file"}
+        assert len(spans["parse"]["traceId"]) == 32 and len(spans["parse"]["spanId"]) == 16
+        assert int(spans["parse"]["endTimeUnixNano"]) >= int(spans["parse"]["startTimeUnixNano"])
+        attributes = {item["key"]: item["value"] for item in spans["parse"]["attributes"]}
+        assert attributes["pipeline.page_count"] == {"intValue": "12"}
+        assert "doubleValue" in attributes["process.peak_rss_mb"]
+
+        assert tracer.summary()["stages"]["parse"]["errors"] == 1
+
+    def test_export_without_collector_file(self, monkeypatch):
+        """Test that nothing is written when no collector file is configured"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "pipeline_trace_file", "")
+        tracer = PipelineTracer()
+        with tracer.span("process_document"):
+            pass
+
+        assert not tracer.export()
+
+    def test_parts_continue_and_merge_the_trace(self):
+        """Test that part jobs join the document's trace and their summaries are merged"""
+        document = PipelineTracer()
+        with document.span("process_document"):
+            with trace_span("parse", page_count=300):
+                pass
+        metadata = {TRACE_METADATA_KEY: document.summary()}
+
+        parts = []
+        for chapters in (2, 3):
+            part = PipelineTracer.from_metadata(metadata)
+            with part.span("process_part"):
+                for _ in range(chapters):
+                    with trace_span("chapter", card_count=10):
+                        pass
+            parts.append(part)
+
+        assert parts[0].trace_id == document.trace_id
+        assert parts[0].root.parent_span_id == document.root.span_id
+
+        merged = merge_trace_summaries([metadata[TRACE_METADATA_KEY], None] + [part.summary() for part in parts])
+        assert merged["trace_id"] == document.trace_id
+        assert merged["stages"]["parse"]["page_count"] == 300
+        assert merged["stages"]["chapter"]["count"] == 5
+        assert merged["stages"]["chapter"]["card_count"] == 50
+        assert merged["stages"]["process_part"]["count"] == 2
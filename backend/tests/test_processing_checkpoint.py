@@ -0,0 +1,324 @@
+"""Tests for document processing checkpoints."""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.document import Document, Chapter, ProcessingStatus
+from app.models.knowledge import Knowledge, KnowledgeType
+from app.models.learning import Card, CardType
+from app.parsers.base import ParsedContent, TextBlock
+from app.services import chapter_service, document_processing_pipeline
+from app.services.document_processing_pipeline import DocumentProcessingPipeline
+from app.services.processing_checkpoint import (
+    ProcessingCheckpoint,
+    PipelineStage,
+    compute_file_fingerprint,
+    compute_chapter_fingerprint,
+)
+
+BBOX = {"x": 0, "y": 0, "width": 100, "height": 10}
+CHAPTER_TEXTS = ["Alpha is the first letter.", "Beta is the second letter.", "Gamma is the third letter."]
+
+
+class TestProcessingCheckpoint:
+    """Test cases for ProcessingCheckpoint."""
+
+    @pytest.fixture
+    def checkpoint(self):
+        """Create a checkpoint with completed parse and chapter stages."""
+        checkpoint = ProcessingCheckpoint()
+        checkpoint.restart("source-v1")
+        checkpoint.mark_stage(PipelineStage.PARSED, pages=12, figures=2)
+        checkpoint.mark_stage(PipelineStage.CHAPTERS, chapter_count=2)
+        return checkpoint
+
+    def test_empty_metadata(self):
+        """Test loading a checkpoint from metadata without one."""
+        checkpoint = ProcessingCheckpoint.from_metadata({})
+
+        assert checkpoint.source_fingerprint is None
+        assert not checkpoint.is_stage_complete(PipelineStage.PARSED)
+        assert not checkpoint.matches_source(None)
+
+    def test_round_trip_through_metadata(self, checkpoint):
+        """Test that a checkpoint survives serialization into doc_metadata."""
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.KNOWLEDGE, knowledge_points=4)
+        metadata = {ProcessingCheckpoint.METADATA_KEY: checkpoint.to_dict()}
+
+        restored = ProcessingCheckpoint.from_metadata(metadata)
+
+        assert restored.matches_source("source-v1")
+        assert restored.is_stage_complete(PipelineStage.CHAPTERS)
+        assert restored.stage_details(PipelineStage.PARSED)["pages"] == 12
+        assert restored.is_chapter_stage_complete("ch-1", PipelineStage.KNOWLEDGE)
+        assert not restored.is_chapter_complete("ch-1")
+
+    def test_to_dict_is_a_copy(self, checkpoint):
+        """Test that serialized data does not alias internal state."""
+        data = checkpoint.to_dict()
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.CARDS, cards=3)
+
+        assert "ch-1" not in data["chapters"]
+
+    def test_unknown_version_is_discarded(self):
+        """Test that checkpoints from another format version are ignored."""
+        checkpoint = ProcessingCheckpoint({"version": 0, "stages": {"parsed": {}}})
+
+        assert not checkpoint.is_stage_complete(PipelineStage.PARSED)
+
+    def test_failed_chapter_is_redone(self, checkpoint):
+        """Test that failures are tracked per chapter and cleared on success."""
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.CARDS, cards=3)
+        checkpoint.mark_chapter_failed("ch-2", "extraction error")
+
+        assert checkpoint.is_chapter_complete("ch-1")
+        assert not checkpoint.is_chapter_complete("ch-2")
+        assert checkpoint.failed_chapters() == ["ch-2"]
+
+        checkpoint.mark_chapter_stage("ch-2", PipelineStage.KNOWLEDGE, knowledge_points=1)
+
+        assert checkpoint.failed_chapters() == []
+
+    def test_restart_keeps_completed_chapters_for_reuse(self, checkpoint):
+        """Test that a changed source keeps completed chapters as reuse candidates."""
+        checkpoint.mark_chapter_stage(
+            "ch-1", PipelineStage.KNOWLEDGE, knowledge_points=4, fingerprint="fp-1"
+        )
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.CARDS, cards=6)
+        checkpoint.mark_chapter_stage(
+            "ch-2", PipelineStage.KNOWLEDGE, knowledge_points=2, fingerprint="fp-2"
+        )
+
+        checkpoint.restart("source-v2")
+
+        assert not checkpoint.is_stage_complete(PipelineStage.PARSED)
+        assert checkpoint.chapters == {}
+        assert checkpoint.take_reusable_chapter("fp-2") is None
+
+        reusable = checkpoint.take_reusable_chapter("fp-1")
+        assert reusable["chapter_id"] == "ch-1"
+        assert reusable["knowledge_points"] == 4
+        assert reusable["cards"] == 6
+        assert checkpoint.take_reusable_chapter("fp-1") is None
+
+    def test_restart_without_reuse(self, checkpoint):
+        """Test that a full reprocess discards all previous progress."""
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.CARDS, fingerprint="fp-1")
+
+        checkpoint.restart("source-v1", reuse_chapters=False)
+
+        assert checkpoint.take_reusable_chapter("fp-1") is None
+
+    def test_summary(self, checkpoint):
+        """Test the status summary."""
+        checkpoint.mark_chapter_stage("ch-1", PipelineStage.CARDS, cards=3)
+        checkpoint.mark_chapter_failed("ch-2", "boom")
+        checkpoint.mark_resumed()
+
+        summary = checkpoint.summary()
+
+        assert summary["completed_stages"] == ["parsed", "chapters"]
+        assert summary["chapters_total"] == 2
+        assert summary["chapters_completed"] == 1
+        assert summary["chapters_failed"] == 1
+        assert summary["resume_count"] == 1
+
+
+class TestFingerprints:
+    """Test cases for file and chapter fingerprints."""
+
+    def test_file_fingerprint_changes_with_content(self):
+        """Test that file fingerprints track content changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "doc.md"
+            path.write_text("# Chapter 1\n\nContent")
+            first = compute_file_fingerprint(path)
+
+            path.write_text("# Chapter 1\n\nChanged content")
+
+            assert first is not None
+            assert compute_file_fingerprint(path) != first
+
+    def test_missing_file_has_no_fingerprint(self):
+        """Test that unreadable files have no fingerprint."""
+        assert compute_file_fingerprint(Path("/nonexistent/file.pdf")) is None
+
+    def test_chapter_fingerprint(self):
+        """Test that chapter fingerprints depend on title and content."""
+        base = compute_chapter_fingerprint("Intro", "Some text")
+
+        assert compute_chapter_fingerprint("Intro", "Some text") == base
+        assert compute_chapter_fingerprint("Intro", "Other text") != base
+        assert compute_chapter_fingerprint("Introduction", "Some text") != base
+        assert compute_chapter_fingerprint(None, None) == compute_chapter_fingerprint("", "")
+
+
+class FakeSegmentation:
+    """One segment per chapter"""
+
+    async def segment_text(self, text, chapter_id, page_start):
+        return [SimpleNamespace(text=text.split("\n\n")[0])]
+
+
+class FakeKnowledgeExtraction:
+    """One knowledge point per segment, recording the chapters it extracted"""
+
+    def __init__(self):
+        self.texts = []
+
+    async def extract_knowledge_from_segments(self, segments, chapter_id):
+        self.texts.extend(segment.text for segment in segments)
+        return [
+            SimpleNamespace(kind=KnowledgeType.FACT, text=segment.text, entities=[], anchors={}, confidence=0.9)
+            for segment in segments
+        ]
+
+
+class FakeCardGeneration:
+    """One card per knowledge point; the worker is killed when it reaches ``crash_on``"""
+
+    def __init__(self, crash_on=None):
+        self.texts = []
+        self.crash_on = crash_on
+
+    async def generate_cards_from_knowledge(self, knowledge_points, figures):
+        if knowledge_points[0].text == self.crash_on:
+            raise asyncio.CancelledError()
+        self.texts.extend(knowledge.text for knowledge in knowledge_points)
+        return [
+            SimpleNamespace(
+                knowledge_id=str(knowledge.id), card_type=CardType.QA,
+                front=f"What is {knowledge.text}?", back=knowledge.text, difficulty=1.0, metadata={}
+            )
+            for knowledge in knowledge_points
+        ]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path, monkeypatch):
+    """Pipeline and chapter service sessions on a SQLite database"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pipeline.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(document_processing_pipeline, "get_async_session", factory)
+    monkeypatch.setattr(chapter_service, "get_async_session", factory)
+    yield factory
+    await engine.dispose()
+
+
+class TestPipelineResume:
+    """Test cases for resuming the processing pipeline from its checkpoints"""
+
+    @pytest_asyncio.fixture
+    async def document(self, tmp_path, session_factory):
+        """A document whose source file holds one paragraph per chapter"""
+        source = tmp_path / "letters.md"
+        source.write_text("\n\n".join(CHAPTER_TEXTS))
+        async with session_factory() as session:
+            document = Document(
+                filename=source.name, file_type="md", file_path=str(source), file_size=source.stat().st_size
+            )
+            session.add(document)
+            await session.commit()
+        return document
+
+    @pytest.fixture
+    def parses(self):
+        return []
+
+    def make_pipeline(self, parses, crash_on=None):
+        """A pipeline with parsing and the NLP services replaced by deterministic fakes"""
+        pipeline = DocumentProcessingPipeline()
+        pipeline.text_segmentation = FakeSegmentation()
+        pipeline.knowledge_extraction = FakeKnowledgeExtraction()
+        pipeline.card_generation = FakeCardGeneration(crash_on)
+
+        async def parse(document):
+            parses.append(document.id)
+            blocks = []
+            for index, text in enumerate(Path(document.file_path).read_text().split("\n\n")):
+                page = index * 2 + 1
+                blocks.extend([
+                    TextBlock(f"Chapter {index + 1}", page, BBOX, {"type": "header", "level": 1, "size": 22}),
+                    TextBlock(text, page, BBOX, {"type": "text", "size": 12}),
+                    TextBlock(f"{text} More.", page + 1, BBOX, {"type": "text", "size": 12}),
+                ])
+            return ParsedContent(blocks, [], {})
+
+        pipeline._parse_document = parse
+        return pipeline
+
+    async def load(self, session_factory, document):
+        """The document, its chapters and the knowledge text of every card"""
+        async with session_factory() as session:
+            document = await session.get(Document, document.id)
+            chapters = (await session.execute(
+                select(Chapter).where(Chapter.document_id == document.id).order_by(Chapter.order_index)
+            )).scalars().all()
+            cards = (await session.execute(
+                select(Card.id, Knowledge.text, Knowledge.chapter_id).join(Knowledge, Card.knowledge_id == Knowledge.id)
+            )).all()
+        return document, chapters, {text: (card_id, chapter_id) for card_id, text, chapter_id in cards}
+
+    @pytest.mark.asyncio
+    async def test_resume_after_interrupted_run(self, session_factory, document, parses):
+        """Test that a retry skips parsing and completed chapters after the worker died in chapter 2"""
+        with pytest.raises(asyncio.CancelledError):
+            await self.make_pipeline(parses, crash_on=CHAPTER_TEXTS[1]).process_document(document.id)
+
+        interrupted, chapters, cards = await self.load(session_factory, document)
+        checkpoint = ProcessingCheckpoint.from_metadata(interrupted.doc_metadata)
+        chapter_keys = [str(chapter.id) for chapter in chapters]
+        assert interrupted.status == ProcessingStatus.PROCESSING
+        assert checkpoint.is_stage_complete(PipelineStage.CHAPTERS)
+        assert checkpoint.is_chapter_complete(chapter_keys[0])
+        assert checkpoint.is_chapter_stage_complete(chapter_keys[1], PipelineStage.KNOWLEDGE)
+        assert not checkpoint.is_chapter_complete(chapter_keys[1])
+        assert chapter_keys[2] not in checkpoint.chapters
+        assert list(cards) == CHAPTER_TEXTS[:1]
+
+        pipeline = self.make_pipeline(parses)
+        result = await pipeline.process_document(document.id)
+
+        completed, resumed_chapters, resumed_cards = await self.load(session_factory, document)
+        assert len(parses) == 1
+        assert [str(chapter.id) for chapter in resumed_chapters] == chapter_keys
+        assert pipeline.knowledge_extraction.texts == CHAPTER_TEXTS[2:]
+        assert pipeline.card_generation.texts == CHAPTER_TEXTS[1:]
+        assert resumed_cards[CHAPTER_TEXTS[0]] == cards[CHAPTER_TEXTS[0]]
+        assert sorted(resumed_cards) == sorted(CHAPTER_TEXTS)
+        assert result["chapters_resumed"] == 1
+        assert result["knowledge_points_extracted"] == result["cards_generated"] == 3
+        assert completed.status == ProcessingStatus.COMPLETED
+        assert ProcessingCheckpoint.from_metadata(completed.doc_metadata).summary()["resume_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_source_reprocesses_changed_chapters(self, session_factory, document, parses):
+        """Test that reconciliation moves unchanged chapters' cards and deletes the old chapters"""
+        await self.make_pipeline(parses).process_document(document.id)
+        _, old_chapters, old_cards = await self.load(session_factory, document)
+
+        changed = [CHAPTER_TEXTS[0], "Delta is the fourth letter.", CHAPTER_TEXTS[2]]
+        Path(document.file_path).write_text("\n\n".join(changed))
+        pipeline = self.make_pipeline(parses)
+        result = await pipeline.process_document(document.id)
+
+        _, chapters, cards = await self.load(session_factory, document)
+        assert len(parses) == 2
+        assert pipeline.knowledge_extraction.texts == pipeline.card_generation.texts == [changed[1]]
+        assert not {chapter.id for chapter in chapters} & {chapter.id for chapter in old_chapters}
+        assert sorted(cards) == sorted(changed)
+        for index in (0, 2):
+            assert cards[changed[index]] == (old_cards[changed[index]][0], chapters[index].id)
+        assert result["chapters_resumed"] == 2
+        assert result["cards_generated"] == 3
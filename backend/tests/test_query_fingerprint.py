@@ -0,0 +1,139 @@
+"""
+Tests for SQL query fingerprints and their attribution to requests
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.middleware import performance
+from app.middleware.query_fingerprint import (
+    OVERFLOW_FINGERPRINT,
+    QueryRegistry,
+    fingerprint,
+    normalize_statement,
+)
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = performance.PerformanceMetrics()
+    monkeypatch.setattr(performance, "performance_metrics", metrics)
+    return metrics
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'queries.db'}", connect_args={"check_same_thread": False}
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE cards (id INTEGER PRIMARY KEY, front TEXT, deck_2 INTEGER)"))
+        conn.execute(text("INSERT INTO cards (front, deck_2) VALUES ('a', 1), ('b', 1), ('c', 2)"))
+    return engine
+
+
+class TestFingerprint:
+    """Test cases for statement normalization"""
+
+    @pytest.mark.parametrize("first, second", [
+        ("SELECT * FROM cards WHERE id = 1", "SELECT * FROM cards WHERE id = 42.5"),
+        ("SELECT * FROM cards WHERE front = 'it''s'", "SELECT * FROM cards WHERE front = 'x'"),
+        ("SELECT * FROM cards WHERE id = ?", "SELECT * FROM cards WHERE id = :id_1"),
+        ("SELECT * FROM cards WHERE id = %(id)s", "SELECT * FROM cards WHERE id = $1"),
+        ("SELECT * FROM cards WHERE id IN (?, ?)", "SELECT * FROM cards WHERE id IN (?,?,?,?)"),
+        ("INSERT INTO cards (front) VALUES (?)", "INSERT INTO cards (front) VALUES (?), (?), (?)"),
+        ("SELECT id FROM cards -- by id\nWHERE id = 1", "SELECT id /* hint */ FROM cards WHERE id = 2"),
+    ])
+    def test_same_query_shares_fingerprint(self, first, second):
+        """Test that literals, parameter styles, list lengths and comments do not matter"""
+        assert fingerprint(first) == fingerprint(second)
+
+    def test_identifiers_and_casts_are_kept(self):
+        """Test that digits in identifiers and type casts are not taken for literals"""
+        assert normalize_statement("SELECT deck_2, t1.id::text FROM cards AS t1 LIMIT 10") == (
+            "SELECT deck_2, t1.id::text FROM cards AS t1 LIMIT ?"
+        )
+        assert fingerprint("SELECT * FROM cards WHERE id = 1")[0] != fingerprint("SELECT * FROM decks WHERE id = 1")[0]
+
+    def test_fingerprints_are_bounded(self):
+        """Test that fingerprints beyond the cap are counted together"""
+        registry = QueryRegistry(max_fingerprints=2)
+        for table in ("a", "b", "c", "d"):
+            query_fingerprint, statement = fingerprint(f"SELECT * FROM {table}")
+            registry.record(query_fingerprint, statement, 0.001)
+
+        assert len(registry.stats) == 3
+        assert registry.stats[OVERFLOW_FINGERPRINT].latency.count == 2
+        assert registry.total_count == 4
+
+
+class TestQueryAggregation:
+    """Test cases for statement timings recorded by the engine hooks"""
+
+    def test_statements_aggregate_by_fingerprint(self, metrics, engine):
+        """Test that count, time and rows are aggregated per fingerprint"""
+        with engine.begin() as conn:
+            for card_id in (1, 2, 3):
+                conn.execute(text(f"SELECT front FROM cards WHERE id = {card_id}"))
+            conn.execute(text("UPDATE cards SET front = 'z' WHERE deck_2 = 1"))
+
+        by_statement = {entry["statement"]: entry for entry in metrics.get_stats()["queries"]}
+        select = by_statement["SELECT front FROM cards WHERE id = ?"]
+        assert select["count"] == 3
+        assert select["total_time"] == pytest.approx(select["mean_time"] * 3)
+        assert 0 < select["p99_time"] <= select["max_time"] * 1.01
+        assert select["endpoints"] == {"(background)": 3}
+        assert by_statement["UPDATE cards SET front = ? WHERE deck_2 = ?"]["rows"] == 2
+
+
+class TestRequestAttribution:
+    """Test cases for statements counted towards requests"""
+
+    @pytest.fixture
+    def client(self, metrics, engine, monkeypatch):
+        monkeypatch.setattr(settings, "n_plus_one_threshold", 5)
+        app = FastAPI()
+        app.add_middleware(performance.PerformanceMiddleware)
+
+        @app.get("/decks/{deck_id}/cards")
+        async def list_cards(deck_id: int):
+            with engine.connect() as conn:
+                ids = conn.execute(text("SELECT id FROM cards")).scalars().all()
+                # One query per card
+                return [conn.execute(text("SELECT front FROM cards WHERE id = :id"), {"id": i}).scalar() for i in ids * 3]
+
+        @app.get("/cards/{card_id}")
+        def read_card(card_id: int):
+            with engine.connect() as conn:
+                return conn.execute(text("SELECT front FROM cards WHERE id = :id"), {"id": card_id}).scalar()
+
+        return TestClient(app)
+
+    def test_n_plus_one_is_flagged(self, client, metrics):
+        """Test that a request repeating a statement past the threshold is flagged with its endpoint"""
+        response = client.get("/decks/1/cards")
+
+        assert response.headers["X-DB-Queries"] == "10"
+        stats = metrics.get_stats()
+        [incident] = stats["n_plus_one"]
+        assert incident["endpoint"] == "GET /decks/{deck_id}/cards"
+        assert incident["count"] == 9
+        assert incident["query"] == "SELECT front FROM cards WHERE id = ?"
+        endpoint = stats["endpoints"]["GET /decks/{deck_id}/cards"]
+        assert endpoint["db_queries_per_request"] == 10
+        assert endpoint["n_plus_one_requests"] == 1
+        assert 0 < endpoint["db_time_share"] <= 1
+
+    def test_statements_of_threadpool_endpoints_are_attributed(self, client, metrics):
+        """Test that sync endpoints, run in worker threads, count towards their request"""
+        for card_id in (1, 2):
+            assert client.get(f"/cards/{card_id}").headers["X-DB-Queries"] == "1"
+
+        stats = metrics.get_stats()
+        assert stats["n_plus_one"] == []
+        [entry] = [e for e in stats["queries"] if e["statement"] == "SELECT front FROM cards WHERE id = ?"]
+        assert entry["endpoints"] == {"GET /cards/{card_id}": 2}
+        assert stats["endpoints"]["GET /cards/{card_id}"]["db_queries_per_request"] == 1
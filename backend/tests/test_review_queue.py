@@ -0,0 +1,126 @@
+"""
+Tests for the SQL review queue builder
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.learning import SRS, CardType
+from app.services.review_queue import ReviewQueueBuilder
+from app.services.review_service import ReviewService
+from app.services.review_session_store import InMemoryReviewSessionStore
+from tests.factories import add_card, add_knowledge, make_document, sqlite_engine
+
+USER_ID = "3f1c2b9e-8a4d-4c5e-9f6a-1b2c3d4e5f60"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlite_engine(tmp_path / "queue.db")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Database with 12 overdue, 9 due today and 5 future cards in two chapters"""
+    db = sessionmaker(bind=engine)()
+    document = make_document(chapters=2, first_chapter=0)
+
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    due_dates = (
+        [today - timedelta(days=i + 1, hours=1) for i in range(12)]
+        + [today + (now - today) * (i / 10) for i in range(9)]
+        + [now + timedelta(days=i + 1) for i in range(5)]
+    )
+    for i, due_date in enumerate(due_dates):
+        add_card(
+            add_knowledge(document.chapters[i % 2], f"Fact {i}"), f"Q{i}", f"A{i}",
+            card_type=CardType.QA if i % 3 else CardType.CLOZE,
+            difficulty=round(3.0 - i * 0.1, 2),
+            srs={"user_id": USER_ID if i % 4 == 0 else None, "due_date": due_date}
+        )
+    db.add(document)
+    db.commit()
+    yield db
+    db.close()
+
+
+def reference_queue(db, max_cards, prioritize_overdue, user_id=None):
+    """Previous implementation: load every due card, order in Python, then slice"""
+    now = datetime.utcnow()
+    builder = ReviewQueueBuilder(db)
+    query = builder.card_query().filter(SRS.due_date <= now)
+    if user_id:
+        query = query.filter(SRS.user_id == user_id)
+    cards = [builder.to_review_card(row, now) for row in query.all()]
+    service = ReviewService(db, session_store=InMemoryReviewSessionStore())
+    return service._optimize_review_queue(cards, prioritize_overdue)[:max_cards]
+
+
+class TestReviewQueueBuilder:
+    """Test cases for top-K review queue selection"""
+
+    @pytest.mark.parametrize("max_cards", [1, 2, 5, 9, 20, 50])
+    @pytest.mark.parametrize("prioritize_overdue", [True, False])
+    def test_matches_in_memory_ordering(self, db_session, max_cards, prioritize_overdue):
+        """Test that the SQL top-K gives the same queue as sorting every due card"""
+        queue = ReviewQueueBuilder(db_session).build(max_cards=max_cards, prioritize_overdue=prioritize_overdue)
+        expected = reference_queue(db_session, max_cards, prioritize_overdue)
+
+        assert [card.srs_id for card in queue] == [card.srs_id for card in expected]
+
+    def test_overdue_interleaving(self, db_session):
+        """Test the 2:1 overdue / due today pattern"""
+        queue = ReviewQueueBuilder(db_session).build(max_cards=9)
+
+        assert [card.days_overdue > 0 for card in queue] == [True, True, False] * 3
+        assert queue[0].days_overdue == 13
+        due_today = [card.difficulty for card in queue if card.days_overdue == 0]
+        assert due_today == sorted(due_today)
+
+    def test_user_filter(self, db_session):
+        """Test that only the user's cards are selected"""
+        queue = ReviewQueueBuilder(db_session).build(user_id=USER_ID, max_cards=50)
+
+        assert len(queue) == len(reference_queue(db_session, 50, True, user_id=USER_ID))
+        assert [card.srs_id for card in queue] == \
+            [card.srs_id for card in reference_queue(db_session, 50, True, user_id=USER_ID)]
+
+    def test_chapter_titles_in_one_query(self, engine, db_session):
+        """Test that chapter titles are loaded without a query per card"""
+        statements = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        queue = ReviewQueueBuilder(db_session).build(max_cards=20)
+        event.remove(engine, "before_cursor_execute", record)
+
+        assert {card.chapter_title for card in queue} == {"Chapter 0", "Chapter 1"}
+        assert all(card.knowledge_text for card in queue)
+        assert len(statements) == 2  # one per priority bucket
+
+    def test_rows_are_limited_and_streamed(self, db_session):
+        """Test that at most max_cards rows are read and cards are produced lazily"""
+        cards = ReviewQueueBuilder(db_session).iter_review_cards(max_cards=4)
+
+        first_two = list(islice(cards, 2))
+
+        assert [card.days_overdue for card in first_two] == [13, 12]
+        assert len(list(cards)) == 2
+
+    def test_review_service_uses_builder(self, db_session):
+        """Test that daily review cards come from the builder"""
+        service = ReviewService(db_session, session_store=InMemoryReviewSessionStore())
+
+        cards = service.get_daily_review_cards(max_cards=6)
+        session = service.start_review_session(max_cards=6)
+
+        assert [card.srs_id for card in cards] == [card.srs_id for card in session.cards]
+        assert service.get_current_card(session.session_id).chapter_title == cards[0].chapter_title
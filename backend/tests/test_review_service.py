@@ -246,7 +246,7 @@ class TestReviewService:
         assert result['session_progress']['completed'] == 1
         
         # Check if session advanced
-        updated_session = review_service._active_sessions[session.session_id]
+        updated_session = review_service.get_session(session.session_id)
         assert updated_session.current_index == 1
         assert updated_session.completed_cards == 1
     
@@ -291,7 +291,7 @@ class TestReviewService:
         # Session should be completed
         assert result['session_complete'] is True
         
-        updated_session = review_service._active_sessions[session.session_id]
+        updated_session = review_service.get_session(session.session_id)
         assert updated_session.status == ReviewSessionStatus.COMPLETED
         assert updated_session.end_time is not None
     
@@ -324,14 +324,14 @@ class TestReviewService:
         success = review_service.pause_session(session.session_id)
         assert success is True
         
-        updated_session = review_service._active_sessions[session.session_id]
+        updated_session = review_service.get_session(session.session_id)
         assert updated_session.status == ReviewSessionStatus.PAUSED
         
         # Resume session
         success = review_service.resume_session(session.session_id)
         assert success is True
         
-        updated_session = review_service._active_sessions[session.session_id]
+        updated_session = review_service.get_session(session.session_id)
         assert updated_session.status == ReviewSessionStatus.ACTIVE
     
     def test_cancel_session(self, db_session: Session, sample_cards_with_srs):
@@ -345,7 +345,7 @@ class TestReviewService:
         success = review_service.cancel_session(session.session_id)
         assert success is True
         
-        updated_session = review_service._active_sessions[session.session_id]
+        updated_session = review_service.get_session(session.session_id)
         assert updated_session.status == ReviewSessionStatus.CANCELLED
         assert updated_session.end_time is not None
     
@@ -390,9 +390,10 @@ class TestReviewService:
             review_service.grade_current_card(session.session_id, 4)
         
         # Manually set end time to past
-        if session.session_id in review_service._active_sessions:
-            review_service._active_sessions[session.session_id].end_time = \
-                datetime.utcnow() - timedelta(hours=25)
+        state = review_service.session_store.get(session.session_id)
+        if state is not None:
+            state.end_time = datetime.utcnow() - timedelta(hours=25)
+            review_service.session_store.save(state)
         
         # Cleanup sessions older than 24 hours
         cleaned_count = review_service.cleanup_completed_sessions(hours_old=24)
@@ -411,8 +412,8 @@ class TestReviewService:
         
         # Both sessions should be active and independent
         assert session1.session_id != session2.session_id
-        assert session1.session_id in review_service._active_sessions
-        assert session2.session_id in review_service._active_sessions
+        assert review_service.get_session(session1.session_id) is not None
+        assert review_service.get_session(session2.session_id) is not None
         
         # Grade cards in different sessions
         if session1.total_cards > 0:
@@ -424,8 +425,8 @@ class TestReviewService:
             assert result2['success'] is True
         
         # Sessions should remain independent
-        s1 = review_service._active_sessions[session1.session_id]
-        s2 = review_service._active_sessions[session2.session_id]
+        s1 = review_service.get_session(session1.session_id)
+        s2 = review_service.get_session(session2.session_id)
         
         if session1.total_cards > 0 and session2.total_cards > 0:
             assert s1.completed_cards == 1
@@ -0,0 +1,302 @@
+"""
+Tests for the shared review session stores
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.document import Document, Chapter
+from app.models.knowledge import Knowledge, KnowledgeType
+from app.models.learning import Card, SRS, CardType
+from app.services.review_service import ReviewService, ReviewSessionStatus
+from app.services.review_session_store import (
+    InMemoryReviewSessionStore,
+    RedisReviewSessionStore,
+    ReviewSessionState,
+    SQLiteReviewSessionStore,
+)
+
+
+def make_state(session_id="session-1", status="active", srs_ids=None, end_time=None):
+    return ReviewSessionState(
+        session_id=session_id,
+        user_id=None,
+        status=status,
+        srs_ids=srs_ids if srs_ids is not None else ["srs-1", "srs-2", "srs-3"],
+        start_time=datetime.utcnow(),
+        end_time=end_time
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    """Each store implementation"""
+    if request.param == "memory":
+        return InMemoryReviewSessionStore()
+    if request.param == "sqlite":
+        return SQLiteReviewSessionStore(tmp_path / "sessions.db")
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisReviewSessionStore(fakeredis.FakeRedis())
+
+
+class TestReviewSessionStore:
+    """Test cases shared by all session stores"""
+
+    def test_save_and_get(self, store):
+        """Test that stored sessions round-trip"""
+        state = make_state()
+        state.grades.append(4)
+        state.card_types_reviewed["qa"] = 1
+
+        assert store.save(state) is True
+        assert state.version == 1
+
+        loaded = store.get("session-1")
+        assert loaded == state
+        assert loaded.total_cards == 3
+        assert loaded.current_srs_id == "srs-1"
+        assert store.get("missing") is None
+
+    def test_stale_save_is_rejected(self, store):
+        """Test compare-and-set between two concurrent writers"""
+        store.save(make_state())
+        first = store.get("session-1")
+        second = store.get("session-1")
+
+        first.current_index = 1
+        assert store.save(first) is True
+
+        second.current_index = 1
+        assert store.save(second) is False
+        assert store.get("session-1").version == 2
+
+    def test_new_session_does_not_overwrite(self, store):
+        """Test that a session ID is only created once"""
+        assert store.save(make_state()) is True
+        assert store.save(make_state(srs_ids=["other"])) is False
+        assert store.get("session-1").srs_ids == ["srs-1", "srs-2", "srs-3"]
+
+    def test_delete(self, store):
+        """Test removing a session"""
+        store.save(make_state())
+
+        assert store.delete("session-1") is True
+        assert store.get("session-1") is None
+
+    def test_cleanup_ended(self, store):
+        """Test that only sessions ended before the cutoff are removed"""
+        now = datetime.utcnow()
+        store.save(make_state("old", "completed", end_time=now - timedelta(hours=30)))
+        store.save(make_state("cancelled", "cancelled", end_time=now - timedelta(hours=25)))
+        store.save(make_state("recent", "completed", end_time=now - timedelta(hours=1)))
+        store.save(make_state("active"))
+
+        assert store.cleanup_ended(now - timedelta(hours=24)) == 2
+        assert store.get("old") is None
+        assert store.get("cancelled") is None
+        assert store.get("recent") is not None
+        assert store.get("active") is not None
+
+
+    def test_pending_sessions(self, store):
+        """Test that sessions are listed by the review time of their oldest buffered grade"""
+        now = datetime.utcnow()
+        for session_id, minutes in (("old", 10), ("recent", 1)):
+            state = make_state(session_id)
+            state.pending_grades = [{"srs_id": "srs-1", "grade": 4, "reviewed_at": (now - timedelta(minutes=minutes)).isoformat()}]
+            store.save(state)
+        store.save(make_state("idle"))
+
+        assert store.pending_sessions(now - timedelta(minutes=5)) == ["old"]
+        assert sorted(store.pending_sessions()) == ["old", "recent"]
+
+        state = store.get("old")
+        state.pending_grades = []
+        store.save(state)
+        assert store.pending_sessions() == ["recent"]
+
+    def test_sessions_with_buffered_grades_are_kept(self, store):
+        """Test that ended sessions are not cleaned up while their grades are buffered"""
+        now = datetime.utcnow()
+        state = make_state("finished", "completed", end_time=now - timedelta(hours=30))
+        state.pending_grades = [{"srs_id": "srs-1", "grade": 4, "reviewed_at": now.isoformat()}]
+        store.save(state)
+
+        assert store.cleanup_ended(now) == 0
+        assert store.get("finished").pending_grades
+
+
+class TestInMemoryReviewSessionStore:
+    """Test cases for the process-local store"""
+
+    def test_least_recently_used_sessions_are_evicted(self):
+        """Test the LRU bound"""
+        store = InMemoryReviewSessionStore(max_sessions=2)
+        store.save(make_state("a"))
+        store.save(make_state("b"))
+        store.get("a")
+        store.save(make_state("c"))
+
+        assert len(store) == 2
+        assert store.get("b") is None
+        assert store.get("a") is not None
+
+    def test_idle_sessions_expire(self):
+        """Test the TTL"""
+        store = InMemoryReviewSessionStore(ttl_seconds=-1)
+        store.save(make_state())
+
+        assert store.get("session-1") is None
+
+    def test_sessions_with_buffered_grades_are_not_evicted(self):
+        """Test that eviction and expiry skip sessions until their grades are flushed"""
+        store = InMemoryReviewSessionStore(max_sessions=1, ttl_seconds=-1)
+        state = make_state("buffered")
+        state.pending_grades = [{"srs_id": "srs-1", "grade": 4, "reviewed_at": datetime.utcnow().isoformat()}]
+        store.save(state)
+        store.save(make_state("next"))
+
+        assert store.get("buffered") is not None
+        assert store.get("next") is None
+
+    def test_reopened_session_is_not_cleaned_up(self):
+        """Test that stale end-time index entries are ignored"""
+        store = InMemoryReviewSessionStore()
+        state = make_state(status="completed", end_time=datetime.utcnow() - timedelta(hours=30))
+        store.save(state)
+        state.status = "active"
+        state.end_time = None
+        store.save(state)
+
+        assert store.cleanup_ended(datetime.utcnow()) == 0
+        assert store.get("session-1") is not None
+
+
+class TestSharedReviewSessions:
+    """Test cases for review sessions served by separate service instances"""
+
+    @pytest.fixture
+    def session_factory(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine)
+
+        db = factory()
+        document = Document(filename="notes.md", file_type="md", file_path="notes.md", file_size=1)
+        db.add(document)
+        db.flush()
+        chapter = Chapter(document_id=document.id, title="Chapter 1", level=1, order_index=1)
+        db.add(chapter)
+        db.flush()
+
+        now = datetime.utcnow()
+        for i in range(3):
+            knowledge = Knowledge(chapter_id=chapter.id, kind=KnowledgeType.DEFINITION, text=f"Term {i}")
+            db.add(knowledge)
+            db.flush()
+            card = Card(
+                knowledge_id=knowledge.id, card_type=CardType.QA,
+                front=f"What is term {i}?", back=f"Term {i}", difficulty=1.0 + i
+            )
+            db.add(card)
+            db.flush()
+            db.add(SRS(card_id=card.id, due_date=now - timedelta(days=i)))
+        db.commit()
+        db.close()
+
+        yield factory
+        engine.dispose()
+
+    def test_session_continues_on_another_worker(self, session_factory, tmp_path):
+        """Test that a session started by one worker can be graded by another"""
+        path = tmp_path / "sessions.db"
+        db1, db2 = session_factory(), session_factory()
+        worker1 = ReviewService(db1, session_store=SQLiteReviewSessionStore(path))
+        worker2 = ReviewService(db2, session_store=SQLiteReviewSessionStore(path))
+
+        session = worker1.start_review_session(max_cards=3)
+        assert session.total_cards == 3
+
+        current = worker2.get_current_card(session.session_id)
+        assert current.srs_id == session.cards[0].srs_id
+
+        result = worker2.grade_current_card(session.session_id, 4, response_time_ms=1500)
+        assert result['success'] is True
+        assert result['next_card']['card_id'] == session.cards[1].card_id
+
+        progress = worker1.get_session_progress(session.session_id)
+        assert progress['progress']['completed'] == 1
+        assert progress['content']['chapters_reviewed'] == ["Chapter 1"]
+
+        reloaded = worker1.get_session(session.session_id)
+        assert [card.srs_id for card in reloaded.cards] == [card.srs_id for card in session.cards]
+        assert reloaded.current_index == 1
+
+        db1.close()
+        db2.close()
+
+    def test_session_view_skips_deleted_cards(self, session_factory):
+        """Test that the cursor still points at the current card after earlier cards were deleted"""
+        db = session_factory()
+        service = ReviewService(db, session_store=InMemoryReviewSessionStore())
+        session = service.start_review_session(max_cards=3)
+        service.grade_current_card(session.session_id, 4)
+        service.grade_current_card(session.session_id, 4)
+
+        db.query(SRS).filter(SRS.id == session.cards[0].srs_id).delete()
+        db.commit()
+        reloaded = service.get_session(session.session_id)
+
+        assert [card.srs_id for card in reloaded.cards] == [card.srs_id for card in session.cards[1:]]
+        assert reloaded.cards[reloaded.current_index].srs_id == session.cards[2].srs_id
+        db.close()
+
+    def test_concurrent_grade_does_not_grade_twice(self, session_factory):
+        """Test that a request with a stale session cannot advance it again"""
+        db = session_factory()
+        store = InMemoryReviewSessionStore()
+        service = ReviewService(db, session_store=store)
+        session = service.start_review_session(max_cards=3)
+
+        stale = store.get(session.session_id)
+        service.grade_current_card(session.session_id, 4)
+
+        stale.current_index += 1
+        assert store.save(stale) is False
+        assert store.get(session.session_id).completed_cards == 1
+        db.close()
+
+    def test_failed_grade_restores_cursor(self, session_factory):
+        """Test that the cursor moves back when grading fails"""
+        db = session_factory()
+        service = ReviewService(db, session_store=InMemoryReviewSessionStore())
+        session = service.start_review_session(max_cards=3)
+
+        result = service.grade_current_card(session.session_id, 9)
+
+        assert result['success'] is False
+        progress = service.get_session_progress(session.session_id)
+        assert progress['progress']['completed'] == 0
+        assert progress['performance']['grade_distribution']['4'] == 0
+        assert service.get_current_card(session.session_id).srs_id == session.cards[0].srs_id
+        db.close()
+
+    def test_session_lifecycle(self, session_factory):
+        """Test pause, resume, cancel and cleanup through the store"""
+        db = session_factory()
+        service = ReviewService(db, session_store=InMemoryReviewSessionStore())
+        session = service.start_review_session(max_cards=3)
+
+        assert service.pause_session(session.session_id) is True
+        assert service.get_current_card(session.session_id) is None
+        assert service.resume_session(session.session_id) is True
+        assert service.cancel_session(session.session_id) is True
+        assert service.get_session(session.session_id).status == ReviewSessionStatus.CANCELLED
+
+        assert service.cleanup_completed_sessions(hours_old=24) == 0
+        assert service.cleanup_completed_sessions(hours_old=-1) == 1
+        assert service.get_session(session.session_id) is None
+        db.close()
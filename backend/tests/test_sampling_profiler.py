@@ -0,0 +1,165 @@
+"""
+Tests for the continuous sampling profiler
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.sampling_profiler import (
+    OTHER_LABEL,
+    SamplingProfiler,
+    label_samples,
+    merge_stacks,
+    to_collapsed,
+    to_speedscope,
+)
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = SamplingProfiler(hz=200)
+    profiler.start("api", directory=str(tmp_path / "profiles"))
+    yield profiler
+    profiler.stop()
+
+
+class TestSamplingProfiler:
+    """Test cases for stack sampling and attribution"""
+
+    def test_labelled_threads_are_sampled(self, profiler):
+        """Test that busy threads are sampled under their labels and idle ones are skipped"""
+        def job(name):
+            with profiler.label(name):
+                busy_loop(0.3)
+
+        threads = [threading.Thread(target=job, args=(f"job {name}",)) for name in ("parse", "generate")]
+        idle = threading.Event()
+        waiting = threading.Thread(target=idle.wait, args=(5,))
+        for thread in threads + [waiting]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        idle.set()
+        waiting.join()
+
+        samples = label_samples(merge_stacks([profiler.to_dict()]))
+        assert samples["job parse"] > 10
+        assert samples["job generate"] > 10
+        assert profiler.idle_samples > 0
+        assert profiler.thread_labels == {}
+        stacks = profiler.to_dict()["stacks"]["job parse"]
+        leaf = f"test_sampling_profiler.py:{busy_loop.__code__.co_firstlineno})"
+        assert any(stack.rsplit(";", 1)[-1].startswith("busy_loop (") and stack.endswith(leaf) for stack in stacks)
+
+    def test_route_samples_are_attributed_to_endpoints(self, profiler):
+        """Test that samples taken inside endpoints, sync or async, count towards their route"""
+        app = FastAPI()
+
+        @app.get("/documents/{document_id}/sync")
+        def sync_endpoint(document_id: str):
+            return busy_loop(0.2)
+
+        @app.get("/documents/{document_id}/async")
+        async def async_endpoint(document_id: str):
+            return busy_loop(0.2)
+
+        profiler.register_routes(app)
+        client = TestClient(app)
+        assert client.get("/documents/1/sync").status_code == 200
+        assert client.get("/documents/1/async").status_code == 200
+
+        samples = label_samples(merge_stacks([profiler.to_dict()]))
+        assert samples["GET /documents/{document_id}/sync"] > 10
+        assert samples["GET /documents/{document_id}/async"] > 10
+
+    def test_snapshots_of_other_processes_are_merged(self, profiler, tmp_path):
+        """Test that the profile includes the stacks written by the worker processes"""
+        worker = {"role": "worker", "pid": 1, "hz": 200, "samples": 3,
+                  "stacks": {"job process_document": {"perform (rq/job.py:1);parse (pipeline.py:2)": 3}}}
+        (tmp_path / "profiles").mkdir(exist_ok=True)
+        (tmp_path / "profiles" / "worker-1.json").write_text(json.dumps(worker))
+
+        profiles = profiler.collect()
+
+        assert [profile["role"] for profile in profiles] == ["api", "worker"]
+        assert label_samples(merge_stacks(profiles))["job process_document"] == 3
+
+    def test_stale_snapshots_are_removed(self, profiler, tmp_path):
+        """Test that snapshots no longer rewritten by their process are not merged"""
+        worker = {"role": "worker", "pid": 2, "hz": 200, "samples": 3,
+                  "stacks": {"job process_document": {"perform (rq/job.py:1)": 3}}}
+        snapshot = tmp_path / "profiles" / "worker-2.json"
+        snapshot.parent.mkdir(exist_ok=True)
+        snapshot.write_text(json.dumps(worker))
+        written = time.time() - profiler.SNAPSHOT_INTERVAL_SECONDS * (profiler.STALE_SNAPSHOT_INTERVALS + 1)
+        os.utime(snapshot, (written, written))
+
+        profiles = profiler.collect()
+
+        assert [profile["role"] for profile in profiles] == ["api"]
+        assert not snapshot.exists()
+
+    def test_overhead_is_measured(self, profiler):
+        """Test that the time spent sampling is reported against wall time"""
+        busy_loop(0.2)
+
+        assert profiler.samples > 10
+        assert 0 < profiler.overhead < 0.5
+        profiler.stop()
+        snapshot = json.loads(next(profiler.directory.glob("api-*.json")).read_text())
+        assert snapshot["samples"] == profiler.samples
+
+    def test_labels_outside_profiling_are_noops(self):
+        """Test that job labels cost nothing while the profiler is stopped"""
+        profiler = SamplingProfiler(hz=100)
+        with profiler.label("job parse"):
+            assert profiler.thread_labels == {}
+
+
+class TestProfileFormats:
+    """Test cases for the collapsed and speedscope output"""
+
+    STACKS = {
+        "GET /documents": {"main (main.py:1);list (api.py:10)": 4, "main (main.py:1);query (db.py:3)": 1},
+        OTHER_LABEL: {"run (threading.py:9)": 2},
+    }
+
+    def test_collapsed_stacks(self):
+        """Test the flamegraph.pl format, with labels as root frames unless one is selected"""
+        assert to_collapsed(self.STACKS).splitlines() == [
+            "(other);run (threading.py:9) 2",
+            "GET /documents;main (main.py:1);list (api.py:10) 4",
+            "GET /documents;main (main.py:1);query (db.py:3) 1",
+        ]
+        assert to_collapsed(self.STACKS, "GET /documents").splitlines()[0] == "main (main.py:1);list (api.py:10) 4"
+        assert to_collapsed(self.STACKS, "missing") == ""
+
+    def test_speedscope_file(self):
+        """Test that each label becomes a sampled profile weighted in seconds"""
+        document = to_speedscope(self.STACKS, hz=100)
+
+        frames = document["shared"]["frames"]
+        assert frames[0] == {"name": "main", "file": "main.py", "line": 1}
+        [endpoint, other] = document["profiles"]
+        assert endpoint["name"] == "GET /documents"
+        assert endpoint["type"] == "sampled" and endpoint["unit"] == "seconds"
+        assert [[frames[i]["name"] for i in sample] for sample in endpoint["samples"]] == [
+            ["main", "list"], ["main", "query"]
+        ]
+        assert endpoint["weights"] == [0.04, 0.01]
+        assert endpoint["endValue"] == pytest.approx(0.05)
+        assert len(to_speedscope(self.STACKS, hz=100, label=OTHER_LABEL)["profiles"]) == 1
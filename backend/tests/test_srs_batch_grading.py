@@ -0,0 +1,305 @@
+"""
+Tests for batch and write-behind grading
+"""
+
+import time
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeType
+from app.models.learning import SRS
+from app.services.daily_review_queue import DailyReviewQueueService
+from app.services.review_service import PendingGradeFlusher, ReviewService
+from app.services.review_session_store import InMemoryReviewSessionStore
+from app.services.srs_scheduler import ONE_DAY, SM2Scheduler
+from app.services.srs_service import SRSService
+from tests.factories import add_card, add_knowledge, make_document, sqlite_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlite_engine(tmp_path / "srs.db")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def srs_ids(db_session):
+    """Three due cards with SRS records"""
+    document = make_document()
+    cards = [
+        add_card(
+            add_knowledge(document.chapters[0], f"Term {i}", KnowledgeType.DEFINITION), f"Q{i}", f"A{i}",
+            srs={"due_date": datetime.utcnow() - timedelta(days=1)}
+        )
+        for i in range(3)
+    ]
+    db_session.add(document)
+    db_session.commit()
+    return [str(card.srs_records[0].id) for card in cards]
+
+
+class TenfoldScheduler(SM2Scheduler):
+    """SM-2 with ten times longer intervals"""
+
+    name = "tenfold"
+
+    def review(self, state, index, grades, reviewed_at):
+        super().review(state, index, grades, reviewed_at)
+        state.interval[index] *= 10
+        state.due_date[index] = reviewed_at + state.interval[index] * ONE_DAY
+
+
+def load(db_session, srs_id):
+    db_session.expire_all()
+    return db_session.query(SRS).filter(SRS.id == srs_id).one()
+
+
+def statement_summary(statement):
+    """Verb and table of a SQL statement"""
+    words = statement.split()
+    if words[0] == "SELECT":
+        return f"SELECT {words[words.index('FROM') + 1]}"
+    # UPDATE table, INSERT INTO table, DELETE FROM table
+    return f"{words[0]} {words[1] if words[0] == 'UPDATE' else words[2]}"
+
+
+class TestBatchGrading:
+    """Test cases for SRSService.grade_cards_batch"""
+
+    def test_matches_single_grading(self, db_session, srs_ids):
+        """Test that a batch schedules cards like individual grades"""
+        service = SRSService(db_session)
+        service.grade_card(srs_ids[0], 4)
+        service.grade_card(srs_ids[0], 5)
+
+        results = service.grade_cards_batch([
+            {'srs_id': srs_ids[1], 'grade': 4},
+            {'srs_id': srs_ids[1], 'grade': 5}
+        ])
+
+        single, batched = load(db_session, srs_ids[0]), load(db_session, srs_ids[1])
+        assert [r['applied'] for r in results] == [True, True]
+        assert (batched.repetitions, batched.interval, batched.ease_factor, batched.last_grade) == \
+            (single.repetitions, single.interval, single.ease_factor, single.last_grade)
+        assert results[1]['new_interval'] == batched.interval
+
+    def test_repeated_grades_follow_review_time(self, db_session, srs_ids):
+        """Test that repeated grades of a card apply in reviewed_at order, not submission order"""
+        t0 = datetime.utcnow() - timedelta(hours=2)
+        service = SRSService(db_session)
+
+        results = service.grade_cards_batch([
+            {'srs_id': srs_ids[0], 'grade': 5, 'reviewed_at': t0 + timedelta(minutes=20)},
+            {'srs_id': srs_ids[0], 'grade': 1, 'reviewed_at': t0},
+            {'srs_id': srs_ids[0], 'grade': 4, 'reviewed_at': t0 + timedelta(minutes=10)}
+        ])
+
+        srs = load(db_session, srs_ids[0])
+        # 1 resets, then 4 and 5 advance
+        assert srs.repetitions == 2
+        assert srs.interval == 6
+        assert srs.last_grade == 5
+        assert srs.last_reviewed == t0 + timedelta(minutes=20)
+        assert srs.due_date == t0 + timedelta(minutes=20, days=6)
+        # Results keep submission order
+        assert [r['grade'] for r in results] == [5, 1, 4]
+        assert results[0]['repetitions'] == 2
+        assert results[1]['repetitions'] == 0
+
+    def test_repeated_grades_without_time_follow_submission(self, db_session, srs_ids):
+        """Test that untimed grades of a card apply in submission order"""
+        SRSService(db_session).grade_cards_batch([
+            {'srs_id': srs_ids[0], 'grade': 5},
+            {'srs_id': srs_ids[0], 'grade': 0}
+        ])
+
+        srs = load(db_session, srs_ids[0])
+        assert srs.last_grade == 0
+        assert srs.repetitions == 0
+
+    def test_replayed_batch_is_skipped(self, db_session, srs_ids):
+        """Test that uploading the same grades twice applies them once"""
+        reviewed_at = datetime.utcnow() - timedelta(minutes=5)
+        batch = [
+            {'srs_id': srs_ids[0], 'grade': 4, 'reviewed_at': reviewed_at},
+            {'srs_id': srs_ids[1], 'grade': 3, 'reviewed_at': reviewed_at}
+        ]
+        service = SRSService(db_session)
+        service.grade_cards_batch(batch)
+        first = load(db_session, srs_ids[0]).due_date
+
+        results = service.grade_cards_batch(batch)
+
+        assert [r['applied'] for r in results] == [False, False]
+        srs = load(db_session, srs_ids[0])
+        assert srs.repetitions == 1
+        assert srs.due_date == first
+
+    def test_grade_older_than_last_review_is_skipped(self, db_session, srs_ids):
+        """Test that a late offline grade does not override a newer review"""
+        service = SRSService(db_session)
+        service.grade_card(srs_ids[0], 5)
+
+        results = service.grade_cards_batch([
+            {'srs_id': srs_ids[0], 'grade': 0, 'reviewed_at': datetime.utcnow() - timedelta(days=1)}
+        ])
+
+        assert results[0]['applied'] is False
+        assert load(db_session, srs_ids[0]).last_grade == 5
+
+    def test_invalid_batch_writes_nothing(self, db_session, srs_ids):
+        """Test that the batch is validated before anything is written"""
+        service = SRSService(db_session)
+
+        with pytest.raises(ValueError, match="between 0 and 5"):
+            service.grade_cards_batch([{'srs_id': srs_ids[0], 'grade': 4}, {'srs_id': srs_ids[1], 'grade': 7}])
+        with pytest.raises(ValueError, match="not found"):
+            service.grade_cards_batch([{'srs_id': srs_ids[0], 'grade': 4}, {'srs_id': 'missing', 'grade': 4}])
+
+        assert load(db_session, srs_ids[0]).last_grade is None
+
+    def test_single_update_statement(self, engine, db_session, srs_ids):
+        """Test that all rows are written by one bulk UPDATE, and each derived table by one statement"""
+        DailyReviewQueueService(db_session).build()
+        statements = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement_summary(statement))
+
+        SRSService(db_session).grade_cards_batch([{'srs_id': srs_id, 'grade': 4} for srs_id in srs_ids * 3])
+        event.remove(engine, "before_cursor_execute", record)
+
+        # The count does not grow with the batch
+        assert statements == [
+            # The grades
+            "SELECT srs", "UPDATE srs",
+            # Change log entries of all cards, in one executemany
+            "INSERT sync_change_log",
+            # Rehash of the graded rows and upsert of their Merkle leaves
+            "SELECT srs", "INSERT sync_entity_hashes",
+            # Today's all-users queue, locked and rewritten
+            "SELECT daily_review_queues", "UPDATE daily_review_queues",
+        ]
+
+
+class TestWriteBehindGrading:
+    """Test cases for buffered in-session grades"""
+
+    @pytest.fixture
+    def service(self, db_session, srs_ids):
+        return ReviewService(db_session, session_store=InMemoryReviewSessionStore(), write_behind=True)
+
+    def test_grades_are_written_at_session_end(self, db_session, srs_ids, service):
+        """Test that grades stay buffered until the session completes"""
+        session = service.start_review_session(max_cards=3)
+
+        first = service.grade_current_card(session.session_id, 4)
+        service.grade_current_card(session.session_id, 2)
+
+        assert first['graded_card']['pending'] is True
+        assert first['graded_card']['new_interval'] == 1
+        assert service.get_session_progress(session.session_id)['progress']['pending_grades'] == 2
+        assert all(load(db_session, srs_id).last_grade is None for srs_id in srs_ids)
+
+        result = service.grade_current_card(session.session_id, 5)
+
+        assert result['session_complete'] is True
+        assert service.get_session_progress(session.session_id)['progress']['pending_grades'] == 0
+        grades = {card.srs_id: grade for card, grade in zip(session.cards, [4, 2, 5])}
+        for srs_id, grade in grades.items():
+            assert load(db_session, srs_id).last_grade == grade
+
+    def test_flush_on_pause_and_threshold(self, db_session, srs_ids, service, monkeypatch):
+        """Test flushing when a session is paused or the buffer is full"""
+        session = service.start_review_session(max_cards=3)
+        service.grade_current_card(session.session_id, 4)
+
+        assert service.pause_session(session.session_id) is True
+        assert load(db_session, session.cards[0].srs_id).last_grade == 4
+
+        monkeypatch.setattr(settings, "review_flush_max_pending", 1)
+        service.resume_session(session.session_id)
+        service.grade_current_card(session.session_id, 3)
+        assert load(db_session, session.cards[1].srs_id).last_grade == 3
+
+    def test_repeated_flush_is_idempotent(self, db_session, srs_ids, service):
+        """Test that flushing buffered grades twice applies them once"""
+        session = service.start_review_session(max_cards=3)
+        service.grade_current_card(session.session_id, 4)
+        pending = service.session_store.get(session.session_id).pending_grades
+
+        assert service.flush_pending_grades(session.session_id) == 1
+        assert service.flush_pending_grades(session.session_id) == 0
+
+        # A flush that was written but not cleared from the session
+        state = service.session_store.get(session.session_id)
+        state.pending_grades = pending
+        service.session_store.save(state)
+        service.flush_pending_grades(session.session_id)
+
+        assert load(db_session, session.cards[0].srs_id).repetitions == 1
+
+    def test_invalid_grade_is_not_buffered(self, service):
+        """Test that invalid grades fail without advancing the session"""
+        session = service.start_review_session(max_cards=3)
+
+        result = service.grade_current_card(session.session_id, 6)
+
+        assert result['success'] is False
+        progress = service.get_session_progress(session.session_id)['progress']
+        assert progress['completed'] == 0
+        assert progress['pending_grades'] == 0
+
+    def test_preview_uses_the_configured_scheduler(self, db_session, srs_ids, service):
+        """Test that the schedule shown for a buffered grade is the one written"""
+        service.srs_service.scheduler = TenfoldScheduler()
+        session = service.start_review_session(max_cards=3)
+
+        result = service.grade_current_card(session.session_id, 4)
+        service.flush_pending_grades(session.session_id)
+
+        srs = load(db_session, session.cards[0].srs_id)
+        assert result['graded_card']['new_interval'] == srs.interval == 10
+        assert result['graded_card']['new_due_date'] == srs.due_date.isoformat()
+
+    def test_abandoned_session_is_flushed_in_background(self, engine, db_session, srs_ids, service, monkeypatch):
+        """Test that grades of a session nobody continues are written after the flush interval"""
+        monkeypatch.setattr(settings, "review_flush_interval_seconds", 0.2)
+        session = service.start_review_session(max_cards=3)
+        service.grade_current_card(session.session_id, 4)
+
+        flusher = PendingGradeFlusher(sessionmaker(bind=engine), service.session_store)
+        flusher.start()
+        try:
+            deadline = time.monotonic() + 5
+            while service.session_store.get(session.session_id).pending_grades and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            flusher.stop()
+
+        assert service.session_store.get(session.session_id).pending_grades == []
+        assert service.session_store.pending_sessions() == []
+        assert load(db_session, session.cards[0].srs_id).last_grade == 4
+
+    def test_stopping_the_flusher_writes_recent_grades(self, engine, db_session, srs_ids, service):
+        """Test that buffered grades are written at shutdown even before they are due"""
+        session = service.start_review_session(max_cards=3)
+        service.grade_current_card(session.session_id, 3)
+        flusher = PendingGradeFlusher(sessionmaker(bind=engine), service.session_store)
+
+        assert flusher.flush() == 0
+        assert flusher.stop() == 1
+        assert load(db_session, session.cards[0].srs_id).last_grade == 3
@@ -0,0 +1,282 @@
+"""
+Tests for the columnar SRS scheduler and the bulk SRS operations built on it
+"""
+
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.api import reviews as reviews_api
+from app.core.database import get_db
+from app.models.document import Document
+from app.models.learning import SRS
+from app.services.srs_scheduler import (
+    SCHEDULERS,
+    ScheduleState,
+    Scheduler,
+    SM2Scheduler,
+    get_scheduler,
+    register_scheduler,
+    to_datetime64,
+)
+from app.services.srs_service import SRSService
+from tests.factories import add_card, add_knowledge, make_document, sqlite_engine
+
+
+def sm2_reference(srs, grade, reviewed_at):
+    """SM-2 applied to one card, as the rules are usually written"""
+    if grade < 3:
+        srs.repetitions = 0
+        srs.interval = 1
+        srs.ease_factor = max(1.3, srs.ease_factor - 0.2)
+    else:
+        srs.repetitions += 1
+        if srs.repetitions == 1:
+            srs.interval = 1
+        elif srs.repetitions == 2:
+            srs.interval = 6
+        else:
+            srs.interval = int(srs.interval * srs.ease_factor)
+        srs.ease_factor = max(1.3, srs.ease_factor - 0.1 * (5 - grade) * (0.08 * (5 - grade) + 0.02))
+    srs.due_date = reviewed_at + timedelta(days=srs.interval)
+    return srs
+
+
+def random_states(count, seed=1):
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        SimpleNamespace(
+            ease_factor=float(rng.choice([1.3, 1.7, 2.36, 2.5, 2.9])),
+            interval=int(rng.integers(1, 200)),
+            repetitions=int(rng.integers(0, 6)),
+            due_date=now - timedelta(days=int(rng.integers(0, 20))),
+            last_reviewed=None,
+            last_grade=None
+        )
+        for _ in range(count)
+    ]
+
+
+class TestSM2Scheduler:
+    """Test cases for vectorized SM-2"""
+
+    def test_matches_single_card_algorithm(self):
+        """Test that every grade gives the same schedule as SM-2 applied card by card"""
+        states = random_states(300)
+        grades = np.tile(np.arange(6), 50)
+        reviewed_at = datetime.utcnow()
+
+        state = ScheduleState.from_rows(states)
+        SM2Scheduler().review(state, np.arange(300), grades, to_datetime64([reviewed_at] * 300))
+
+        due_dates = state.due_date.tolist()
+        for i, srs in enumerate(states):
+            expected = sm2_reference(srs, int(grades[i]), reviewed_at)
+            assert state.ease_factor[i] == expected.ease_factor
+            assert state.interval[i] == expected.interval
+            assert state.repetitions[i] == expected.repetitions
+            assert due_dates[i] == expected.due_date
+
+    def test_replay_applies_reviews_in_time_order(self):
+        """Test that several reviews of a card are applied in review order"""
+        t0 = datetime(2026, 1, 1, 12)
+        state = SM2Scheduler().new_state(2, t0)
+
+        result = SM2Scheduler().replay(
+            state,
+            positions=np.array([0, 1, 0, 0]),
+            grades=np.array([5, 4, 1, 4]),
+            reviewed_at=to_datetime64([t0 + timedelta(days=8), t0, t0, t0 + timedelta(days=2)])
+        )
+
+        # Card 0: 1 resets, then 4 and 5 advance
+        assert state.repetitions.tolist() == [2, 1]
+        assert state.interval.tolist() == [6, 1]
+        assert state.last_grade.tolist() == [5, 4]
+        assert state.due_date.tolist()[0] == t0 + timedelta(days=14)
+        # Results are in the given order
+        assert result.repetitions.tolist() == [2, 1, 0, 1]
+        assert result.applied.all()
+
+    def test_replay_skips_stale_reviews(self):
+        """Test that reviews not newer than the last review are skipped"""
+        t0 = datetime(2026, 1, 1, 12)
+        scheduler = SM2Scheduler()
+        state = scheduler.new_state(1, t0)
+        reviews = dict(positions=np.array([0]), grades=np.array([4]), reviewed_at=to_datetime64([t0]))
+
+        scheduler.replay(state, **reviews)
+        result = scheduler.replay(state, **reviews)
+
+        assert result.applied.tolist() == [False]
+        assert state.repetitions.tolist() == [1]
+
+    def test_simulation_reviews_due_cards(self):
+        """Test that simulated days review due cards and lapsed cards come back"""
+        now = datetime(2026, 1, 1, 12)
+        state = SM2Scheduler().new_state(100, now)
+
+        simulation = SM2Scheduler().simulate(state, 10, now, grade_probabilities=[1, 0, 0, 0, 0, 0], seed=3)
+
+        # Always failing: every card is due again the next day
+        assert simulation['reviews'].tolist() == [100] * 10
+        assert simulation['lapses'].tolist() == [100] * 10
+
+
+class TestSchedulerRegistry:
+    """Test cases for pluggable schedulers"""
+
+    def test_default_and_unknown(self):
+        """Test scheduler lookup by name"""
+        assert isinstance(get_scheduler(), SM2Scheduler)
+        with pytest.raises(ValueError, match="Unknown SRS scheduler"):
+            get_scheduler("missing")
+
+    def test_register_scheduler(self, monkeypatch):
+        """Test that registered schedulers are used by SRSService"""
+        monkeypatch.setattr("app.services.srs_scheduler.SCHEDULERS", dict(SCHEDULERS))
+
+        @register_scheduler
+        class FixedScheduler(SM2Scheduler):
+            name = "fixed"
+
+            def review(self, state, index, grades, reviewed_at):
+                state.interval[index] = 3
+                state.due_date[index] = reviewed_at + np.timedelta64(3, "D")
+
+        assert SRSService(db=None, scheduler="fixed").scheduler.name == "fixed"
+
+    def test_scheduler_must_implement_review(self):
+        """Test that an incomplete scheduler cannot be instantiated"""
+        class IncompleteScheduler(Scheduler):
+            name = "incomplete"
+
+            def new_state(self, count, now):
+                return SM2Scheduler().new_state(count, now)
+
+        with pytest.raises(TypeError):
+            IncompleteScheduler()
+
+
+@pytest.fixture
+def db_session(tmp_path):
+    """Two documents with four cards each"""
+    engine = sqlite_engine(tmp_path / "srs.db")
+    db = sessionmaker(bind=engine)()
+    for name in ("a.md", "b.md"):
+        document = make_document(name)
+        for i in range(4):
+            add_card(
+                add_knowledge(document.chapters[0], f"Fact {i}"), f"Q{i}", f"A{i}",
+                srs={"due_date": datetime.utcnow() - timedelta(days=1)}
+            )
+        db.add(document)
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+class TestBulkOperations:
+    """Test cases for the SRSService bulk operations"""
+
+    def test_import_review_history(self, db_session):
+        """Test that an imported history is replayed once"""
+        srs_ids = [str(srs.id) for srs in db_session.query(SRS).all()]
+        t0 = datetime.utcnow() - timedelta(days=30)
+        history = [
+            {'srs_id': srs_id, 'grade': 4, 'reviewed_at': t0 + timedelta(days=day)}
+            for srs_id in srs_ids for day in (0, 1, 7)
+        ]
+        service = SRSService(db_session)
+
+        summary = service.import_review_history(history)
+        again = service.import_review_history(history)
+
+        assert summary == {'reviews': 24, 'applied': 24, 'skipped': 0, 'cards': 8}
+        assert again['applied'] == 0
+        db_session.expire_all()
+        srs = db_session.query(SRS).first()
+        assert (srs.repetitions, srs.interval) == (3, 14)  # int(6 * 2.48)
+        assert srs.last_reviewed == t0 + timedelta(days=7)
+
+    def test_import_requires_review_time(self, db_session):
+        """Test that imported reviews must be timestamped"""
+        srs_id = str(db_session.query(SRS.id).first().id)
+
+        with pytest.raises(ValueError, match="reviewed_at"):
+            SRSService(db_session).import_review_history([{'srs_id': srs_id, 'grade': 4}])
+
+    def test_reset_deck_of_document(self, db_session):
+        """Test that only the document's cards are reset"""
+        service = SRSService(db_session)
+        service.grade_cards_batch([{'srs_id': str(srs.id), 'grade': 5} for srs in db_session.query(SRS)])
+        document = db_session.query(Document).filter(Document.filename == "a.md").one()
+
+        assert service.reset_deck(document_id=str(document.id)) == 4
+
+        db_session.expire_all()
+        assert sorted(srs.repetitions for srs in db_session.query(SRS)) == [0] * 4 + [1] * 4
+        reset = [srs for srs in db_session.query(SRS) if srs.repetitions == 0]
+        assert all(srs.last_grade is None and srs.ease_factor == 2.5 for srs in reset)
+
+    def test_reset_deck_requires_a_filter(self, db_session):
+        """Test that the whole deck is only reset when asked for explicitly"""
+        service = SRSService(db_session)
+        service.grade_cards_batch([{'srs_id': str(srs.id), 'grade': 5} for srs in db_session.query(SRS)])
+
+        with pytest.raises(ValueError, match="all_cards"):
+            service.reset_deck()
+        assert db_session.query(SRS).filter(SRS.repetitions == 0).count() == 0
+
+        assert service.reset_deck(all_cards=True) == 8
+
+    def test_reset_endpoint_rejects_empty_request(self, db_session):
+        """Test that POST /reviews/reset without a user or document resets nothing"""
+        app = FastAPI()
+        app.include_router(reviews_api.router)
+        app.dependency_overrides[get_db] = lambda: db_session
+        SRSService(db_session).grade_cards_batch([{'srs_id': str(srs.id), 'grade': 5} for srs in db_session.query(SRS)])
+
+        response = TestClient(app).post("/reviews/reset", json={})
+
+        assert response.status_code == 422
+        db_session.expire_all()
+        assert db_session.query(SRS).filter(SRS.repetitions == 0).count() == 0
+
+    def test_grade_card_uses_configured_scheduler(self, db_session, monkeypatch):
+        """Test that single grades are scheduled like batch grades"""
+        monkeypatch.setattr("app.services.srs_scheduler.SCHEDULERS", dict(SCHEDULERS))
+
+        @register_scheduler
+        class FixedScheduler(SM2Scheduler):
+            name = "fixed"
+
+            def review(self, state, index, grades, reviewed_at):
+                state.interval[index] = 3
+                state.due_date[index] = reviewed_at + np.timedelta64(3, "D")
+
+        single, batch = db_session.query(SRS).limit(2).all()
+        service = SRSService(db_session, scheduler="fixed")
+
+        graded = service.grade_card(str(single.id), 4)
+        [result] = service.grade_cards_batch([{'srs_id': str(batch.id), 'grade': 4}])
+
+        assert graded.interval == result['new_interval'] == 3
+        assert (graded.last_grade, graded.due_date - graded.last_reviewed) == (4, timedelta(days=3))
+
+    def test_forecast_workload(self, db_session):
+        """Test the forecast of a deck that is all due today"""
+        forecast = SRSService(db_session).forecast_workload(days=7)
+
+        assert forecast['scheduler'] == "sm2"
+        assert len(forecast['forecast']) == 7
+        assert forecast['forecast'][0]['reviews'] == 8
+        assert forecast['total_reviews'] == sum(day['reviews'] for day in forecast['forecast'])
+        # Simulated grades are reproducible
+        assert SRSService(db_session).forecast_workload(days=7)['forecast'] == forecast['forecast']
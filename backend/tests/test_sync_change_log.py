@@ -0,0 +1,265 @@
+"""
+Tests for the sync change log and delta pulls
+"""
+
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.sync import SyncRequest, pull_changes
+from app.models.document import Document, Chapter
+from app.models.knowledge import Knowledge
+from app.models.learning import Card, SRS
+from app.models.sync import SyncChangeLog
+from app.core.config import settings
+from app.services.sync_change_log import SYNC_CLIENT_ID_KEY, prune_change_log
+from app.services.sync_service import SyncHistoryExpired, SyncService
+from tests.factories import add_card, add_knowledge, async_sqlite_engine, make_document
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """A document with one chapter and three cards"""
+    engine = await async_sqlite_engine(tmp_path / "sync.db")
+    session = async_sessionmaker(engine, expire_on_commit=False)()
+    document = make_document()
+    knowledge = add_knowledge(document.chapters[0])
+    for i in range(3):
+        add_card(knowledge, f"Q{i}", f"A{i}", srs={"due_date": datetime(2026, 1, 1)})
+    session.add(document)
+    await session.commit()
+    yield session
+    await session.close()
+    await engine.dispose()
+
+
+async def log_entries(db, after_seq=0):
+    result = await db.execute(
+        select(SyncChangeLog).where(SyncChangeLog.seq > after_seq).order_by(SyncChangeLog.seq)
+    )
+    return list(result.scalars().all())
+
+
+class TestChangeRecording:
+    """Test cases for the ORM event hooks"""
+
+    @pytest.mark.asyncio
+    async def test_flushed_creates_updates_and_deletes(self, db):
+        """Test that creates log their fields, updates only the changed ones, and deletes a tombstone"""
+        entries = await log_entries(db)
+        assert [entry.seq for entry in entries] == list(range(1, 10))
+        assert [entry.entity_type for entry in entries[:3]] == ["document", "chapter", "knowledge"]
+        assert all(entry.operation == "create" for entry in entries)
+        assert entries[0].changes["filename"] == "notes.md"
+        last_seq = entries[-1].seq
+
+        card = (await db.execute(select(Card).where(Card.front == "Q0"))).scalar_one()
+        srs = (await db.execute(select(SRS).where(SRS.card_id == card.id))).scalar_one()
+        card.front = "New question"
+        await db.delete(srs)
+        await db.commit()
+
+        entries = await log_entries(db, last_seq)
+        assert [(entry.entity_type, entry.operation) for entry in entries] == [("card", "update"), ("srs", "delete")]
+        assert entries[0].changes == {"front": "New question"}
+        assert entries[0].entity_id == card.id
+        assert entries[1].changes is None
+
+    @pytest.mark.asyncio
+    async def test_bulk_statements(self, db):
+        """Test that ORM bulk UPDATE and criteria UPDATE/DELETE statements are logged"""
+        last_seq = (await log_entries(db))[-1].seq
+        srs_ids = list((await db.execute(select(SRS.id))).scalars())
+        chapter = Chapter(document_id=(await db.execute(select(Document.id))).scalar(), title="Chapter 2",
+                          level=1, order_index=2)
+        db.add(chapter)
+        await db.flush()
+
+        await db.execute(update(SRS), [{"id": srs_id, "interval": 6} for srs_id in srs_ids])
+        await db.execute(
+            update(Knowledge).values(chapter_id=chapter.id).execution_options(synchronize_session=False)
+        )
+        card_ids = select(Card.id).where(Card.front == "Q1")
+        await db.execute(delete(SRS).where(SRS.card_id.in_(card_ids)).execution_options(synchronize_session=False))
+        await db.commit()
+
+        entries = await log_entries(db, last_seq)
+        operations = [(entry.entity_type, entry.operation) for entry in entries]
+        assert operations == [("chapter", "create")] + [("srs", "update")] * 3 + [("knowledge", "update"), ("srs", "delete")]
+        assert all(entry.changes == {"interval": 6} for entry in entries[1:4])
+        assert entries[4].changes == {"chapter_id": str(chapter.id)}
+
+    @pytest.mark.asyncio
+    async def test_changes_are_attributed_to_pushing_client(self, db):
+        """Test that changes applied for a client carry its ID"""
+        last_seq = (await log_entries(db))[-1].seq
+        db.info[SYNC_CLIENT_ID_KEY] = "phone"
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+        card.back = "Answer"
+        await db.commit()
+
+        page = await SyncService(db).get_changes_after(last_seq)
+
+        assert [(change.id, change.client_id) for change in page.changes] == [(str(card.id), "phone")]
+
+
+class TestDeltaPull:
+    """Test cases for paged pulls from the change log"""
+
+    @pytest.mark.asyncio
+    async def test_pages_follow_the_sequence(self, db):
+        """Test that paging covers every entry once and reports the next cursor"""
+        service = SyncService(db)
+        seen, after_seq, pages = [], 0, 0
+        while True:
+            page = await service.get_changes_after(after_seq, limit=4)
+            seen.extend(change.version for change in page.changes)
+            after_seq = page.last_seq
+            pages += 1
+            if not page.has_more:
+                break
+
+        assert seen == list(range(1, 10))
+        assert pages == 3
+        assert after_seq == await service.get_latest_seq()
+        assert (await service.get_changes_after(after_seq)).changes == []
+
+    @pytest.mark.asyncio
+    async def test_changes_of_an_entity_are_merged(self, db):
+        """Test that a page holds one change per entity with the merged fields"""
+        card = (await db.execute(select(Card).where(Card.front == "Q2"))).scalar_one()
+        last_seq = (await log_entries(db))[-1].seq
+        card.front = "Front"
+        await db.commit()
+        card.back = "Back"
+        await db.commit()
+
+        page = await SyncService(db).get_changes_after(last_seq)
+
+        assert len(page.changes) == 1
+        assert page.changes[0].operation == "update"
+        assert page.changes[0].data == {"front": "Front", "back": "Back"}
+        assert page.changes[0].version == page.last_seq == last_seq + 2
+
+        # A later delete replaces the update with a tombstone
+        srs = (await db.execute(select(SRS).where(SRS.card_id == card.id))).scalar_one()
+        await db.delete(srs)
+        await db.delete(card)
+        await db.commit()
+        page = await SyncService(db).get_changes_after(last_seq)
+        assert [(change.entity_type, change.operation) for change in page.changes] == [("srs", "delete"), ("card", "delete")]
+
+    @pytest.mark.asyncio
+    async def test_recent_gap_holds_back_later_entries(self, db):
+        """Test that entries after a missing sequence number wait until it has settled"""
+        last_seq = (await log_entries(db))[-1].seq
+        now = datetime.utcnow()
+        db.add(SyncChangeLog(seq=last_seq + 2, entity_type="card", entity_id=(await db.execute(select(Card.id))).scalar(),
+                             operation="update", changes={"front": "Q"}, created_at=now))
+        await db.commit()
+        service = SyncService(db)
+
+        held = await service.get_changes_after(last_seq, now=now)
+        settled = await service.get_changes_after(last_seq, now=now + timedelta(minutes=5))
+
+        assert (held.changes, held.last_seq, held.has_more) == ([], last_seq, False)
+        assert settled.last_seq == last_seq + 2
+
+    @pytest.mark.asyncio
+    async def test_changes_since_time(self, db):
+        """Test that clients without a token pull the entries logged after their last sync"""
+        sync_time = datetime.utcnow() + timedelta(seconds=1)
+        for entry in await log_entries(db):
+            entry.created_at = sync_time - timedelta(hours=1)
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+        card.difficulty = 2.0
+        await db.flush()
+        (await log_entries(db))[-1].created_at = sync_time + timedelta(seconds=1)
+        await db.commit()
+
+        page = await SyncService(db).get_changes_since(sync_time, client_id="web", platform="web")
+
+        assert [(change.entity_type, change.data) for change in page.changes] == [("card", {"difficulty": 2.0})]
+
+
+class TestPullEndpoint:
+    """Test cases for POST /api/sync/pull"""
+
+    @pytest.mark.asyncio
+    async def test_full_then_delta(self, db):
+        """Test that a full pull returns a token from which deltas continue"""
+        full = await pull_changes(SyncRequest(client_id="phone", platform="ios"), db=db)
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+        card.front = "Changed"
+        await db.commit()
+
+        delta = await pull_changes(
+            SyncRequest(client_id="phone", platform="ios", sync_token=full.next_sync_token), db=db
+        )
+
+        assert full.stats["pulled_changes"] == 9
+        assert [(change.id, change.data) for change in delta.changes] == [(str(card.id), {"front": "Changed"})]
+        assert int(delta.next_sync_token) == int(full.next_sync_token) + 1
+        assert delta.has_more is False
+
+    @pytest.mark.asyncio
+    async def test_invalid_token(self, db):
+        """Test that a malformed token gives 400"""
+        with pytest.raises(HTTPException) as error:
+            await pull_changes(SyncRequest(client_id="phone", platform="ios", sync_token="abc"), db=db)
+
+        assert error.value.status_code == 400
+
+
+class TestRetention:
+    """Test cases for pruning the change log"""
+
+    @pytest.mark.asyncio
+    async def test_old_entries_are_pruned(self, db):
+        """Test that entries past the retention period are deleted, except the latest"""
+        now = datetime.utcnow()
+        entries = await log_entries(db)
+        for entry in entries:
+            entry.created_at = now - timedelta(days=settings.sync_change_log_retention_days + 1)
+        entries[-2].created_at = now
+        await db.commit()
+
+        deleted = await db.run_sync(lambda session: prune_change_log(session, now))
+
+        assert deleted == len(entries) - 2
+        assert [entry.seq for entry in await log_entries(db)] == [entry.seq for entry in entries[-2:]]
+
+    @pytest.mark.asyncio
+    async def test_pruned_history_needs_full_sync(self, db):
+        """Test that pulls after pruned entries give 410"""
+        entries = await log_entries(db)
+        await db.execute(delete(SyncChangeLog).where(SyncChangeLog.seq < entries[3].seq))
+        await db.commit()
+        service = SyncService(db)
+
+        await service.check_history(entries[2].seq)
+        with pytest.raises(SyncHistoryExpired):
+            await service.check_history(entries[1].seq)
+        with pytest.raises(SyncHistoryExpired):
+            await service.get_seq_before(datetime.utcnow() - timedelta(days=settings.sync_change_log_retention_days + 1))
+        with pytest.raises(HTTPException) as error:
+            await pull_changes(
+                SyncRequest(client_id="phone", platform="ios", sync_token=str(entries[1].seq)), db=db
+            )
+        assert error.value.status_code == 410
+
+    def test_prune_job_is_scheduled_daily(self, tmp_path, monkeypatch):
+        """Test that the pruning job is scheduled on the local queue"""
+        from app.services.queue_service import QueueService
+
+        monkeypatch.setattr(settings, "local_queue_path", str(tmp_path / "jobs.db"))
+        queue_service = QueueService(backend="local")
+
+        job_id = queue_service.schedule_sync_change_log_prune()
+
+        tomorrow = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
+        assert job_id == f"sync_change_log_prune_{tomorrow}"
+        assert queue_service.get_job_status(job_id)["status"] == "scheduled"
@@ -0,0 +1,175 @@
+"""
+Tests for the Merkle trees of synced entities
+"""
+
+import uuid
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.sync import get_merkle_bucket, get_merkle_buckets, validate_data_consistency
+from app.models.knowledge import Knowledge
+from app.models.learning import Card, SRS
+from app.models.sync import SyncEntityHash
+from app.services.sync_merkle import (
+    EMPTY_HASH,
+    MERKLE_BUCKETS,
+    MerkleTreeService,
+    entity_bucket,
+    repair_tree,
+    root_hash,
+)
+from app.services.sync_service import SyncService
+from tests.factories import add_card, add_knowledge, async_sqlite_engine, make_document
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """A chapter with 40 cards"""
+    engine = await async_sqlite_engine(tmp_path / "merkle.db")
+    session = async_sessionmaker(engine, expire_on_commit=False)()
+    document = make_document()
+    knowledge = add_knowledge(document.chapters[0])
+    for i in range(40):
+        add_card(knowledge, f"Q{i}", f"A{i}", srs={"due_date": datetime(2026, 1, 1)})
+    session.add(document)
+    await session.commit()
+    yield session
+    await session.close()
+    await engine.dispose()
+
+
+async def leaf_count(db, entity_type):
+    result = await db.execute(
+        select(func.count()).select_from(SyncEntityHash).where(SyncEntityHash.entity_type == entity_type)
+    )
+    return result.scalar()
+
+
+async def repair(db, entity_type):
+    return await db.run_sync(lambda session: repair_tree(session, entity_type))
+
+
+class TestIncrementalMaintenance:
+    """Test cases for trees kept current on write"""
+
+    @pytest.mark.asyncio
+    async def test_writes_keep_trees_current(self, db):
+        """Test that ORM, bulk and criteria writes update the trees like a rebuild"""
+        assert await leaf_count(db, "card") == 40
+
+        cards = list((await db.execute(select(Card).order_by(Card.front))).scalars())
+        cards[0].front = "Changed"
+        await db.delete((await db.execute(select(SRS).where(SRS.card_id == cards[1].id))).scalar_one())
+        await db.flush()
+        await db.delete(cards[1])
+        await db.flush()
+        await db.execute(update(SRS), [{"id": srs_id, "interval": 3} for srs_id in (await db.execute(select(SRS.id).limit(5))).scalars()])
+        stale = select(Card.id).where(Card.front.in_(["Q2", "Q3"]))
+        await db.execute(delete(SRS).where(SRS.card_id.in_(stale)).execution_options(synchronize_session=False))
+        await db.execute(delete(Card).where(Card.front.in_(["Q2", "Q3"])).execution_options(synchronize_session=False))
+        await db.commit()
+
+        assert await leaf_count(db, "card") == 37
+        assert await leaf_count(db, "srs") == 37
+        # Rehashing every entity finds nothing to repair
+        assert await repair(db, "card") == 0
+        assert await repair(db, "srs") == 0
+
+    @pytest.mark.asyncio
+    async def test_reverting_a_change_restores_the_root(self, db):
+        """Test that the root depends on entity data, not on history"""
+        service = MerkleTreeService(db)
+        root = await service.get_root("card")
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+
+        card.back = "Other"
+        await db.commit()
+        changed = await service.get_root("card")
+        card.back = "A" + card.front[1:]
+        await db.commit()
+
+        assert changed != root
+        assert await service.get_root("card") == root
+
+    @pytest.mark.asyncio
+    async def test_repair_fixes_untracked_rows(self, db):
+        """Test that rows written around the ORM are rehashed by the repair job, even at the same count"""
+        service = MerkleTreeService(db)
+        knowledge_id = (await db.execute(select(Knowledge.id))).scalar()
+        cards = list((await db.execute(select(Card.id).order_by(Card.front).limit(2))).scalars())
+        connection = await db.connection()
+        await connection.execute(insert(Card.__table__).values(
+            id=str(uuid.uuid4()), knowledge_id=str(knowledge_id), card_type="QA", front="Raw", back="Raw",
+            difficulty=1.0, created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        ))
+        await connection.execute(update(Card.__table__).where(Card.__table__.c.id == cards[0]).values(front="Raw edit"))
+        await connection.execute(delete(SRS.__table__).where(SRS.__table__.c.card_id == cards[1]))
+        await connection.execute(delete(Card.__table__).where(Card.__table__.c.id == cards[1]))
+        await db.commit()
+        stale_root = await service.get_root("card")
+
+        assert await repair(db, "card") == 3
+        assert await repair(db, "srs") == 1
+
+        assert await leaf_count(db, "card") == 40
+        assert await service.get_root("card") != stale_root
+        assert await repair(db, "card") == 0
+
+
+class TestTreeDescent:
+    """Test cases for finding divergent entities"""
+
+    @pytest.mark.asyncio
+    async def test_diff_descends_to_changed_entity(self, db):
+        """Test that a changed entity is found through its bucket"""
+        service = MerkleTreeService(db)
+        client_buckets = dict(enumerate(await service.get_bucket_hashes("card")))
+        client_leaves = {}
+        for bucket in range(MERKLE_BUCKETS):
+            client_leaves.update(await service.get_leaves("card", bucket))
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+        card.front = "Edited on the server"
+        await db.commit()
+
+        mismatched = await service.diff_buckets("card", client_buckets)
+
+        assert mismatched == [entity_bucket(card.id)]
+        leaves = await service.get_leaves("card", mismatched[0])
+        assert [entity_id for entity_id, value in leaves.items() if client_leaves[entity_id] != value] == [str(card.id)]
+        changes = await SyncService(db).get_bucket_changes("card", mismatched[0])
+        assert {change.id for change in changes} == set(leaves)
+        assert next(change for change in changes if change.id == str(card.id)).data["front"] == "Edited on the server"
+
+    @pytest.mark.asyncio
+    async def test_empty_tree(self, db):
+        """Test the root of a type without entities"""
+        buckets = await MerkleTreeService(db).get_bucket_hashes("figure")
+
+        assert buckets == [EMPTY_HASH] * MERKLE_BUCKETS
+        assert await SyncService(db).calculate_entity_checksum("figure", "web") == root_hash(buckets)
+        assert await SyncService(db).calculate_entity_checksum("unknown", "web") == ""
+
+
+class TestMerkleEndpoints:
+    """Test cases for the consistency endpoints"""
+
+    @pytest.mark.asyncio
+    async def test_validate_and_descend(self, db):
+        """Test that matching roots are consistent and a mismatch points at the tree"""
+        tree = await get_merkle_buckets("card", db=db)
+
+        result = await validate_data_consistency(
+            client_id="phone", entity_checksums={"card": tree["root"], "srs": "stale"}, db=db
+        )
+
+        assert result["entity_results"]["card"]["consistent"] is True
+        assert [item["entity_type"] for item in result["inconsistencies"]] == ["srs"]
+        assert result["inconsistencies"][0]["merkle_path"] == "/api/sync/merkle/srs"
+        assert result["recommendation"] == "full_sync"
+
+        bucket = next(i for i, value in enumerate(tree["buckets"]) if value != EMPTY_HASH)
+        detail = await get_merkle_bucket("card", bucket=bucket, include_data=True, db=db)
+        assert set(detail["leaves"]) == {entity["id"] for entity in detail["entities"]}
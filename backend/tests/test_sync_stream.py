@@ -0,0 +1,242 @@
+"""
+Tests for streamed sync payloads
+"""
+
+import json
+import zlib
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.sync import SyncRequest, perform_full_sync, pull_changes, router
+from app.core.database import get_async_db
+from app.models.learning import Card
+from app.services.sync_service import SyncService
+from app.services.sync_stream import (
+    compress_stream,
+    decode_sync_cursor,
+    ndjson_full_sync,
+    ndjson_pull,
+    negotiate_encoding,
+)
+from tests.factories import add_card, add_knowledge, async_sqlite_engine, make_document
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """Two chapters with 12 cards"""
+    engine = await async_sqlite_engine(tmp_path / "stream.db")
+    session = async_sessionmaker(engine, expire_on_commit=False)()
+    document = make_document(chapters=2, first_chapter=0)
+    for c, chapter in enumerate(document.chapters):
+        knowledge = add_knowledge(chapter, f"Fact {c}")
+        for i in range(6):
+            add_card(knowledge, f"Q{c}.{i}", srs={"due_date": datetime(2026, 1, 1)})
+    session.add(document)
+    await session.commit()
+    yield session
+    await session.close()
+    await engine.dispose()
+
+
+async def read_lines(chunks):
+    return [json.loads(line) async for line in _split(chunks)]
+
+
+async def _split(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestEncoding:
+    """Test cases for compression negotiation"""
+
+    @pytest.mark.parametrize("header, expected", [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "gzip"),
+        ("br;q=1.0, gzip;q=0.5", "gzip"),
+    ])
+    def test_negotiate(self, header, expected):
+        """Test that gzip is chosen when zstd is not available"""
+        assert negotiate_encoding(header) == expected
+
+    def test_zstd_preferred_when_available(self, monkeypatch):
+        """Test that zstd wins over gzip unless weighted lower"""
+        monkeypatch.setattr("app.services.sync_stream.ZSTD_AVAILABLE", True)
+
+        assert negotiate_encoding("gzip, zstd") == "zstd"
+        assert negotiate_encoding("gzip;q=1, zstd;q=0.8") == "gzip"
+
+    @pytest.mark.asyncio
+    async def test_gzip_stream_decodes_line_by_line(self):
+        """Test that each compressed chunk is decodable as it arrives"""
+        async def lines():
+            for i in range(3):
+                yield f'{{"n":{i}}}\n'.encode()
+
+        chunks = await collect(compress_stream(lines(), "gzip"))
+        decoder = zlib.decompressobj(wbits=31)
+
+        assert [decoder.decompress(chunk) for chunk in chunks[:3]] == [b'{"n":0}\n', b'{"n":1}\n', b'{"n":2}\n']
+        assert zlib.decompress(b"".join(chunks), wbits=31).count(b"\n") == 3
+
+
+class TestFullSyncStream:
+    """Test cases for streamed full syncs"""
+
+    @pytest.mark.asyncio
+    async def test_batches_by_entity_type(self, db):
+        """Test the start, batch and end lines"""
+        lines = await read_lines(ndjson_full_sync(SyncService(db), batch_size=5))
+
+        assert lines[0]["type"] == "start"
+        assert lines[-1] == {"type": "end", "next_sync_token": lines[0]["sync_token"], "total_changes": 29}
+        batches = lines[1:-1]
+        assert [(batch["entity_type"], len(batch["changes"])) for batch in batches] == [
+            ("document", 1), ("chapter", 2), ("knowledge", 2),
+            ("card", 5), ("card", 5), ("card", 2),
+            ("srs", 5), ("srs", 5), ("srs", 2),
+        ]
+        cards = [change for batch in batches if batch["entity_type"] == "card" for change in batch["changes"]]
+        assert [change["id"] for change in cards] == sorted(change["id"] for change in cards)
+
+    @pytest.mark.asyncio
+    async def test_resume_from_cursor(self, db):
+        """Test that a resumed stream continues after the last received batch"""
+        service = SyncService(db)
+        complete = await read_lines(ndjson_full_sync(service, batch_size=5))
+        interrupted_after = complete[4]
+        card = (await db.execute(select(Card).limit(1))).scalar_one()
+        card.front = "Changed meanwhile"
+        await db.commit()
+
+        resumed = await read_lines(ndjson_full_sync(service, cursor=interrupted_after["cursor"], batch_size=5))
+
+        ids = lambda lines: [c["id"] for line in lines if line["type"] == "batch" for c in line["changes"]]
+        assert ids(complete[1:5]) + ids(resumed) == ids(complete)
+        # The original token is kept, so the change is pulled afterwards
+        assert resumed[0]["sync_token"] == complete[0]["sync_token"]
+        assert decode_sync_cursor(interrupted_after["cursor"])[1] == "card"
+
+    @pytest.mark.asyncio
+    async def test_endpoint_streams_compressed(self, db):
+        """Test the streamed /full-sync response"""
+        response = await perform_full_sync(
+            client_id="phone", platform="ios", force=False, stream=True, cursor=None, batch_size=100,
+            accept_encoding="gzip", db=db
+        )
+        body = zlib.decompress(b"".join(await collect(response.body_iterator)), wbits=31)
+
+        assert response.media_type == "application/x-ndjson"
+        assert response.headers["content-encoding"] == "gzip"
+        assert [json.loads(line)["type"] for line in body.splitlines()][-1] == "end"
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, db):
+        """Test that a malformed cursor gives 400 before streaming"""
+        with pytest.raises(HTTPException) as error:
+            await perform_full_sync(
+                client_id="phone", platform="ios", force=False, stream=True, cursor="bogus", batch_size=None,
+                accept_encoding=None, db=db
+            )
+
+        assert error.value.status_code == 400
+
+
+class TestPullStream:
+    """Test cases for streamed delta pulls"""
+
+    @pytest.mark.asyncio
+    async def test_streams_every_page(self, db):
+        """Test that all change log pages are streamed with their tokens"""
+        lines = await read_lines(ndjson_pull(SyncService(db), 0, limit=10))
+
+        assert [len(line["changes"]) for line in lines[:-1]] == [10, 10, 9]
+        assert [line["next_sync_token"] for line in lines] == ["10", "20", "29", "29"]
+        assert lines[-1]["total_changes"] == 29
+
+    @pytest.mark.asyncio
+    async def test_endpoint(self, db):
+        """Test the streamed /pull response from a sync token"""
+        response = await pull_changes(
+            SyncRequest(client_id="phone", platform="ios", sync_token="25", stream=True),
+            accept_encoding=None, db=db
+        )
+
+        lines = await read_lines(response.body_iterator)
+        assert [change["version"] for change in lines[0]["changes"]] == [26, 27, 28, 29]
+
+
+def used_after_teardown(*args):
+    raise AssertionError("Request session used after the endpoint returned")
+
+
+class TestStreamingThroughApp:
+    """Test cases for streamed responses sent by the application"""
+
+    @pytest.fixture
+    def client(self, db):
+        """
+        App whose request sessions must not be used once the response has
+        started, as FastAPI 0.106-0.117 closes them before streaming
+        """
+        engine = create_async_engine(db.bind.url, poolclass=NullPool)
+        sessions = []
+
+        async def request_session():
+            session = AsyncSession(engine)
+            sessions.append(session)
+            try:
+                yield session
+            finally:
+                await session.close()
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_async_db] = request_session
+
+        @app.middleware("http")
+        async def close_sessions_when_endpoint_returns(request, call_next):
+            response = await call_next(request)
+            for session in sessions:
+                await session.close()
+                event.listen(session.sync_session, "after_begin", used_after_teardown)
+            return response
+
+        return TestClient(app)
+
+    def test_full_sync_streams_after_teardown(self, client):
+        """Test that a streamed full sync reads through its own session"""
+        with client.stream("POST", "/api/sync/full-sync", params={
+            "client_id": "phone", "platform": "ios", "stream": True, "batch_size": 5
+        }, headers={"Accept-Encoding": "gzip"}) as response:
+            lines = [json.loads(line) for line in response.iter_lines()]
+
+        assert response.status_code == 200
+        assert lines[-1] == {"type": "end", "next_sync_token": lines[0]["sync_token"], "total_changes": 29}
+
+    def test_pull_streams_after_teardown(self, client):
+        """Test that a streamed pull reads through its own session"""
+        with client.stream("POST", "/api/sync/pull", json={
+            "client_id": "phone", "platform": "ios", "sync_token": "20", "limit": 5, "stream": True
+        }) as response:
+            lines = [json.loads(line) for line in response.iter_lines()]
+
+        assert response.status_code == 200
+        assert [line["next_sync_token"] for line in lines] == ["25", "29", "29"]
@@ -218,8 +218,7 @@ def test_review_service_initialization():
         # Verify initialization
         assert review_service.db == mock_db
         assert hasattr(review_service, 'srs_service')
-        assert hasattr(review_service, '_active_sessions')
-        assert isinstance(review_service._active_sessions, dict)
+        assert hasattr(review_service, 'session_store')
         
         print("✓ ReviewService initializes correctly")
         return True
@@ -384,22 +383,23 @@ def test_concurrent_session_data_structure():
         mock_db = MockSession()
         review_service = ReviewService(mock_db)
         
-        # Verify _active_sessions is a dictionary
-        assert isinstance(review_service._active_sessions, dict)
-        assert len(review_service._active_sessions) == 0
+        from app.services.review_session_store import ReviewSessionState
         
-        # Test adding sessions to the dictionary
+        # Sessions are kept in the shared session store
+        store = review_service.session_store
         session_id_1 = str(uuid4())
         session_id_2 = str(uuid4())
         
         # Simulate adding sessions
-        review_service._active_sessions[session_id_1] = "mock_session_1"
-        review_service._active_sessions[session_id_2] = "mock_session_2"
+        for session_id, srs_ids in ((session_id_1, ["a", "b"]), (session_id_2, ["c"])):
+            assert store.save(ReviewSessionState(
+                session_id=session_id, user_id=None, status="active",
+                srs_ids=srs_ids, start_time=datetime.utcnow()
+            ))
         
         # Verify independent storage
-        assert len(review_service._active_sessions) == 2
-        assert review_service._active_sessions[session_id_1] == "mock_session_1"
-        assert review_service._active_sessions[session_id_2] == "mock_session_2"
+        assert store.get(session_id_1).srs_ids == ["a", "b"]
+        assert store.get(session_id_2).srs_ids == ["c"]
         
         print("✓ Concurrent session data structures are correct")
         return True
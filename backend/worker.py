@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 """
 RQ Worker startup script
+
+Starts a pool of pre-forked RQ workers. Models are loaded once in the parent
+process and shared with the forked workers, which reuse them across jobs.
+Workers are assigned to size-class queues within each class's concurrency
+limit, so large documents cannot occupy every worker. With the 'local' queue
+backend the workers take jobs from the embedded SQLite queue and no Redis
+server is needed.
 """
 
 import sys
+import argparse
 import logging
-from rq import Worker
 import redis
+from datetime import datetime
 
 from app.core.config import settings
+from app.services.job_scheduler import JobScheduler
+from app.services.local_queue import LocalJobStore
+from app.services.queue_service import QueueService
+from app.workers.pool import WorkerPool
 
 # Configure logging
 logging.basicConfig(
@@ -17,33 +29,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Queues every worker listens to before its size-class queues (priority order);
+# document_processing drains jobs enqueued before size-class routing
+SHARED_QUEUE_NAMES = ['priority_processing', 'document_processing']
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Start document processing workers")
+    parser.add_argument(
+        '--processes', '-n',
+        type=int,
+        default=settings.worker_processes,
+        help='Number of worker processes to fork'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['rq', 'local'],
+        default=settings.queue_backend,
+        help='Job queue backend'
+    )
+    parser.add_argument(
+        '--no-preload',
+        action='store_true',
+        help='Do not load NLP models before forking'
+    )
+    return parser.parse_args()
+
 
 def main():
-    """Start RQ worker"""
+    """Start RQ worker pool"""
+    args = parse_args()
     
-    logger.info("Starting RQ worker...")
+    logger.info(f"Starting {args.backend} worker...")
     
-    # Connect to Redis
+    # Connect to the job store
     try:
-        redis_conn = redis.from_url(settings.redis_url)
-        redis_conn.ping()  # Test connection
-        logger.info(f"Connected to Redis at {settings.redis_url}")
+        if args.backend == 'local':
+            store = LocalJobStore(settings.local_queue_path)
+            store.ping()
+            logger.info(f"Using local job queue at {settings.local_queue_path}")
+        else:
+            store = redis.from_url(settings.redis_url)
+            store.ping()  # Test connection
+            logger.info(f"Connected to Redis at {settings.redis_url}")
     except Exception as e:
-        logger.error(f"Failed to connect to Redis: {e}")
+        logger.error(f"Failed to connect to job store: {e}")
         sys.exit(1)
     
-    # Create worker that listens to both queues (priority first)
-    worker = Worker(
-        ['priority_processing', 'document_processing'],  # Queue names to listen to (priority order)
-        connection=redis_conn,
-        name='document-worker'
+    queue_plan = JobScheduler(store).plan_worker_queues(
+        args.processes, shared_queues=SHARED_QUEUE_NAMES
+    )
+    
+    # Build today's review queues now; each build schedules the next day's
+    if settings.review_queue_precompute:
+        try:
+            QueueService(args.backend).schedule_daily_review_queue_build(run_at=datetime.utcnow())
+        except Exception as e:
+            logger.warning(f"Could not schedule daily review queue build: {e}")
+    
+    # Prune the sync change log and hash untracked rows now; each run schedules the next day's
+    if settings.sync_change_log_enabled:
+        try:
+            QueueService(args.backend).schedule_sync_change_log_prune(run_at=datetime.utcnow())
+            QueueService(args.backend).schedule_merkle_tree_repair(run_at=datetime.utcnow())
+        except Exception as e:
+            logger.warning(f"Could not schedule sync maintenance: {e}")
+    
+    # Remove expired export files now; each run schedules the next hour's
+    try:
+        QueueService(args.backend).schedule_export_cleanup(run_at=datetime.utcnow())
+    except Exception as e:
+        logger.warning(f"Could not schedule export cleanup: {e}")
+    
+    pool = WorkerPool(
+        queue_plan,
+        redis_url=settings.redis_url,
+        preload_models=settings.worker_preload_models and not args.no_preload,
+        name='document-worker',
+        backend=args.backend,
+        local_queue_path=settings.local_queue_path
     )
     
-    logger.info("Worker started. Listening for jobs...")
+    logger.info(f"Worker pool started with {args.processes} processes. Listening for jobs...")
     
     try:
-        # Start worker (this blocks)
-        worker.work(with_scheduler=True)
+        # Start workers (this blocks)
+        pool.run()
     except KeyboardInterrupt:
         logger.info("Worker interrupted by user")
     except Exception as e:
@@ -54,4 +126,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()